@@ -19,6 +19,9 @@ from typing import Optional, List
 from fastapi import APIRouter, HTTPException, Query, Depends
 from pydantic import BaseModel
 
+from services.open_po_index import open_po_index, DEFAULT_AMOUNT_TOLERANCE
+from services.blob_store import blob_store
+
 logger = logging.getLogger(__name__)
 
 # Create router
@@ -151,7 +154,13 @@ async def search_purchase_orders(
     """
     Search open purchase orders from Business Central.
     Optionally filter by vendor.
+    
+    Served from the open PO index when it is loaded, otherwise from BC.
     """
+    if open_po_index.ready:
+        pos = open_po_index.for_vendor(vendor_id, limit) if vendor_id else open_po_index.all(limit)
+        return {"purchaseOrders": pos, "total": len(pos), "mock": False, "source": "index"}
+    
     if bc_service is None:
         from services.business_central_service import get_bc_service
         service = get_bc_service()
@@ -170,6 +179,54 @@ async def search_purchase_orders(
         raise HTTPException(status_code=500, detail=f"PO search failed: {str(e)}")
 
 
+@ap_review_router.get("/purchase-orders/suggest")
+async def suggest_purchase_orders(
+    amount: float = Query(..., description="Invoice total to match"),
+    vendor_id: Optional[str] = Query(None, description="Restrict to vendor number"),
+    tolerance: float = Query(DEFAULT_AMOUNT_TOLERANCE, ge=0, le=0.5, description="Allowed difference as a fraction of amount"),
+    limit: int = Query(10, le=50)
+):
+    """
+    Suggest open POs whose total is within tolerance of an amount, closest first.
+    Answered from the open PO index without calling BC.
+    """
+    if not open_po_index.ready:
+        raise HTTPException(status_code=503, detail="Open PO index is not loaded yet")
+    matches = open_po_index.suggest_by_amount(amount, tolerance, vendor_id, limit)
+    return {"purchaseOrders": matches, "total": len(matches), "source": "index"}
+
+
+@ap_review_router.get("/purchase-orders/index/status")
+async def open_po_index_status():
+    """Open PO index size and refresh times."""
+    return open_po_index.stats()
+
+
+@ap_review_router.post("/purchase-orders/index/refresh")
+async def refresh_open_po_index(full: bool = Query(False)):
+    """Refresh the open PO index now (incremental unless full=true)."""
+    if bc_service is None:
+        from services.business_central_service import get_bc_service
+        service = get_bc_service()
+    else:
+        service = bc_service
+    try:
+        return await open_po_index.refresh(service, full=full)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Open PO index refresh failed: {str(e)}")
+
+
+@ap_review_router.get("/purchase-orders/{po_number}")
+async def get_open_purchase_order(po_number: str):
+    """Look up an open PO by number in the open PO index."""
+    if not open_po_index.ready:
+        raise HTTPException(status_code=503, detail="Open PO index is not loaded yet")
+    po = open_po_index.get(po_number)
+    if not po:
+        raise HTTPException(status_code=404, detail=f"No open PO {po_number}")
+    return po
+
+
 # =============================================================================
 # AP REVIEW SAVE/UPDATE ENDPOINTS
 # =============================================================================
@@ -576,14 +633,15 @@ async def extract_invoice_data_endpoint(
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Get file path - check uploads directory
-    file_path = None
+    # Get file path - content-addressed blob store first
+    blob_path = await blob_store.local_path(doc.get("sha256_hash"))
+    file_path = str(blob_path) if blob_path else None
     
-    # Try to find file in uploads directory
+    # Try to find file in uploads directory (files stored before the blob store)
     upload_path = os.path.join(UPLOAD_DIR, doc_id)
-    if os.path.exists(upload_path):
+    if not file_path and os.path.exists(upload_path):
         file_path = upload_path
-    else:
+    elif not file_path:
         # Try with file extension
         file_name = doc.get("file_name", "")
         if file_name:
@@ -11,6 +11,8 @@ from pydantic import BaseModel
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from dependencies import get_database
+from services.config_cache import config_cache, MAILBOX_SOURCES, VENDOR_ALIASES
+from services.vendor_alias_index import normalize_vendor_name
 import uuid
 
 router = APIRouter(prefix="/config", tags=["config"])
@@ -75,6 +77,7 @@ async def create_mailbox(source: MailboxSource,
     
     await database.mailbox_sources.insert_one(mailbox)
     mailbox.pop("_id", None)
+    await config_cache.invalidate(MAILBOX_SOURCES)
     
     return mailbox
 
@@ -94,6 +97,7 @@ async def update_mailbox(mailbox_id: str, source: MailboxSource,
     }
     
     await database.mailbox_sources.update_one({"id": mailbox_id}, {"$set": update})
+    await config_cache.invalidate(MAILBOX_SOURCES)
     
     updated = await database.mailbox_sources.find_one({"id": mailbox_id}, {"_id": 0})
     return updated
@@ -107,6 +111,7 @@ async def delete_mailbox(mailbox_id: str,
     result = await database.mailbox_sources.delete_one({"id": mailbox_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Mailbox not found")
+    await config_cache.invalidate(MAILBOX_SOURCES)
     
     return {"message": "Mailbox deleted", "id": mailbox_id}
 
@@ -162,6 +167,7 @@ async def create_vendor_alias(
         "id": alias_id,
         "alias_string": alias_string,
         "alias_normalized": alias_string.lower().strip(),
+        "alias_key": normalize_vendor_name(alias_string),
         "canonical_vendor_no": canonical_vendor_no,
         "canonical_vendor_name": canonical_vendor_name,
         "usage_count": 0,
@@ -171,6 +177,7 @@ async def create_vendor_alias(
     
     await database.vendor_aliases.insert_one(alias)
     alias.pop("_id", None)
+    await config_cache.invalidate(VENDOR_ALIASES)
     
     return alias
 
@@ -183,6 +190,7 @@ async def delete_vendor_alias(alias_id: str,
     result = await database.vendor_aliases.delete_one({"id": alias_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Alias not found")
+    await config_cache.invalidate(VENDOR_ALIASES)
     
     return {"message": "Alias deleted", "id": alias_id}
 
@@ -4,10 +4,12 @@ SharePoint Migration API Routes
 REST API endpoints for the OneGamer to One_Gamer-Flat-Test SharePoint migration POC.
 """
 
+import json
 import logging
 import asyncio
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
@@ -17,7 +19,16 @@ from services.sharepoint_migration_service import (
     DEFAULT_SOURCE_LIBRARY,
     DEFAULT_SOURCE_FOLDER,
     DEFAULT_TARGET_SITE,
-    DEFAULT_TARGET_LIBRARY
+    DEFAULT_TARGET_LIBRARY,
+    AI_BATCH_SIZE,
+    AI_BATCH_CONCURRENCY,
+    LIST_CONCURRENCY,
+    MIGRATE_CONCURRENCY,
+    TRANSFER_MODES
+)
+from services.sharepoint_migration_runner import (
+    SharePointMigrationRunner,
+    TERMINAL_STATUSES
 )
 
 logger = logging.getLogger(__name__)
@@ -43,6 +54,13 @@ def get_service() -> SharePointMigrationService:
     return SharePointMigrationService(db)
 
 
+def get_runner() -> SharePointMigrationRunner:
+    """Get the migration run manager."""
+    if db is None:
+        raise HTTPException(status_code=500, detail="Database not initialized")
+    return SharePointMigrationRunner(db)
+
+
 # Request/Response Models
 
 class DiscoverRequest(BaseModel):
@@ -50,6 +68,9 @@ class DiscoverRequest(BaseModel):
     sourceSiteUrl: str = DEFAULT_SOURCE_SITE
     sourceLibraryName: str = DEFAULT_SOURCE_LIBRARY
     sourceFolderPath: str = DEFAULT_SOURCE_FOLDER
+    deltaToken: Optional[str] = None  # From a previous response; fetch only changes
+    trackChanges: bool = False  # Return a deltaToken for the next discovery
+    concurrency: int = LIST_CONCURRENCY
 
 
 class DiscoverResponse(BaseModel):
@@ -57,11 +78,17 @@ class DiscoverResponse(BaseModel):
     total_discovered: int
     new_candidates: int
     existing_candidates: int
+    removed_candidates: int = 0
+    mode: str = "full"
+    delta_token: Optional[str] = None
 
 
 class ClassifyRequest(BaseModel):
     """Request body for classification endpoint."""
     maxCount: int = 25
+    batchMode: bool = False  # Pack unmatched files into multi-file LLM requests
+    batchSize: int = AI_BATCH_SIZE
+    concurrency: int = AI_BATCH_CONCURRENCY
 
 
 class ClassifyResponse(BaseModel):
@@ -78,6 +105,8 @@ class MigrateRequest(BaseModel):
     targetLibraryName: str = DEFAULT_TARGET_LIBRARY
     maxCount: int = 20
     onlyIds: Optional[List[str]] = None
+    transferMode: str = "auto"  # auto (server-side copy, else stream), copy, stream
+    concurrency: int = MIGRATE_CONCURRENCY
 
 
 class MigrateResponse(BaseModel):
@@ -96,6 +125,19 @@ class ResetCandidatesRequest(BaseModel):
     force_all: bool = False  # If True, reset ALL files regardless of status
 
 
+class MigrationRunRequest(BaseModel):
+    """Request body for starting a resumable migration run."""
+    sourceSiteUrl: str = DEFAULT_SOURCE_SITE
+    sourceLibraryName: str = DEFAULT_SOURCE_LIBRARY
+    sourceFolderPath: str = DEFAULT_SOURCE_FOLDER
+    targetSiteUrl: str = DEFAULT_TARGET_SITE
+    targetLibraryName: str = DEFAULT_TARGET_LIBRARY
+    batchSize: int = 25
+    classifyBatchMode: bool = True
+    continuous: bool = False  # Keep discovering/migrating new files
+    pollIntervalSeconds: int = 300
+
+
 class CandidateUpdate(BaseModel):
     """Request body for updating a candidate - aligned with Excel metadata structure."""
     # NEW: Excel metadata fields
@@ -140,6 +182,8 @@ async def discover_candidates(request: DiscoverRequest):
     
     Creates migration_candidates records for each file found.
     Idempotent - running again will update existing records.
+    Pass the deltaToken from a previous response (requested with
+    trackChanges) to fetch only files changed since then.
     """
     service = get_service()
     logger.info(f"Discovery request: {request.sourceSiteUrl}/{request.sourceLibraryName}/{request.sourceFolderPath}")
@@ -148,7 +192,10 @@ async def discover_candidates(request: DiscoverRequest):
         result = await service.discover_candidates(
             source_site_url=request.sourceSiteUrl,
             source_library_name=request.sourceLibraryName,
-            source_folder_path=request.sourceFolderPath
+            source_folder_path=request.sourceFolderPath,
+            delta_token=request.deltaToken,
+            track_changes=request.trackChanges,
+            concurrency=request.concurrency
         )
         return DiscoverResponse(**result)
     except Exception as e:
@@ -163,12 +210,19 @@ async def classify_candidates(request: ClassifyRequest):
     
     Processes up to maxCount candidates and infers metadata.
     Sets status to 'ready_for_migration' if confidence >= 0.85.
+    With batchMode, files needing full AI classification are sent batchSize
+    at a time per LLM request, with up to `concurrency` requests in flight.
     """
     service = get_service()
-    logger.info(f"Classification request: maxCount={request.maxCount}")
+    logger.info(f"Classification request: maxCount={request.maxCount}, batchMode={request.batchMode}")
     
     try:
-        result = await service.classify_candidates(max_count=request.maxCount)
+        result = await service.classify_candidates(
+            max_count=request.maxCount,
+            batch_mode=request.batchMode,
+            batch_size=request.batchSize,
+            concurrency=request.concurrency
+        )
         return ClassifyResponse(**result)
     except Exception as e:
         logger.error(f"Classification error: {e}")
@@ -182,7 +236,8 @@ async def migrate_candidates(request: MigrateRequest, background_tasks: Backgrou
     
     Copies files and applies metadata columns.
     Idempotent - already migrated files are skipped.
-    For large files (videos), uses chunked upload.
+    Files are copied server-side by Graph where possible; otherwise they are
+    streamed from source to destination, with chunked upload for large files.
     
     Returns immediately and processes in background to avoid timeout.
     """
@@ -197,6 +252,9 @@ async def migrate_candidates(request: MigrateRequest, background_tasks: Backgrou
             metadata_errors=0
         )
     
+    if request.transferMode not in TRANSFER_MODES:
+        raise HTTPException(status_code=400, detail=f"transferMode must be one of {list(TRANSFER_MODES)}")
+    
     service = get_service()
     batch_size = min(request.maxCount or 10, 10)
     logger.info(f"Migration request: {request.targetSiteUrl}, maxCount={batch_size}")
@@ -210,7 +268,9 @@ async def migrate_candidates(request: MigrateRequest, background_tasks: Backgrou
                 target_site_url=request.targetSiteUrl,
                 target_library_name=request.targetLibraryName,
                 max_count=batch_size,
-                only_ids=request.onlyIds
+                only_ids=request.onlyIds,
+                transfer_mode=request.transferMode,
+                concurrency=request.concurrency
             )
             migration_status["last_result"] = result
             migration_status["processed"] = result.get("attempted", 0)
@@ -397,6 +457,31 @@ async def reset_candidates(request: ResetCandidatesRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class ApplyMetadataRequest(BaseModel):
+    """Request body for bulk metadata application."""
+    onlyIds: Optional[List[str]] = None
+    maxCount: int = 200
+
+
+@router.post("/apply-metadata")
+async def apply_metadata_bulk(request: ApplyMetadataRequest):
+    """
+    Apply metadata to many migrated files, 20 per Graph batch request.
+    
+    Without onlyIds, processes migrated files whose metadata write has not
+    succeeded yet.
+    """
+    service = get_service()
+    try:
+        return await service.apply_metadata_to_candidates(
+            candidate_ids=request.onlyIds,
+            max_count=request.maxCount
+        )
+    except Exception as e:
+        logger.error(f"Bulk metadata error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/apply-metadata/{candidate_id}")
 async def apply_metadata_to_existing(candidate_id: str):
     """
@@ -465,3 +550,109 @@ async def retry_failed_migrations(request: MigrateRequest):
     except Exception as e:
         logger.error(f"Error retrying failed migrations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# Resumable migration runs
+
+@router.post("/runs")
+async def start_migration_run(request: MigrationRunRequest):
+    """
+    Start a resumable discover -> classify -> migrate run in the background.
+    
+    Progress is persisted, so the run continues after a restart. Use
+    GET /runs/{run_id}/events to stream progress.
+    """
+    runner = get_runner()
+    run = await runner.create_run(
+        source_site_url=request.sourceSiteUrl,
+        source_library_name=request.sourceLibraryName,
+        source_folder_path=request.sourceFolderPath,
+        target_site_url=request.targetSiteUrl,
+        target_library_name=request.targetLibraryName,
+        batch_size=request.batchSize,
+        classify_batch_mode=request.classifyBatchMode,
+        continuous=request.continuous,
+        poll_interval_seconds=request.pollIntervalSeconds
+    )
+    runner.start(run["id"])
+    return {"run": run}
+
+
+@router.get("/runs")
+async def list_migration_runs(limit: int = Query(20, ge=1, le=100)):
+    """List migration runs, newest first."""
+    runs = await get_runner().list_runs(limit=limit)
+    return {"runs": runs, "count": len(runs)}
+
+
+@router.get("/runs/{run_id}")
+async def get_migration_run(run_id: str):
+    """Get a migration run with its phase, cursor and counters."""
+    run = await get_runner().get_run(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return {"run": run}
+
+
+@router.post("/runs/{run_id}/pause")
+async def pause_migration_run(run_id: str):
+    """Pause a run at its next batch boundary."""
+    if not await get_runner().request_action(run_id, "pause"):
+        raise HTTPException(status_code=409, detail="Run is not pending or running")
+    return {"success": True}
+
+
+@router.post("/runs/{run_id}/cancel")
+async def cancel_migration_run(run_id: str):
+    """Cancel a run at its next batch boundary."""
+    if not await get_runner().request_action(run_id, "cancel"):
+        raise HTTPException(status_code=409, detail="Run is already finished")
+    return {"success": True}
+
+
+@router.post("/runs/{run_id}/resume")
+async def resume_migration_run(run_id: str):
+    """Resume a paused or failed run from its saved position."""
+    if not await get_runner().resume_run(run_id):
+        raise HTTPException(status_code=409, detail="Run is not paused or failed")
+    return {"success": True}
+
+
+@router.get("/runs/{run_id}/events")
+async def stream_migration_run(
+    run_id: str,
+    interval: float = Query(2.0, ge=0.5, le=30, description="Seconds between progress checks")
+):
+    """
+    Stream run progress as Server-Sent Events.
+    
+    Emits a "progress" event whenever the run document changes and an "end"
+    event once the run is paused or finished.
+    """
+    runner = get_runner()
+    if not await runner.get_run(run_id):
+        raise HTTPException(status_code=404, detail="Run not found")
+    
+    async def event_stream():
+        last_update = None
+        while True:
+            run = await runner.get_run(run_id)
+            if run is None:
+                yield "event: end\ndata: {}\n\n"
+                return
+            if run.get("updated_utc") != last_update:
+                last_update = run.get("updated_utc")
+                yield f"event: progress\ndata: {json.dumps(run, default=str)}\n\n"
+            else:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+            if run.get("status") in TERMINAL_STATUSES or run.get("status") == "paused":
+                yield f"event: end\ndata: {json.dumps({'status': run.get('status')})}\n\n"
+                return
+            await asyncio.sleep(interval)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -16,6 +16,8 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 import uuid
 
+from services.customer_dashboard import build_customer_dashboard, customer_dashboard_cache
+
 # Create Sales API router
 sales_router = APIRouter(prefix="/api/sales", tags=["Sales"])
 
@@ -381,128 +383,17 @@ async def get_customer_dashboard(
     - Detailed inventory positions
     - Open orders list
     - Alerts (low stock, at-risk orders, lost business)
+    
+    Built with aggregations and cached briefly per (customer, warehouse);
+    file imports and seeding invalidate the cache.
     """
-    # Get customer
-    customer = await _db.sales_customers.find_one({"customer_id": customer_id}, {"_id": 0})
-    if not customer:
+    dashboard = await customer_dashboard_cache.get(
+        (customer_id, warehouse, days),
+        lambda: build_customer_dashboard(_db, customer_id, warehouse, days)
+    )
+    if dashboard is None:
         raise HTTPException(status_code=404, detail="Customer not found")
-    
-    # Build inventory query
-    inv_query = {"customer_id": customer_id}
-    if warehouse:
-        inv_query["warehouse_id"] = warehouse
-    
-    # Get inventory positions
-    inventory_docs = await _db.sales_inventory_positions.find(inv_query, {"_id": 0}).to_list(500)
-    
-    # Get items and warehouses for joining
-    items = {i["item_id"]: i for i in await _db.sales_items.find({}, {"_id": 0}).to_list(500)}
-    warehouses = {w["warehouse_id"]: w for w in await _db.sales_warehouses.find({}, {"_id": 0}).to_list(100)}
-    customer_items = {ci["item_id"]: ci for ci in await _db.sales_customer_items.find({"customer_id": customer_id}, {"_id": 0}).to_list(500)}
-    
-    # Enrich inventory positions with item/warehouse data
-    inventory_positions = []
-    summary = {"on_hand": 0, "allocated": 0, "available": 0, "on_water": 0, "on_order": 0}
-    
-    for inv in inventory_docs:
-        item = items.get(inv["item_id"], {})
-        wh = warehouses.get(inv["warehouse_id"], {})
-        ci = customer_items.get(inv["item_id"], {})
-        
-        enriched = {
-            **inv,
-            "item_no": item.get("item_no"),
-            "item_description": item.get("description"),
-            "customer_sku": ci.get("customer_sku"),
-            "warehouse_code": wh.get("code")
-        }
-        inventory_positions.append(enriched)
-        
-        # Accumulate summary
-        summary["on_hand"] += inv.get("qty_on_hand", 0)
-        summary["allocated"] += inv.get("qty_allocated", 0)
-        summary["available"] += inv.get("qty_available", 0)
-        summary["on_water"] += inv.get("qty_on_water", 0)
-        summary["on_order"] += inv.get("qty_on_order", 0)
-    
-    # Get open orders
-    order_query = {"customer_id": customer_id, "status": {"$nin": ["shipped", "closed"]}}
-    order_docs = await _db.sales_open_order_headers.find(order_query, {"_id": 0}).sort("order_date", -1).to_list(100)
-    
-    # Get order lines for totals
-    order_ids = [o["order_id"] for o in order_docs]
-    order_lines = await _db.sales_open_order_lines.find({"order_id": {"$in": order_ids}}, {"_id": 0}).to_list(1000)
-    
-    # Compute totals per order
-    order_totals = {}
-    for line in order_lines:
-        oid = line["order_id"]
-        if oid not in order_totals:
-            order_totals[oid] = {"total_qty": 0, "line_count": 0}
-        order_totals[oid]["total_qty"] += line.get("ordered_qty", 0)
-        order_totals[oid]["line_count"] += 1
-    
-    open_orders = []
-    for order in order_docs:
-        totals = order_totals.get(order["order_id"], {"total_qty": 0, "line_count": 0})
-        open_orders.append({
-            **order,
-            "total_qty": totals["total_qty"],
-            "line_count": totals["line_count"]
-        })
-    
-    # Generate alerts
-    alerts = []
-    
-    # Alert: Low stock (available < 20% of on_hand)
-    for inv in inventory_positions:
-        on_hand = inv.get("qty_on_hand", 0)
-        available = inv.get("qty_available", 0)
-        if on_hand > 0 and available < (on_hand * 0.2):
-            alerts.append({
-                "alert_type": "low_stock",
-                "severity": "warning" if available > 0 else "critical",
-                "message": f"Low stock: {inv.get('item_no', 'Unknown')} at {inv.get('warehouse_code', 'Unknown')} - {available:,.0f} available",
-                "item_id": inv["item_id"],
-                "details": {"available": available, "on_hand": on_hand}
-            })
-    
-    # Alert: At-risk orders (backordered lines)
-    backordered_lines = [ol for ol in order_lines if ol.get("line_status") == "backordered"]
-    for line in backordered_lines:
-        item = items.get(line["item_id"], {})
-        alerts.append({
-            "alert_type": "at_risk_order",
-            "severity": "warning",
-            "message": f"Backordered: {item.get('item_no', 'Unknown')} qty {line.get('ordered_qty', 0):,.0f}",
-            "order_id": line["order_id"],
-            "item_id": line["item_id"],
-            "details": {"line_id": line["order_line_id"], "qty": line.get("ordered_qty", 0)}
-        })
-    
-    # Alert: Recent lost business
-    cutoff_date = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
-    lost_count = await _db.sales_lost_business.count_documents({
-        "customer_id": customer_id,
-        "date": {"$gte": cutoff_date}
-    })
-    if lost_count > 0:
-        alerts.append({
-            "alert_type": "lost_business",
-            "severity": "warning",
-            "message": f"{lost_count} lost business record(s) in last {days} days",
-            "details": {"count": lost_count, "days": days}
-        })
-    
-    return {
-        "customer_id": customer_id,
-        "customer_name": customer.get("name"),
-        "account_manager": customer.get("account_manager"),
-        "summary": summary,
-        "inventory_positions": inventory_positions,
-        "open_orders": open_orders,
-        "alerts": alerts
-    }
+    return dashboard
 
 
 @sales_router.get("/customers/{customer_id}/open-orders")
@@ -641,6 +532,7 @@ async def seed_sales_data():
     await _db.sales_customer_items.delete_many({})
     await _db.sales_warehouses.delete_many({})
     await _db.sales_inventory_positions.delete_many({})
+    await _db.sales_inventory_snapshots.delete_many({})
     await _db.sales_open_order_headers.delete_many({})
     await _db.sales_open_order_lines.delete_many({})
     await _db.sales_lost_business.delete_many({})
@@ -668,6 +560,7 @@ async def seed_sales_data():
         await _db.sales_pricing_tiers.insert_many(seed["pricing_tiers"])
     if seed["draft_candidates"]:
         await _db.sales_order_draft_candidates.insert_many(seed["draft_candidates"])
+    customer_dashboard_cache.invalidate()
     
     return {
         "status": "success",
@@ -722,6 +615,8 @@ async def initialize_sales_indexes(database):
     await db.sales_open_order_headers.create_index("customer_id")
     await db.sales_open_order_headers.create_index("status")
     await db.sales_open_order_headers.create_index("customer_po_no")
+    # File imports upsert headers by PO within one ingestion
+    await db.sales_open_order_headers.create_index([("ingestion_id", 1), ("customer_po_no", 1)])
     
     # Open Order Lines
     await db.sales_open_order_lines.create_index("order_line_id", unique=True)
@@ -1057,20 +952,14 @@ async def ingest_sales_document(
     This is the main entry point for sales document ingestion.
     All documents land in NeedsReview status (shadow mode).
     """
-    import hashlib
-    import os
-    from pathlib import Path
+    from services.blob_store import blob_store
     
     doc_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
     
-    # Save file temporarily for classification
-    upload_dir = Path("/app/uploads/sales")
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    file_path = upload_dir / doc_id
-    
-    with open(file_path, 'wb') as f:
-        f.write(file_content)
+    # Store file (deduplicated by content hash) for classification
+    file_hash = await blob_store.put(file_content, doc_id)
+    file_path = await blob_store.local_path(file_hash)
     
     # Classify document with AI
     classification = await classify_sales_document_with_ai(
@@ -1112,7 +1001,7 @@ async def ingest_sales_document(
         "document_id": doc_id,
         "file_name": filename,
         "file_size": len(file_content),
-        "file_hash": hashlib.sha256(file_content).hexdigest(),
+        "file_hash": file_hash,
         "source": source,
         "document_type": doc_type,
         "ai_confidence": confidence,
@@ -1140,10 +1029,10 @@ async def ingest_sales_document(
     # Insert into database
     await _db.sales_documents.insert_one(document)
     
-    # Clean up temp file
+    # The file was only needed for classification; drop this document's reference
     try:
-        os.remove(file_path)
-    except:
+        await blob_store.release(file_hash, doc_id)
+    except Exception:
         pass
     
     return {
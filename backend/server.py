@@ -1,5 +1,5 @@
 from fastapi import FastAPI, APIRouter, UploadFile, File, Form, HTTPException, Query, Request, BackgroundTasks
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse
 from dotenv import load_dotenv
 load_dotenv()  # Load .env file before any os.environ calls
 from starlette.middleware.cors import CORSMiddleware
@@ -19,8 +19,8 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
-import httpx
 from dateutil import parser as date_parser
+from pymongo import UpdateOne
 
 # Sales Module (Phase 0)
 from sales_module import (
@@ -38,6 +38,7 @@ from sales_module import (
 from services.file_ingestion_service import (
     file_ingestion_service, set_file_ingestion_db, IngestionType
 )
+from services.inventory_snapshots import inventory_snapshot_store
 
 # Workflow Engine Service
 from services.workflow_engine import (
@@ -55,7 +56,7 @@ from services.bc_sandbox_service import (
 # Migration Service
 from services.migration import (
     MigrationJob, MigrationResult, LegacyDocumentSource, 
-    JsonFileSource, InMemorySource, WorkflowInitializer
+    JsonFileSource, InMemorySource, WorkflowInitializer, open_file_source
 )
 from services.migration.job import MigrationMode, MigrationJobBuilder
 from services.migration.sources import create_sample_migration_file
@@ -136,6 +137,11 @@ api_router = APIRouter(prefix="/api")
 _email_polling_task = None
 _sales_polling_task = None
 _pilot_summary_task = None
+_migration_run_supervisor_task = None
+_open_po_index_task = None
+_graph_notification_workers_task = None
+_config_version_task = None
+_graph_subscription_task = None
 
 # ==================== AUTH ====================
 # NOTE: Auth endpoints moved to routes/auth.py
@@ -144,6 +150,19 @@ from routes.auth import router as auth_router
 # ==================== AP REVIEW ====================
 from routes.ap_review import ap_review_router, set_dependencies as set_ap_review_deps
 from services.business_central_service import BusinessCentralService, get_bc_service
+from services.resilience import resilient_client, get_resilience_stats, render_prometheus
+from services.bc_lookup_cache import bc_lookup_cache, FOUND as CACHE_FOUND, NOT_FOUND as CACHE_NOT_FOUND
+from services.open_po_index import open_po_index, run_open_po_index_refresher
+from services.sharepoint_storage import SharePointStorage
+from services.audit_writer import audit_writer
+from services.blob_store import blob_store
+from services.file_serving import file_response
+from services.thumbnails import thumbnail_renderer
+from services.config_cache import config_cache, JOB_TYPES, MAILBOX_SOURCES, EMAIL_WATCHER, VENDOR_ALIASES, SHADOW_MODE
+from services.vendor_alias_index import vendor_alias_index, normalize_vendor_name, alias_target
+from services.graph_notification_queue import (
+    GraphNotificationQueue, SubscriptionManager, GRAPH_WEBHOOK_CLIENT_STATE, SUBSCRIPTION_LIFETIME, valid_client_state
+)
 
 # ==================== AUTO-POST SERVICE ====================
 from services.auto_post_service import (
@@ -159,6 +178,10 @@ from services.auto_post_service import (
 # ==================== SHAREPOINT MIGRATION ====================
 from routes.sharepoint_migration import router as sharepoint_migration_router
 import routes.sharepoint_migration as sharepoint_migration_module
+from services.sharepoint_migration_runner import (
+    run_supervisor as run_migration_supervisor,
+    stop_active_runs as stop_migration_runs
+)
 
 # ==================== SPIRO INTEGRATION ====================
 from routes.spiro import spiro_router
@@ -221,7 +244,7 @@ MOCK_SALES_ORDERS = [
 async def get_graph_token():
     if DEMO_MODE or not GRAPH_CLIENT_ID:
         return "mock-graph-token"
-    async with httpx.AsyncClient() as c:
+    async with resilient_client() as c:
         resp = await c.post(f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token",
             data={"grant_type": "client_credentials", "client_id": GRAPH_CLIENT_ID, "client_secret": GRAPH_CLIENT_SECRET, "scope": "https://graph.microsoft.com/.default"})
         data = resp.json()
@@ -238,7 +261,7 @@ async def get_email_token():
     
     if DEMO_MODE or not client_id:
         return "mock-email-token"
-    async with httpx.AsyncClient() as c:
+    async with resilient_client() as c:
         resp = await c.post(f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token",
             data={"grant_type": "client_credentials", "client_id": client_id, "client_secret": client_secret, "scope": "https://graph.microsoft.com/.default"})
         data = resp.json()
@@ -250,7 +273,7 @@ async def get_email_token():
 async def get_bc_token():
     if DEMO_MODE or not BC_CLIENT_ID:
         return "mock-bc-token"
-    async with httpx.AsyncClient() as c:
+    async with resilient_client() as c:
         resp = await c.post(f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token",
             data={"grant_type": "client_credentials", "client_id": BC_CLIENT_ID, "client_secret": BC_CLIENT_SECRET, "scope": "https://api.businesscentral.dynamics.com/.default"})
         data = resp.json()
@@ -259,86 +282,46 @@ async def get_bc_token():
             raise Exception(f"BC token error: {error_desc}")
         return data["access_token"]
 
-async def upload_to_sharepoint(file_content: bytes, file_name: str, folder: str):
-    if DEMO_MODE or not GRAPH_CLIENT_ID:
-        item_id = str(uuid.uuid4())
-        drive_id = "mock-drive-" + str(uuid.uuid4())[:8]
-        return {
-            "drive_id": drive_id, "item_id": item_id,
-            "web_url": f"https://{SHAREPOINT_SITE_HOSTNAME}{SHAREPOINT_SITE_PATH}/{SHAREPOINT_LIBRARY_NAME}/{folder}/{file_name}",
-            "name": file_name
-        }
-    token = await get_graph_token()
-    async with httpx.AsyncClient(timeout=30.0) as c:
-        # Step 1: Resolve site (format: sites/{hostname}:/{server-relative-path}:)
-        site_resp = await c.get(
-            f"https://graph.microsoft.com/v1.0/sites/{SHAREPOINT_SITE_HOSTNAME}:{SHAREPOINT_SITE_PATH}:",
-            headers={"Authorization": f"Bearer {token}"})
-        site_data = site_resp.json()
-        if site_resp.status_code == 401 or site_resp.status_code == 403:
-            raise Exception(
-                f"Graph API permission denied (HTTP {site_resp.status_code}). "
-                f"The app registration needs 'Sites.ReadWrite.All' (Application) permission with admin consent. "
-                f"Go to Azure Portal > App Registrations > {GRAPH_CLIENT_ID} > API Permissions > Add 'Sites.ReadWrite.All' > Grant admin consent."
-            )
-        if site_resp.status_code == 404 or "id" not in site_data:
-            error = site_data.get("error", {})
-            raise Exception(
-                f"SharePoint site not found (HTTP {site_resp.status_code}). "
-                f"Check SHAREPOINT_SITE_HOSTNAME='{SHAREPOINT_SITE_HOSTNAME}' and SHAREPOINT_SITE_PATH='{SHAREPOINT_SITE_PATH}'. "
-                f"Detail: {error.get('message', error.get('code', 'unknown'))}"
-            )
-        if "id" not in site_data:
-            raise Exception(f"Unexpected Graph response: {str(site_data)[:200]}")
-        site_id = site_data["id"]
+_sharepoint_storage = SharePointStorage(
+    get_graph_token, SHAREPOINT_SITE_HOSTNAME, SHAREPOINT_SITE_PATH, SHAREPOINT_LIBRARY_NAME,
+    client_id=GRAPH_CLIENT_ID
+)
 
-        # Step 2: Resolve drive
-        drives_resp = await c.get(
-            f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives",
-            headers={"Authorization": f"Bearer {token}"})
-        drives_data = drives_resp.json()
-        if drives_resp.status_code in (401, 403):
-            raise Exception(f"Graph permission denied listing drives (HTTP {drives_resp.status_code}). Ensure 'Sites.ReadWrite.All' permission is granted.")
-        if "error" in drives_data:
-            raise Exception(f"Drive list error: {drives_data['error'].get('message', drives_data['error'])}")
-        drives = drives_data.get("value", [])
-        drive = next((d for d in drives if d["name"] == SHAREPOINT_LIBRARY_NAME), drives[0] if drives else None)
-        if not drive:
-            raise Exception(f"Document library '{SHAREPOINT_LIBRARY_NAME}' not found. Available: {[d['name'] for d in drives]}")
-        drive_id = drive["id"]
-
-        # Step 3: Upload file
-        upload_resp = await c.put(
-            f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{folder}/{file_name}:/content",
-            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/octet-stream"},
-            content=file_content)
-        item = upload_resp.json()
-        if upload_resp.status_code in (401, 403):
-            raise Exception(f"Upload permission denied (HTTP {upload_resp.status_code}). Ensure app has 'Files.ReadWrite.All' or 'Sites.ReadWrite.All'.")
-        if "id" not in item:
-            error = item.get("error", {})
-            raise Exception(f"Upload failed (HTTP {upload_resp.status_code}): {error.get('message', error.get('code', item))}")
-        return {"drive_id": drive_id, "item_id": item["id"], "web_url": item.get("webUrl", ""), "name": file_name}
+def _mock_sharepoint_result(file_name: str, folder: str):
+    item_id = str(uuid.uuid4())
+    drive_id = "mock-drive-" + str(uuid.uuid4())[:8]
+    return {
+        "drive_id": drive_id, "item_id": item_id,
+        "web_url": f"https://{SHAREPOINT_SITE_HOSTNAME}{SHAREPOINT_SITE_PATH}/{SHAREPOINT_LIBRARY_NAME}/{folder}/{file_name}",
+        "name": file_name
+    }
+
+async def upload_and_share(file_content: Optional[bytes], file_name: str, folder: str, file_path: Optional[Path] = None):
+    """
+    Upload a file and create its organization view link.
+
+    Small files go up with the link in one Graph $batch call; large files use
+    a resumable upload session. Returns (sp_result, share_link); sp_result
+    includes uploaded_utc, when the upload step finished.
+    """
+    if DEMO_MODE or not GRAPH_CLIENT_ID:
+        sp_result = _mock_sharepoint_result(file_name, folder)
+        sp_result["uploaded_utc"] = datetime.now(timezone.utc).isoformat()
+        return sp_result, await create_sharing_link(sp_result["drive_id"], sp_result["item_id"])
+    result = await _sharepoint_storage.upload(file_name, folder, content=file_content, file_path=file_path)
+    share_link = result.pop("share_link")
+    return result, share_link
 
 async def create_sharing_link(drive_id: str, item_id: str):
     if DEMO_MODE or not GRAPH_CLIENT_ID:
         return f"https://{SHAREPOINT_SITE_HOSTNAME}/:b:/s/GPI-DocumentHub-Test/{item_id[:8]}"
-    token = await get_graph_token()
-    async with httpx.AsyncClient(timeout=30.0) as c:
-        resp = await c.post(
-            f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{item_id}/createLink",
-            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
-            json={"type": "view", "scope": "organization"})
-        data = resp.json()
-        if "error" in data:
-            raise Exception(f"Sharing link error: {data['error'].get('message', data['error'])}")
-        return data.get("link", {}).get("webUrl", "")
+    return await _sharepoint_storage.create_link(drive_id, item_id)
 
 async def get_bc_companies():
     if DEMO_MODE or not BC_CLIENT_ID:
         return MOCK_COMPANIES
     token = await get_bc_token()
-    async with httpx.AsyncClient(timeout=30.0) as c:
+    async with resilient_client(timeout=30.0) as c:
         resp = await c.get(
             f"https://api.businesscentral.dynamics.com/v2.0/{TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies",
             headers={"Authorization": f"Bearer {token}"})
@@ -368,7 +351,7 @@ async def get_bc_sales_orders(order_no: str = None):
     if not companies:
         raise Exception("No BC companies found")
     company_id = companies[0]["id"]
-    async with httpx.AsyncClient(timeout=30.0) as c:
+    async with resilient_client(timeout=30.0) as c:
         url = f"https://api.businesscentral.dynamics.com/v2.0/{TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/salesOrders"
         if order_no:
             url += f"?$filter=contains(number,'{order_no}')"
@@ -411,7 +394,7 @@ async def link_document_to_bc(bc_record_id: str, share_link: str, file_name: str
     
     company_id = companies[0]["id"]
     
-    async with httpx.AsyncClient(timeout=60.0) as c:
+    async with resilient_client(timeout=60.0) as c:
         # Step 1: Create the attachment metadata record
         # Using documentAttachments entity bound to the specified bc_entity
         attach_url = f"https://api.businesscentral.dynamics.com/v2.0/{TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/{bc_entity}({bc_record_id})/documentAttachments"
@@ -532,7 +515,7 @@ async def check_duplicate_purchase_invoice(vendor_no: str, external_doc_no: str,
         return {"found": False, "method": "demo"}
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as c:
+        async with resilient_client(timeout=30.0) as c:
             # Check for existing purchase invoices with same vendor + external doc no
             # This checks both posted and unposted invoices
             filter_query = f"vendorNumber eq '{vendor_no}' and vendorInvoiceNumber eq '{external_doc_no}'"
@@ -623,7 +606,7 @@ async def create_purchase_invoice_header(
             return {"success": False, "error": f"Failed to get BC token/company: {str(e)}"}
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as c:
+        async with resilient_client(timeout=60.0) as c:
             # Build invoice header payload - HEADER FIELDS ONLY
             today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
             
@@ -682,6 +665,10 @@ async def create_purchase_invoice_header(
             invoice_id = invoice_data.get("id")
             invoice_no = invoice_data.get("number")
             
+            # Cached invoice and PO lookups may now be stale
+            bc_lookup_cache.invalidate("purchase_invoice")
+            bc_lookup_cache.invalidate("purchase_order")
+            
             if not invoice_id:
                 return {
                     "success": False,
@@ -792,7 +779,7 @@ def is_eligible_for_draft_creation(
 
 # ==================== WORKFLOW ENGINE ====================
 
-async def run_upload_and_link_workflow(doc_id: str, file_content: bytes, file_name: str, doc_type: str, bc_record_id: str = None, bc_document_no: str = None):
+async def run_upload_and_link_workflow(doc_id: str, file_content: bytes, file_name: str, doc_type: str, bc_record_id: str = None, bc_document_no: str = None, file_path: Optional[Path] = None):
     workflow_id = str(uuid.uuid4())
     correlation_id = str(uuid.uuid4())
     started = datetime.now(timezone.utc).isoformat()
@@ -812,18 +799,14 @@ async def run_upload_and_link_workflow(doc_id: str, file_content: bytes, file_na
         folder = FOLDER_MAP.get(doc_type, "Incoming")
         step1_start = datetime.now(timezone.utc).isoformat()
         steps.append({"step": "upload_to_sharepoint", "status": "running", "started": step1_start})
-        sp_result = await upload_to_sharepoint(file_content, file_name, folder)
+        # Step 2: Create sharing link - sent with the upload, streamed from the stored file
+        sp_result, share_link = await upload_and_share(file_content, file_name, folder, file_path=file_path)
+        uploaded = sp_result["uploaded_utc"]
         steps[-1]["status"] = "completed"
-        steps[-1]["ended"] = datetime.now(timezone.utc).isoformat()
+        steps[-1]["ended"] = uploaded
         steps[-1]["result"] = {"drive_id": sp_result["drive_id"], "item_id": sp_result["item_id"], "folder": folder}
-
-        # Step 2: Create sharing link
-        step2_start = datetime.now(timezone.utc).isoformat()
-        steps.append({"step": "create_sharing_link", "status": "running", "started": step2_start})
-        share_link = await create_sharing_link(sp_result["drive_id"], sp_result["item_id"])
-        steps[-1]["status"] = "completed"
-        steps[-1]["ended"] = datetime.now(timezone.utc).isoformat()
-        steps[-1]["result"] = {"share_link": share_link}
+        steps.append({"step": "create_sharing_link", "status": "completed", "started": uploaded,
+                      "ended": datetime.now(timezone.utc).isoformat(), "result": {"share_link": share_link}})
 
         # Step 3: Validate and link BC record
         bc_linked = False
@@ -892,7 +875,7 @@ async def run_upload_and_link_workflow(doc_id: str, file_content: bytes, file_na
             "steps": steps, "correlation_id": correlation_id, 
             "error": bc_error
         }
-        await db.hub_workflow_runs.insert_one(workflow)
+        await audit_writer.insert(db, "hub_workflow_runs", workflow)
         return workflow_id, new_status
 
     except Exception as e:
@@ -902,7 +885,7 @@ async def run_upload_and_link_workflow(doc_id: str, file_content: bytes, file_na
             "started_utc": started, "ended_utc": datetime.now(timezone.utc).isoformat(),
             "status": "Failed", "steps": steps, "correlation_id": correlation_id, "error": str(e)
         }
-        await db.hub_workflow_runs.insert_one(workflow)
+        await audit_writer.insert(db, "hub_workflow_runs", workflow)
         await db.hub_documents.update_one({"id": doc_id}, {"$set": {
             "status": "Exception", "last_error": str(e), "updated_utc": datetime.now(timezone.utc).isoformat()
         }})
@@ -910,10 +893,22 @@ async def run_upload_and_link_workflow(doc_id: str, file_content: bytes, file_na
 
 # ==================== DOCUMENT ENDPOINTS ====================
 
-# Upload storage path
+# Upload storage path (files from before the blob store are still read from here)
 UPLOAD_DIR = ROOT_DIR / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+async def stored_file_path(doc: dict) -> Optional[Path]:
+    """Local path of a document's file: its content-addressed blob, or a legacy UPLOAD_DIR/<doc_id> file."""
+    path = await blob_store.local_path(doc.get("sha256_hash"))
+    if path:
+        return path
+    legacy_path = UPLOAD_DIR / doc["id"]
+    return legacy_path if legacy_path.exists() else None
+
+async def read_stored_file(doc: dict) -> Optional[bytes]:
+    path = await stored_file_path(doc)
+    return await asyncio.to_thread(path.read_bytes) if path else None
+
 @api_router.post("/documents/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -924,13 +919,12 @@ async def upload_document(
     source: str = Form("manual_upload")
 ):
     file_content = await file.read()
-    sha256_hash = hashlib.sha256(file_content).hexdigest()
     doc_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
 
-    # Persist file to disk for potential resubmit
-    file_path = UPLOAD_DIR / doc_id
-    file_path.write_bytes(file_content)
+    # Persist file (deduplicated by content hash) for potential resubmit
+    sha256_hash = await blob_store.put(file_content, doc_id)
+    file_path = await blob_store.local_path(sha256_hash)
 
     # Determine doc_type from document_type parameter
     doc_type_value = DocumentClassifier.classify_from_ai_result(document_type or "").value if document_type else DocType.OTHER.value
@@ -973,9 +967,10 @@ async def upload_document(
         **get_pilot_metadata()
     }
     await db.hub_documents.insert_one(doc)
+    thumbnail_renderer.enqueue(doc_id)
 
     workflow_id, final_status = await run_upload_and_link_workflow(
-        doc_id, file_content, file.filename, document_type, bc_record_id, bc_document_no
+        doc_id, file_content, file.filename, document_type, bc_record_id, bc_document_no, file_path=file_path
     )
     updated_doc = await db.hub_documents.find_one({"id": doc_id}, {"_id": 0})
     return {"document": updated_doc, "workflow_id": workflow_id}
@@ -1025,39 +1020,54 @@ async def delete_document(doc_id: str):
         raise HTTPException(status_code=404, detail="Document not found")
     await db.hub_documents.delete_one({"id": doc_id})
     await db.hub_workflow_runs.delete_many({"document_id": doc_id})
-    file_path = UPLOAD_DIR / doc_id
-    if file_path.exists():
-        file_path.unlink()
+    # Blobs themselves are removed once no other document references them
+    await thumbnail_renderer.release(doc)
+    await blob_store.release(doc.get("sha256_hash"), doc_id)
+    legacy_path = UPLOAD_DIR / doc_id
+    if legacy_path.exists():
+        legacy_path.unlink()
     return {"message": "Document deleted", "id": doc_id}
 
 
-@api_router.get("/documents/{doc_id}/file")
-async def get_document_file(doc_id: str):
+@api_router.api_route("/documents/{doc_id}/file", methods=["GET", "HEAD"])
+async def get_document_file(doc_id: str, request: Request):
     """
     Serve the document file for preview/download.
-    Returns the raw file with appropriate content type.
+    Returns the raw file with appropriate content type. Supports byte ranges
+    and conditional requests; the ETag is the document's content hash, so
+    repeat opens are answered from the browser cache or with 304.
     """
-    from fastapi.responses import FileResponse
-    
     doc = await db.hub_documents.find_one({"id": doc_id}, {"_id": 0})
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    file_path = UPLOAD_DIR / doc_id
-    if not file_path.exists():
+    file_path = await stored_file_path(doc)
+    if not file_path:
         raise HTTPException(status_code=404, detail="File not found on disk")
     
-    content_type = doc.get("content_type", "application/octet-stream")
-    filename = doc.get("file_name", f"{doc_id}.bin")
+    content_type = doc.get("content_type") or "application/octet-stream"
+    filename = doc.get("file_name") or f"{doc_id}.bin"
     
-    return FileResponse(
-        path=file_path,
-        media_type=content_type,
-        filename=filename,
-        headers={
-            "Content-Disposition": f'inline; filename="{filename}"'
-        }
-    )
+    return file_response(request, file_path, content_type, filename, sha256=doc.get("sha256_hash"))
+
+
+@api_router.api_route("/documents/{doc_id}/thumbnail", methods=["GET", "HEAD"])
+async def get_document_thumbnail(doc_id: str, request: Request, page: int = Query(1, ge=1)):
+    """
+    Serve a small JPEG preview of a document page (first page by default).
+    Rendered at intake; documents without thumbnails yet are rendered now.
+    """
+    doc = await db.hub_documents.find_one({"id": doc_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    thumbnails = await thumbnail_renderer.ensure(doc)
+    thumbnail = next((t for t in thumbnails if t["page"] == page), None)
+    thumbnail_path = await blob_store.local_path(thumbnail["sha256"]) if thumbnail else None
+    if not thumbnail_path:
+        raise HTTPException(status_code=404, detail="No preview available for this page")
+    
+    return file_response(request, thumbnail_path, "image/jpeg", f"{doc_id}-page{page}.jpg", sha256=thumbnail["sha256"])
 
 
 # =============================================================================
@@ -1116,8 +1126,8 @@ async def retry_document(doc_id: str, reason: str = "Manual retry"):
         }
     
     # Re-run workflow (using existing resubmit logic)
-    file_path = UPLOAD_DIR / doc_id
-    if not file_path.exists():
+    file_path = await stored_file_path(doc)
+    if not file_path:
         return {
             "success": False,
             "message": "Stored file not found - cannot retry",
@@ -1125,14 +1135,14 @@ async def retry_document(doc_id: str, reason: str = "Manual retry"):
         }
     
     # Read file and re-run workflow
-    file_content = file_path.read_bytes()
+    file_content = await asyncio.to_thread(file_path.read_bytes)
     file_name = doc.get("file_name", f"{doc_id}.pdf")
     document_type = doc.get("document_type", "Invoice")
     bc_record_id = doc.get("bc_record_id")
     bc_document_no = doc.get("bc_document_no")
     
     workflow_id, final_status = await run_upload_and_link_workflow(
-        doc_id, file_content, file_name, document_type, bc_record_id, bc_document_no
+        doc_id, file_content, file_name, document_type, bc_record_id, bc_document_no, file_path=file_path
     )
     
     # Update Square9 stage after workflow
@@ -1226,10 +1236,10 @@ async def resubmit_document(doc_id: str):
         raise HTTPException(status_code=404, detail="Document not found")
 
     # Read stored file from disk
-    file_path = UPLOAD_DIR / doc_id
-    if not file_path.exists():
+    file_path = await stored_file_path(doc)
+    if not file_path:
         raise HTTPException(status_code=400, detail="Original file not found on server. Please upload again via the Upload page.")
-    file_content = file_path.read_bytes()
+    file_content = await asyncio.to_thread(file_path.read_bytes)
     now = datetime.now(timezone.utc).isoformat()
 
     # Reset document status
@@ -1248,7 +1258,8 @@ async def resubmit_document(doc_id: str):
         doc_id, file_content, doc["file_name"],
         doc.get("document_type", "Other"),
         doc.get("bc_record_id"),
-        doc.get("bc_document_no")
+        doc.get("bc_document_no"),
+        file_path=file_path
     )
 
     updated_doc = await db.hub_documents.find_one({"id": doc_id}, {"_id": 0})
@@ -1267,17 +1278,14 @@ async def link_document(doc_id: str):
         raise HTTPException(status_code=400, detail="No BC record reference set on this document")
 
     # Load the stored file for attachment
-    file_path = UPLOAD_DIR / doc_id
-    file_content = None
-    if file_path.exists():
-        file_content = file_path.read_bytes()
+    file_content = await read_stored_file(doc)
 
     # Determine BC entity from document type or job_type
     doc_type = doc.get("document_type", "Other")
     job_type = doc.get("suggested_job_type", "")
     
     # Try to get bc_entity from job config first
-    job_config = await db.hub_job_types.find_one({"job_type": job_type}, {"_id": 0})
+    job_config = await config_cache.job_type(job_type)
     if job_config:
         bc_entity = job_config.get("bc_entity", "salesOrders")
     else:
@@ -1334,7 +1342,7 @@ async def link_document(doc_id: str):
             "status": wf_status, "steps": steps, "correlation_id": correlation_id,
             "error": None if wf_status == "Completed" else steps[-1].get("error", "BC record not found")
         }
-        await db.hub_workflow_runs.insert_one(workflow)
+        await audit_writer.insert(db, "hub_workflow_runs", workflow)
     except Exception as e:
         steps.append({"step": "error", "status": "failed", "error": str(e)})
         workflow = {
@@ -1342,7 +1350,7 @@ async def link_document(doc_id: str):
             "started_utc": started, "ended_utc": datetime.now(timezone.utc).isoformat(),
             "status": "Failed", "steps": steps, "correlation_id": correlation_id, "error": str(e)
         }
-        await db.hub_workflow_runs.insert_one(workflow)
+        await audit_writer.insert(db, "hub_workflow_runs", workflow)
 
     doc = await db.hub_documents.find_one({"id": doc_id}, {"_id": 0})
     return {"document": doc, "workflow_id": workflow_id}
@@ -2020,7 +2028,7 @@ async def test_connection(service: str = Query(...)):
             if token == "mock-graph-token":
                 return {"service": "graph", "status": "demo", "detail": "Running in demo mode"}
             # Test site resolution (format: sites/{hostname}:/{server-relative-path}:)
-            async with httpx.AsyncClient(timeout=15.0) as c:
+            async with resilient_client(timeout=15.0) as c:
                 site_resp = await c.get(
                     f"https://graph.microsoft.com/v1.0/sites/{SHAREPOINT_SITE_HOSTNAME}:{SHAREPOINT_SITE_PATH}:",
                     headers={"Authorization": f"Bearer {token}"})
@@ -2054,7 +2062,7 @@ async def test_connection(service: str = Query(...)):
             token = await get_bc_token()
             if token == "mock-bc-token":
                 return {"service": "bc", "status": "demo", "detail": "Running in demo mode"}
-            async with httpx.AsyncClient(timeout=15.0) as c:
+            async with resilient_client(timeout=15.0) as c:
                 resp = await c.get(
                     f"https://api.businesscentral.dynamics.com/v2.0/{TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies",
                     headers={"Authorization": f"Bearer {token}"})
@@ -2459,12 +2467,6 @@ DEFAULT_JOB_TYPES = {
     }
 }
 
-# Vendor Alias Map (company-specific)
-VENDOR_ALIAS_MAP = {
-    # "Alias on Invoice": "Vendor Name in BC"
-    # Add company-specific aliases here
-}
-
 # ==================== MAILBOX SOURCE CONFIGURATION ====================
 
 class MailboxSource(BaseModel):
@@ -2915,16 +2917,11 @@ async def lookup_vendor_alias(vendor_normalized: str) -> dict:
     if not vendor_normalized:
         return {"vendor_canonical": None, "vendor_match_method": "none"}
     
-    # Check vendor_aliases collection
-    alias_doc = await db.vendor_aliases.find_one({
-        "$or": [
-            {"normalized": vendor_normalized},
-            {"normalized_alias": vendor_normalized},
-            {"alias_string": {"$regex": f"^{re.escape(vendor_normalized)}$", "$options": "i"}}
-        ]
-    }, {"_id": 0})
+    # Check vendor aliases (in-memory index keyed by normalized name)
+    alias_doc = await vendor_alias_index.lookup(vendor_normalized)
     
     if alias_doc:
+        await record_alias_usage(alias_doc["alias_string"])
         canonical_id = alias_doc.get("canonical_vendor_id") or alias_doc.get("vendor_no") or alias_doc.get("vendor_name")
         return {
             "vendor_canonical": canonical_id,
@@ -3221,38 +3218,6 @@ def compute_draft_candidate_flag(
     }
 
 
-def normalize_vendor_name(name: str) -> str:
-    """
-    Normalize vendor name for matching.
-    Strips common suffixes, punctuation, and converts to lowercase.
-    """
-    if not name:
-        return ""
-    
-    # Convert to lowercase
-    name = name.lower()
-    
-    # Remove common business suffixes
-    suffixes = [
-        r'\s*,?\s*(inc\.?|incorporated)$',
-        r'\s*,?\s*(llc\.?|l\.l\.c\.?)$',
-        r'\s*,?\s*(ltd\.?|limited)$',
-        r'\s*,?\s*(corp\.?|corporation)$',
-        r'\s*,?\s*(co\.?|company)$',
-        r'\s*,?\s*(plc\.?)$',
-        r'\s*,?\s*(gmbh)$',
-        r'\s*,?\s*(ag)$',
-    ]
-    
-    for suffix in suffixes:
-        name = re.sub(suffix, '', name, flags=re.IGNORECASE)
-    
-    # Remove punctuation and extra spaces
-    name = re.sub(r'[^\w\s]', '', name)
-    name = re.sub(r'\s+', ' ', name).strip()
-    
-    return name
-
 def calculate_fuzzy_score(name1: str, name2: str) -> float:
     """
     Calculate fuzzy match score between two strings.
@@ -3329,7 +3294,7 @@ async def match_vendor_in_bc(
     search_terms = [w for w in normalized_input.split() if len(w) >= 3]
     primary_search_term = max(search_terms, key=len) if search_terms else None
     
-    async with httpx.AsyncClient(timeout=30.0) as c:
+    async with resilient_client(timeout=30.0) as c:
         vendors = []
         
         # Strategy 1: Try server-side search with contains() filter
@@ -3361,20 +3326,18 @@ async def match_vendor_in_bc(
         
         # Check alias map first (case-insensitive)
         if "alias" in strategies:
-            # Try exact match, then lowercase, then normalized
-            alias_target = (
-                VENDOR_ALIAS_MAP.get(vendor_name) or 
-                VENDOR_ALIAS_MAP.get(vendor_name.lower()) or 
-                VENDOR_ALIAS_MAP.get(normalized_input)
-            )
-            if alias_target:
+            # Same alias index as lookup_vendor_alias (lowercase, then normalized)
+            alias_doc = await vendor_alias_index.lookup(vendor_name)
+            target = alias_target(alias_doc) if alias_doc else None
+            if target:
                 # alias_target is the vendor_name or vendor_no from the alias
                 for v in vendors:
                     v_display = v.get("displayName", "")
                     v_number = v.get("number", "")
                     # Match against vendor name or number
-                    if (v_display.lower() == alias_target.lower() or 
-                        v_number.lower() == alias_target.lower()):
+                    if (v_display.lower() == target.lower() or 
+                        v_number.lower() == target.lower()):
+                        # Usage is recorded once per document, by lookup_vendor_alias
                         result["matched"] = True
                         result["match_method"] = "alias"
                         result["selected_vendor"] = v
@@ -3469,7 +3432,7 @@ async def match_customer_in_bc(
     
     normalized_input = normalize_vendor_name(customer_name)
     
-    async with httpx.AsyncClient(timeout=30.0) as c:
+    async with resilient_client(timeout=30.0) as c:
         resp = await c.get(
             f"https://api.businesscentral.dynamics.com/v2.0/{TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/customers",
             headers={"Authorization": f"Bearer {token}"},
@@ -3629,7 +3592,7 @@ async def validate_bc_match(job_type: str, extracted_fields: dict, job_config: d
         match_threshold = job_config.get("vendor_match_threshold", 0.80)
         po_mode = job_config.get("po_validation_mode", "PO_IF_PRESENT")
         
-        async with httpx.AsyncClient(timeout=30.0) as c:
+        async with resilient_client(timeout=30.0) as c:
             # Vendor match for AP_Invoice, Remittance
             if job_type in ("AP_Invoice", "Remittance"):
                 vendor_name = normalized_fields.get("vendor") or extracted_fields.get("vendor", "")
@@ -3780,14 +3743,27 @@ async def validate_bc_match(job_type: str, extracted_fields: dict, job_config: d
     return validation_results
 
 async def _validate_po(c, token: str, company_id: str, po_number: str, validation_results: dict, required: bool):
-    """Helper to validate PO number in BC."""
-    resp = await c.get(
-        f"https://api.businesscentral.dynamics.com/v2.0/{TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/purchaseOrders",
-        headers={"Authorization": f"Bearer {token}"},
-        params={"$filter": f"number eq '{po_number}'"}
+    """
+    Helper to validate PO number in BC.
+    Open POs are answered from the open PO index; other numbers (closed
+    POs, index not loaded) go to BC through the BC lookup cache.
+    """
+    async def load_pos():
+        resp = await c.get(
+            f"https://api.businesscentral.dynamics.com/v2.0/{TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/purchaseOrders",
+            headers={"Authorization": f"Bearer {token}"},
+            params={"$filter": f"number eq '{po_number}'"}
+        )
+        if resp.status_code != 200:
+            return None
+        return resp.json().get("value", [])
+
+    open_po = open_po_index.get(po_number)
+    pos = [open_po] if open_po else await bc_lookup_cache.get_or_load(
+        "purchase_order", (company_id, po_number), load_pos,
+        outcome=lambda v: None if v is None else (CACHE_FOUND if v else CACHE_NOT_FOUND)
     )
-    if resp.status_code == 200:
-        pos = resp.json().get("value", [])
+    if pos is not None:
         if pos:
             validation_results["checks"].append({
                 "check_name": "po_validation",
@@ -3885,7 +3861,7 @@ def make_automation_decision(
 
 async def get_email_watcher_config() -> dict:
     """Load email watcher configuration from database."""
-    config = await db.hub_config.find_one({"_key": "email_watcher"}, {"_id": 0})
+    config = await config_cache.email_watcher()
     if not config:
         return {
             "mailbox_address": "",
@@ -3912,16 +3888,18 @@ async def subscribe_to_mailbox_notifications(mailbox_address: str, webhook_url:
     try:
         token = await get_graph_token()
         
-        # Create subscription for new messages
+        # Create subscription for new messages; lifecycle events (reauthorization,
+        # removal) go to the same endpoint so the renewer can react to them
         subscription_payload = {
             "changeType": "created",
             "notificationUrl": webhook_url,
+            "lifecycleNotificationUrl": webhook_url,
             "resource": f"users/{mailbox_address}/mailFolders/Inbox/messages",
-            "expirationDateTime": (datetime.now(timezone.utc).replace(hour=23, minute=59) + timedelta(days=2)).isoformat() + "Z",
-            "clientState": "gpi-document-hub-secret"
+            "expirationDateTime": (datetime.now(timezone.utc) + SUBSCRIPTION_LIFETIME).strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+            "clientState": GRAPH_WEBHOOK_CLIENT_STATE
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as c:
+        async with resilient_client(timeout=30.0) as c:
             resp = await c.post(
                 "https://graph.microsoft.com/v1.0/subscriptions",
                 headers={
@@ -3947,6 +3925,9 @@ async def subscribe_to_mailbox_notifications(mailbox_address: str, webhook_url:
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+graph_notification_queue = GraphNotificationQueue(db)
+graph_subscription_manager = SubscriptionManager(db, get_graph_token, subscribe_to_mailbox_notifications)
+
 async def fetch_email_with_attachments(email_id: str, mailbox_address: str) -> dict:
     """Fetch a specific email and its attachments from Graph API."""
     if DEMO_MODE or not GRAPH_CLIENT_ID:
@@ -3955,7 +3936,7 @@ async def fetch_email_with_attachments(email_id: str, mailbox_address: str) -> d
     try:
         token = await get_graph_token()
         
-        async with httpx.AsyncClient(timeout=60.0) as c:
+        async with resilient_client(timeout=60.0) as c:
             # Get email details
             email_resp = await c.get(
                 f"https://graph.microsoft.com/v1.0/users/{mailbox_address}/messages/{email_id}",
@@ -4008,7 +3989,7 @@ async def move_email_to_folder(email_id: str, mailbox_address: str, folder_name:
     try:
         token = await get_graph_token()
         
-        async with httpx.AsyncClient(timeout=30.0) as c:
+        async with resilient_client(timeout=30.0) as c:
             # First, find the folder ID
             folders_resp = await c.get(
                 f"https://graph.microsoft.com/v1.0/users/{mailbox_address}/mailFolders",
@@ -4090,7 +4071,7 @@ async def on_document_ingested(doc_id: str, source: str = "unknown"):
         extracted_fields = doc.get("extracted_fields", {})
         
         # Get job config
-        job_configs = await db.hub_job_types.find_one({"job_type": job_type}, {"_id": 0})
+        job_configs = await config_cache.job_type(job_type)
         if not job_configs:
             job_configs = DEFAULT_JOB_TYPES.get(job_type, DEFAULT_JOB_TYPES["AP_Invoice"])
         
@@ -4131,7 +4112,7 @@ async def on_document_ingested(doc_id: str, source: str = "unknown"):
         # Create workflow audit trail entry
         duration = (datetime.now(timezone.utc) - started_at).total_seconds()
         
-        await db.hub_workflow_runs.insert_one({
+        await audit_writer.insert(db, "hub_workflow_runs", {
             "run_id": run_id,
             "correlation_id": correlation_id,
             "document_id": doc_id,
@@ -4166,7 +4147,7 @@ async def on_document_ingested(doc_id: str, source: str = "unknown"):
         logger.error("[Workflow:%s] Error processing doc %s: %s", run_id, doc_id, str(e))
         
         try:
-            await db.hub_workflow_runs.insert_one({
+            await audit_writer.insert(db, "hub_workflow_runs", {
                 "run_id": run_id,
                 "correlation_id": correlation_id,
                 "document_id": doc_id,
@@ -4776,13 +4757,12 @@ async def _internal_intake_document(
     Internal function to process document intake from email polling.
     Similar to intake_document but accepts raw bytes instead of UploadFile.
     """
-    computed_hash = hashlib.sha256(file_content).hexdigest()
     doc_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
     
-    # Store file locally
-    file_path = UPLOAD_DIR / doc_id
-    file_path.write_bytes(file_content)
+    # Store file locally (deduplicated by content hash)
+    computed_hash = await blob_store.put(file_content, doc_id)
+    file_path = await blob_store.local_path(computed_hash)
     
     # Apply pilot capture channel if pilot mode is enabled
     base_capture_channel = CaptureChannel.EMAIL.value if "email" in source.lower() else CaptureChannel.UPLOAD.value
@@ -4835,6 +4815,7 @@ async def _internal_intake_document(
         **get_pilot_metadata()
     }
     await db.hub_documents.insert_one(doc)
+    thumbnail_renderer.enqueue(doc_id)
     
     # Run AI extraction (for field extraction, not doc_type classification)
     logger.info("Running AI field extraction for document %s", doc_id)
@@ -4918,7 +4899,7 @@ async def _internal_intake_document(
     )
     
     # Get job type config
-    job_configs = await db.hub_job_types.find_one({"job_type": suggested_type}, {"_id": 0})
+    job_configs = await config_cache.job_type(suggested_type)
     if not job_configs:
         job_configs = DEFAULT_JOB_TYPES.get(suggested_type, DEFAULT_JOB_TYPES["AP_Invoice"])
     
@@ -4935,8 +4916,7 @@ async def _internal_intake_document(
     sp_error = None
     
     try:
-        sp_result = await upload_to_sharepoint(file_content, filename, folder)
-        share_link = await create_sharing_link(sp_result["drive_id"], sp_result["item_id"])
+        sp_result, share_link = await upload_and_share(file_content, filename, folder, file_path=file_path)
         logger.info("Document %s stored in SharePoint: %s", doc_id, sp_result.get("web_url"))
     except Exception as e:
         sp_error = str(e)
@@ -5104,7 +5084,7 @@ async def _internal_intake_document(
         ],
         "error": None
     }
-    await db.hub_workflow_runs.insert_one(workflow)
+    await audit_writer.insert(db, "hub_workflow_runs", workflow)
     
     logger.info("[Workflow:%s] Intake complete: %s → status=%s, decision=%s, score=%.2f", 
                 workflow_run_id, filename, final_status, decision, validation_results.get("match_score", 0.0))
@@ -5133,16 +5113,15 @@ async def intake_document(
     Runs AI classification and automation decision matrix.
     """
     file_content = await file.read()
-    computed_hash = hashlib.sha256(file_content).hexdigest()
     doc_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
     
     # Use provided attachment name or fall back to filename
     final_filename = attachment_name or file.filename
     
-    # Store file locally
-    file_path = UPLOAD_DIR / doc_id
-    file_path.write_bytes(file_content)
+    # Store file locally (deduplicated by content hash)
+    computed_hash = await blob_store.put(file_content, doc_id)
+    file_path = await blob_store.local_path(computed_hash)
     
     # Create document record with workflow tracking
     doc = {
@@ -5195,6 +5174,7 @@ async def intake_document(
         **get_pilot_metadata()
     }
     await db.hub_documents.insert_one(doc)
+    thumbnail_renderer.enqueue(doc_id)
     
     # Run AI field extraction (for extracting vendor, amount, etc.)
     logger.info("Running AI field extraction for document %s", doc_id)
@@ -5255,7 +5235,7 @@ async def intake_document(
     )
     
     # Get job type config
-    job_configs = await db.hub_job_types.find_one({"job_type": suggested_type}, {"_id": 0})
+    job_configs = await config_cache.job_type(suggested_type)
     if not job_configs:
         job_configs = DEFAULT_JOB_TYPES.get(suggested_type, DEFAULT_JOB_TYPES["AP_Invoice"])
     
@@ -5276,8 +5256,7 @@ async def intake_document(
     sp_error = None
     
     try:
-        sp_result = await upload_to_sharepoint(file_content, final_filename, folder)
-        share_link = await create_sharing_link(sp_result["drive_id"], sp_result["item_id"])
+        sp_result, share_link = await upload_and_share(file_content, final_filename, folder, file_path=file_path)
         logger.info("Document %s stored in SharePoint: %s", doc_id, sp_result.get("web_url"))
     except Exception as e:
         sp_error = str(e)
@@ -5385,7 +5364,7 @@ async def intake_document(
         "correlation_id": str(uuid.uuid4()),
         "error": None
     }
-    await db.hub_workflow_runs.insert_one(workflow)
+    await audit_writer.insert(db, "hub_workflow_runs", workflow)
     
     # Execute BC action based on decision (only if SharePoint upload succeeded)
     final_status = update_data["status"]
@@ -5559,8 +5538,8 @@ async def classify_document(doc_id: str):
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    file_path = UPLOAD_DIR / doc_id
-    if not file_path.exists():
+    file_path = await stored_file_path(doc)
+    if not file_path:
         raise HTTPException(status_code=400, detail="Original file not found")
     
     classification = await classify_document_with_ai(str(file_path), doc["file_name"])
@@ -5570,7 +5549,7 @@ async def classify_document(doc_id: str):
     extracted_fields = classification.get("extracted_fields", {})
     
     # Get job type config
-    job_configs = await db.hub_job_types.find_one({"job_type": suggested_type}, {"_id": 0})
+    job_configs = await config_cache.job_type(suggested_type)
     if not job_configs:
         job_configs = DEFAULT_JOB_TYPES.get(suggested_type, DEFAULT_JOB_TYPES["AP_Invoice"])
     
@@ -5630,10 +5609,8 @@ async def resolve_and_link_document(doc_id: str, resolve: ResolveRequest):
     if doc.get("status") not in ("NeedsReview", "StoredInSP", "Classified"):
         raise HTTPException(status_code=400, detail=f"Document status must be NeedsReview, StoredInSP, or Classified. Current: {doc.get('status')}")
     
-    file_path = UPLOAD_DIR / doc_id
-    file_content = None
-    if file_path.exists():
-        file_content = file_path.read_bytes()
+    file_path = await stored_file_path(doc)
+    file_content = await asyncio.to_thread(file_path.read_bytes) if file_path else None
     
     # Determine what BC record to link to
     bc_record_id = None
@@ -5651,15 +5628,14 @@ async def resolve_and_link_document(doc_id: str, resolve: ResolveRequest):
     share_link = doc.get("sharepoint_share_link_url")
     if not share_link and file_content:
         # Upload to SharePoint now
-        job_configs = await db.hub_job_types.find_one({"job_type": bc_record_type}, {"_id": 0})
+        job_configs = await config_cache.job_type(bc_record_type)
         if not job_configs:
             job_configs = DEFAULT_JOB_TYPES.get(bc_record_type, DEFAULT_JOB_TYPES["AP_Invoice"])
         
         folder = job_configs.get("sharepoint_folder", "Incoming")
         bc_entity = job_configs.get("bc_entity", "salesOrders")
         try:
-            sp_result = await upload_to_sharepoint(file_content, doc["file_name"], folder)
-            share_link = await create_sharing_link(sp_result["drive_id"], sp_result["item_id"])
+            sp_result, share_link = await upload_and_share(file_content, doc["file_name"], folder, file_path=file_path)
             
             await db.hub_documents.update_one({"id": doc_id}, {"$set": {
                 "sharepoint_drive_id": sp_result["drive_id"],
@@ -5729,7 +5705,7 @@ async def resolve_and_link_document(doc_id: str, resolve: ResolveRequest):
         "correlation_id": str(uuid.uuid4()),
         "error": link_error
     }
-    await db.hub_workflow_runs.insert_one(workflow)
+    await audit_writer.insert(db, "hub_workflow_runs", workflow)
     
     updated_doc = await db.hub_documents.find_one({"id": doc_id}, {"_id": 0})
     return {
@@ -5774,13 +5750,11 @@ async def reprocess_document(doc_id: str, reclassify: bool = Query(False)):
         }
     
     # Get the file content for BC linking (if needed)
-    file_path = UPLOAD_DIR / doc_id
-    file_content = None
-    if file_path.exists():
-        file_content = file_path.read_bytes()
+    file_path = await stored_file_path(doc)
+    file_content = await asyncio.to_thread(file_path.read_bytes) if file_path else None
     
     # Re-run AI classification if requested
-    if reclassify and file_path.exists():
+    if reclassify and file_path:
         logger.info("Re-running AI classification for document %s", doc_id)
         classification = await classify_document_with_ai(str(file_path), doc["file_name"])
         
@@ -5800,7 +5774,7 @@ async def reprocess_document(doc_id: str, reclassify: bool = Query(False)):
     
     # Get job config
     job_type = doc.get("suggested_job_type", "AP_Invoice")
-    job_configs = await db.hub_job_types.find_one({"job_type": job_type}, {"_id": 0})
+    job_configs = await config_cache.job_type(job_type)
     if not job_configs:
         job_configs = DEFAULT_JOB_TYPES.get(job_type, DEFAULT_JOB_TYPES["AP_Invoice"])
     
@@ -5903,7 +5877,7 @@ async def reprocess_document(doc_id: str, reclassify: bool = Query(False)):
         "correlation_id": str(uuid.uuid4()),
         "error": None
     }
-    await db.hub_workflow_runs.insert_one(workflow)
+    await audit_writer.insert(db, "hub_workflow_runs", workflow)
     
     updated_doc = await db.hub_documents.find_one({"id": doc_id}, {"_id": 0})
     
@@ -5922,47 +5896,54 @@ async def reprocess_document(doc_id: str, reclassify: bool = Query(False)):
     }
 
 @api_router.post("/graph/webhook")
-async def graph_webhook(request_data: dict = None):
+async def graph_webhook(request_data: dict = None, validationToken: str = Query(None)):
     """
     Microsoft Graph webhook endpoint for email notifications.
     Handles both validation and notification requests.
+    
+    Notifications are only validated, deduplicated and persisted to the
+    notification queue; the worker pool fetches and processes the emails,
+    so Graph gets its 202 within its response deadline.
     """
     # Handle validation request (Graph sends this when creating subscription)
+    if validationToken:
+        return PlainTextResponse(content=validationToken)
     if request_data and "validationToken" in request_data:
-        return request_data["validationToken"]
+        return PlainTextResponse(content=request_data["validationToken"])
     
-    # Handle notification
+    summary = {"accepted": 0, "duplicates": 0, "rejected": 0, "ignored": 0}
     if request_data and "value" in request_data:
+        notifications = []
         for notification in request_data.get("value", []):
-            # Verify client state
-            if notification.get("clientState") != "gpi-document-hub-secret":
-                logger.warning("Invalid client state in webhook notification")
+            if "lifecycleEvent" in notification:
+                # reauthorizationRequired / subscriptionRemoved / missed
+                if valid_client_state(notification):
+                    logger.info("Graph lifecycle event: %s", notification["lifecycleEvent"])
+                    graph_subscription_manager.request_renewal()
+                else:
+                    summary["rejected"] += 1
                 continue
-            
-            resource = notification.get("resource", "")
-            change_type = notification.get("changeType", "")
-            
-            if change_type == "created" and "/messages/" in resource:
-                # Extract email ID and mailbox from resource
-                # Resource format: users/{mailbox}/mailFolders/Inbox/messages/{emailId}
-                parts = resource.split("/")
-                if len(parts) >= 6:
-                    mailbox = parts[1]
-                    email_id = parts[-1]
-                    
-                    # Queue for processing (in production, use a proper queue)
-                    logger.info("New email notification: mailbox=%s, email_id=%s", mailbox, email_id)
-                    
-                    # Process the email
-                    await process_incoming_email(email_id, mailbox)
+            notifications.append(notification)
+        
+        queued = await graph_notification_queue.enqueue(notifications)
+        for key, count in queued.items():
+            summary[key] += count
+        if summary["rejected"]:
+            logger.warning("Invalid client state in %d webhook notification(s)", summary["rejected"])
+        if summary["accepted"]:
+            logger.info("Queued %d email notification(s) (%d duplicates)", summary["accepted"], summary["duplicates"])
     
-    return {"status": "ok"}
+    return JSONResponse(status_code=202, content={"status": "accepted", **summary})
+
+@api_router.get("/graph/webhook/queue")
+async def get_graph_notification_queue_status():
+    """Notification queue depth by status."""
+    return await graph_notification_queue.stats()
 
 @api_router.get("/graph/webhook")
 async def graph_webhook_validation(validationToken: str = Query(None)):
     """Handle Graph subscription validation (GET request)."""
     if validationToken:
-        from starlette.responses import PlainTextResponse
         return PlainTextResponse(content=validationToken)
     return {"status": "ready"}
 
@@ -5977,9 +5958,11 @@ async def process_incoming_email(email_id: str, mailbox_address: str):
     # Fetch email and attachments
     email_data = await fetch_email_with_attachments(email_id, mailbox_address)
     
-    if email_data.get("status") != "ok":
-        logger.error("Failed to fetch email %s: %s", email_id, email_data.get("message"))
+    if email_data.get("status") == "demo":
         return
+    if email_data.get("status") != "ok":
+        # Raised so the notification queue retries the email with backoff
+        raise Exception(f"Failed to fetch email {email_id}: {email_data.get('message')}")
     
     email = email_data.get("email", {})
     attachments = email_data.get("attachments", [])
@@ -6005,15 +5988,13 @@ async def process_incoming_email(email_id: str, mailbox_address: str):
                 email_received_utc=email.get("received_utc")
             )
             
-            # Save attachment temporarily
-            temp_id = str(uuid.uuid4())
-            temp_path = UPLOAD_DIR / temp_id
-            temp_path.write_bytes(content_bytes)
-            
             # Process through intake workflow
             doc_id = str(uuid.uuid4())
             now = datetime.now(timezone.utc).isoformat()
             
+            # Store attachment (deduplicated by content hash)
+            await blob_store.put(content_bytes, doc_id)
+            
             # Create document record
             doc = {
                 "id": doc_id,
@@ -6033,10 +6014,9 @@ async def process_incoming_email(email_id: str, mailbox_address: str):
                 **get_pilot_metadata()
             }
             await db.hub_documents.insert_one(doc)
+            thumbnail_renderer.enqueue(doc_id)
             
-            # Move temp file to permanent location
-            perm_path = UPLOAD_DIR / doc_id
-            temp_path.rename(perm_path)
+            perm_path = await blob_store.local_path(intake.content_hash)
             
             # Run classification
             classification = await classify_document_with_ai(str(perm_path), attachment.get("name"))
@@ -6052,7 +6032,7 @@ async def process_incoming_email(email_id: str, mailbox_address: str):
             vendor_alias_result = await lookup_vendor_alias(normalized_fields.get("vendor_normalized"))
             
             # Get job config and validate
-            job_configs = await db.hub_job_types.find_one({"job_type": suggested_type}, {"_id": 0})
+            job_configs = await config_cache.job_type(suggested_type)
             if not job_configs:
                 job_configs = DEFAULT_JOB_TYPES.get(suggested_type, DEFAULT_JOB_TYPES["AP_Invoice"])
             
@@ -6143,7 +6123,7 @@ async def record_mail_intake_log(
         "error": error,
         "processed_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.mail_intake_log.insert_one(log_entry)
+    await audit_writer.insert(db, "mail_intake_log", log_entry)
     return log_entry
 
 
@@ -6159,10 +6139,50 @@ async def check_duplicate_mail_intake(internet_message_id: str, attachment_hash:
     if message_id and attachment_id:
         query["$or"].append({"message_id": message_id, "attachment_id": attachment_id})
     
+    # Log entries still buffered by the audit writer count as processed
+    if audit_writer.pending("mail_intake_log", lambda e: any(
+        all(e.get(k) == v for k, v in clause.items()) for clause in query["$or"]
+    )):
+        return True
+    
     existing = await db.mail_intake_log.find_one(query)
     return existing is not None
 
 
+async def find_processed_mail_attachments(messages: List[tuple]) -> set:
+    """Batch idempotency lookup for a page of (message_id, internet_message_id) pairs.
+    
+    Returns the (internet_message_id, attachment_id) and (message_id, attachment_id)
+    keys already in mail_intake_log, found with one $in query instead of a
+    lookup per downloaded attachment.
+    """
+    if not messages:
+        return set()
+    message_ids = list({m for m, _ in messages})
+    internet_ids = list({i for _, i in messages})
+    entries = await db.mail_intake_log.find(
+        {"$or": [
+            {"internet_message_id": {"$in": internet_ids}},
+            {"message_id": {"$in": message_ids}}
+        ]},
+        {"_id": 0, "message_id": 1, "internet_message_id": 1, "attachment_id": 1}
+    ).to_list(None)
+    wanted_internet, wanted_messages = set(internet_ids), set(message_ids)
+    entries += audit_writer.pending("mail_intake_log", lambda e: (
+        e.get("internet_message_id") in wanted_internet or e.get("message_id") in wanted_messages
+    ))
+    keys = set()
+    for entry in entries:
+        att_id = entry.get("attachment_id")
+        if not att_id:
+            continue
+        if entry.get("internet_message_id"):
+            keys.add((entry["internet_message_id"], att_id))
+        if entry.get("message_id"):
+            keys.add((entry["message_id"], att_id))
+    return keys
+
+
 def should_skip_attachment(filename: str, content_type: str, size_bytes: int) -> tuple:
     """Determine if attachment should be skipped (inline images, signatures, too large)."""
     # Check content type
@@ -6193,12 +6213,14 @@ async def poll_mailbox_for_attachments():
     Process flow:
     1. Get watermark (last seen receivedDateTime)
     2. Query messages received after watermark (with overlap buffer)
-    3. For each message with attachments:
-       - Check idempotency log (skip duplicates)
+    3. List attachments for the page and resolve already-logged ones with
+       one idempotency query (they are skipped without downloading)
+    4. For each remaining attachment:
+       - Check idempotency log by content hash (forwarded copies)
        - Store in SharePoint first (durability)
        - Process through intake pipeline
        - Log result
-    4. Update watermark
+    5. Update watermark
     
     Permissions: Mail.Read only (application permission)
     
@@ -6258,7 +6280,7 @@ async def poll_mailbox_for_attachments():
         # So we filter by date only and check attachments client-side
         filter_query = f"receivedDateTime ge {buffer_time}"
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with resilient_client(timeout=60.0) as client:
             messages_resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/users/{EMAIL_POLLING_USER}/mailFolders/Inbox/messages",
                 headers={"Authorization": f"Bearer {token}"},
@@ -6283,13 +6305,12 @@ async def poll_mailbox_for_attachments():
             
             logger.info("[EmailPoll:%s] Detected %d messages with attachments (out of %d total)", run_id, len(messages_with_attachments), len(messages))
             
-            # Process each message
+            # List attachments for the whole page first, so attachments already
+            # processed (e.g. in the overlap window) are found with one query
+            # and never downloaded
+            listed = []
             for msg in messages_with_attachments:
                 msg_id = msg["id"]
-                internet_msg_id = msg.get("internetMessageId", msg_id)
-                subject = msg.get("subject", "No Subject")
-                sender = msg.get("from", {}).get("emailAddress", {}).get("address", "unknown")
-                
                 try:
                     # Fetch attachments list (without contentBytes - not allowed in list query)
                     att_resp = await client.get(
@@ -6302,8 +6323,22 @@ async def poll_mailbox_for_attachments():
                         stats["errors"].append(f"Failed to fetch attachments for {msg_id}")
                         continue
                     
-                    attachments = att_resp.json().get("value", [])
-                    
+                    listed.append((msg, att_resp.json().get("value", [])))
+                except Exception as e:
+                    stats["errors"].append(f"Failed processing message {msg_id}: {str(e)}")
+            
+            processed_keys = await find_processed_mail_attachments(
+                [(msg["id"], msg.get("internetMessageId", msg["id"])) for msg, _ in listed]
+            )
+            
+            # Process each message
+            for msg, attachments in listed:
+                msg_id = msg["id"]
+                internet_msg_id = msg.get("internetMessageId", msg_id)
+                subject = msg.get("subject", "No Subject")
+                sender = msg.get("from", {}).get("emailAddress", {}).get("address", "unknown")
+                
+                try:
                     for att in attachments:
                         att_id = att.get("id")
                         filename = att.get("name", "unknown")
@@ -6325,6 +6360,11 @@ async def poll_mailbox_for_attachments():
                             stats["attachments_skipped_inline"] += 1
                             continue
                         
+                        # Already logged by an earlier poll: skip without downloading
+                        if (internet_msg_id, att_id) in processed_keys or (msg_id, att_id) in processed_keys:
+                            stats["attachments_skipped_duplicate"] += 1
+                            continue
+                        
                         # Fetch individual attachment content
                         try:
                             att_content_resp = await client.get(
@@ -6428,9 +6468,8 @@ async def poll_mailbox_for_attachments():
     
     stats["ended_at"] = datetime.now(timezone.utc).isoformat()
     
-    # Store run stats (make a copy since insert_one adds _id)
-    stats_to_store = stats.copy()
-    await db.mail_poll_runs.insert_one(stats_to_store)
+    # Store run stats (the audit writer copies, so stats never gains an _id)
+    await audit_writer.insert(db, "mail_poll_runs", stats)
     
     logger.info(
         "[EmailPoll:%s] Complete: detected=%d, ingested=%d, skipped_dup=%d, skipped_inline=%d, failed=%d",
@@ -6602,7 +6641,7 @@ async def backfill_ap_mailbox(
         # Query messages with attachments in date range
         filter_query = f"receivedDateTime ge {start_date}"
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with resilient_client(timeout=60.0) as client:
             messages_resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/users/{target_mailbox}/mailFolders/Inbox/messages",
                 headers={"Authorization": f"Bearer {token}"},
@@ -6687,7 +6726,10 @@ async def backfill_ap_mailbox(
                         # Check idempotency - have we already processed this attachment?
                         # Primary key: internetMessageId + attachment_hash (handles forwarded copies correctly)
                         # Fallback: message_id + attachment_id (Graph-specific IDs)
-                        existing = await db.mail_intake_log.find_one({
+                        existing = audit_writer.pending("mail_intake_log", lambda e: (
+                            (e.get("internet_message_id"), e.get("attachment_hash")) == (internet_msg_id, content_hash)
+                            or (e.get("message_id"), e.get("attachment_id")) == (msg_id, att_id)
+                        )) or await db.mail_intake_log.find_one({
                             "$or": [
                                 {"internet_message_id": internet_msg_id, "attachment_hash": content_hash},
                                 {"message_id": msg_id, "attachment_id": att_id}
@@ -6728,7 +6770,7 @@ async def backfill_ap_mailbox(
                             doc_id = result.get("document", {}).get("id", "unknown")
                             
                             # Log to mail_intake_log for idempotency
-                            await db.mail_intake_log.insert_one({
+                            await audit_writer.insert(db, "mail_intake_log", {
                                 "message_id": msg_id,
                                 "internet_message_id": internet_msg_id,
                                 "attachment_id": att_id,
@@ -6825,7 +6867,7 @@ async def backfill_sales_mailbox(
         start_date = (datetime.now(timezone.utc) - timedelta(days=days_back)).isoformat()
         filter_query = f"receivedDateTime ge {start_date}"
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with resilient_client(timeout=60.0) as client:
             messages_resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/users/{SALES_EMAIL_POLLING_USER}/mailFolders/Inbox/messages",
                 headers={"Authorization": f"Bearer {token}"},
@@ -7136,7 +7178,7 @@ async def run_sales_email_poll():
         buffer_time = (datetime.now(timezone.utc) - timedelta(minutes=lookback)).isoformat()
         filter_query = f"receivedDateTime ge {buffer_time}"
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with resilient_client(timeout=60.0) as client:
             # Query messages
             messages_resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/users/{SALES_EMAIL_POLLING_USER}/mailFolders/Inbox/messages",
@@ -7272,9 +7314,8 @@ async def run_sales_email_poll():
     
     stats["completed_at"] = datetime.now(timezone.utc).isoformat()
     
-    # Record poll run - make a copy to avoid _id mutation affecting response
-    stats_to_store = {**stats}
-    await db.sales_mail_poll_runs.insert_one(stats_to_store)
+    # Record poll run (the audit writer copies, so stats never gains an _id)
+    await audit_writer.insert(db, "sales_mail_poll_runs", stats)
     
     logger.info("[SalesPoll:%s] Complete: detected=%d, ingested=%d, skipped_dup=%d, skipped_inline=%d, failed=%d",
                 run_id, stats["messages_detected"], stats["attachments_ingested"],
@@ -7328,6 +7369,7 @@ async def update_job_type(job_type: str, config: JobTypeConfig):
         {"$set": update_data},
         upsert=True
     )
+    await config_cache.invalidate(JOB_TYPES)
     
     return await get_job_type(job_type)
 
@@ -7351,6 +7393,7 @@ async def update_email_watcher_settings(config: EmailWatchConfig):
     )
     
     logger.info("MongoDB update result: matched=%s, modified=%s", result.matched_count, result.modified_count)
+    await config_cache.invalidate(EMAIL_WATCHER)
     
     return await get_email_watcher_config()
 
@@ -7369,9 +7412,12 @@ async def subscribe_email_watcher(webhook_url: str = Query(...)):
             {"_key": "email_watcher"},
             {"$set": {
                 "webhook_subscription_id": result.get("subscription_id"),
-                "webhook_expiration": result.get("expiration")
+                "webhook_expiration": result.get("expiration"),
+                # Kept so the renewer can recreate a removed subscription
+                "webhook_url": webhook_url
             }}
         )
+        await config_cache.invalidate(EMAIL_WATCHER)
     
     return result
 
@@ -7797,6 +7843,7 @@ async def set_vendor_for_document(doc_id: str, request: SetVendorRequest):
         alias_doc = {
             "alias_string": request.vendor_alias_used,
             "normalized_alias": doc.get("vendor_normalized"),
+            "alias_key": normalize_vendor_name(request.vendor_alias_used),
             "canonical_vendor_id": request.vendor_id,
             "vendor_name": request.vendor_name,
             "created_utc": datetime.now(timezone.utc).isoformat(),
@@ -7807,6 +7854,7 @@ async def set_vendor_for_document(doc_id: str, request: SetVendorRequest):
             {"$set": alias_doc},
             upsert=True
         )
+        await config_cache.invalidate(VENDOR_ALIASES)
     
     # Advance workflow
     doc.update(update_data)
@@ -8693,6 +8741,8 @@ class MigrationRequest(BaseModel):
     doc_type_filter: Optional[str] = None
     limit: Optional[int] = None
     mode: str = "dry_run"  # "dry_run" or "real"
+    job_id: Optional[str] = None  # Checkpoint key for resumable real runs
+    resume: bool = False  # Continue from the saved checkpoint for job_id
 
 
 @api_router.post("/migration/run")
@@ -8710,6 +8760,9 @@ async def run_migration_job(
     - dry_run: Validate and preview without writing to database
     - real: Actually write documents to database
     
+    Real runs with a job_id checkpoint their source offset; pass resume=true
+    with the same job_id to continue an interrupted run.
+    
     Returns migration result with statistics and sample documents.
     """
     # Determine source
@@ -8720,7 +8773,7 @@ async def run_migration_job(
                 status_code=400,
                 detail=f"Source file not found: {request.source_file}"
             )
-        source = JsonFileSource(request.source_file)
+        source = open_file_source(request.source_file)
     else:
         # Use default sample migration file
         sample_path = "/app/backend/data/sample_migration.json"
@@ -8739,12 +8792,17 @@ async def run_migration_job(
             detail=f"Invalid mode: {request.mode}. Use 'dry_run' or 'real'"
         )
     
+    if request.resume and not request.job_id:
+        raise HTTPException(status_code=400, detail="job_id is required to resume a migration")
+    
     # Create job
     job = MigrationJob(
         source=source,
         db_collection=db.hub_documents if mode == MigrationMode.REAL else None,
         skip_duplicates=True,
-        batch_size=100
+        batch_size=500,
+        checkpoint_collection=db.migration_checkpoints,
+        job_id=request.job_id
     )
     
     # Run job
@@ -8752,7 +8810,8 @@ async def run_migration_job(
         mode=mode,
         source_filter=request.source_filter,
         doc_type_filter=request.doc_type_filter,
-        limit=request.limit
+        limit=request.limit,
+        resume=request.resume
     )
     
     return result.to_dict()
@@ -8779,7 +8838,7 @@ async def preview_migration(
                 status_code=400,
                 detail=f"Source file not found: {source_file}"
             )
-        source = JsonFileSource(source_file)
+        source = open_file_source(source_file)
     else:
         sample_path = "/app/backend/data/sample_migration.json"
         if not Path(sample_path).exists():
@@ -9595,6 +9654,7 @@ async def create_mailbox_source(source: MailboxSource):
     doc["updated_utc"] = now
     
     await db.mailbox_sources.insert_one(doc)
+    await config_cache.invalidate(MAILBOX_SOURCES)
     
     logger.info("Created mailbox source: %s (%s)", source.name, source.email_address)
     
@@ -9618,6 +9678,7 @@ async def update_mailbox_source(mailbox_id: str, source: MailboxSource):
         {"mailbox_id": mailbox_id},
         {"$set": update_data}
     )
+    await config_cache.invalidate(MAILBOX_SOURCES)
     
     logger.info("Updated mailbox source: %s", mailbox_id)
     
@@ -9631,6 +9692,7 @@ async def delete_mailbox_source(mailbox_id: str):
         raise HTTPException(status_code=404, detail=f"Mailbox source {mailbox_id} not found")
     
     await db.mailbox_sources.delete_one({"mailbox_id": mailbox_id})
+    await config_cache.invalidate(MAILBOX_SOURCES)
     
     logger.info("Deleted mailbox source: %s (%s)", existing.get("name"), existing.get("email_address"))
     
@@ -9650,7 +9712,7 @@ async def test_mailbox_connection(mailbox_id: str):
         if not token:
             return {"status": "error", "message": "Failed to get email token - check Graph API credentials"}
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with resilient_client(timeout=30.0) as client:
             # Try to access the mailbox
             resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/users/{email_address}/mailFolders/Inbox",
@@ -9728,7 +9790,7 @@ async def poll_mailbox_for_documents(mailbox_address: str, default_category: str
         # Look back 1 hour for new emails
         lookback_time = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with resilient_client(timeout=60.0) as client:
             messages_resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/users/{mailbox_address}/mailFolders/Inbox/messages",
                 headers={"Authorization": f"Bearer {token}"},
@@ -9782,7 +9844,9 @@ async def poll_mailbox_for_documents(mailbox_address: str, default_category: str
                         continue
                     
                     # Check for duplicates
-                    existing = await db.mail_intake_log.find_one({
+                    existing = audit_writer.pending("mail_intake_log", lambda e: (
+                        (e.get("internet_message_id"), e.get("attachment_name")) == (internet_msg_id, filename)
+                    )) or await db.mail_intake_log.find_one({
                         "internet_message_id": internet_msg_id,
                         "attachment_name": filename
                     })
@@ -9817,7 +9881,7 @@ async def poll_mailbox_for_documents(mailbox_address: str, default_category: str
                         )
                         
                         # Log the intake
-                        await db.mail_intake_log.insert_one({
+                        await audit_writer.insert(db, "mail_intake_log", {
                             "internet_message_id": internet_msg_id,
                             "attachment_name": filename,
                             "attachment_hash": content_hash,
@@ -9874,7 +9938,8 @@ async def create_vendor_alias(alias: VendorAlias):
     existing = await db.vendor_aliases.find_one({
         "$or": [
             {"alias_string": alias.alias_string},
-            {"normalized_alias": normalized}
+            {"normalized_alias": normalized},
+            {"alias_key": normalized}
         ]
     })
     
@@ -9885,6 +9950,7 @@ async def create_vendor_alias(alias: VendorAlias):
         "alias_id": alias_id,
         "alias_string": alias.alias_string,
         "normalized_alias": normalized,
+        "alias_key": normalized,
         "vendor_no": alias.vendor_no,
         "vendor_name": alias.vendor_name,
         "confidence_override": alias.confidence_override,
@@ -9895,11 +9961,9 @@ async def create_vendor_alias(alias: VendorAlias):
         "last_used_at": None
     }
     
+    # Invalidating the section also rebuilds the alias index
     await db.vendor_aliases.insert_one(alias_doc)
-    
-    # Update global alias map
-    VENDOR_ALIAS_MAP[alias.alias_string] = alias.vendor_name or alias.vendor_no
-    VENDOR_ALIAS_MAP[normalized] = alias.vendor_name or alias.vendor_no
+    await config_cache.invalidate(VENDOR_ALIASES)
     
     return {"alias_id": alias_id, "message": "Alias created successfully"}
 
@@ -9909,6 +9973,7 @@ async def delete_vendor_alias(alias_id: str):
     result = await db.vendor_aliases.delete_one({"alias_id": alias_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Alias not found")
+    await config_cache.invalidate(VENDOR_ALIASES)
     return {"message": "Alias deleted"}
 
 @api_router.get("/aliases/vendors/suggest")
@@ -9948,7 +10013,8 @@ async def suggest_alias_creation(vendor_name: str, resolved_vendor_no: str, reso
 # Update resolve endpoint to increment alias usage
 async def record_alias_usage(alias_string: str):
     """Record when an alias is used for matching."""
-    await db.vendor_aliases.update_one(
+    await audit_writer.update(
+        db, "vendor_aliases",
         {"alias_string": alias_string},
         {
             "$inc": {"usage_count": 1},
@@ -10100,6 +10166,38 @@ async def get_automation_metrics(
     """
     return await _get_automation_metrics_internal(days=days, job_type=job_type)
 
+@api_router.get("/metrics/http-clients")
+async def get_http_client_metrics(format: str = Query("json", description="json or prometheus")):
+    """
+    Outbound Graph/BC/Spiro client health: per-host concurrency limit,
+    circuit breaker state, and request/retry/throttle counters.
+    """
+    if format == "prometheus":
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+    return get_resilience_stats()
+
+@api_router.get("/metrics/audit-writer")
+async def get_audit_writer_metrics():
+    """Write-behind audit buffer: pending entries, batches written, drops and backpressure waits."""
+    return audit_writer.stats()
+
+@api_router.get("/metrics/config-cache")
+async def get_config_cache_metrics():
+    """Configuration cache: loaded sections, versions, hits and reloads."""
+    return config_cache.stats()
+
+@api_router.get("/metrics/blob-store")
+async def get_blob_store_metrics():
+    """Document blob store: writes, deduplicated puts, unreferenced blobs deleted and thumbnail rendering."""
+    stats = blob_store.stats()
+    totals = await db.blob_refs.aggregate([
+        {"$group": {"_id": None, "blobs": {"$sum": 1}, "bytes": {"$sum": "$size"}, "refs": {"$sum": {"$size": "$refs"}}}}
+    ]).to_list(1)
+    if totals:
+        stats.update({k: totals[0][k] for k in ("blobs", "bytes", "refs")})
+    stats["thumbnails"] = thumbnail_renderer.stats()
+    return stats
+
 @api_router.get("/metrics/vendors")
 async def get_vendor_friction_metrics(days: int = Query(30)):
     """
@@ -10248,7 +10346,8 @@ async def get_alias_impact_metrics():
             k: round(v / total_matches * 100, 1) if total_matches > 0 else 0
             for k, v in match_methods.items()
         },
-        "alias_contribution": round(match_methods.get("alias", 0) / total_matches * 100, 1) if total_matches > 0 else 0
+        "alias_contribution": round(match_methods.get("alias", 0) / total_matches * 100, 1) if total_matches > 0 else 0,
+        "alias_index": vendor_alias_index.stats()
     }
 
 @api_router.get("/metrics/resolution-time")
@@ -10773,7 +10872,7 @@ async def get_shadow_mode_status():
     Returns feature flag status, shadow mode duration, and quick health indicators.
     """
     # Get shadow mode config from settings
-    settings = await db.hub_settings.find_one({"type": "shadow_mode"}, {"_id": 0})
+    settings = await config_cache.shadow_mode()
     
     if not settings:
         # Initialize shadow mode settings if not exists
@@ -10889,6 +10988,7 @@ async def update_shadow_mode_settings(config: ShadowModeConfig):
             {"$set": update_data},
             upsert=True
         )
+        await config_cache.invalidate(SHADOW_MODE)
     
     return await get_shadow_mode_status()
 
@@ -11617,7 +11717,9 @@ from services.bc_sandbox_service import (
     validate_purchase_order_in_bc, get_bc_sandbox_status,
     PilotModeWriteBlockedError, BCSandboxError, BCLookupResult
 )
-from services.workflow_engine import BCValidationHistoryEntry
+from services.bc_bulk_validation import (
+    validate_document, validation_update, validate_documents_bulk, MAX_BULK_VALIDATION_DOCUMENTS
+)
 
 
 @api_router.get("/bc-sandbox/status")
@@ -11802,69 +11904,13 @@ async def bc_sandbox_validate_document(doc_id: str, background_tasks: Background
         raise HTTPException(status_code=404, detail="Document not found")
     
     doc_type = doc.get("doc_type", "OTHER")
-    validation_result = None
-    history_entry = None
-    
-    # Run appropriate validation based on doc_type
-    if doc_type == "AP_INVOICE":
-        vendor_number = doc.get("vendor_canonical") or doc.get("vendor_raw") or doc.get("extracted_data", {}).get("vendor_number")
-        invoice_number = doc.get("invoice_number") or doc.get("extracted_data", {}).get("invoice_number")
-        po_number = doc.get("po_number") or doc.get("extracted_data", {}).get("po_number")
-        
-        if vendor_number:
-            validation_result = await validate_ap_invoice_in_bc(
-                vendor_number=vendor_number,
-                invoice_number=invoice_number,
-                po_number=po_number
-            )
-            history_entry = BCValidationHistoryEntry.create_bc_validation_entry(
-                validation_type="ap_invoice",
-                validation_result=validation_result
-            )
-        else:
-            validation_result = {"error": "No vendor number available for validation", "observation_only": True}
-            
-    elif doc_type == "SALES_INVOICE":
-        customer_number = doc.get("customer_number") or doc.get("extracted_data", {}).get("customer_number")
-        invoice_number = doc.get("invoice_number") or doc.get("extracted_data", {}).get("invoice_number")
-        
-        if customer_number:
-            validation_result = await validate_sales_invoice_in_bc(
-                customer_number=customer_number,
-                invoice_number=invoice_number
-            )
-            history_entry = BCValidationHistoryEntry.create_bc_validation_entry(
-                validation_type="sales_invoice",
-                validation_result=validation_result
-            )
-        else:
-            validation_result = {"error": "No customer number available for validation", "observation_only": True}
-            
-    elif doc_type == "PURCHASE_ORDER":
-        po_number = doc.get("po_number") or doc.get("extracted_data", {}).get("po_number")
-        
-        if po_number:
-            validation_result = await validate_purchase_order_in_bc(po_number)
-            history_entry = BCValidationHistoryEntry.create_bc_validation_entry(
-                validation_type="purchase_order",
-                validation_result=validation_result
-            )
-        else:
-            validation_result = {"error": "No PO number available for validation", "observation_only": True}
-    else:
-        validation_result = {"info": f"No BC validation defined for doc_type: {doc_type}", "observation_only": True}
+    validation_result, history_entry = await validate_document(doc)
     
     # Add history entry to document (if we have one)
     if history_entry:
         await db.hub_documents.update_one(
             {"id": doc_id},
-            {
-                "$push": {"workflow_history": history_entry},
-                "$set": {
-                    "bc_validation_result": validation_result,
-                    "bc_validation_timestamp": datetime.now(timezone.utc).isoformat()
-                }
-            }
+            validation_update(validation_result, history_entry)
         )
     
     return {
@@ -11876,6 +11922,41 @@ async def bc_sandbox_validate_document(doc_id: str, background_tasks: Background
     }
 
 
+class BulkBCValidationRequest(BaseModel):
+    document_ids: Optional[List[str]] = None
+    doc_type: Optional[str] = None
+    status: Optional[str] = None
+    limit: int = 500
+
+
+@api_router.post("/bc-sandbox/documents/validate")
+async def bc_sandbox_validate_documents(request: BulkBCValidationRequest):
+    """
+    Validate a batch of documents against BC in one pass.
+    
+    Select documents by document_ids, or by doc_type/status (up to limit).
+    Distinct vendor, customer, PO and invoice numbers across the batch are
+    resolved with a few `number in (...)` BC queries and all results are
+    written with one bulk_write.
+    
+    READ-ONLY operation in observation mode.
+    """
+    if request.limit < 1 or request.limit > MAX_BULK_VALIDATION_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_BULK_VALIDATION_DOCUMENTS}")
+    
+    if request.document_ids:
+        query = {"id": {"$in": request.document_ids[:MAX_BULK_VALIDATION_DOCUMENTS]}}
+    else:
+        query = {"doc_type": {"$in": ["AP_INVOICE", "SALES_INVOICE", "PURCHASE_ORDER"]}}
+        if request.doc_type:
+            query["doc_type"] = request.doc_type
+        if request.status:
+            query["workflow_status"] = request.status
+    
+    docs = await db.hub_documents.find(query, {"_id": 0}).limit(request.limit).to_list(request.limit)
+    return await validate_documents_bulk(db, docs)
+
+
 # ==================== BC SIMULATION API (Phase 2 Shadow Pilot) ====================
 
 from services.bc_simulation_service import (
@@ -12172,6 +12253,8 @@ async def run_batch_simulation(
     docs = await cursor.to_list(limit)
     
     results = []
+    result_docs = []
+    doc_updates = []
     for doc in docs:
         doc_id = doc.get("id")
         try:
@@ -12183,14 +12266,14 @@ async def run_batch_simulation(
             for sim_type, result in results_dict.items():
                 result_copy = copy.deepcopy(result)
                 result_copy["_collection_timestamp"] = datetime.now(timezone.utc).isoformat()
-                await db.pilot_simulation_results.insert_one(result_copy)
+                result_docs.append(result_copy)
             
             # Update document
             history_entry = SimulationHistoryEntry.create_batch_simulation_entry(
                 document_id=doc_id,
                 simulation_results=results_dict
             )
-            await db.hub_documents.update_one(
+            doc_updates.append(UpdateOne(
                 {"id": doc_id},
                 {
                     "$push": {"workflow_history": history_entry},
@@ -12199,7 +12282,7 @@ async def run_batch_simulation(
                         "last_simulation_timestamp": datetime.now(timezone.utc).isoformat()
                     }
                 }
-            )
+            ))
             
             would_succeed = all(r.get("would_succeed_in_production") for r in results_dict.values())
             results.append({
@@ -12213,6 +12296,12 @@ async def run_batch_simulation(
                 "error": str(e)
             })
     
+    # One round trip per collection instead of one per document
+    if result_docs:
+        await db.pilot_simulation_results.insert_many(result_docs, ordered=False)
+    if doc_updates:
+        await db.hub_documents.bulk_write(doc_updates, ordered=False)
+    
     succeeded = sum(1 for r in results if r.get("all_would_succeed"))
     
     return {
@@ -12338,6 +12427,9 @@ async def get_failure_reason_codes():
 
 # ==================== BATCH RE-INGEST API ====================
 
+# Max documents re-ingested concurrently within one batch
+REINGEST_CONCURRENCY = 10
+
 # Global state for tracking re-ingest progress
 _reingest_state = {
     "running": False,
@@ -12442,7 +12534,7 @@ async def run_batch_reingest(batch_size: int, doc_type_filter: str = None):
             batch_ids = doc_ids[batch_num:batch_num + batch_size]
             _reingest_state["current_batch"] = (batch_num // batch_size) + 1
             
-            for doc_id in batch_ids:
+            async def reingest_one(doc_id: str):
                 try:
                     await reingest_single_document(doc_id)
                     _reingest_state["successes"] += 1
@@ -12456,6 +12548,15 @@ async def run_batch_reingest(batch_size: int, doc_type_filter: str = None):
                 
                 _reingest_state["processed"] += 1
             
+            # Documents within a batch are independent - dispatch them concurrently
+            semaphore = asyncio.Semaphore(REINGEST_CONCURRENCY)
+            
+            async def bounded(doc_id: str):
+                async with semaphore:
+                    await reingest_one(doc_id)
+            
+            await asyncio.gather(*(bounded(doc_id) for doc_id in batch_ids))
+            
             # Small delay between batches to prevent overload
             await asyncio.sleep(0.5)
         
@@ -12604,6 +12705,18 @@ async def stop_reingest():
 
 # ==================== FILE INGESTION API ====================
 
+# Uploads are parsed and imported as streams, so the limit only bounds spooled disk usage
+FILE_IMPORT_MAX_BYTES = int(os.environ.get("FILE_IMPORT_MAX_MB", "200")) * 1024 * 1024
+
+def _check_import_file_size(file: UploadFile) -> None:
+    size = file.size
+    if size is None:
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(0)
+    if size > FILE_IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=400, detail=f"File too large. Maximum size is {FILE_IMPORT_MAX_BYTES // (1024 * 1024)}MB.")
+
 @api_router.post("/sales/file-import/parse")
 async def parse_sales_file(
     file: UploadFile = File(...),
@@ -12620,14 +12733,12 @@ async def parse_sales_file(
     
     Returns parsed data preview and validation results.
     """
-    content = await file.read()
-    
-    if len(content) > 10 * 1024 * 1024:  # 10MB limit
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB.")
+    _check_import_file_size(file)
     
     try:
-        result = file_ingestion_service.parse_file(
-            content=content,
+        result = await asyncio.to_thread(
+            file_ingestion_service.parse_file,
+            content=file.file,
             file_name=file.filename,
             ingestion_type=ingestion_type,
             sheet_name=sheet_name
@@ -12652,44 +12763,21 @@ async def import_sales_orders_from_file(
     
     Groups order lines by customer_po into order headers and lines.
     Use dry_run=True to preview without saving to database.
+    The file is streamed; progress is recorded on its file_ingestion_log entry.
     """
-    content = await file.read()
-    
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB.")
+    _check_import_file_size(file)
     
     try:
-        # First parse the file
-        parsed = file_ingestion_service.parse_file(
-            content=content,
-            file_name=file.filename,
-            ingestion_type="sales_order",
-            sheet_name=sheet_name
-        )
-        
-        if not parsed.success:
-            return {
-                "success": False,
-                "error": parsed.error,
-                "validation_errors": parsed.validation_errors,
-                "warnings": parsed.warnings
-            }
-        
-        # Then import
-        result = await file_ingestion_service.import_sales_orders(
-            parsed_result=parsed,
+        result = await file_ingestion_service.import_file(
+            file.file,
+            file.filename,
+            "sales_order",
+            sheet_name=sheet_name,
             customer_id=customer_id,
             source="file_import",
             dry_run=dry_run
         )
-        
         result["file_name"] = file.filename
-        result["ingestion_id"] = parsed.ingestion_id
-        result["rows_parsed"] = parsed.rows_parsed
-        result["rows_valid"] = parsed.rows_valid
-        result["rows_invalid"] = parsed.rows_invalid
-        result["validation_errors"] = parsed.validation_errors
-        
         return result
         
     except Exception as e:
@@ -12709,44 +12797,21 @@ async def import_inventory_from_file(
     Import inventory positions from an Excel/CSV file.
     
     Use dry_run=True to preview without saving to database.
+    The file is streamed; progress is recorded on its file_ingestion_log entry.
     """
-    content = await file.read()
-    
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB.")
+    _check_import_file_size(file)
     
     try:
-        # First parse the file
-        parsed = file_ingestion_service.parse_file(
-            content=content,
-            file_name=file.filename,
-            ingestion_type="inventory_position",
-            sheet_name=sheet_name
-        )
-        
-        if not parsed.success:
-            return {
-                "success": False,
-                "error": parsed.error,
-                "validation_errors": parsed.validation_errors,
-                "warnings": parsed.warnings
-            }
-        
-        # Then import
-        result = await file_ingestion_service.import_inventory_positions(
-            parsed_result=parsed,
+        result = await file_ingestion_service.import_file(
+            file.file,
+            file.filename,
+            "inventory_position",
+            sheet_name=sheet_name,
             customer_id=customer_id,
             warehouse_id=warehouse_id,
             dry_run=dry_run
         )
-        
         result["file_name"] = file.filename
-        result["ingestion_id"] = parsed.ingestion_id
-        result["rows_parsed"] = parsed.rows_parsed
-        result["rows_valid"] = parsed.rows_valid
-        result["rows_invalid"] = parsed.rows_invalid
-        result["validation_errors"] = parsed.validation_errors
-        
         return result
         
     except Exception as e:
@@ -12805,6 +12870,15 @@ async def get_import_history(
     return {"history": history, "total": total}
 
 
+@api_router.get("/sales/file-import/{ingestion_id}/progress")
+async def get_import_progress(ingestion_id: str):
+    """Progress of a running (or finished) file import."""
+    entry = await db.file_ingestion_log.find_one({"ingestion_id": ingestion_id}, {"_id": 0})
+    if not entry:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return entry
+
+
 # ==================== APP SETUP ====================
 
 app.include_router(api_router)
@@ -12851,10 +12925,7 @@ async def dynamic_mailbox_polling_worker():
     while True:
         try:
             # Get all enabled mailbox sources
-            mailbox_sources = await db.mailbox_sources.find(
-                {"enabled": True}, 
-                {"_id": 0}
-            ).to_list(100)
+            mailbox_sources = await config_cache.mailbox_sources(enabled_only=True)
             
             now = datetime.now(timezone.utc)
             
@@ -12906,12 +12977,19 @@ async def dynamic_mailbox_polling_worker():
 
 @app.on_event("startup")
 async def startup():
-    global _email_polling_task
+    global _email_polling_task, _config_version_task
+    # Serve job types, mailbox sources, email watcher, aliases and shadow mode from memory
+    config_cache.bind(db)
+    _config_version_task = asyncio.create_task(config_cache.run_version_watcher())
+    # Content-addressed document file store with reference counts in blob_refs
+    blob_store.bind(db)
+    await blob_store.ensure_indexes()
     await db.hub_documents.create_index("id", unique=True)
     await db.hub_documents.create_index("status")
     await db.hub_documents.create_index("document_type")
     await db.hub_documents.create_index("created_utc")
     await db.hub_documents.create_index("source")
+    await db.file_ingestion_log.create_index("ingestion_id")
     await db.hub_documents.create_index("suggested_job_type")
     await db.hub_documents.create_index([("extracted_fields.vendor", 1)])
     # Phase 7: Indexes for new flat normalized fields
@@ -12937,12 +13015,23 @@ async def startup():
     await db.vendor_aliases.create_index("alias_id", unique=True)
     await db.vendor_aliases.create_index("alias_string", unique=True)
     await db.vendor_aliases.create_index("normalized_alias")
+    await db.vendor_aliases.create_index("alias_key")
     await db.vendor_aliases.create_index("vendor_no")
     await db.vendor_aliases.create_index("canonical_vendor_id")
     # Phase C1: Mail intake log indexes
     await db.mail_intake_log.create_index("internet_message_id")
     await db.mail_intake_log.create_index("attachment_hash")
     await db.mail_intake_log.create_index([("internet_message_id", 1), ("attachment_hash", 1)])
+    await db.mail_intake_log.create_index("message_id")
+    try:
+        # One Processed entry per attachment; also guards concurrent poll runs
+        await db.mail_intake_log.create_index(
+            [("internet_message_id", 1), ("attachment_id", 1)],
+            unique=True, partialFilterExpression={"status": "Processed"},
+            name="mail_intake_processed_unique"
+        )
+    except Exception as e:
+        logger.warning("Could not create unique mail intake index (existing duplicates?): %s", str(e))
     await db.mail_intake_log.create_index("processed_at")
     await db.mail_poll_runs.create_index("started_at")
     # Sales Module (Phase 0): Initialize database and indexes
@@ -12950,6 +13039,9 @@ async def startup():
     await initialize_sales_indexes(db)
     # File Ingestion Service: Initialize database
     set_file_ingestion_db(db)
+    # Inventory snapshots: collapse legacy duplicate positions, then key current positions
+    inventory_snapshot_store.set_db(db)
+    await inventory_snapshot_store.ensure_indexes()
     # Spiro Integration: Initialize database
     set_spiro_db(db)
     # Create Spiro indexes
@@ -12977,11 +13069,18 @@ async def startup():
         existing = await db.hub_job_types.find_one({"job_type": jt_key})
         if not existing:
             await db.hub_job_types.insert_one(jt_config)
-    # Load vendor aliases into memory
-    aliases = await db.vendor_aliases.find({}, {"_id": 0}).to_list(500)
-    for alias in aliases:
-        VENDOR_ALIAS_MAP[alias["alias_string"]] = alias.get("vendor_name") or alias.get("vendor_no")
-        VENDOR_ALIAS_MAP[alias["normalized_alias"]] = alias.get("vendor_name") or alias.get("vendor_no")
+    # Precompute alias_key for aliases created before it existed, then warm the alias index
+    missing_keys = await db.vendor_aliases.find(
+        {"alias_key": {"$exists": False}}, {"_id": 1, "alias_string": 1}
+    ).to_list(None)
+    if missing_keys:
+        await db.vendor_aliases.bulk_write([
+            UpdateOne({"_id": a["_id"]}, {"$set": {"alias_key": normalize_vendor_name(a.get("alias_string", ""))}})
+            for a in missing_keys
+        ])
+        await config_cache.invalidate(VENDOR_ALIASES)
+    aliases = await config_cache.vendor_aliases()
+    vendor_alias_index.build(aliases)
     
     # Start dynamic mailbox polling worker (polls mailboxes configured via UI)
     global _dynamic_mailbox_polling_task
@@ -13012,8 +13111,27 @@ async def startup():
     await db.migration_candidates.create_index("source_item_id", unique=True)
     await db.migration_candidates.create_index("status")
     await db.migration_candidates.create_index("doc_type")
+    await db.sharepoint_migration_runs.create_index("id", unique=True)
+    await db.sharepoint_migration_runs.create_index("status")
+    global _migration_run_supervisor_task
+    _migration_run_supervisor_task = asyncio.create_task(run_migration_supervisor(db))
     logger.info("SharePoint Migration module initialized")
     
+    # Batch audit-trail and mail intake log writes off the request path
+    audit_writer.start(db)
+    # Render page thumbnails of newly stored documents in the background
+    thumbnail_renderer.start(db, read_content=read_stored_file)
+    
+    # Drain Graph webhook notifications and keep the mail subscription alive
+    global _graph_notification_workers_task, _graph_subscription_task
+    await graph_notification_queue.ensure_indexes()
+    _graph_notification_workers_task = asyncio.create_task(graph_notification_queue.run_workers(process_incoming_email))
+    _graph_subscription_task = asyncio.create_task(graph_subscription_manager.run())
+    
+    # Keep the open PO index warm for PO validation, linkage simulation and AP review
+    global _open_po_index_task
+    _open_po_index_task = asyncio.create_task(run_open_po_index_refresher(get_bc_service()))
+    
     # Start daily pilot summary scheduler if enabled
     global _pilot_summary_task
     if PILOT_MODE_ENABLED and DAILY_PILOT_EMAIL_ENABLED:
@@ -13046,6 +13164,16 @@ async def shutdown_db_client():
             await _sales_polling_task
         except asyncio.CancelledError:
             logger.info("Sales email polling worker stopped")
+    # Stop SharePoint migration runs; they are resumed on next startup
+    if _migration_run_supervisor_task and not _migration_run_supervisor_task.done():
+        _migration_run_supervisor_task.cancel()
+    await stop_migration_runs()
+    if _open_po_index_task and not _open_po_index_task.done():
+        _open_po_index_task.cancel()
+    # Queued notifications stay in MongoDB; claimed ones are retried after their lease
+    for task in (_graph_notification_workers_task, _graph_subscription_task, _config_version_task):
+        if task and not task.done():
+            task.cancel()
     # Cancel pilot summary scheduler if running
     if _pilot_summary_task and not _pilot_summary_task.done():
         _pilot_summary_task.cancel()
@@ -13053,4 +13181,7 @@ async def shutdown_db_client():
             await _pilot_summary_task
         except asyncio.CancelledError:
             logger.info("Pilot summary scheduler stopped")
+    # Write buffered audit entries before the client closes
+    await thumbnail_renderer.close()
+    await audit_writer.close()
     client.close()
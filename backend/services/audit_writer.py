@@ -0,0 +1,220 @@
+"""
+GPI Document Hub - Audit Write-Behind Buffer
+
+Buffers audit-trail writes (workflow runs, mail intake logs, poll run stats,
+alias usage counters) and writes them in periodic batches so intake and mail
+polling do not await one MongoDB round trip per log entry.
+
+Key features:
+1. Inserts are grouped per collection into insert_many(ordered=False);
+   updates into bulk_write(ordered=False)
+2. Flushes every AUDIT_FLUSH_INTERVAL_SECONDS, or as soon as
+   AUDIT_BATCH_SIZE entries are waiting
+3. Bounded buffer: writers wait (backpressure) once AUDIT_MAX_PENDING
+   entries are buffered instead of growing memory without limit
+4. Buffered entries are flushed on shutdown; failed entries are retried on
+   the next flush up to MAX_WRITE_ATTEMPTS times. Duplicate-key rejections
+   (unique idempotency indexes) are not retried
+5. pending() exposes buffered inserts so idempotency checks see entries
+   that are not written yet
+6. Before start() (scripts, tests) writes go straight to MongoDB
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.environ.get("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0"))
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "500"))
+AUDIT_MAX_PENDING = int(os.environ.get("AUDIT_MAX_PENDING", "10000"))
+MAX_WRITE_ATTEMPTS = 3
+DUPLICATE_KEY = 11000
+
+INSERT = "insert"
+UPDATE = "update"
+
+
+@dataclass
+class _AuditEntry:
+    collection: str
+    kind: str
+    payload: Any
+    attempts: int = 0
+
+
+class AuditWriter:
+    """Write-behind buffer for audit inserts and counter updates."""
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        max_pending: int = AUDIT_MAX_PENDING,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._db = None
+        self._buffer: List[_AuditEntry] = []
+        self._in_flight: List[_AuditEntry] = []
+        self._wake = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._written = 0
+        self._dropped = 0
+        self._flushes = 0
+        self._backpressure_waits = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, db) -> None:
+        """Start the background flusher against db."""
+        self._db = db
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the flusher and write everything still buffered."""
+        if self._task:
+            # Cancel only between flushes, so a batch being written is not lost
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._buffer:
+            before = len(self._buffer)
+            await self.flush()
+            if len(self._buffer) >= before:
+                break
+        if self._buffer:
+            logger.error("Audit writer closing with %d unwritten entries", len(self._buffer))
+            self._dropped += len(self._buffer)
+            self._buffer = []
+        self._not_full.set()
+
+    async def insert(self, db, collection: str, document: Dict[str, Any]) -> None:
+        """Queue an insert. The document is copied, so the caller's dict never gains an _id."""
+        if not self.running:
+            await db[collection].insert_one(dict(document))
+            return
+        await self._enqueue(_AuditEntry(collection, INSERT, dict(document)))
+
+    async def update(self, db, collection: str, filter: Dict[str, Any], update: Dict[str, Any]) -> None:
+        """Queue an update_one (counters, last-used timestamps)."""
+        if not self.running:
+            await db[collection].update_one(filter, update)
+            return
+        await self._enqueue(_AuditEntry(collection, UPDATE, UpdateOne(filter, update)))
+
+    async def _enqueue(self, entry: _AuditEntry) -> None:
+        while len(self._buffer) >= self.max_pending:
+            self._backpressure_waits += 1
+            self._not_full.clear()
+            self._wake.set()
+            await self._not_full.wait()
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    def pending(self, collection: str, predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Dict[str, Any]]:
+        """Buffered or in-flight inserts into collection, optionally filtered."""
+        return [
+            e.payload for e in self._in_flight + self._buffer
+            if e.collection == collection and e.kind == INSERT and (predicate is None or predicate(e.payload))
+        ]
+
+    async def flush(self) -> int:
+        """Write the buffered entries now; returns the number written."""
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            self._in_flight, self._buffer = self._buffer, []
+            self._not_full.set()
+            written = 0
+            try:
+                groups: Dict[tuple, List[_AuditEntry]] = {}
+                for entry in self._in_flight:
+                    groups.setdefault((entry.collection, entry.kind), []).append(entry)
+                for (collection, kind), entries in groups.items():
+                    try:
+                        if kind == INSERT:
+                            await self._db[collection].insert_many([e.payload for e in entries], ordered=False)
+                        else:
+                            await self._db[collection].bulk_write([e.payload for e in entries], ordered=False)
+                        written += len(entries)
+                    except BulkWriteError as e:
+                        # Unordered: everything except the reported errors was written
+                        errors = e.details.get("writeErrors", [])
+                        failed = [entries[err["index"]] for err in errors if err.get("code") != DUPLICATE_KEY]
+                        duplicates = len(errors) - len(failed)
+                        written += len(entries) - len(errors)
+                        if duplicates:
+                            logger.info("Audit write to %s skipped %d duplicate entries", collection, duplicates)
+                        if failed:
+                            self._requeue(collection, failed, e)
+                    except Exception as e:
+                        self._requeue(collection, entries, e)
+            finally:
+                self._in_flight = []
+            self._written += written
+            self._flushes += 1
+            return written
+
+    def _requeue(self, collection: str, entries: List[_AuditEntry], error: Exception) -> None:
+        retry = []
+        for entry in entries:
+            entry.attempts += 1
+            if entry.attempts < MAX_WRITE_ATTEMPTS:
+                # Strip the _id insert_many assigned so the retry is a fresh insert
+                if entry.kind == INSERT:
+                    entry.payload.pop("_id", None)
+                retry.append(entry)
+        dropped = len(entries) - len(retry)
+        self._dropped += dropped
+        self._buffer[:0] = retry
+        logger.error(
+            "Audit write to %s failed (%d retried, %d dropped): %s",
+            collection, len(retry), dropped, str(error)
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Audit flush failed: %s", str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending": len(self._buffer),
+            "in_flight": len(self._in_flight),
+            "written": self._written,
+            "dropped": self._dropped,
+            "flushes": self._flushes,
+            "backpressure_waits": self._backpressure_waits,
+        }
+
+
+audit_writer = AuditWriter()
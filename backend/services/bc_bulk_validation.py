@@ -0,0 +1,177 @@
+"""
+GPI Document Hub - Bulk BC Validation
+
+Validates a batch of hub documents against the BC sandbox (observation
+mode, READ-ONLY). Instead of each document doing its own vendor, customer,
+PO and invoice lookups, the distinct numbers across the batch are resolved
+once with `number in (...)` queries (bc_sandbox_service.prefetch_lookups),
+each document's validation is then served from the BC lookup cache, and
+all results are written back with a single bulk_write.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from services.bc_sandbox_service import (
+    prefetch_lookups,
+    validate_ap_invoice_in_bc,
+    validate_purchase_order_in_bc,
+    validate_sales_invoice_in_bc,
+)
+from services.workflow_engine import BCValidationHistoryEntry
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on documents validated per bulk request
+MAX_BULK_VALIDATION_DOCUMENTS = 1000
+
+
+def _document_numbers(doc: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """Vendor/customer/invoice/PO numbers used for validation, from doc fields or extracted data."""
+    extracted = doc.get("extracted_data") or {}
+    return {
+        "vendor_number": doc.get("vendor_canonical") or doc.get("vendor_raw") or extracted.get("vendor_number"),
+        "customer_number": doc.get("customer_number") or extracted.get("customer_number"),
+        "invoice_number": doc.get("invoice_number") or extracted.get("invoice_number"),
+        "po_number": doc.get("po_number") or extracted.get("po_number"),
+    }
+
+
+def _lookups_for_document(doc: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """Cache entity -> number that validate_document() will look up for this document."""
+    doc_type = doc.get("doc_type", "OTHER")
+    numbers = _document_numbers(doc)
+    if doc_type == "AP_INVOICE" and numbers["vendor_number"]:
+        return {"vendor": numbers["vendor_number"], "purchase_order": numbers["po_number"]}
+    if doc_type == "SALES_INVOICE" and numbers["customer_number"]:
+        return {"customer": numbers["customer_number"], "sales_invoice": numbers["invoice_number"]}
+    if doc_type == "PURCHASE_ORDER":
+        return {"purchase_order": numbers["po_number"]}
+    return {}
+
+
+async def validate_document(doc: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Run the BC validation for one document based on its doc_type.
+
+    Returns:
+        (validation_result, history_entry); history_entry is None when the
+        document could not be validated (missing numbers, unsupported type)
+    """
+    doc_type = doc.get("doc_type", "OTHER")
+    numbers = _document_numbers(doc)
+
+    if doc_type == "AP_INVOICE":
+        if not numbers["vendor_number"]:
+            return {"error": "No vendor number available for validation", "observation_only": True}, None
+        validation_result = await validate_ap_invoice_in_bc(
+            vendor_number=numbers["vendor_number"],
+            invoice_number=numbers["invoice_number"],
+            po_number=numbers["po_number"]
+        )
+        validation_type = "ap_invoice"
+
+    elif doc_type == "SALES_INVOICE":
+        if not numbers["customer_number"]:
+            return {"error": "No customer number available for validation", "observation_only": True}, None
+        validation_result = await validate_sales_invoice_in_bc(
+            customer_number=numbers["customer_number"],
+            invoice_number=numbers["invoice_number"]
+        )
+        validation_type = "sales_invoice"
+
+    elif doc_type == "PURCHASE_ORDER":
+        if not numbers["po_number"]:
+            return {"error": "No PO number available for validation", "observation_only": True}, None
+        validation_result = await validate_purchase_order_in_bc(numbers["po_number"])
+        validation_type = "purchase_order"
+
+    else:
+        return {"info": f"No BC validation defined for doc_type: {doc_type}", "observation_only": True}, None
+
+    history_entry = BCValidationHistoryEntry.create_bc_validation_entry(
+        validation_type=validation_type,
+        validation_result=validation_result
+    )
+    return validation_result, history_entry
+
+
+def validation_update(validation_result: Dict[str, Any], history_entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Mongo update recording a validation result on a hub document."""
+    return {
+        "$push": {"workflow_history": history_entry},
+        "$set": {
+            "bc_validation_result": validation_result,
+            "bc_validation_timestamp": datetime.now(timezone.utc).isoformat()
+        }
+    }
+
+
+async def validate_documents_bulk(db, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Validate a batch of documents with one round of bulk BC lookups and one bulk_write.
+
+    Args:
+        db: Motor database holding hub_documents
+        docs: Hub documents (need id, doc_type and the number fields)
+
+    Returns:
+        Summary with per-document results and the number of BC calls made
+    """
+    start_time = time.time()
+
+    numbers_by_entity: Dict[str, set] = {}
+    for doc in docs:
+        for entity, number in _lookups_for_document(doc).items():
+            if number:
+                numbers_by_entity.setdefault(entity, set()).add(number)
+
+    prefetch = await prefetch_lookups(numbers_by_entity)
+
+    outcomes = await asyncio.gather(*(validate_document(doc) for doc in docs), return_exceptions=True)
+
+    operations = []
+    results = []
+    for doc, outcome in zip(docs, outcomes):
+        doc_id = doc.get("id")
+        if isinstance(outcome, Exception):
+            logger.error("Bulk BC validation failed for %s: %s", doc_id, str(outcome))
+            results.append({"document_id": doc_id, "doc_type": doc.get("doc_type"), "error": str(outcome)})
+            continue
+        validation_result, history_entry = outcome
+        if history_entry:
+            operations.append(UpdateOne({"id": doc_id}, validation_update(validation_result, history_entry)))
+        results.append({
+            "document_id": doc_id,
+            "doc_type": doc.get("doc_type"),
+            "validated": history_entry is not None,
+            "overall_valid": validation_result.get("overall_valid"),
+            "warnings": validation_result.get("warnings", []),
+            "error": validation_result.get("error"),
+        })
+
+    if operations:
+        await db.hub_documents.bulk_write(operations, ordered=False)
+
+    elapsed_ms = int((time.time() - start_time) * 1000)
+    validated = len(operations)
+    logger.info(
+        "Bulk BC validation: documents=%d, validated=%d, bc_calls=%d, timing=%dms",
+        len(docs), validated, prefetch["bc_calls"], elapsed_ms
+    )
+
+    return {
+        "documents_processed": len(docs),
+        "validated": validated,
+        "skipped": len(docs) - validated,
+        "distinct_lookups": prefetch["requested"],
+        "bc_calls": prefetch["bc_calls"],
+        "total_timing_ms": elapsed_ms,
+        "observation_only": True,
+        "results": results,
+    }
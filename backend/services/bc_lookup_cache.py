@@ -0,0 +1,185 @@
+"""
+GPI Document Hub - Business Central Lookup Cache
+
+In-process read-through cache for BC reference lookups (companies, vendors,
+customers, purchase orders, invoices). Validation, batch simulation and
+reingest look up the same vendors and POs many times; this keeps those
+lookups off the BC API.
+
+Key features:
+1. Per-entity TTLs: master data (companies, vendors, customers) lives longer
+   than documents whose status changes (purchase orders, invoices)
+2. Negative caching: "not found" answers are cached for a short TTL so a
+   batch with the same unknown PO does not query BC for every document
+3. Errors are never cached
+4. Concurrent lookups for the same key share a single BC call; if the
+   caller doing the load is cancelled, a waiting caller takes it over
+5. Explicit invalidation after our own writes, and hit/miss stats
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds a found record stays cached, per entity
+ENTITY_TTL_SECONDS: Dict[str, float] = {
+    "company": 3600,
+    "vendor": 900,
+    "customer": 900,
+    "purchase_order": 300,
+    "purchase_invoice": 300,
+    "sales_invoice": 300,
+}
+DEFAULT_TTL_SECONDS = 300
+# Seconds a "not found" answer stays cached
+NEGATIVE_TTL_SECONDS = 60
+# Upper bound on cached entries per entity; expired entries are evicted first
+MAX_ENTRIES_PER_ENTITY = 5000
+
+FOUND = "found"
+NOT_FOUND = "not_found"
+
+
+class BCLookupCache:
+    """TTL cache keyed by (entity, key) with negative entries and single-flight loads."""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[Hashable, Tuple[Any, float, bool]]] = {}
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, entity: str, name: str) -> None:
+        counters = self._stats.setdefault(
+            entity, {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0}
+        )
+        counters[name] += 1
+
+    def get(self, entity: str, key: Hashable) -> Tuple[bool, Any]:
+        """Return (hit, value) for an unexpired entry."""
+        entry = self._entries.get(entity, {}).get(key)
+        if entry is None:
+            return False, None
+        value, expires_at, negative = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[entity][key]
+            return False, None
+        self._count(entity, "negative_hits" if negative else "hits")
+        return True, value
+
+    def contains(self, entity: str, key: Hashable) -> bool:
+        """True if an unexpired entry exists; does not count as a hit."""
+        entry = self._entries.get(entity, {}).get(key)
+        return entry is not None and time.monotonic() < entry[1]
+
+    def set(self, entity: str, key: Hashable, value: Any, negative: bool = False) -> None:
+        ttl = NEGATIVE_TTL_SECONDS if negative else ENTITY_TTL_SECONDS.get(entity, DEFAULT_TTL_SECONDS)
+        entries = self._entries.setdefault(entity, {})
+        if len(entries) >= MAX_ENTRIES_PER_ENTITY and key not in entries:
+            self._evict(entries)
+        entries[key] = (value, time.monotonic() + ttl, negative)
+
+    @staticmethod
+    def _evict(entries: Dict[Hashable, Tuple[Any, float, bool]]) -> None:
+        now = time.monotonic()
+        expired = [k for k, (_, expires_at, _) in entries.items() if expires_at <= now]
+        for k in expired:
+            del entries[k]
+        if len(entries) >= MAX_ENTRIES_PER_ENTITY:
+            # Dicts keep insertion order, so this drops the oldest entry
+            del entries[next(iter(entries))]
+
+    async def get_or_load(
+        self,
+        entity: str,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        outcome: Optional[Callable[[Any], Optional[str]]] = None,
+    ) -> Any:
+        """
+        Return the cached value for (entity, key), calling loader() on a miss.
+
+        outcome(value) decides what is cached: FOUND, NOT_FOUND (short TTL)
+        or None to not cache (errors). By default any truthy value is FOUND.
+        """
+        while True:
+            hit, value = self.get(entity, key)
+            if hit:
+                return value
+            inflight = self._inflight.get((entity, key))
+            if inflight is None:
+                break
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The loading caller was cancelled, not us: take over the load
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        self._count(entity, "misses")
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[(entity, key)] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve the exception so an unawaited future does not log it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop((entity, key), None)
+
+        decision = outcome(value) if outcome else (FOUND if value else None)
+        if decision == FOUND:
+            self.set(entity, key, value)
+        elif decision == NOT_FOUND:
+            self.set(entity, key, value, negative=True)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, entity: str, key: Optional[Hashable] = None) -> int:
+        """Drop one key, or every key of an entity when key is None. Returns entries dropped."""
+        entries = self._entries.get(entity)
+        if not entries:
+            return 0
+        if key is None:
+            dropped = len(entries)
+            entries.clear()
+        else:
+            dropped = 1 if entries.pop(key, None) is not None else 0
+        if dropped:
+            self._count(entity, "invalidations")
+            logger.debug("BC lookup cache: invalidated %d %s entries", dropped, entity)
+        return dropped
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._stats.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and live entry counts per entity."""
+        now = time.monotonic()
+        entities = {}
+        for entity in sorted(set(self._stats) | set(self._entries)):
+            counters = dict(self._stats.get(entity, {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0}))
+            entries = self._entries.get(entity, {})
+            counters["entries"] = sum(1 for _, expires_at, _ in entries.values() if expires_at > now)
+            counters["negative_entries"] = sum(
+                1 for _, expires_at, negative in entries.values() if negative and expires_at > now
+            )
+            lookups = counters["hits"] + counters["negative_hits"] + counters["misses"]
+            counters["hit_rate"] = round((counters["hits"] + counters["negative_hits"]) / lookups, 3) if lookups else 0.0
+            entities[entity] = counters
+        return {
+            "ttl_seconds": dict(ENTITY_TTL_SECONDS),
+            "negative_ttl_seconds": NEGATIVE_TTL_SECONDS,
+            "entities": entities,
+        }
+
+
+bc_lookup_cache = BCLookupCache()
@@ -18,15 +18,19 @@ Configuration:
 """
 
 import os
+import copy
+import asyncio
 import logging
 import time
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
 from enum import Enum
 import httpx
 from dotenv import load_dotenv
 load_dotenv()  # Load .env before reading environment variables
 
+from services.resilience import resilient_client
+from services.bc_lookup_cache import bc_lookup_cache, FOUND, NOT_FOUND
 from services.pilot_config import (
     PILOT_MODE_ENABLED, is_external_write_blocked,
     create_pilot_log_entry
@@ -225,7 +229,7 @@ async def get_bc_sandbox_token() -> str:
     
     start_time = time.time()
     try:
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             response = await client.post(
                 token_url,
                 data={
@@ -270,7 +274,7 @@ async def _get_companies() -> List[Dict]:
     token = await get_bc_sandbox_token()
     url = f"{BC_API_BASE}/{BC_SANDBOX_TENANT_ID}/{BC_SANDBOX_ENVIRONMENT}/api/v2.0/companies"
     
-    async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+    async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
         response = await client.get(url, headers={"Authorization": f"Bearer {token}"})
         if response.status_code == 200:
             return response.json().get("value", [])
@@ -278,7 +282,11 @@ async def _get_companies() -> List[Dict]:
 
 
 async def _get_company_id() -> str:
-    """Get the primary company ID for API calls."""
+    """Get the primary company ID for API calls (cached, see bc_lookup_cache)."""
+    return await bc_lookup_cache.get_or_load("company", "primary", _resolve_company_id)
+
+
+async def _resolve_company_id() -> str:
     companies = await _get_companies()
     if not companies:
         raise BCSandboxError("No companies found in BC sandbox")
@@ -354,9 +362,38 @@ async def post_sales_invoice(*args, **kwargs):
 # READ-ONLY LOOKUP FUNCTIONS
 # =============================================================================
 
+def _lookup_outcome(result: BCLookupResult) -> Optional[str]:
+    """Cache found and not-found answers; never cache errors."""
+    if result.status == BCLookupStatus.SUCCESS:
+        return FOUND
+    if result.status == BCLookupStatus.NOT_FOUND:
+        return NOT_FOUND
+    return None
+
+
+async def _cached_lookup(
+    entity: str, number: str, fetch: Callable[[], Awaitable[BCLookupResult]]
+) -> BCLookupResult:
+    """
+    Serve a lookup through bc_lookup_cache.
+
+    Each caller gets its own copy of the cached result, with the timing of
+    this call, so cache hits report their real latency and callers cannot
+    modify the cached entry.
+    """
+    start_time = time.time()
+    cached = await bc_lookup_cache.get_or_load(entity, number, fetch, outcome=_lookup_outcome)
+    result = copy.copy(cached)
+    result.data = copy.deepcopy(cached.data)
+    result.timing_ms = int((time.time() - start_time) * 1000)
+    result.timestamp = datetime.now(timezone.utc).isoformat()
+    return result
+
+
 async def get_vendor(vendor_number: str) -> BCLookupResult:
     """
     Get vendor details by vendor number.
+    Served from the BC lookup cache when possible.
     
     Args:
         vendor_number: BC vendor number (e.g., "V10000")
@@ -364,6 +401,11 @@ async def get_vendor(vendor_number: str) -> BCLookupResult:
     Returns:
         BCLookupResult with vendor data or error
     """
+    return await _cached_lookup("vendor", vendor_number, lambda: _fetch_vendor(vendor_number))
+
+
+async def _fetch_vendor(vendor_number: str) -> BCLookupResult:
+    """Uncached BC lookup behind get_vendor."""
     start_time = time.time()
     endpoint = f"vendors?$filter=number eq '{vendor_number}'"
     
@@ -398,7 +440,7 @@ async def get_vendor(vendor_number: str) -> BCLookupResult:
         company_id = await _get_company_id()
         url = f"{BC_API_BASE}/{BC_SANDBOX_TENANT_ID}/{BC_SANDBOX_ENVIRONMENT}/api/v2.0/companies({company_id})/vendors"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             response = await client.get(
                 url,
                 headers={"Authorization": f"Bearer {token}"},
@@ -488,7 +530,7 @@ async def search_vendors_by_name(name_fragment: str, limit: int = 20) -> BCLooku
         company_id = await _get_company_id()
         url = f"{BC_API_BASE}/{BC_SANDBOX_TENANT_ID}/{BC_SANDBOX_ENVIRONMENT}/api/v2.0/companies({company_id})/vendors"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             response = await client.get(
                 url,
                 headers={"Authorization": f"Bearer {token}"},
@@ -558,6 +600,7 @@ async def validate_vendor_exists(vendor_number: str) -> Tuple[bool, BCLookupResu
 async def get_customer(customer_number: str) -> BCLookupResult:
     """
     Get customer details by customer number.
+    Served from the BC lookup cache when possible.
     
     Args:
         customer_number: BC customer number (e.g., "C20000")
@@ -565,6 +608,11 @@ async def get_customer(customer_number: str) -> BCLookupResult:
     Returns:
         BCLookupResult with customer data or error
     """
+    return await _cached_lookup("customer", customer_number, lambda: _fetch_customer(customer_number))
+
+
+async def _fetch_customer(customer_number: str) -> BCLookupResult:
+    """Uncached BC lookup behind get_customer."""
     start_time = time.time()
     endpoint = f"customers?$filter=number eq '{customer_number}'"
     
@@ -598,7 +646,7 @@ async def get_customer(customer_number: str) -> BCLookupResult:
         company_id = await _get_company_id()
         url = f"{BC_API_BASE}/{BC_SANDBOX_TENANT_ID}/{BC_SANDBOX_ENVIRONMENT}/api/v2.0/companies({company_id})/customers"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             response = await client.get(
                 url,
                 headers={"Authorization": f"Bearer {token}"},
@@ -654,6 +702,7 @@ async def get_customer(customer_number: str) -> BCLookupResult:
 async def get_purchase_order(po_number: str) -> BCLookupResult:
     """
     Get purchase order details by PO number.
+    Served from the BC lookup cache when possible.
     
     Args:
         po_number: Purchase order number (e.g., "PO-001")
@@ -661,6 +710,11 @@ async def get_purchase_order(po_number: str) -> BCLookupResult:
     Returns:
         BCLookupResult with PO data or error
     """
+    return await _cached_lookup("purchase_order", po_number, lambda: _fetch_purchase_order(po_number))
+
+
+async def _fetch_purchase_order(po_number: str) -> BCLookupResult:
+    """Uncached BC lookup behind get_purchase_order."""
     start_time = time.time()
     endpoint = f"purchaseOrders?$filter=number eq '{po_number}'"
     
@@ -694,7 +748,7 @@ async def get_purchase_order(po_number: str) -> BCLookupResult:
         company_id = await _get_company_id()
         url = f"{BC_API_BASE}/{BC_SANDBOX_TENANT_ID}/{BC_SANDBOX_ENVIRONMENT}/api/v2.0/companies({company_id})/purchaseOrders"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             response = await client.get(
                 url,
                 headers={"Authorization": f"Bearer {token}"},
@@ -750,6 +804,7 @@ async def get_purchase_order(po_number: str) -> BCLookupResult:
 async def get_purchase_invoice(invoice_number: str) -> BCLookupResult:
     """
     Get purchase invoice details by invoice number.
+    Served from the BC lookup cache when possible.
     
     Args:
         invoice_number: Purchase invoice number (e.g., "PI-1001")
@@ -757,6 +812,11 @@ async def get_purchase_invoice(invoice_number: str) -> BCLookupResult:
     Returns:
         BCLookupResult with invoice data or error
     """
+    return await _cached_lookup("purchase_invoice", invoice_number, lambda: _fetch_purchase_invoice(invoice_number))
+
+
+async def _fetch_purchase_invoice(invoice_number: str) -> BCLookupResult:
+    """Uncached BC lookup behind get_purchase_invoice."""
     start_time = time.time()
     endpoint = f"purchaseInvoices?$filter=number eq '{invoice_number}'"
     
@@ -790,7 +850,7 @@ async def get_purchase_invoice(invoice_number: str) -> BCLookupResult:
         company_id = await _get_company_id()
         url = f"{BC_API_BASE}/{BC_SANDBOX_TENANT_ID}/{BC_SANDBOX_ENVIRONMENT}/api/v2.0/companies({company_id})/purchaseInvoices"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             response = await client.get(
                 url,
                 headers={"Authorization": f"Bearer {token}"},
@@ -846,6 +906,7 @@ async def get_purchase_invoice(invoice_number: str) -> BCLookupResult:
 async def get_sales_invoice(invoice_number: str) -> BCLookupResult:
     """
     Get sales invoice details by invoice number.
+    Served from the BC lookup cache when possible.
     
     Args:
         invoice_number: Sales invoice number (e.g., "SI-5001")
@@ -853,6 +914,11 @@ async def get_sales_invoice(invoice_number: str) -> BCLookupResult:
     Returns:
         BCLookupResult with invoice data or error
     """
+    return await _cached_lookup("sales_invoice", invoice_number, lambda: _fetch_sales_invoice(invoice_number))
+
+
+async def _fetch_sales_invoice(invoice_number: str) -> BCLookupResult:
+    """Uncached BC lookup behind get_sales_invoice."""
     start_time = time.time()
     endpoint = f"salesInvoices?$filter=number eq '{invoice_number}'"
     
@@ -886,7 +952,7 @@ async def get_sales_invoice(invoice_number: str) -> BCLookupResult:
         company_id = await _get_company_id()
         url = f"{BC_API_BASE}/{BC_SANDBOX_TENANT_ID}/{BC_SANDBOX_ENVIRONMENT}/api/v2.0/companies({company_id})/salesInvoices"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             response = await client.get(
                 url,
                 headers={"Authorization": f"Bearer {token}"},
@@ -966,6 +1032,110 @@ async def validate_invoice_exists(
     return (exists, result)
 
 
+# =============================================================================
+# BULK LOOKUPS
+# =============================================================================
+
+# Numbers per `number in (...)` query; keeps the request URL well under BC's limit
+BULK_LOOKUP_CHUNK_SIZE = 40
+
+# Cache entity -> (BC API entity set, label used in not-found messages)
+_BULK_LOOKUP_ENTITIES = {
+    "vendor": ("vendors", "Vendor"),
+    "customer": ("customers", "Customer"),
+    "purchase_order": ("purchaseOrders", "Purchase Order"),
+    "purchase_invoice": ("purchaseInvoices", "Purchase invoice"),
+    "sales_invoice": ("salesInvoices", "Sales invoice"),
+}
+
+
+def _odata_in_filter(numbers: List[str]) -> str:
+    quoted = ",".join("'" + n.replace("'", "''") + "'" for n in numbers)
+    return f"number in ({quoted})"
+
+
+async def prefetch_lookups(numbers_by_entity: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Resolve many vendor/customer/PO/invoice numbers with `number in (...)`
+    queries and store each answer in the BC lookup cache.
+
+    After this, get_vendor(), get_purchase_order() etc. for those numbers are
+    served from the cache, so per-document validation makes no BC calls.
+    Numbers already cached are skipped. A failed query leaves its numbers
+    uncached, so they fall back to single lookups.
+
+    Args:
+        numbers_by_entity: e.g. {"vendor": {"V10000", ...}, "purchase_order": [...]}
+
+    Returns:
+        Dict with "requested", "already_cached" and "bc_calls" counts
+    """
+    stats = {"requested": 0, "already_cached": 0, "bc_calls": 0}
+    pending: List[Tuple[str, List[str]]] = []
+    for entity, numbers in numbers_by_entity.items():
+        if entity not in _BULK_LOOKUP_ENTITIES:
+            raise ValueError(f"Unsupported bulk lookup entity: {entity}")
+        distinct = sorted({n for n in numbers if n})
+        stats["requested"] += len(distinct)
+        missing = [n for n in distinct if not bc_lookup_cache.contains(entity, n)]
+        stats["already_cached"] += len(distinct) - len(missing)
+        for i in range(0, len(missing), BULK_LOOKUP_CHUNK_SIZE):
+            pending.append((entity, missing[i:i + BULK_LOOKUP_CHUNK_SIZE]))
+    
+    # Demo lookups are served from mock data and need no prefetch
+    if not pending or DEMO_MODE or not BC_SANDBOX_CLIENT_SECRET:
+        return stats
+    
+    token = await get_bc_sandbox_token()
+    company_id = await _get_company_id()
+    base_url = f"{BC_API_BASE}/{BC_SANDBOX_TENANT_ID}/{BC_SANDBOX_ENVIRONMENT}/api/v2.0/companies({company_id})"
+    
+    async def fetch_chunk(client: httpx.AsyncClient, entity: str, numbers: List[str]) -> None:
+        entity_set, label = _BULK_LOOKUP_ENTITIES[entity]
+        endpoint = f"{entity_set}?$filter=number in ({len(numbers)} numbers)"
+        start_time = time.time()
+        try:
+            response = await client.get(
+                f"{base_url}/{entity_set}",
+                headers={"Authorization": f"Bearer {token}"},
+                params={"$filter": _odata_in_filter(numbers), "$top": len(numbers) * 2}
+            )
+        except httpx.HTTPError as e:
+            logger.warning("BC Sandbox: bulk %s lookup failed: %s", entity, str(e))
+            return
+        elapsed_ms = int((time.time() - start_time) * 1000)
+        if response.status_code != 200:
+            logger.warning(
+                "BC Sandbox: bulk %s lookup failed, status=%d, count=%d",
+                entity, response.status_code, len(numbers)
+            )
+            return
+        
+        by_number = {r.get("number", "").upper(): r for r in response.json().get("value", [])}
+        for number in numbers:
+            record = by_number.get(number.upper())
+            if record:
+                result = BCLookupResult(
+                    status=BCLookupStatus.SUCCESS, data=record,
+                    timing_ms=elapsed_ms, endpoint=endpoint, response_size=len(str(record))
+                )
+            else:
+                result = BCLookupResult(
+                    status=BCLookupStatus.NOT_FOUND, error=f"{label} {number} not found",
+                    timing_ms=elapsed_ms, endpoint=endpoint
+                )
+            bc_lookup_cache.set(entity, number, result, negative=record is None)
+        logger.info(
+            "BC Sandbox: bulk %s lookup, requested=%d, found=%d, timing=%dms",
+            entity, len(numbers), len(by_number), elapsed_ms
+        )
+    
+    async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
+        await asyncio.gather(*(fetch_chunk(client, entity, numbers) for entity, numbers in pending))
+    stats["bc_calls"] = len(pending)
+    return stats
+
+
 # =============================================================================
 # WORKFLOW VALIDATION HELPERS
 # =============================================================================
@@ -1182,6 +1352,7 @@ def get_bc_sandbox_status() -> Dict[str, Any]:
             "has_secret": bool(effective_secret),
         },
         "api_base": BC_API_BASE,
+        "lookup_cache": bc_lookup_cache.stats(),
         "available_operations": [
             "get_vendor",
             "search_vendors_by_name",
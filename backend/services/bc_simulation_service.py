@@ -20,6 +20,7 @@ from typing import Dict, Any, Optional, List, Tuple
 from enum import Enum
 import uuid
 
+from services.open_po_index import open_po_index
 from services.pilot_config import (
     PILOT_MODE_ENABLED, CURRENT_PILOT_PHASE,
     is_external_write_blocked
@@ -318,7 +319,21 @@ def validate_po_for_linkage(document: Dict) -> Tuple[bool, List[Dict], str]:
         "value": vendor
     })
     
-    is_valid = has_po
+    # Check 3: PO is open in BC (only when the open PO index is loaded)
+    po_is_open = True
+    if has_po and open_po_index.ready:
+        open_po = open_po_index.get(po_number)
+        po_is_open = open_po is not None
+        checks.append({
+            "check": "po_open_in_bc",
+            "passed": po_is_open,
+            "value": po_number,
+            "bc_vendor_number": open_po.get("vendorNumber") if open_po else None
+        })
+        if not po_is_open:
+            failure_reasons.append(f"PO {po_number} is not an open purchase order in BC")
+    
+    is_valid = has_po and po_is_open
     failure_reason = "; ".join(failure_reasons) if failure_reasons else None
     
     return is_valid, checks, failure_reason
@@ -0,0 +1,268 @@
+"""
+GPI Document Hub - Blob Store
+
+Content-addressed storage for uploaded and ingested document files. Files
+are keyed by their SHA-256, so the same PDF forwarded five times is stored
+once and each hub document only holds a reference to it.
+
+Key features:
+1. Sharded keys (ab/cd/<sha256>) keep directories small on the upload volume
+2. Atomic writes: local blobs are written to a temp file in the target
+   directory and renamed into place, so readers never see partial files
+3. Reference counting in the blob_refs collection: a blob is removed only
+   when the last document referencing it is deleted
+4. Pluggable backends: local filesystem (default) and S3-compatible object
+   storage (BLOB_STORE_BACKEND=s3); remote blobs are cached on local disk
+   for consumers that need a file path (AI classification, SharePoint
+   session uploads)
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+BLOB_STORE_BACKEND = os.environ.get("BLOB_STORE_BACKEND", "local")
+BLOB_STORE_DIR = Path(os.environ.get("BLOB_STORE_DIR", str(Path(__file__).parent.parent / "uploads" / "blobs")))
+BLOB_STORE_BUCKET = os.environ.get("BLOB_STORE_BUCKET", "")
+BLOB_STORE_PREFIX = os.environ.get("BLOB_STORE_PREFIX", "blobs/")
+BLOB_STORE_ENDPOINT_URL = os.environ.get("BLOB_STORE_ENDPOINT_URL") or None
+BLOB_CACHE_DIR = Path(os.environ.get("BLOB_CACHE_DIR", str(Path(tempfile.gettempdir()) / "gpi-blob-cache")))
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def blob_key(sha256: str) -> str:
+    """Sharded key for a blob: ab/cd/abcd...."""
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class LocalBlobBackend:
+    """Blobs as files under a root directory."""
+
+    def __init__(self, root: Path = BLOB_STORE_DIR):
+        self.root = Path(root)
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def write(self, key: str, data: bytes) -> None:
+        _atomic_write(self.root / key, data)
+
+    def read(self, key: str) -> bytes:
+        return (self.root / key).read_bytes()
+
+    def move(self, key: str, new_key: str) -> None:
+        os.replace(self.root / key, self.root / new_key)
+
+    def delete(self, key: str) -> None:
+        try:
+            (self.root / key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[Path]:
+        path = self.root / key
+        return path if path.exists() else None
+
+
+class S3BlobBackend:
+    """Blobs as objects in an S3-compatible bucket."""
+
+    def __init__(
+        self,
+        bucket: str = BLOB_STORE_BUCKET,
+        prefix: str = BLOB_STORE_PREFIX,
+        client=None,
+        cache_dir: Path = BLOB_CACHE_DIR,
+    ):
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=BLOB_STORE_ENDPOINT_URL)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = Path(cache_dir)
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+            return True
+        except Exception as e:
+            status = getattr(e, "response", {}).get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if status == 404:
+                return False
+            raise
+
+    def write(self, key: str, data: bytes) -> None:
+        # Object PUTs are atomic; the local cache copy is written when first needed
+        self.client.put_object(Bucket=self.bucket, Key=self._object_key(key), Body=data)
+
+    def read(self, key: str) -> bytes:
+        cached = self.cache_dir / key
+        if cached.exists():
+            return cached.read_bytes()
+        return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"].read()
+
+    def move(self, key: str, new_key: str) -> None:
+        if not self.exists(key):
+            raise FileNotFoundError(key)
+        self.client.copy_object(
+            Bucket=self.bucket, Key=self._object_key(new_key),
+            CopySource={"Bucket": self.bucket, "Key": self._object_key(key)}
+        )
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        self._drop_cached(key)
+
+    def _drop_cached(self, key: str) -> None:
+        try:
+            (self.cache_dir / key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        self._drop_cached(key)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        cached = self.cache_dir / key
+        if not cached.exists():
+            if not self.exists(key):
+                return None
+            _atomic_write(cached, self.read(key))
+        return cached
+
+
+def backend_from_env():
+    if BLOB_STORE_BACKEND == "s3":
+        return S3BlobBackend()
+    return LocalBlobBackend()
+
+
+class BlobStore:
+    """Deduplicated, reference-counted file storage keyed by SHA-256."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or backend_from_env()
+        self._refs = None
+        self._writes = 0
+        self._dedup_hits = 0
+        self._deletes = 0
+
+    def bind(self, db) -> None:
+        self._refs = db.blob_refs
+
+    async def ensure_indexes(self) -> None:
+        await self._refs.create_index("sha256", unique=True)
+        await self._refs.create_index("refs")
+
+    async def _add_ref(self, sha256: str, ref: str, size: int) -> None:
+        update = {
+            "$addToSet": {"refs": ref},
+            "$setOnInsert": {"size": size, "created_utc": datetime.now(timezone.utc).isoformat()},
+        }
+        try:
+            await self._refs.update_one({"sha256": sha256}, update, upsert=True)
+        except DuplicateKeyError:
+            # A concurrent put inserted the same blob first; add to its document
+            await self._refs.update_one({"sha256": sha256}, update)
+
+    async def put(self, content: bytes, ref: str) -> str:
+        """Store content (once) and record `ref` (a document id) against it. Returns the SHA-256."""
+        sha256 = content_hash(content)
+        # Reference first, so a concurrent release never sees a blob without refs
+        await self._add_ref(sha256, ref, len(content))
+        key = blob_key(sha256)
+        if await asyncio.to_thread(self.backend.exists, key):
+            self._dedup_hits += 1
+        else:
+            await asyncio.to_thread(self.backend.write, key, content)
+            self._writes += 1
+        return sha256
+
+    async def get(self, sha256: Optional[str]) -> Optional[bytes]:
+        if not sha256:
+            return None
+        key = blob_key(sha256)
+        if not await asyncio.to_thread(self.backend.exists, key):
+            return None
+        return await asyncio.to_thread(self.backend.read, key)
+
+    async def local_path(self, sha256: Optional[str]) -> Optional[Path]:
+        """Path of the blob on local disk (downloaded to the cache for remote backends)."""
+        if not sha256:
+            return None
+        return await asyncio.to_thread(self.backend.local_path, blob_key(sha256))
+
+    async def release(self, sha256: Optional[str], ref: str) -> bool:
+        """Drop `ref` from a blob; delete the blob once nothing references it. Returns True if deleted."""
+        if not sha256:
+            return False
+        remaining = await self._refs.find_one_and_update(
+            {"sha256": sha256}, {"$pull": {"refs": ref}},
+            projection={"_id": 0, "refs": 1}, return_document=ReturnDocument.AFTER
+        )
+        if remaining is None or remaining.get("refs"):
+            return False
+        # Set the blob aside before dropping its ref document: a put that
+        # re-references it in between either finds no blob and writes it
+        # again, or makes the delete below miss, and the blob is restored
+        key = blob_key(sha256)
+        tombstone = f"{key}.deleting-{uuid.uuid4().hex}"
+        try:
+            await asyncio.to_thread(self.backend.move, key, tombstone)
+        except FileNotFoundError:
+            tombstone = None
+        result = await self._refs.delete_one({"sha256": sha256, "refs": {"$size": 0}})
+        if result.deleted_count != 1:
+            if tombstone:
+                await asyncio.to_thread(self.backend.move, tombstone, key)
+            return False
+        if tombstone:
+            await asyncio.to_thread(self.backend.delete, tombstone)
+        self._deletes += 1
+        logger.info("Deleted unreferenced blob %s", sha256)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "writes": self._writes,
+            "dedup_hits": self._dedup_hits,
+            "deletes": self._deletes,
+        }
+
+
+blob_store = BlobStore()
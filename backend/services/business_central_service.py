@@ -19,9 +19,12 @@ import os
 import logging
 import httpx
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from dotenv import load_dotenv
 
+from services.resilience import resilient_client
+from services.bc_lookup_cache import bc_lookup_cache
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -56,12 +59,21 @@ if USE_MOCK:
 BC_API_BASE = "https://api.businesscentral.dynamics.com/v2.0"
 BC_REQUEST_TIMEOUT = 30.0
 
+# Maximum requests BC accepts in one OData $batch call
+BC_BATCH_MAX_REQUESTS = 100
+
+# How long a resolved item number -> GUID mapping is reused (seconds)
+ITEM_ID_CACHE_TTL = 3600
+
 # Token cache
 _token_cache = {
     "access_token": None,
     "expires_at": 0
 }
 
+# Item GUID cache, keyed by (company_id, item number)
+_item_id_cache: Dict[tuple, Dict[str, Any]] = {}
+
 
 # =============================================================================
 # MOCK DATA
@@ -104,7 +116,7 @@ async def get_bc_token() -> str:
     
     token_url = f"https://login.microsoftonline.com/{BC_TENANT_ID}/oauth2/v2.0/token"
     
-    async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+    async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
         resp = await client.post(
             token_url,
             data={
@@ -134,7 +146,7 @@ async def get_bc_company_id() -> str:
     token = await get_bc_token()
     url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies"
     
-    async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+    async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
         resp = await client.get(url, headers={"Authorization": f"Bearer {token}"})
         
         if resp.status_code != 200:
@@ -223,7 +235,7 @@ class BusinessCentralService:
             # We'll do client-side filtering for number matches
             params["$filter"] = f"contains(displayName, '{filter_text}')"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             resp = await client.get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
             
             if resp.status_code != 200:
@@ -269,7 +281,7 @@ class BusinessCentralService:
         
         url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/vendors({vendor_id})"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             resp = await client.get(url, headers={"Authorization": f"Bearer {token}"})
             
             if resp.status_code == 404:
@@ -319,7 +331,7 @@ class BusinessCentralService:
         if vendor_id:
             params["$filter"] += f" and vendorNumber eq '{vendor_id}'"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             resp = await client.get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
             
             if resp.status_code != 200:
@@ -347,6 +359,55 @@ class BusinessCentralService:
                 "mock": False
             }
     
+    async def list_purchase_orders(self, open_only: bool = True, modified_since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get all purchase orders, following @odata.nextLink pages.
+        
+        Used to build the open PO index (see services/open_po_index.py).
+        
+        Args:
+            open_only: Only return POs with status Open
+            modified_since: ISO timestamp; only return POs modified at or after it
+                (inclusive, so a PO saved in the same instant as the watermark
+                is not missed; re-reading one is harmless)
+        
+        Returns:
+            List of PO records including totalAmountIncludingTax and lastModifiedDateTime
+        """
+        if self.use_mock:
+            return [po for po in MOCK_PURCHASE_ORDERS if not open_only or po["status"] == "Open"]
+        
+        token = await get_bc_token()
+        company_id = await self._get_company_id()
+        
+        filters = []
+        if open_only:
+            filters.append("status eq 'Open'")
+        if modified_since:
+            filters.append(f"lastModifiedDateTime ge {modified_since}")
+        
+        url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/purchaseOrders"
+        params = {
+            "$select": "id,number,vendorNumber,vendorName,orderDate,status,totalAmountIncludingTax,lastModifiedDateTime"
+        }
+        if filters:
+            params["$filter"] = " and ".join(filters)
+        
+        pos = []
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
+            while url:
+                resp = await client.get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
+                if resp.status_code != 200:
+                    logger.error("Failed to list purchase orders: %s", resp.text[:200])
+                    raise Exception(f"Failed to list purchase orders: {resp.status_code}")
+                data = resp.json()
+                pos.extend(data.get("value", []))
+                # nextLink already carries the query
+                url = data.get("@odata.nextLink")
+                params = None
+        
+        return pos
+    
     # =========================================================================
     # PURCHASE INVOICE METHODS
     # =========================================================================
@@ -399,7 +460,7 @@ class BusinessCentralService:
         
         url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/purchaseInvoices"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             resp = await client.post(
                 url,
                 headers={
@@ -421,6 +482,10 @@ class BusinessCentralService:
             
             data = resp.json()
             
+            # Cached invoice and PO lookups may now be stale
+            bc_lookup_cache.invalidate("purchase_invoice")
+            bc_lookup_cache.invalidate("purchase_order")
+            
             # Add line items if provided
             line_result = None
             if invoice_data.get("lines") and len(invoice_data["lines"]) > 0:
@@ -453,11 +518,9 @@ class BusinessCentralService:
         - unitCost: Cost per unit
         
         Uses BC_DEFAULT_ITEM_CODE (e.g., "FREIGHT") as the default item for all lines.
+        Lines are created in one OData $batch (see _create_lines).
         """
-        url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/purchaseInvoices({invoice_id})/purchaseInvoiceLines"
-        
-        added_count = 0
-        errors = []
+        path = f"companies({company_id})/purchaseInvoices({invoice_id})/purchaseInvoiceLines"
         
         # Get default Item code and look up its GUID
         default_item_code = os.environ.get("BC_DEFAULT_ITEM_CODE", "FREIGHT")
@@ -469,72 +532,175 @@ class BusinessCentralService:
         
         logger.info("Using Item '%s' (ID: %s) for %d invoice lines", default_item_code, default_item_id, len(lines))
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
-            for idx, line in enumerate(lines):
-                # Get values with fallbacks - support both AI extraction format and direct format
-                description = line.get("description", "")
-                quantity = float(line.get("quantity", 1) or 1)
-                # AI extraction uses "unit_price", BC uses "unitCost"
-                unit_price = float(line.get("unit_price") or line.get("unitCost") or 0)
-                # AI extraction uses "total", also support "line_total"
-                line_total = float(line.get("total") or line.get("line_total") or 0)
-                
-                # If we have a total but no unit price, calculate unit price
-                if line_total > 0 and unit_price == 0 and quantity > 0:
-                    unit_price = line_total / quantity
-                
-                # If we still have no unit price but have a total, use total as unit price (qty=1)
-                if unit_price == 0 and line_total > 0:
-                    unit_price = line_total
-                    quantity = 1
-                
-                # Skip truly empty lines (no description AND no amount)
-                if not description and unit_price == 0 and line_total == 0:
-                    logger.debug("Skipping empty invoice line %d", idx)
-                    continue
-                
-                # Build line payload using Item type with itemId (GUID)
-                line_payload = {
-                    "lineType": "Item",
-                    "itemId": default_item_id,
-                    "description": description[:100] if description else f"Line {idx + 1}",
-                    "quantity": quantity,
-                    "unitCost": unit_price,
+        prepared = []
+        for idx, line in enumerate(lines):
+            # Get values with fallbacks - support both AI extraction format and direct format
+            description = line.get("description", "")
+            quantity = float(line.get("quantity", 1) or 1)
+            # AI extraction uses "unit_price", BC uses "unitCost"
+            unit_price = float(line.get("unit_price") or line.get("unitCost") or 0)
+            # AI extraction uses "total", also support "line_total"
+            line_total = float(line.get("total") or line.get("line_total") or 0)
+            
+            # If we have a total but no unit price, calculate unit price
+            if line_total > 0 and unit_price == 0 and quantity > 0:
+                unit_price = line_total / quantity
+            
+            # If we still have no unit price but have a total, use total as unit price (qty=1)
+            if unit_price == 0 and line_total > 0:
+                unit_price = line_total
+                quantity = 1
+            
+            # Skip truly empty lines (no description AND no amount)
+            if not description and unit_price == 0 and line_total == 0:
+                logger.debug("Skipping empty invoice line %d", idx)
+                continue
+            
+            # Build line payload using Item type with itemId (GUID)
+            line_payload = {
+                "lineType": "Item",
+                "itemId": default_item_id,
+                "description": description[:100] if description else f"Line {idx + 1}",
+                "quantity": quantity,
+                "unitCost": unit_price,
+            }
+            
+            logger.debug("Invoice line %d payload: %s", idx + 1, line_payload)
+            prepared.append((idx + 1, line_payload, {"description": description[:50]}))
+        
+        result = await self._create_lines(path, prepared, token, "invoice")
+        
+        logger.info("Invoice line addition complete: %d/%d lines added", result["added"], len(lines))
+        return {"added": result["added"], "total": len(lines), "errors": result["errors"]}
+    
+    async def _create_lines(
+        self,
+        path: str,
+        prepared: List[Tuple[int, Dict[str, Any], Dict[str, Any]]],
+        token: str,
+        kind: str
+    ) -> Dict[str, Any]:
+        """
+        Create document lines through BC's OData $batch endpoint.
+        
+        Each batch of up to BC_BATCH_MAX_REQUESTS lines is sent with
+        "Isolation: snapshot", so BC creates all of its lines or none of them.
+        Falls back to one POST per line if the $batch call itself fails.
+        
+        Args:
+            path: Lines collection path relative to api/v2.0
+            prepared: (line number, payload, extra error fields) per line
+            kind: "invoice" or "sales order", for logging
+            
+        Returns:
+            Dict with added count and per-line errors
+        """
+        added_count = 0
+        errors = []
+        batch_url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/$batch"
+        
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT * 2) as client:
+            for start in range(0, len(prepared), BC_BATCH_MAX_REQUESTS):
+                chunk = prepared[start:start + BC_BATCH_MAX_REQUESTS]
+                batch_body = {
+                    "requests": [
+                        {
+                            "id": str(line_no),
+                            "method": "POST",
+                            "url": path,
+                            "headers": {"Content-Type": "application/json"},
+                            "body": payload
+                        }
+                        for line_no, payload, _ in chunk
+                    ]
                 }
                 
-                logger.info("Adding invoice line %d: desc='%s', itemId=%s, qty=%s, unitCost=$%.2f", 
-                           idx + 1, description[:40], default_item_id[:8] + "...", quantity, unit_price)
-                logger.debug("Line payload: %s", line_payload)
-                
                 resp = await client.post(
-                    url,
+                    batch_url,
                     headers={
                         "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
+                        "Content-Type": "application/json",
+                        "Accept": "application/json",
+                        "Isolation": "snapshot"
                     },
-                    json=line_payload
+                    json=batch_body
                 )
                 
-                if resp.status_code in (200, 201):
-                    added_count += 1
-                    logger.info("Successfully added invoice line %d", idx + 1)
-                else:
-                    error_msg = resp.text[:300]
-                    logger.warning("Failed to add invoice line %d: HTTP %d - %s", 
-                                  idx + 1, resp.status_code, error_msg)
+                if resp.status_code != 200:
+                    logger.warning("BC $batch for %s lines failed: HTTP %d - %s; adding lines one by one",
+                                   kind, resp.status_code, resp.text[:200])
+                    result = await self._create_lines_sequential(client, path, chunk, token, kind)
+                    added_count += result["added"]
+                    errors.extend(result["errors"])
+                    continue
+                
+                responses = {r.get("id"): r for r in resp.json().get("responses", [])}
+                failed = [
+                    (line_no, extra, responses.get(str(line_no), {}))
+                    for line_no, _, extra in chunk
+                    if responses.get(str(line_no), {}).get("status") not in (200, 201)
+                ]
+                if not failed:
+                    added_count += len(chunk)
+                    logger.info("Added %d %s lines in one batch", len(chunk), kind)
+                    continue
+                
+                # The batch is atomic: any failure rolls back every line in it
+                for line_no, extra, response in failed:
+                    error_msg = str(response.get("body", ""))[:300]
+                    logger.warning("Failed to add %s line %d: HTTP %s - %s",
+                                   kind, line_no, response.get("status"), error_msg)
+                    errors.append({"line": line_no, **extra, "error": error_msg})
+                rolled_back = len(chunk) - len(failed)
+                if rolled_back:
+                    logger.warning("%d other %s lines in the batch were rolled back", rolled_back, kind)
                     errors.append({
-                        "line": idx + 1,
-                        "description": description[:50],
-                        "error": error_msg
+                        "line": 0,
+                        "error": f"{rolled_back} other lines rolled back because the batch is atomic"
                     })
         
-        logger.info("Invoice line addition complete: %d/%d lines added", added_count, len(lines))
-        return {"added": added_count, "total": len(lines), "errors": errors}
+        return {"added": added_count, "errors": errors}
+    
+    async def _create_lines_sequential(
+        self,
+        client: httpx.AsyncClient,
+        path: str,
+        prepared: List[Tuple[int, Dict[str, Any], Dict[str, Any]]],
+        token: str,
+        kind: str
+    ) -> Dict[str, Any]:
+        """Create document lines with one POST each."""
+        url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/{path}"
+        added_count = 0
+        errors = []
+        
+        for line_no, line_payload, extra in prepared:
+            resp = await client.post(
+                url,
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                json=line_payload
+            )
+            
+            if resp.status_code in (200, 201):
+                added_count += 1
+            else:
+                error_msg = resp.text[:300]
+                logger.warning("Failed to add %s line %d: HTTP %d - %s",
+                               kind, line_no, resp.status_code, error_msg)
+                errors.append({"line": line_no, **extra, "error": error_msg})
+        
+        return {"added": added_count, "errors": errors}
     
     async def _get_item_id_by_code(self, item_code: str, token: str, company_id: str) -> Optional[str]:
         """
         Look up an Item's GUID by its number/code.
         
+        Found GUIDs are cached per company for ITEM_ID_CACHE_TTL seconds;
+        misses are not cached so a newly created item is picked up.
+        
         Args:
             item_code: The item number (e.g., "FREIGHT")
             token: BC API access token
@@ -543,10 +709,15 @@ class BusinessCentralService:
         Returns:
             The item's GUID if found, None otherwise
         """
+        cache_key = (company_id, item_code.upper())
+        cached = _item_id_cache.get(cache_key)
+        if cached and cached["expires_at"] > datetime.now(timezone.utc).timestamp():
+            return cached["id"]
+        
         url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/items"
         
         try:
-            async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+            async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
                 resp = await client.get(
                     url,
                     headers={"Authorization": f"Bearer {token}"},
@@ -562,6 +733,10 @@ class BusinessCentralService:
                         item = items[0]
                         logger.info("Found Item '%s': %s (ID: %s)", 
                                    item_code, item.get("displayName"), item["id"])
+                        _item_id_cache[cache_key] = {
+                            "id": item["id"],
+                            "expires_at": datetime.now(timezone.utc).timestamp() + ITEM_ID_CACHE_TTL
+                        }
                         return item["id"]
                     else:
                         # Item not found - log available items to help debug
@@ -599,7 +774,7 @@ class BusinessCentralService:
         
         url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/purchaseInvoices({invoice_id})"
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             resp = await client.get(url, headers={"Authorization": f"Bearer {token}"})
             
             if resp.status_code == 404:
@@ -658,7 +833,7 @@ class BusinessCentralService:
             # Use the GPI Document Links custom API endpoint
             api_base_url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/gpi/documents/v1.0/companies({company_id})/documentLinks"
             
-            async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+            async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
                 # First, check if a link already exists for this invoice
                 filter_query = f"documentType eq 'Purchase Invoice' and targetSystemId eq {invoice_id}"
                 check_url = f"{api_base_url}?$filter={filter_query}"
@@ -771,7 +946,7 @@ class BusinessCentralService:
             if len(link_text) > 100:
                 link_text = sharepoint_url[:100]
             
-            async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+            async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
                 resp = await client.post(
                     url,
                     headers={
@@ -866,7 +1041,7 @@ class BusinessCentralService:
         
         logger.info("Creating Sales Order in BC for customer %s", payload.get("customerNumber"))
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
+        async with resilient_client(timeout=BC_REQUEST_TIMEOUT) as client:
             resp = await client.post(
                 url,
                 headers={
@@ -920,59 +1095,39 @@ class BusinessCentralService:
         - quantity
         - unitPrice
         """
-        url = f"{BC_API_BASE}/{BC_TENANT_ID}/{BC_ENVIRONMENT}/api/v2.0/companies({company_id})/salesOrders({order_id})/salesOrderLines"
+        path = f"companies({company_id})/salesOrders({order_id})/salesOrderLines"
         
-        added_count = 0
-        errors = []
+        prepared = []
+        for idx, line in enumerate(lines):
+            # Get values
+            item_number = line.get("itemNumber") or line.get("item_number") or line.get("item_no")
+            description = line.get("description", "")
+            quantity = float(line.get("quantity", 1) or 1)
+            unit_price = float(line.get("unitPrice") or line.get("unit_price", 0) or 0)
+            
+            # Skip empty lines
+            if not item_number and not description:
+                continue
+            
+            line_payload = {
+                "lineType": "Item",
+                "quantity": quantity,
+            }
+            
+            if item_number:
+                line_payload["itemNumber"] = item_number
+            if description:
+                line_payload["description"] = description[:100]
+            if unit_price > 0:
+                line_payload["unitPrice"] = unit_price
+            
+            logger.debug("Sales order line %d: item=%s, qty=%s, price=$%s",
+                         idx + 1, item_number or description[:30], quantity, unit_price)
+            prepared.append((idx + 1, line_payload, {}))
         
-        async with httpx.AsyncClient(timeout=BC_REQUEST_TIMEOUT) as client:
-            for idx, line in enumerate(lines):
-                # Get values
-                item_number = line.get("itemNumber") or line.get("item_number") or line.get("item_no")
-                description = line.get("description", "")
-                quantity = float(line.get("quantity", 1) or 1)
-                unit_price = float(line.get("unitPrice") or line.get("unit_price", 0) or 0)
-                
-                # Skip empty lines
-                if not item_number and not description:
-                    continue
-                
-                line_payload = {
-                    "lineType": "Item",
-                    "quantity": quantity,
-                }
-                
-                if item_number:
-                    line_payload["itemNumber"] = item_number
-                if description:
-                    line_payload["description"] = description[:100]
-                if unit_price > 0:
-                    line_payload["unitPrice"] = unit_price
-                
-                logger.info("Adding sales order line %d: item=%s, qty=%s, price=$%s", 
-                           idx + 1, item_number or description[:30], quantity, unit_price)
-                
-                resp = await client.post(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    json=line_payload
-                )
-                
-                if resp.status_code in (200, 201):
-                    added_count += 1
-                else:
-                    error_msg = resp.text[:300]
-                    logger.warning("Failed to add sales order line %d: HTTP %d - %s", 
-                                  idx + 1, resp.status_code, error_msg)
-                    errors.append({
-                        "line": idx + 1,
-                        "error": error_msg
-                    })
+        result = await self._create_lines(path, prepared, token, "sales order")
         
-        return {"added": added_count, "total": len(lines), "errors": errors}
+        return {"added": result["added"], "total": len(lines), "errors": result["errors"]}
 
 
 # =============================================================================
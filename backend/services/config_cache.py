@@ -0,0 +1,174 @@
+"""
+GPI Document Hub - Configuration Cache
+
+In-memory copy of configuration and reference data read on every document
+or poll loop: job types, mailbox sources, the email watcher config, vendor
+aliases and shadow-mode settings.
+
+Key features:
+1. Sections load lazily from MongoDB and are then served from memory
+2. Invalidation by version counter: settings/alias endpoints call
+   invalidate(), which drops the local copy and increments the section's
+   counter in hub_settings; a watcher task picks up counters bumped by
+   other processes every CONFIG_VERSION_CHECK_SECONDS
+3. CONFIG_CACHE_MAX_AGE_SECONDS bounds staleness for writes that bypass the
+   endpoints (e.g. manual database edits)
+4. Dict results are copies, so callers may modify them freely
+"""
+
+import asyncio
+import copy
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+CONFIG_VERSION_CHECK_SECONDS = float(os.environ.get("CONFIG_VERSION_CHECK_SECONDS", "5"))
+CONFIG_CACHE_MAX_AGE_SECONDS = float(os.environ.get("CONFIG_CACHE_MAX_AGE_SECONDS", "300"))
+
+JOB_TYPES = "job_types"
+MAILBOX_SOURCES = "mailbox_sources"
+EMAIL_WATCHER = "email_watcher"
+VENDOR_ALIASES = "vendor_aliases"
+SHADOW_MODE = "shadow_mode"
+
+VERSIONS_KEY = {"type": "config_cache_versions"}
+
+
+def _loaders(db) -> Dict[str, Callable[[], Awaitable[Any]]]:
+    async def job_types():
+        docs = await db.hub_job_types.find({}, {"_id": 0}).to_list(None)
+        return {d["job_type"]: d for d in docs if d.get("job_type")}
+
+    async def mailbox_sources():
+        return await db.mailbox_sources.find({}, {"_id": 0}).to_list(None)
+
+    async def email_watcher():
+        return await db.hub_config.find_one({"_key": "email_watcher"}, {"_id": 0})
+
+    async def vendor_aliases():
+        return await db.vendor_aliases.find({}, {"_id": 0}).to_list(None)
+
+    async def shadow_mode():
+        return await db.hub_settings.find_one({"type": "shadow_mode"}, {"_id": 0})
+
+    return {
+        JOB_TYPES: job_types,
+        MAILBOX_SOURCES: mailbox_sources,
+        EMAIL_WATCHER: email_watcher,
+        VENDOR_ALIASES: vendor_aliases,
+        SHADOW_MODE: shadow_mode,
+    }
+
+
+class ConfigCache:
+    """Versioned in-memory cache of configuration sections."""
+
+    def __init__(self, max_age_seconds: float = CONFIG_CACHE_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._db = None
+        self._loaders: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        # name -> (value, version it was loaded at, monotonic load time)
+        self._entries: Dict[str, tuple] = {}
+        self._versions: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._hits = 0
+        self._loads = 0
+        self._invalidations = 0
+
+    def bind(self, db) -> None:
+        self._db = db
+        self._loaders = _loaders(db)
+        self._entries.clear()
+
+    def _fresh(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        _, version, loaded_at = entry
+        return version == self._versions.get(name, 0) and time.monotonic() - loaded_at < self.max_age_seconds
+
+    async def _section(self, name: str) -> Any:
+        if self._fresh(name):
+            self._hits += 1
+            return self._entries[name][0]
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if not self._fresh(name):
+                version = self._versions.get(name, 0)
+                value = await self._loaders[name]()
+                self._entries[name] = (value, version, time.monotonic())
+                self._loads += 1
+            else:
+                self._hits += 1
+        return self._entries[name][0]
+
+    async def invalidate(self, name: str) -> None:
+        """Drop a section here and bump its shared version for other processes."""
+        self._entries.pop(name, None)
+        self._invalidations += 1
+        try:
+            versions = await self._db.hub_settings.find_one_and_update(
+                VERSIONS_KEY, {"$inc": {name: 1}},
+                upsert=True, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+            )
+            self._versions[name] = versions.get(name, 0)
+        except Exception as e:
+            # The local copy is already dropped; other processes fall back to max age
+            logger.warning("Could not bump config version for %s: %s", name, str(e))
+
+    async def refresh_versions(self) -> None:
+        versions = await self._db.hub_settings.find_one(VERSIONS_KEY, {"_id": 0}) or {}
+        for name in self._loaders:
+            self._versions[name] = int(versions.get(name, 0))
+
+    async def run_version_watcher(self, interval_seconds: float = CONFIG_VERSION_CHECK_SECONDS) -> None:
+        """Background task: pick up invalidations made by other processes."""
+        while True:
+            try:
+                await self.refresh_versions()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Config version check failed: %s", str(e))
+            await asyncio.sleep(interval_seconds)
+
+    # ------------------------------------------------------------------
+    # Typed accessors
+    # ------------------------------------------------------------------
+
+    async def job_type(self, job_type: str) -> Optional[Dict[str, Any]]:
+        config = (await self._section(JOB_TYPES)).get(job_type)
+        return copy.deepcopy(config) if config else None
+
+    async def mailbox_sources(self, enabled_only: bool = False) -> List[Dict[str, Any]]:
+        sources = await self._section(MAILBOX_SOURCES)
+        return [copy.deepcopy(s) for s in sources if not enabled_only or s.get("enabled")]
+
+    async def email_watcher(self) -> Optional[Dict[str, Any]]:
+        config = await self._section(EMAIL_WATCHER)
+        return copy.deepcopy(config) if config else None
+
+    async def vendor_aliases(self) -> List[Dict[str, Any]]:
+        """Alias documents, shared and not copied: treat as read-only."""
+        return await self._section(VENDOR_ALIASES)
+
+    async def shadow_mode(self) -> Optional[Dict[str, Any]]:
+        settings = await self._section(SHADOW_MODE)
+        return copy.deepcopy(settings) if settings else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sections_loaded": sorted(self._entries),
+            "versions": dict(self._versions),
+            "hits": self._hits,
+            "loads": self._loads,
+            "invalidations": self._invalidations,
+        }
+
+
+config_cache = ConfigCache()
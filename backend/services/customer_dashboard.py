@@ -0,0 +1,246 @@
+"""
+GPI Document Hub - Customer Dashboard
+
+Builds the sales customer dashboard (the sales team's landing page) with
+MongoDB aggregations instead of loading and joining collections in Python.
+
+Key features:
+1. Inventory positions are joined to items, warehouses and customer items
+   with $lookup; the summary totals are one $group
+2. Open orders get their line totals from a $lookup on order lines, and
+   backordered lines come from the same aggregation ($facet)
+3. Low-stock and at-risk alerts are selected by the database; only the
+   messages are formatted here
+4. Positions are matched to items by item_id (seed data) or item_no
+   (file imports), and warehouses by warehouse_id or code
+5. Responses are cached per (customer, warehouse, days) for
+   DASHBOARD_CACHE_TTL_SECONDS and invalidated by imports and seeding in
+   this process; other processes see the change when their entry expires
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get("DASHBOARD_CACHE_TTL_SECONDS", "60"))
+OPEN_ORDER_LIMIT = 100
+LOW_STOCK_RATIO = 0.2
+QUANTITY_FIELDS = {
+    "on_hand": "qty_on_hand",
+    "allocated": "qty_allocated",
+    "available": "qty_available",
+    "on_water": "qty_on_water",
+    "on_order": "qty_on_order",
+}
+
+
+def _first(path: str) -> Dict[str, Any]:
+    return {"$arrayElemAt": [path, 0]}
+
+
+def inventory_pipeline(customer_id: str, warehouse: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Enriched inventory positions of a customer, each flagged `_low_stock`."""
+    match = {"customer_id": customer_id}
+    if warehouse:
+        match["warehouse_id"] = warehouse
+    on_hand = {"$ifNull": ["$qty_on_hand", 0]}
+    return [
+        {"$match": match},
+        {"$lookup": {"from": "sales_items", "localField": "item_id", "foreignField": "item_id", "as": "_item_by_id"}},
+        {"$lookup": {"from": "sales_items", "localField": "item_no", "foreignField": "item_no", "as": "_item_by_no"}},
+        {"$lookup": {"from": "sales_warehouses", "localField": "warehouse_id", "foreignField": "warehouse_id", "as": "_wh_by_id"}},
+        {"$lookup": {"from": "sales_warehouses", "localField": "warehouse_id", "foreignField": "code", "as": "_wh_by_code"}},
+        {"$lookup": {
+            "from": "sales_customer_items",
+            "let": {"item_id": "$item_id"},
+            "pipeline": [
+                {"$match": {"customer_id": customer_id, "$expr": {"$eq": ["$item_id", "$$item_id"]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "customer_sku": 1}},
+            ],
+            "as": "_customer_item",
+        }},
+        {"$addFields": {
+            "_item": _first({"$concatArrays": ["$_item_by_id", "$_item_by_no"]}),
+            "_warehouse": _first({"$concatArrays": ["$_wh_by_id", "$_wh_by_code"]}),
+        }},
+        {"$addFields": {
+            "item_no": {"$ifNull": ["$_item.item_no", "$item_no"]},
+            "item_description": "$_item.description",
+            "customer_sku": {"$ifNull": [_first("$_customer_item.customer_sku"), "$customer_sku"]},
+            "warehouse_code": "$_warehouse.code",
+            "_low_stock": {"$and": [
+                {"$gt": [on_hand, 0]},
+                {"$lt": [{"$ifNull": ["$qty_available", 0]}, {"$multiply": [on_hand, LOW_STOCK_RATIO]}]},
+            ]},
+        }},
+        {"$project": {
+            "_id": 0, "_item": 0, "_warehouse": 0, "_item_by_id": 0, "_item_by_no": 0,
+            "_wh_by_id": 0, "_wh_by_code": 0, "_customer_item": 0,
+        }},
+        {"$sort": {"item_no": 1, "warehouse_id": 1}},
+    ]
+
+
+def summary_pipeline(customer_id: str, warehouse: Optional[str] = None) -> List[Dict[str, Any]]:
+    match = {"customer_id": customer_id}
+    if warehouse:
+        match["warehouse_id"] = warehouse
+    return [
+        {"$match": match},
+        {"$group": {"_id": None, **{name: {"$sum": f"${field}"} for name, field in QUANTITY_FIELDS.items()}}},
+    ]
+
+
+def open_orders_pipeline(customer_id: str) -> List[Dict[str, Any]]:
+    """Open orders with line totals, plus their backordered lines."""
+    return [
+        {"$match": {"customer_id": customer_id, "status": {"$nin": ["shipped", "closed"]}}},
+        {"$sort": {"order_date": -1}},
+        {"$limit": OPEN_ORDER_LIMIT},
+        {"$lookup": {"from": "sales_open_order_lines", "localField": "order_id", "foreignField": "order_id", "as": "_lines"}},
+        {"$facet": {
+            "orders": [
+                {"$addFields": {"total_qty": {"$sum": "$_lines.ordered_qty"}, "line_count": {"$size": "$_lines"}}},
+                {"$project": {"_id": 0, "_lines": 0}},
+            ],
+            "backordered": [
+                {"$unwind": "$_lines"},
+                {"$replaceRoot": {"newRoot": "$_lines"}},
+                {"$match": {"line_status": "backordered"}},
+                {"$lookup": {"from": "sales_items", "localField": "item_id", "foreignField": "item_id", "as": "_item"}},
+                {"$project": {
+                    "_id": 0, "order_id": 1, "order_line_id": 1, "item_id": 1,
+                    "ordered_qty": {"$ifNull": ["$ordered_qty", 0]},
+                    "item_no": {"$ifNull": [_first("$_item.item_no"), "$item_no"]},
+                }},
+            ],
+        }},
+    ]
+
+
+def _low_stock_alert(position: Dict[str, Any]) -> Dict[str, Any]:
+    on_hand = position.get("qty_on_hand", 0)
+    available = position.get("qty_available", 0)
+    return {
+        "alert_type": "low_stock",
+        "severity": "warning" if available > 0 else "critical",
+        "message": f"Low stock: {position.get('item_no') or 'Unknown'} at {position.get('warehouse_code') or 'Unknown'} - {available:,.0f} available",
+        "item_id": position.get("item_id"),
+        "details": {"available": available, "on_hand": on_hand},
+    }
+
+
+def _backordered_alert(line: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "alert_type": "at_risk_order",
+        "severity": "warning",
+        "message": f"Backordered: {line.get('item_no') or 'Unknown'} qty {line['ordered_qty']:,.0f}",
+        "order_id": line["order_id"],
+        "item_id": line.get("item_id"),
+        "details": {"line_id": line.get("order_line_id"), "qty": line["ordered_qty"]},
+    }
+
+
+async def build_customer_dashboard(
+    db, customer_id: str, warehouse: Optional[str] = None, days: int = 30
+) -> Optional[Dict[str, Any]]:
+    """Dashboard data for a customer, or None if the customer does not exist."""
+    cutoff_date = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+    customer, positions, summary, orders, lost_count = await asyncio.gather(
+        db.sales_customers.find_one({"customer_id": customer_id}, {"_id": 0}),
+        db.sales_inventory_positions.aggregate(inventory_pipeline(customer_id, warehouse)).to_list(None),
+        db.sales_inventory_positions.aggregate(summary_pipeline(customer_id, warehouse)).to_list(1),
+        db.sales_open_order_headers.aggregate(open_orders_pipeline(customer_id)).to_list(1),
+        db.sales_lost_business.count_documents({"customer_id": customer_id, "date": {"$gte": cutoff_date}}),
+    )
+    if not customer:
+        return None
+
+    totals = summary[0] if summary else {}
+    orders = orders[0] if orders else {"orders": [], "backordered": []}
+
+    alerts = [_low_stock_alert(p) for p in positions if p.get("_low_stock")]
+    alerts.extend(_backordered_alert(line) for line in orders["backordered"])
+    if lost_count > 0:
+        alerts.append({
+            "alert_type": "lost_business",
+            "severity": "warning",
+            "message": f"{lost_count} lost business record(s) in last {days} days",
+            "details": {"count": lost_count, "days": days},
+        })
+    for position in positions:
+        position.pop("_low_stock", None)
+
+    return {
+        "customer_id": customer_id,
+        "customer_name": customer.get("name"),
+        "account_manager": customer.get("account_manager"),
+        "summary": {name: totals.get(name, 0) for name in QUANTITY_FIELDS},
+        "inventory_positions": positions,
+        "open_orders": orders["orders"],
+        "alerts": alerts,
+    }
+
+
+class CustomerDashboardCache:
+    """TTL cache of dashboard responses keyed by (customer_id, warehouse, days), with single-flight loads."""
+
+    def __init__(self, ttl_seconds: float = DASHBOARD_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        # key -> (value, monotonic load time)
+        self._entries: Dict[Hashable, tuple] = {}
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        # Bumped by invalidate() so a load that started before it is not cached
+        self._generation = 0
+        self._hits = 0
+        self._loads = 0
+        self._invalidations = 0
+
+    def _fresh(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() - entry[1] < self.ttl_seconds
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for key, loading it once for concurrent callers. None results are not cached."""
+        if self._fresh(key):
+            self._hits += 1
+            return self._entries[key][0]
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if self._fresh(key):
+                self._hits += 1
+                return self._entries[key][0]
+            generation = self._generation
+            value = await load()
+            self._loads += 1
+            if value is not None and generation == self._generation:
+                self._entries[key] = (value, time.monotonic())
+            return value
+
+    def invalidate(self, customer_id: Optional[str] = None) -> None:
+        """Drop a customer's dashboards, or all of them."""
+        self._invalidations += 1
+        self._generation += 1
+        if customer_id is None:
+            self._entries.clear()
+            self._locks.clear()
+            return
+        for key in [k for k in self._entries if k[0] == customer_id]:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "loads": self._loads,
+            "invalidations": self._invalidations,
+        }
+
+
+customer_dashboard_cache = CustomerDashboardCache()
@@ -10,20 +10,56 @@ This service handles parsing and ingestion of Excel/CSV files for:
 Supports file formats:
 - CSV (.csv)
 - Excel (.xlsx, .xls)
+
+Files are streamed: CSV is decoded incrementally and .xlsx sheets are read
+with openpyxl's read-only row iterator, rows are validated and mapped in
+chunks of FILE_IMPORT_BATCH_SIZE and imports insert one batch per chunk, so
+memory use does not grow with the number of rows.
+
+With FILE_IMPORT_COLUMNAR (the default) chunks are pandas DataFrames: CSV is
+parsed by pandas' C reader (Arrow-backed strings when pyarrow is installed)
+and required-field checks, quantity parsing and qty_available are column
+operations. Results and validation errors match the row-by-row path, which
+is kept as the fallback when pandas is not available.
 """
 
+import asyncio
+import codecs
 import csv
 import io
+import os
 import uuid
 import logging
+import warnings
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Tuple, Any
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Any, Union
 from pathlib import Path
 from enum import Enum
 from pydantic import BaseModel
+from pymongo import UpdateOne
+
+from services.customer_dashboard import customer_dashboard_cache
+from services.inventory_snapshots import InventorySnapshotStore
 
 logger = logging.getLogger(__name__)
 
+# Rows validated, mapped and inserted per chunk
+FILE_IMPORT_BATCH_SIZE = int(os.environ.get("FILE_IMPORT_BATCH_SIZE", "5000"))
+# Validation errors kept for the response (all are counted)
+MAX_VALIDATION_ERRORS = 1000
+PREVIEW_ROWS = 100
+READ_BLOCK_SIZE = 1024 * 1024
+# Decode error handler for UTF-8 files: stray non-UTF-8 bytes are read as latin-1
+LATIN1_FALLBACK = "latin1_fallback"
+codecs.register_error(
+    LATIN1_FALLBACK, lambda e: (e.object[e.start:e.end].decode("latin-1"), e.end)
+)
+# Validate with pandas column operations instead of per row (falls back when pandas is missing)
+FILE_IMPORT_COLUMNAR = os.environ.get("FILE_IMPORT_COLUMNAR", "true").lower() == "true"
+# pandas parses CSV in blocks of this many rows, then splits them into chunks
+COLUMNAR_READ_ROWS = 50000
+
 
 class IngestionType(str, Enum):
     """Types of data that can be ingested from files."""
@@ -105,6 +141,9 @@ COLUMN_MAPPINGS = {
     }
 }
 
+# Normalized known column names per ingestion type, filled on first use
+_NORMALIZED_KNOWN_COLUMNS: Dict[str, List[Tuple[str, frozenset]]] = {}
+
 
 class FileIngestionService:
     """Service for parsing and validating Excel/CSV files."""
@@ -120,19 +159,28 @@ class FileIngestionService:
         """Normalize column name for matching."""
         return col.lower().strip().replace("-", "_").replace(" ", "_")
     
+    def _known_column_names(self, ingestion_type: str) -> List[Tuple[str, frozenset]]:
+        """(field name, normalized accepted column names) per field, normalized once per type."""
+        known = _NORMALIZED_KNOWN_COLUMNS.get(ingestion_type)
+        if known is None:
+            known_columns = COLUMN_MAPPINGS.get(ingestion_type, {}).get("known_columns", {})
+            known = _NORMALIZED_KNOWN_COLUMNS[ingestion_type] = [
+                (field_name, frozenset(self._normalize_column_name(p) for p in possible_names))
+                for field_name, possible_names in known_columns.items()
+            ]
+        return known
+    
     def _detect_column_mapping(self, columns: List[str], ingestion_type: str) -> Dict[str, str]:
         """
         Auto-detect column mapping based on column names.
         Returns a dict mapping internal field names to actual column names.
         """
         mapping = {}
-        type_config = COLUMN_MAPPINGS.get(ingestion_type, {})
-        known_columns = type_config.get("known_columns", {})
+        normalized_columns = [(col, self._normalize_column_name(str(col))) for col in columns]
         
-        for field_name, possible_names in known_columns.items():
-            for col in columns:
-                normalized = self._normalize_column_name(col)
-                if normalized in [self._normalize_column_name(p) for p in possible_names]:
+        for field_name, possible_names in self._known_column_names(ingestion_type):
+            for col, normalized in normalized_columns:
+                if normalized in possible_names:
                     mapping[field_name] = col
                     break
         
@@ -150,26 +198,78 @@ class FileIngestionService:
         
         return missing
     
-    def parse_csv(self, content: bytes, file_name: str) -> Tuple[List[str], List[Dict[str, str]]]:
-        """Parse CSV file content into headers and rows."""
+    def _detect_encoding(self, stream: BinaryIO) -> Tuple[str, str]:
+        """
+        (encoding, errors) for a CSV stream, detected from its first block.
+        
+        UTF-8 if the first block decodes as UTF-8, else latin-1. Bytes later
+        in a UTF-8 file that are not valid UTF-8 are decoded as latin-1, so
+        the file is read once instead of being decoded twice.
+        """
+        block = stream.read(READ_BLOCK_SIZE)
+        stream.seek(0)
+        try:
+            # Not final: the block may end inside a multi-byte character
+            codecs.getincrementaldecoder("utf-8")().decode(block)
+        except UnicodeDecodeError:
+            return "latin-1", "strict"
+        return "utf-8-sig", LATIN1_FALLBACK
+    
+    def iter_csv(self, stream: BinaryIO) -> Tuple[List[str], Iterator[Dict[str, str]]]:
+        """Headers and a row iterator over a CSV stream, decoded incrementally."""
         try:
             # Try UTF-8 first, then fallback to latin-1
-            try:
-                text = content.decode('utf-8')
-            except UnicodeDecodeError:
-                text = content.decode('latin-1')
-            
-            reader = csv.DictReader(io.StringIO(text))
+            encoding, errors = self._detect_encoding(stream)
+            text = io.TextIOWrapper(stream, encoding=encoding, errors=errors, newline="")
+            reader = csv.DictReader(text, restval="")
             headers = reader.fieldnames or []
-            rows = list(reader)
-            
-            return headers, rows
+            return headers, reader
         except Exception as e:
             logger.error("Error parsing CSV: %s", str(e))
             raise ValueError(f"Failed to parse CSV file: {str(e)}")
     
+    def iter_excel(self, stream: BinaryIO, sheet_name: str = None) -> Tuple[List[str], Iterator[Dict[str, Any]]]:
+        """Headers and a row iterator over an .xlsx sheet, read with openpyxl in read-only mode."""
+        try:
+            from openpyxl import load_workbook
+            
+            workbook = load_workbook(stream, read_only=True, data_only=True)
+            sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            values = sheet.iter_rows(values_only=True)
+            first = next(values, None)
+            if first is None:
+                workbook.close()
+                return [], iter(())
+            
+            # Clean column names
+            headers = [str(col).strip() if col is not None else f"Unnamed: {i}" for i, col in enumerate(first)]
+            
+            def rows():
+                try:
+                    for values_row in values:
+                        # Skip blank rows
+                        if all(v is None or v == "" for v in values_row):
+                            continue
+                        yield {h: ("" if v is None else v) for h, v in zip(headers, values_row)}
+                finally:
+                    workbook.close()
+            
+            return headers, rows()
+        except Exception as e:
+            logger.error("Error parsing Excel: %s", str(e))
+            raise ValueError(f"Failed to parse Excel file: {str(e)}")
+    
+    def parse_csv(self, content: bytes, file_name: str) -> Tuple[List[str], List[Dict[str, str]]]:
+        """Parse CSV file content into headers and rows."""
+        headers, rows = self.iter_csv(io.BytesIO(content))
+        return headers, list(rows)
+    
     def parse_excel(self, content: bytes, file_name: str, sheet_name: str = None) -> Tuple[List[str], List[Dict[str, Any]]]:
         """Parse Excel file content into headers and rows."""
+        if Path(file_name).suffix.lower() != ".xls":
+            headers, rows = self.iter_excel(io.BytesIO(content), sheet_name)
+            return headers, list(rows)
+        # Legacy .xls is not supported by openpyxl; read it whole with pandas
         try:
             import pandas as pd
             from io import BytesIO
@@ -200,8 +300,30 @@ class FileIngestionService:
             logger.error("Error parsing Excel: %s", str(e))
             raise ValueError(f"Failed to parse Excel file: {str(e)}")
     
+    def iter_file(self, stream: BinaryIO, file_name: str, sheet_name: str = None) -> Tuple[List[str], Iterator[Dict[str, Any]]]:
+        """Headers and row iterator for a CSV/Excel stream, chosen by file extension."""
+        file_ext = Path(file_name).suffix.lower()
+        if file_ext == '.csv':
+            return self.iter_csv(stream)
+        if file_ext == '.xlsx':
+            return self.iter_excel(stream, sheet_name)
+        if file_ext == '.xls':
+            headers, rows = self.parse_excel(stream.read(), file_name, sheet_name)
+            return headers, iter(rows)
+        raise ValueError(f"Unsupported file format: {file_ext}. Supported: .csv, .xlsx, .xls")
+    
     def get_excel_sheets(self, content: bytes) -> List[str]:
         """Get list of sheet names from Excel file."""
+        try:
+            from openpyxl import load_workbook
+            
+            workbook = load_workbook(io.BytesIO(content), read_only=True)
+            try:
+                return workbook.sheetnames
+            finally:
+                workbook.close()
+        except Exception:
+            pass
         try:
             import pandas as pd
             from io import BytesIO
@@ -213,33 +335,386 @@ class FileIngestionService:
             logger.error("Error reading Excel sheets: %s", str(e))
             return []
     
+    def _open_rows(
+        self,
+        stream: BinaryIO,
+        result: IngestionResult,
+        sheet_name: str = None,
+        custom_mapping: Dict[str, str] = None
+    ) -> Optional[Iterator[Dict[str, Any]]]:
+        """Read headers and resolve the column mapping. Returns the row iterator, or None with result.error set."""
+        file_ext = Path(result.file_name).suffix.lower()
+        if file_ext not in ('.csv', '.xlsx', '.xls'):
+            result.error = f"Unsupported file format: {file_ext}. Supported: .csv, .xlsx, .xls"
+            return None
+        
+        headers, rows = self.iter_file(stream, result.file_name, sheet_name)
+        if not self._resolve_mapping(headers, result, custom_mapping):
+            return None
+        return rows
+    
+    def _resolve_mapping(self, headers: List[str], result: IngestionResult, custom_mapping: Dict[str, str] = None) -> bool:
+        """Set result.column_mapping for the headers. False with result.error set if required columns are missing."""
+        if not headers:
+            result.error = "No headers found in file"
+            return False
+        
+        # Detect column mapping
+        if custom_mapping:
+            column_mapping = custom_mapping
+        else:
+            column_mapping = self._detect_column_mapping(headers, result.ingestion_type)
+        
+        result.column_mapping = column_mapping
+        
+        # Validate required columns
+        missing_columns = self._validate_required_columns(column_mapping, result.ingestion_type)
+        if missing_columns:
+            result.error = f"Missing required columns: {', '.join(missing_columns)}"
+            result.warnings.append(f"Detected columns: {headers}")
+            result.warnings.append(f"Auto-mapped: {column_mapping}")
+            return False
+        
+        return True
+    
+    def _open_frames(
+        self,
+        stream: BinaryIO,
+        result: IngestionResult,
+        sheet_name: str = None,
+        custom_mapping: Dict[str, str] = None,
+        chunk_size: int = FILE_IMPORT_BATCH_SIZE
+    ) -> Optional[Iterator[Any]]:
+        """
+        Columnar counterpart of _open_rows: an iterator of DataFrame chunks.
+        
+        CSV is read by pandas' C parser, limited to the mapped columns and
+        kept as strings; Excel rows are read as in _open_rows and grouped
+        into frames.
+        """
+        import pandas as pd
+        
+        file_ext = Path(result.file_name).suffix.lower()
+        if file_ext != '.csv':
+            rows = self._open_rows(stream, result, sheet_name, custom_mapping)
+            if rows is None:
+                return None
+            columns = list(dict.fromkeys(result.column_mapping.values()))
+            return (
+                # object dtype keeps cell values as read, so they stringify like the row path
+                pd.DataFrame(chunk, columns=columns, dtype=object)
+                for chunk in iter(lambda: list(islice(rows, chunk_size)), [])
+            )
+        
+        try:
+            encoding, errors = self._detect_encoding(stream)
+            text = io.TextIOWrapper(stream, encoding=encoding, errors=errors, newline="")
+            headers = next(csv.reader(text), [])
+        except Exception as e:
+            logger.error("Error parsing CSV: %s", str(e))
+            raise ValueError(f"Failed to parse CSV file: {str(e)}")
+        if not self._resolve_mapping(headers, result, custom_mapping):
+            return None
+        
+        # Like csv.DictReader, the last of duplicate headers wins
+        positions = {header: i for i, header in enumerate(headers)}
+        used = {positions[col]: col for col in result.column_mapping.values() if col in positions}
+        if not used:
+            used = {0: headers[0]}
+        
+        def quietly(fn, *args, **kwargs):
+            with warnings.catch_warnings():
+                # Extra fields in a row are dropped, as DictReader does
+                warnings.simplefilter("ignore", pd.errors.ParserWarning)
+                return fn(*args, **kwargs)
+        
+        def frames():
+            try:
+                reader = quietly(
+                    pd.read_csv, text, header=None, names=list(range(len(headers))), usecols=sorted(used),
+                    index_col=False, dtype=str, keep_default_na=False, na_filter=False,
+                    chunksize=max(chunk_size, COLUMNAR_READ_ROWS)
+                )
+                while True:
+                    frame = quietly(next, reader, None)
+                    if frame is None:
+                        return
+                    frame = frame.rename(columns=used)
+                    for start in range(0, len(frame), chunk_size):
+                        yield frame.iloc[start:start + chunk_size]
+            except pd.errors.EmptyDataError:
+                return
+            except pd.errors.ParserError as e:
+                raise ValueError(f"Failed to parse CSV file: {str(e)}")
+        
+        return frames()
+    
+    def _validate_chunk(
+        self,
+        rows: List[Dict[str, Any]],
+        first_row_num: int,
+        column_mapping: Dict[str, str],
+        ingestion_type: str
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """Map and validate a chunk of rows. Returns (valid rows, errors, invalid row count)."""
+        valid_rows = []
+        validation_errors = []
+        rows_invalid = 0
+        
+        for idx, row in enumerate(rows):
+            row_num = first_row_num + idx
+            transformed = {}
+            
+            # Map columns to internal field names
+            for field_name, col_name in column_mapping.items():
+                value = row.get(col_name, '')
+                # Convert to string and strip whitespace
+                if value is not None:
+                    value = str(value).strip()
+                transformed[field_name] = value
+            
+            # Validate based on ingestion type
+            row_errors = []
+            if ingestion_type == "sales_order":
+                row_errors = self._validate_sales_order_row(transformed, row_num)
+            elif ingestion_type == "inventory_position":
+                row_errors = self._validate_inventory_row(transformed, row_num)
+            elif ingestion_type == "customer_item":
+                row_errors = self._validate_customer_item_row(transformed, row_num)
+            
+            if row_errors:
+                validation_errors.extend(row_errors)
+                rows_invalid += 1
+            else:
+                valid_rows.append(transformed)
+        
+        return valid_rows, validation_errors, rows_invalid
+    
+    def _map_frame(self, frame, column_mapping: Dict[str, str]):
+        """Mapped fields of a chunk as stripped strings ("" for missing values and unmapped columns)."""
+        import pandas as pd
+        
+        columns = {}
+        for field_name, col_name in column_mapping.items():
+            if col_name in frame.columns:
+                columns[field_name] = frame[col_name].fillna("").astype(str).str.strip()
+            else:
+                columns[field_name] = ""
+        return pd.DataFrame(columns, index=frame.index)
+    
+    def _parse_quantities(self, values) -> Tuple[Any, Any]:
+        """
+        Vectorized float(str(qty).replace(",", "")): (float array, parseable mask).
+        
+        The whole column is cast at once; if any value does not cast, it is
+        coerced with to_numeric and the failures retried with float() so
+        both paths accept the same input (e.g. "1_000").
+        """
+        import numpy as np
+        import pandas as pd
+        
+        cleaned = values.str.replace(",", "", regex=False)
+        present = (cleaned != "").to_numpy(dtype=bool)
+        parsed = np.full(len(cleaned), np.nan)
+        try:
+            parsed[present] = cleaned[present].astype("float64").to_numpy()
+            return parsed, present
+        except (ValueError, TypeError):
+            pass
+        
+        parsed = np.array(pd.to_numeric(cleaned, errors="coerce").to_numpy(dtype=float, na_value=np.nan))
+        ok = present & ~np.isnan(parsed)
+        for pos in np.flatnonzero(present & ~ok):
+            try:
+                value = float(cleaned.iat[pos])
+            except ValueError:
+                continue
+            parsed[pos] = value
+            ok[pos] = True
+        return parsed, ok
+    
+    def _frame_records(self, frame) -> List[Dict[str, Any]]:
+        """Rows of a frame as plain dicts of Python values (faster than DataFrame.to_dict)."""
+        columns = list(frame.columns)
+        return [dict(zip(columns, values)) for values in zip(*(frame[c].tolist() for c in columns))]
+    
+    def _validate_frame(
+        self,
+        frame,
+        first_row_num: int,
+        column_mapping: Dict[str, str],
+        ingestion_type: str
+    ) -> Tuple[Any, List[Dict[str, Any]], int]:
+        """
+        Columnar _validate_chunk: the same checks as column operations.
+        
+        Returns (valid mapped rows as a DataFrame, errors, invalid row count);
+        errors are identical to the row-by-row validators, in the same order.
+        """
+        import numpy as np
+        
+        mapped = self._map_frame(frame, column_mapping)
+        
+        def blank(field_name):
+            return (mapped[field_name] == "").to_numpy(dtype=bool)
+        
+        # (field, failing rows, error message) in the order the row validators check them
+        checks = []
+        if ingestion_type == "sales_order":
+            checks.append(("customer_po", blank("customer_po"), "Customer PO is required"))
+            checks.append(("item_no", blank("item_no"), "Item number is required"))
+            missing = blank("quantity")
+            parsed, ok = self._parse_quantities(mapped["quantity"])
+            checks.append(("quantity", missing, "Quantity is required"))
+            checks.append(("quantity", ~missing & ~ok, "Invalid quantity: {value}"))
+            checks.append(("quantity", ok & (parsed <= 0), "Quantity must be positive"))
+        elif ingestion_type == "inventory_position":
+            checks.append(("item_no", blank("item_no"), "Item number is required"))
+            missing = blank("qty_on_hand")
+            _, ok = self._parse_quantities(mapped["qty_on_hand"])
+            checks.append(("qty_on_hand", missing, "Quantity on hand is required"))
+            checks.append(("qty_on_hand", ~missing & ~ok, "Invalid quantity: {value}"))
+        elif ingestion_type == "customer_item":
+            checks.append(("customer_sku", blank("customer_sku"), "Customer SKU is required"))
+            checks.append(("item_no", blank("item_no"), "GPI item number is required"))
+        
+        invalid = np.zeros(len(mapped), dtype=bool)
+        for _, mask, _ in checks:
+            invalid |= mask
+        
+        validation_errors = []
+        for pos in np.flatnonzero(invalid):
+            for field_name, mask, message in checks:
+                if mask[pos]:
+                    value = mapped[field_name].iat[pos]
+                    validation_errors.append({
+                        "row": first_row_num + int(pos),
+                        "field": field_name,
+                        "error": message.format(value=value)
+                    })
+        
+        return mapped[~invalid], validation_errors, int(invalid.sum())
+    
+    def _tally(
+        self,
+        result: IngestionResult,
+        rows_parsed: int,
+        rows_valid: int,
+        errors: List[Dict[str, Any]],
+        rows_invalid: int
+    ) -> int:
+        """Add a chunk's counts and errors to `result`. Returns how many more preview rows it takes."""
+        result.rows_parsed += rows_parsed
+        result.rows_valid += rows_valid
+        result.rows_invalid += rows_invalid
+        room = MAX_VALIDATION_ERRORS - len(result.validation_errors)
+        if room > 0:
+            result.validation_errors.extend(errors[:room])
+        return max(PREVIEW_ROWS - len(result.preview_data), 0)
+    
+    def _validated_chunks(
+        self,
+        rows: Iterator[Dict[str, Any]],
+        result: IngestionResult,
+        chunk_size: int = FILE_IMPORT_BATCH_SIZE
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield the valid, mapped rows of each chunk of `rows`.
+        
+        Counts, the first MAX_VALIDATION_ERRORS errors and the first
+        PREVIEW_ROWS valid rows are accumulated on `result`.
+        """
+        row_num = 2  # Excel row number (1-indexed + header row)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            valid_rows, errors, rows_invalid = self._validate_chunk(
+                chunk, row_num, result.column_mapping, result.ingestion_type
+            )
+            row_num += len(chunk)
+            room = self._tally(result, len(chunk), len(valid_rows), errors, rows_invalid)
+            result.preview_data.extend(valid_rows[:room])
+            yield valid_rows
+    
+    def _validated_frames(self, frames: Iterator[Any], result: IngestionResult) -> Iterator[Any]:
+        """Columnar _validated_chunks: yields the valid rows of each frame as a DataFrame."""
+        row_num = 2  # Excel row number (1-indexed + header row)
+        for frame in frames:
+            valid, errors, rows_invalid = self._validate_frame(
+                frame, row_num, result.column_mapping, result.ingestion_type
+            )
+            row_num += len(frame)
+            room = self._tally(result, len(frame), len(valid), errors, rows_invalid)
+            if room:
+                result.preview_data.extend(self._frame_records(valid.head(room)))
+            yield valid
+    
+    def _validated(
+        self,
+        stream: BinaryIO,
+        result: IngestionResult,
+        sheet_name: str = None,
+        custom_mapping: Dict[str, str] = None,
+        chunk_size: int = FILE_IMPORT_BATCH_SIZE,
+        columnar: bool = FILE_IMPORT_COLUMNAR
+    ) -> Tuple[Optional[Iterator[Any]], bool]:
+        """
+        Open a file and return (iterator of validated chunks, whether they are DataFrames).
+        
+        The iterator is None when the file cannot be imported (result.error
+        says why). The columnar path is used when requested and pandas is
+        installed.
+        """
+        if columnar:
+            try:
+                import pandas  # noqa: F401
+            except ImportError:
+                columnar = False
+        if columnar:
+            frames = self._open_frames(stream, result, sheet_name, custom_mapping, chunk_size)
+            return (self._validated_frames(frames, result) if frames is not None else None), True
+        rows = self._open_rows(stream, result, sheet_name, custom_mapping)
+        return (self._validated_chunks(rows, result, chunk_size) if rows is not None else None), False
+    
+    def _finish(self, result: IngestionResult) -> IngestionResult:
+        if result.error is None and result.rows_parsed == 0:
+            result.error = "No data rows found in file"
+        result.success = result.error is None and result.rows_valid > 0
+        if result.rows_invalid > 0:
+            result.warnings.append(f"{result.rows_invalid} rows had validation errors")
+        if result.rows_invalid and len(result.validation_errors) >= MAX_VALIDATION_ERRORS:
+            result.warnings.append(f"Only the first {MAX_VALIDATION_ERRORS} validation errors are listed")
+        return result
+    
     def parse_file(
         self,
-        content: bytes,
+        content: Union[bytes, BinaryIO],
         file_name: str,
         ingestion_type: str,
         sheet_name: str = None,
-        custom_mapping: Dict[str, str] = None
+        custom_mapping: Dict[str, str] = None,
+        columnar: bool = FILE_IMPORT_COLUMNAR
     ) -> IngestionResult:
         """
         Parse a file and return structured data with validation.
         
         Args:
-            content: File content as bytes
+            content: File content as bytes, or a binary stream (read incrementally)
             file_name: Original filename
             ingestion_type: Type of data to expect (sales_order, inventory_position, etc.)
             sheet_name: Optional sheet name for Excel files
             custom_mapping: Optional custom column mapping to override auto-detection
+            columnar: Validate with pandas column operations (same results, faster)
         
         Returns:
-            IngestionResult with parsed data and validation status
+            IngestionResult with counts, validation errors and a preview of valid rows
         """
-        ingestion_id = str(uuid.uuid4())
-        file_ext = Path(file_name).suffix.lower()
+        stream = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
         
         result = IngestionResult(
             success=False,
-            ingestion_id=ingestion_id,
+            ingestion_id=str(uuid.uuid4()),
             ingestion_type=ingestion_type,
             file_name=file_name,
             rows_parsed=0,
@@ -248,81 +723,12 @@ class FileIngestionService:
         )
         
         try:
-            # Parse file based on extension
-            if file_ext == '.csv':
-                headers, rows = self.parse_csv(content, file_name)
-            elif file_ext in ['.xlsx', '.xls']:
-                headers, rows = self.parse_excel(content, file_name, sheet_name)
-            else:
-                result.error = f"Unsupported file format: {file_ext}. Supported: .csv, .xlsx, .xls"
-                return result
-            
-            if not headers:
-                result.error = "No headers found in file"
+            chunks, _ = self._validated(stream, result, sheet_name, custom_mapping, columnar=columnar)
+            if chunks is None:
                 return result
-            
-            if not rows:
-                result.error = "No data rows found in file"
-                return result
-            
-            result.rows_parsed = len(rows)
-            
-            # Detect column mapping
-            if custom_mapping:
-                column_mapping = custom_mapping
-            else:
-                column_mapping = self._detect_column_mapping(headers, ingestion_type)
-            
-            result.column_mapping = column_mapping
-            
-            # Validate required columns
-            missing_columns = self._validate_required_columns(column_mapping, ingestion_type)
-            if missing_columns:
-                result.error = f"Missing required columns: {', '.join(missing_columns)}"
-                result.warnings.append(f"Detected columns: {headers}")
-                result.warnings.append(f"Auto-mapped: {column_mapping}")
-                return result
-            
-            # Validate and transform rows
-            valid_rows = []
-            validation_errors = []
-            
-            for idx, row in enumerate(rows):
-                row_num = idx + 2  # Excel row number (1-indexed + header row)
-                row_errors = []
-                transformed = {}
-                
-                # Map columns to internal field names
-                for field_name, col_name in column_mapping.items():
-                    value = row.get(col_name, '')
-                    # Convert to string and strip whitespace
-                    if value is not None:
-                        value = str(value).strip()
-                    transformed[field_name] = value
-                
-                # Validate based on ingestion type
-                if ingestion_type == "sales_order":
-                    row_errors = self._validate_sales_order_row(transformed, row_num)
-                elif ingestion_type == "inventory_position":
-                    row_errors = self._validate_inventory_row(transformed, row_num)
-                elif ingestion_type == "customer_item":
-                    row_errors = self._validate_customer_item_row(transformed, row_num)
-                
-                if row_errors:
-                    validation_errors.extend(row_errors)
-                    result.rows_invalid += 1
-                else:
-                    valid_rows.append(transformed)
-                    result.rows_valid += 1
-            
-            result.validation_errors = validation_errors
-            result.preview_data = valid_rows[:100]  # Limit preview to 100 rows
-            result.success = result.rows_valid > 0
-            
-            if result.rows_invalid > 0:
-                result.warnings.append(f"{result.rows_invalid} rows had validation errors")
-            
-            return result
+            for _ in chunks:
+                pass
+            return self._finish(result)
             
         except Exception as e:
             logger.exception("Error parsing file: %s", file_name)
@@ -383,162 +789,129 @@ class FileIngestionService:
         
         return errors
     
-    async def import_sales_orders(
+    def _sales_order_lines(
         self,
-        parsed_result: IngestionResult,
-        customer_id: str = None,
-        source: str = "file_import",
-        dry_run: bool = False
-    ) -> Dict[str, Any]:
+        rows: List[Dict[str, Any]],
+        orders_by_po: Dict[str, Dict[str, Any]],
+        customer_id: Optional[str],
+        source: str,
+        ingestion_id: str,
+        now: str,
+        today: str
+    ) -> List[Dict[str, Any]]:
         """
-        Import sales orders from parsed file data into the database.
+        Order lines for a chunk of valid rows.
         
-        Groups order lines by customer_po into order headers and lines.
+        Lines are grouped by customer_po into order headers kept in
+        orders_by_po, whose totals are updated as lines are added. Imports
+        pass a new dict per chunk (see _upsert_order_headers); dry runs keep
+        one for the whole file.
         """
-        if self.db is None:
-            return {"success": False, "error": "Database not configured"}
-        
-        if not parsed_result.success:
-            return {"success": False, "error": "Cannot import invalid parsed data"}
-        
-        now = datetime.now(timezone.utc).isoformat()
-        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-        
-        # Group rows by customer_po
-        orders_by_po = {}
-        for row in parsed_result.preview_data:
-            po = row.get("customer_po", "")
-            if po not in orders_by_po:
-                orders_by_po[po] = {
-                    "lines": [],
-                    "customer_id": row.get("customer_id") or customer_id,
-                    "order_date": row.get("order_date") or today,
-                    "requested_ship_date": row.get("requested_ship_date"),
-                    "notes": row.get("notes", "")
+        lines = []
+        for line_data in rows:
+            po_no = line_data.get("customer_po", "")
+            order_header = orders_by_po.get(po_no)
+            if order_header is None:
+                order_header = orders_by_po[po_no] = {
+                    "order_id": f"ord_{uuid.uuid4().hex[:8]}",
+                    "customer_id": line_data.get("customer_id") or customer_id or "unknown",
+                    "bc_sales_order_no": None,
+                    "customer_po_no": po_no,
+                    "order_date": line_data.get("order_date") or today,
+                    "requested_ship_date": line_data.get("requested_ship_date"),
+                    "status": "planned",
+                    "source": source,
+                    "total_qty": 0,
+                    "line_count": 0,
+                    "created_utc": now,
+                    "updated_utc": now,
+                    "ingestion_id": ingestion_id,
+                    "notes": line_data.get("notes", "")
                 }
-            orders_by_po[po]["lines"].append(row)
-        
-        created_orders = []
-        created_lines = []
-        
-        for po_no, order_data in orders_by_po.items():
-            order_id = f"ord_{uuid.uuid4().hex[:8]}"
-            
-            # Create order header
-            order_header = {
-                "order_id": order_id,
-                "customer_id": order_data["customer_id"] or "unknown",
-                "bc_sales_order_no": None,
-                "customer_po_no": po_no,
-                "order_date": order_data["order_date"],
-                "requested_ship_date": order_data["requested_ship_date"],
-                "status": "planned",
-                "source": source,
-                "total_qty": 0,
-                "line_count": 0,
-                "created_utc": now,
-                "updated_utc": now,
-                "ingestion_id": parsed_result.ingestion_id,
-                "notes": order_data["notes"]
-            }
             
-            # Create order lines
-            line_num = 0
-            for line_data in order_data["lines"]:
-                line_num += 1
-                line_id = f"line_{uuid.uuid4().hex[:8]}"
-                
-                try:
-                    qty = float(str(line_data.get("quantity", "0")).replace(",", ""))
-                except ValueError:
-                    qty = 0
-                
-                order_line = {
-                    "order_line_id": line_id,
-                    "order_id": order_id,
-                    "line_number": line_num,
-                    "item_no": line_data.get("item_no"),
-                    "customer_sku": line_data.get("customer_sku"),
-                    "ordered_qty": qty,
-                    "uom": line_data.get("uom", "EA"),
-                    "ship_from_warehouse_id": line_data.get("warehouse"),
-                    "requested_ship_date": line_data.get("requested_ship_date") or order_data["requested_ship_date"],
-                    "promised_ship_date": None,
-                    "line_status": "open",
-                    "created_utc": now
-                }
-                
-                order_header["total_qty"] += qty
-                order_header["line_count"] += 1
-                created_lines.append(order_line)
+            try:
+                qty = float(str(line_data.get("quantity", "0")).replace(",", ""))
+            except ValueError:
+                qty = 0
             
-            created_orders.append(order_header)
+            order_header["total_qty"] += qty
+            order_header["line_count"] += 1
+            lines.append({
+                "order_line_id": f"line_{uuid.uuid4().hex[:8]}",
+                "order_id": order_header["order_id"],
+                "line_number": order_header["line_count"],
+                "item_no": line_data.get("item_no"),
+                "customer_sku": line_data.get("customer_sku"),
+                "ordered_qty": qty,
+                "uom": line_data.get("uom", "EA"),
+                "ship_from_warehouse_id": line_data.get("warehouse"),
+                "requested_ship_date": line_data.get("requested_ship_date") or order_header["requested_ship_date"],
+                "promised_ship_date": None,
+                "line_status": "open",
+                "created_utc": now
+            })
+        return lines
+    
+    async def _upsert_order_headers(
+        self, headers: List[Dict[str, Any]], now: str
+    ) -> Tuple[int, Dict[str, Tuple[str, int]]]:
+        """
+        Upsert one chunk's order headers, keyed by (ingestion_id, customer_po_no).
         
-        if not dry_run:
-            try:
-                # Insert into database
-                if created_orders:
-                    await self.db.sales_open_order_headers.insert_many(created_orders)
-                if created_lines:
-                    await self.db.sales_open_order_lines.insert_many(created_lines)
-                
-                # Log the import
-                await self.db.file_ingestion_log.insert_one({
-                    "ingestion_id": parsed_result.ingestion_id,
-                    "ingestion_type": "sales_order",
-                    "file_name": parsed_result.file_name,
-                    "rows_parsed": parsed_result.rows_parsed,
-                    "rows_imported": len(created_lines),
-                    "orders_created": len(created_orders),
-                    "created_utc": now,
-                    "customer_id": customer_id,
-                    "source": source
-                })
-                
-            except Exception as e:
-                logger.exception("Error importing sales orders")
-                return {"success": False, "error": str(e)}
+        Totals are added with $inc, so a PO spread over several chunks ends
+        up as one header. Returns the number of new headers and, per chunk
+        order_id, the stored order_id and its line count before this chunk.
+        """
+        collection = self.db.sales_open_order_headers
+        totals = ("total_qty", "line_count", "updated_utc")
+        key = ("ingestion_id", "customer_po_no")
+        result = await collection.bulk_write([
+            UpdateOne(
+                {field: header[field] for field in key},
+                {
+                    "$setOnInsert": {k: v for k, v in header.items() if k not in totals and k not in key},
+                    "$inc": {"total_qty": header["total_qty"], "line_count": header["line_count"]},
+                    "$set": {"updated_utc": now}
+                },
+                upsert=True
+            )
+            for header in headers
+        ], ordered=False)
         
-        return {
-            "success": True,
-            "dry_run": dry_run,
-            "orders_created": len(created_orders),
-            "lines_created": len(created_lines),
-            "total_quantity": sum(o["total_qty"] for o in created_orders),
-            "order_ids": [o["order_id"] for o in created_orders],
-            "preview": created_orders[:5] if dry_run else None
+        stored = {}
+        async for doc in collection.find(
+            {"ingestion_id": headers[0]["ingestion_id"], "customer_po_no": {"$in": [h["customer_po_no"] for h in headers]}},
+            {"_id": 0, "order_id": 1, "customer_po_no": 1, "line_count": 1}
+        ):
+            stored[doc["customer_po_no"]] = doc
+        return result.upserted_count, {
+            h["order_id"]: (
+                stored[h["customer_po_no"]]["order_id"],
+                stored[h["customer_po_no"]]["line_count"] - h["line_count"]
+            )
+            for h in headers
         }
     
-    async def import_inventory_positions(
+    def _inventory_positions(
         self,
-        parsed_result: IngestionResult,
-        customer_id: str = None,
-        warehouse_id: str = None,
-        dry_run: bool = False
-    ) -> Dict[str, Any]:
-        """Import inventory positions from parsed file data."""
-        if self.db is None:
-            return {"success": False, "error": "Database not configured"}
-        
-        if not parsed_result.success:
-            return {"success": False, "error": "Cannot import invalid parsed data"}
-        
-        now = datetime.now(timezone.utc).isoformat()
-        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-        
-        created_positions = []
+        rows: List[Dict[str, Any]],
+        customer_id: Optional[str],
+        warehouse_id: Optional[str],
+        ingestion_id: str,
+        now: str,
+        today: str
+    ) -> List[Dict[str, Any]]:
+        """Inventory position documents for a chunk of valid rows."""
+        def parse_qty(val):
+            try:
+                return float(str(val).replace(",", "")) if val else 0.0
+            except ValueError:
+                return 0.0
         
-        for row in parsed_result.preview_data:
-            position_id = f"inv_{uuid.uuid4().hex[:8]}"
-            
-            def parse_qty(val):
-                try:
-                    return float(str(val).replace(",", "")) if val else 0.0
-                except ValueError:
-                    return 0.0
-            
+        positions = []
+        for row in rows:
             position = {
-                "inventory_id": position_id,
+                "inventory_id": f"inv_{uuid.uuid4().hex[:8]}",
                 "customer_id": row.get("customer_id") or customer_id or "unknown",
                 "item_no": row.get("item_no"),
                 "customer_sku": row.get("customer_sku"),
@@ -550,42 +923,276 @@ class FileIngestionService:
                 "qty_on_water": parse_qty(row.get("qty_on_water")),
                 "qty_on_order": parse_qty(row.get("qty_on_order")),
                 "created_utc": now,
-                "ingestion_id": parsed_result.ingestion_id
+                "ingestion_id": ingestion_id
             }
             
             # Calculate available if not provided
             if position["qty_available"] == 0 and position["qty_on_hand"] > 0:
                 position["qty_available"] = position["qty_on_hand"] - position["qty_allocated"]
             
-            created_positions.append(position)
+            positions.append(position)
+        return positions
+    
+    def _inventory_positions_frame(
+        self,
+        frame,
+        customer_id: Optional[str],
+        warehouse_id: Optional[str],
+        ingestion_id: str,
+        now: str,
+        today: str
+    ) -> List[Dict[str, Any]]:
+        """Columnar _inventory_positions: quantities are parsed and qty_available derived per column."""
+        import numpy as np
+        
+        size = len(frame)
+        
+        def text(field_name, default):
+            if field_name not in frame.columns:
+                return [default] * size
+            values = frame[field_name]
+            return (values.where(values != "", default) if default is not None else values).tolist()
+        
+        def qty(field_name):
+            if field_name not in frame.columns:
+                return np.zeros(size)
+            parsed, ok = self._parse_quantities(frame[field_name])
+            return np.where(ok, parsed, 0.0)
+        
+        on_hand = qty("qty_on_hand")
+        allocated = qty("qty_allocated")
+        available = qty("qty_available")
+        # Calculate available if not provided
+        available = np.where((available == 0) & (on_hand > 0), on_hand - allocated, available)
+        
+        # Same 32 random bits as uuid4().hex[:8], drawn for the whole chunk at once
+        random_hex = os.urandom(4 * size).hex()
+        columns = {
+            "inventory_id": [f"inv_{random_hex[i:i + 8]}" for i in range(0, 8 * size, 8)],
+            "customer_id": text("customer_id", customer_id or "unknown"),
+            "item_no": frame["item_no"].tolist(),
+            "customer_sku": text("customer_sku", None),
+            "warehouse_id": text("warehouse_id", warehouse_id or "unknown"),
+            "snapshot_date": text("snapshot_date", today),
+            "qty_on_hand": on_hand.tolist(),
+            "qty_allocated": allocated.tolist(),
+            "qty_available": available.tolist(),
+            "qty_on_water": qty("qty_on_water").tolist(),
+            "qty_on_order": qty("qty_on_order").tolist(),
+        }
+        keys = list(columns)
+        return [
+            dict(zip(keys, values), created_utc=now, ingestion_id=ingestion_id)
+            for values in zip(*columns.values())
+        ]
+    
+    async def import_file(
+        self,
+        stream: BinaryIO,
+        file_name: str,
+        ingestion_type: str,
+        sheet_name: str = None,
+        customer_id: str = None,
+        warehouse_id: str = None,
+        source: str = "file_import",
+        dry_run: bool = False,
+        chunk_size: int = FILE_IMPORT_BATCH_SIZE,
+        columnar: bool = FILE_IMPORT_COLUMNAR
+    ) -> Dict[str, Any]:
+        """
+        Stream a sales order or inventory file into the database.
+        
+        Rows are read, validated and mapped chunk by chunk (in a worker
+        thread) and each chunk's documents are inserted as one batch.
+        Progress is recorded on the file_ingestion_log entry after every
+        batch. Valid rows are imported even if other rows fail validation.
+        Sales order headers are upserted with each chunk, before its lines,
+        with their totals added by $inc. Inventory positions are upserted
+        as snapshots (see services.inventory_snapshots), with the counts of
+        new, changed and unchanged rows returned as `snapshot_changes`.
+        Cached customer dashboards are invalidated once the writes finish.
+        With `columnar`, chunks are validated and inventory positions built
+        with pandas column operations.
+        """
+        if self.db is None:
+            return {"success": False, "error": "Database not configured"}
+        if ingestion_type not in ("sales_order", "inventory_position"):
+            return {"success": False, "error": f"Import not supported for {ingestion_type}"}
+        
+        now = datetime.now(timezone.utc).isoformat()
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        result = IngestionResult(
+            success=False,
+            ingestion_id=str(uuid.uuid4()),
+            ingestion_type=ingestion_type,
+            file_name=file_name,
+            rows_parsed=0,
+            rows_valid=0,
+            rows_invalid=0
+        )
         
+        def failed(error: str) -> Dict[str, Any]:
+            return {
+                "success": False,
+                "error": error,
+                "ingestion_id": result.ingestion_id,
+                "rows_parsed": result.rows_parsed,
+                "rows_valid": result.rows_valid,
+                "rows_invalid": result.rows_invalid,
+                "rows_imported": result.rows_imported,
+                "validation_errors": result.validation_errors,
+                "warnings": result.warnings
+            }
+        
+        try:
+            chunks, columnar = await asyncio.to_thread(
+                self._validated, stream, result, sheet_name, None, chunk_size, columnar
+            )
+        except Exception as e:
+            logger.exception("Error parsing file: %s", file_name)
+            return failed(str(e))
+        if chunks is None:
+            return failed(result.error)
+        
+        log = self.db.file_ingestion_log
         if not dry_run:
-            try:
-                if created_positions:
-                    await self.db.sales_inventory_positions.insert_many(created_positions)
-                
-                await self.db.file_ingestion_log.insert_one({
-                    "ingestion_id": parsed_result.ingestion_id,
-                    "ingestion_type": "inventory_position",
-                    "file_name": parsed_result.file_name,
-                    "rows_parsed": parsed_result.rows_parsed,
-                    "rows_imported": len(created_positions),
-                    "created_utc": now,
-                    "customer_id": customer_id,
-                    "warehouse_id": warehouse_id
-                })
+            await log.insert_one({
+                "ingestion_id": result.ingestion_id,
+                "ingestion_type": ingestion_type,
+                "file_name": file_name,
+                "status": "running",
+                "rows_parsed": 0,
+                "rows_imported": 0,
+                "created_utc": now,
+                "updated_utc": now,
+                "customer_id": customer_id,
+                **({"source": source} if ingestion_type == "sales_order" else {"warehouse_id": warehouse_id})
+            })
+        
+        # Dry runs only: every PO of the file, for the preview and counts
+        orders_by_po: Dict[str, Dict[str, Any]] = {}
+        orders_created = 0
+        preview: List[Dict[str, Any]] = []
+        total_qty = 0.0
+        snapshots = InventorySnapshotStore(self.db)
+        snapshot_changes: Dict[str, int] = {}
+        try:
+            while True:
+                valid_rows = await asyncio.to_thread(next, chunks, None)
+                if valid_rows is None:
+                    break
+                if ingestion_type == "sales_order":
+                    chunk_orders = orders_by_po if dry_run else {}
+                    docs = self._sales_order_lines(
+                        self._frame_records(valid_rows) if columnar else valid_rows,
+                        chunk_orders, customer_id, source, result.ingestion_id, now, today
+                    )
+                    total_qty += sum(line["ordered_qty"] for line in docs)
+                else:
+                    build_positions = self._inventory_positions_frame if columnar else self._inventory_positions
+                    docs = build_positions(
+                        valid_rows, customer_id, warehouse_id, result.ingestion_id, now, today
+                    )
+                    total_qty += sum(p["qty_on_hand"] for p in docs)
+                    if dry_run and len(preview) < 5:
+                        preview.extend(docs[:5 - len(preview)])
                 
-            except Exception as e:
-                logger.exception("Error importing inventory positions")
-                return {"success": False, "error": str(e)}
+                if not dry_run and docs:
+                    if ingestion_type == "sales_order":
+                        # Headers first, so no line points at a missing order
+                        created, stored = await self._upsert_order_headers(list(chunk_orders.values()), now)
+                        orders_created += created
+                        for line in docs:
+                            line["order_id"], base = stored[line["order_id"]]
+                            line["line_number"] += base
+                        await self.db.sales_open_order_lines.insert_many(docs, ordered=False)
+                    else:
+                        # Snapshots are upserted per (customer, item, warehouse, date)
+                        for name, count in (await snapshots.write(docs)).items():
+                            snapshot_changes[name] = snapshot_changes.get(name, 0) + count
+                    result.rows_imported += len(docs)
+                    await log.update_one({"ingestion_id": result.ingestion_id}, {"$set": {
+                        "rows_parsed": result.rows_parsed,
+                        "rows_valid": result.rows_valid,
+                        "rows_invalid": result.rows_invalid,
+                        "rows_imported": result.rows_imported,
+                        "updated_utc": datetime.now(timezone.utc).isoformat()
+                    }})
+            
+            self._finish(result)
+            if dry_run:
+                orders_created = len(orders_by_po)
+            else:
+                summary = {"orders_created": orders_created} if ingestion_type == "sales_order" else {"snapshot_changes": snapshot_changes}
+                await log.update_one({"ingestion_id": result.ingestion_id}, {"$set": {
+                    "status": "completed" if result.success else "failed",
+                    "rows_parsed": result.rows_parsed,
+                    "rows_valid": result.rows_valid,
+                    "rows_invalid": result.rows_invalid,
+                    "rows_imported": result.rows_imported,
+                    "error": result.error,
+                    "completed_utc": datetime.now(timezone.utc).isoformat(),
+                    "updated_utc": datetime.now(timezone.utc).isoformat(),
+                    **summary
+                }})
+                if ingestion_type == "inventory_position":
+                    try:
+                        await snapshots.compact()
+                    except Exception as e:
+                        logger.warning("Inventory snapshot compaction failed: %s", str(e))
+        except Exception as e:
+            logger.exception("Error importing %s file %s", ingestion_type, file_name)
+            if not dry_run:
+                await log.update_one({"ingestion_id": result.ingestion_id}, {"$set": {
+                    "status": "failed",
+                    "error": str(e),
+                    "rows_parsed": result.rows_parsed,
+                    "rows_imported": result.rows_imported,
+                    "updated_utc": datetime.now(timezone.utc).isoformat()
+                }})
+            return failed(str(e))
+        finally:
+            if not dry_run:
+                # Rows can name their own customer; then every dashboard may be stale
+                per_customer = customer_id and "customer_id" not in result.column_mapping
+                customer_dashboard_cache.invalidate(customer_id if per_customer else None)
         
-        return {
+        if not result.success:
+            return failed(result.error or "No valid rows to import")
+        
+        response = {
             "success": True,
             "dry_run": dry_run,
-            "positions_created": len(created_positions),
-            "total_on_hand": sum(p["qty_on_hand"] for p in created_positions),
-            "preview": created_positions[:5] if dry_run else None
+            "ingestion_id": result.ingestion_id,
+            "rows_parsed": result.rows_parsed,
+            "rows_valid": result.rows_valid,
+            "rows_invalid": result.rows_invalid,
+            "rows_imported": result.rows_imported,
+            "validation_errors": result.validation_errors,
+            "warnings": result.warnings
         }
+        if ingestion_type == "sales_order":
+            if dry_run:
+                order_ids = [o["order_id"] for o in orders_by_po.values()]
+            else:
+                order_ids = await self.db.sales_open_order_headers.distinct(
+                    "order_id", {"ingestion_id": result.ingestion_id}
+                )
+            response.update({
+                "orders_created": orders_created,
+                "lines_created": result.rows_valid,
+                "total_quantity": total_qty,
+                "order_ids": order_ids,
+                "preview": list(orders_by_po.values())[:5] if dry_run else None
+            })
+        else:
+            response.update({
+                "positions_created": result.rows_valid,
+                "snapshot_changes": snapshot_changes,
+                "total_on_hand": total_qty,
+                "preview": preview if dry_run else None
+            })
+        return response
 
 
 # Singleton instance
@@ -0,0 +1,193 @@
+"""
+GPI Document Hub - File Serving
+
+Conditional and partial responses for stored document files, used by the
+document preview endpoint.
+
+Key features:
+1. Strong ETags from the stored SHA-256 (the content hash), answered with
+   304 Not Modified for If-None-Match / If-Modified-Since
+2. Single byte-range requests (206 Partial Content / 416), honouring If-Range
+3. Long-lived private cache headers for content-addressed files, which never
+   change under the same ETag
+4. Zero-copy transfer: the ASGI zerocopysend extension (os.sendfile) or
+   pathsend when the server offers them, otherwise chunked reads off the
+   event loop
+"""
+
+import asyncio
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def strong_etag(sha256: str) -> str:
+    return f'"{sha256}"'
+
+
+def _weak_etag(stat: os.stat_result) -> str:
+    return f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single byte range, or None to serve the whole file.
+
+    Multi-range and malformed headers are ignored (the full file is sent), as
+    RFC 9110 allows; ranges entirely past the end raise RangeNotSatisfiable.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise RangeNotSatisfiable()
+    return start, end
+
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class FileRangeResponse(Response):
+    """Streams bytes [start, end] of a file, without copying through Python when the server allows."""
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: Dict[str, str], media_type: str):
+        self.path = Path(path)
+        self.start = start
+        self.end = end
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if scope.get("method") == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f, "offset": self.start, "count": count})
+            return
+        if "http.response.pathsend" in extensions and self.start == 0 and count == self.path.stat().st_size:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        f = await asyncio.to_thread(open, self.path, "rb")
+        try:
+            await asyncio.to_thread(f.seek, self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; end the response rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    filename: str,
+    sha256: Optional[str] = None,
+    disposition: str = "inline",
+) -> Response:
+    """
+    Serve a stored file with ETag, Last-Modified and Range support.
+
+    With `sha256` the ETag is the content hash and the response may be cached
+    for a year; without it a weak mtime/size ETag is used and clients revalidate.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = strong_etag(sha256) if sha256 else _weak_etag(stat)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if sha256 else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range (or a weak ETag, which cannot validate ranges) means: send everything
+    if range_header and if_range and (if_range.startswith("W/") or if_range != etag or not sha256):
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except RangeNotSatisfiable:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    headers["Content-Disposition"] = f'{disposition}; filename="{filename}"'
+    if byte_range is None or size == 0:
+        headers["Content-Length"] = str(size)
+        return FileRangeResponse(path, 0, size - 1, 200, headers, media_type)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return FileRangeResponse(path, start, end, 206, headers, media_type)
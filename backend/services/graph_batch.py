@@ -0,0 +1,214 @@
+"""
+Microsoft Graph JSON Batching for GPI Document Hub
+
+Sends many small Graph requests through the $batch endpoint so per-item
+metadata reads and writes cost one round trip per 20 items instead of one
+or two per item.
+
+Key features:
+1. Chunking: requests are packed 20 per batch; requests linked by
+   depends_on always travel in the same batch
+2. Ordering: depends_on maps to Graph's dependsOn, so linked requests run
+   in order. A request whose dependency failed is re-sent once the
+   dependency has a final answer, i.e. depends_on orders, it does not gate
+3. Throttling: sub-requests answered 429/503/504 are retried in a later
+   batch after their Retry-After (or exponential backoff). Throttling of
+   the $batch call itself is left to services.resilience
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from services.resilience import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BATCH_URL = "https://graph.microsoft.com/v1.0/$batch"
+
+# Graph limit on sub-requests per $batch call
+MAX_BATCH_REQUESTS = 20
+
+# Retry rounds for throttled sub-requests, and the backoff cap in seconds
+MAX_BATCH_RETRIES = 5
+MAX_RETRY_DELAY = 60.0
+
+# $batch calls in flight at once when a round spans several batches
+BATCH_CONCURRENCY = 4
+
+RETRYABLE_STATUSES = {429, 503, 504}
+FAILED_DEPENDENCY = 424
+
+
+@dataclass
+class GraphRequest:
+    """One sub-request of a $batch call. url is relative to /v1.0."""
+    id: str
+    method: str
+    url: str
+    body: Optional[Any] = None
+    headers: Optional[Dict[str, str]] = None
+    depends_on: List[str] = field(default_factory=list)
+
+    def to_batch_dict(self, depends_on: List[str]) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"id": self.id, "method": self.method, "url": self.url}
+        headers = dict(self.headers or {})
+        if self.body is not None:
+            entry["body"] = self.body
+            headers.setdefault("Content-Type", "application/json")
+        if headers:
+            entry["headers"] = headers
+        if depends_on:
+            entry["dependsOn"] = depends_on
+        return entry
+
+
+@dataclass
+class GraphResponse:
+    """Response to one sub-request."""
+    id: str
+    status: int
+    body: Any = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def error_text(self) -> str:
+        return str(self.body)[:300]
+
+
+def _chunk_requests(requests: List[GraphRequest]) -> List[List[GraphRequest]]:
+    """Pack requests into batches, keeping each depends_on group together."""
+    position = {r.id: i for i, r in enumerate(requests)}
+    group_of: Dict[str, int] = {}
+    groups: List[List[GraphRequest]] = []
+    for request in requests:
+        linked = {group_of[d] for d in request.depends_on if d in group_of}
+        if not linked:
+            group_of[request.id] = len(groups)
+            groups.append([request])
+            continue
+        # Merge every group this request links, keeping original order
+        target = min(linked)
+        for other in sorted(linked - {target}, reverse=True):
+            for moved in groups[other]:
+                group_of[moved.id] = target
+            groups[target].extend(groups[other])
+            groups[other] = []
+        groups[target].append(request)
+        group_of[request.id] = target
+
+    chunks: List[List[GraphRequest]] = []
+    current: List[GraphRequest] = []
+    for group in groups:
+        if not group:
+            continue
+        if len(group) > MAX_BATCH_REQUESTS:
+            raise ValueError(f"Dependent request group of {len(group)} exceeds {MAX_BATCH_REQUESTS}")
+        group.sort(key=lambda r: position[r.id])
+        if len(current) + len(group) > MAX_BATCH_REQUESTS:
+            chunks.append(current)
+            current = []
+        current.extend(group)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _retry_delay(responses: List[GraphResponse], attempt: int) -> float:
+    retry_after = [retry_after_seconds(r) or 0.0 for r in responses]
+    delay = max(retry_after + [0.0]) or 2 ** attempt
+    return min(delay, MAX_RETRY_DELAY)
+
+
+async def _post_batch(
+    client: httpx.AsyncClient,
+    token: str,
+    chunk: List[GraphRequest],
+    pending_ids: set
+) -> Dict[str, GraphResponse]:
+    payload = {
+        "requests": [
+            r.to_batch_dict([d for d in r.depends_on if d in pending_ids])
+            for r in chunk
+        ]
+    }
+    # Throttling of the $batch call itself is retried by the resilient client
+    resp = await client.post(
+        GRAPH_BATCH_URL,
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        },
+        json=payload
+    )
+    if resp.status_code != 200:
+        raise Exception(f"Graph $batch failed: {resp.status_code} - {resp.text[:500]}")
+
+    return {
+        item["id"]: GraphResponse(
+            id=item["id"],
+            status=int(item.get("status", 0)),
+            body=item.get("body"),
+            headers=item.get("headers") or {}
+        )
+        for item in resp.json().get("responses", [])
+    }
+
+
+async def send_batch(
+    client: httpx.AsyncClient,
+    token: str,
+    requests: List[GraphRequest]
+) -> Dict[str, GraphResponse]:
+    """
+    Execute requests through Graph $batch and return responses by request id.
+
+    Every request gets a response. Throttled sub-requests that are still
+    throttled after MAX_BATCH_RETRIES rounds are returned with their last
+    429/503/504 response.
+    """
+    if len({r.id for r in requests}) != len(requests):
+        raise ValueError("Batch request ids must be unique")
+
+    results: Dict[str, GraphResponse] = {}
+    pending = list(requests)
+    for attempt in range(MAX_BATCH_RETRIES + 1):
+        pending_ids = {r.id for r in pending}
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def post(chunk: List[GraphRequest]) -> Dict[str, GraphResponse]:
+            async with semaphore:
+                return await _post_batch(client, token, chunk, pending_ids)
+
+        round_results: Dict[str, GraphResponse] = {}
+        for chunk_results in await asyncio.gather(*(post(c) for c in _chunk_requests(pending))):
+            round_results.update(chunk_results)
+
+        retry: List[GraphRequest] = []
+        throttled: List[GraphResponse] = []
+        for request in pending:
+            response = round_results.get(request.id) or GraphResponse(id=request.id, status=0)
+            retryable = response.status in RETRYABLE_STATUSES or response.status == FAILED_DEPENDENCY
+            if retryable and attempt < MAX_BATCH_RETRIES:
+                retry.append(request)
+                if response.status in RETRYABLE_STATUSES:
+                    throttled.append(response)
+            else:
+                results[request.id] = response
+
+        if not retry:
+            break
+        pending = retry
+        if throttled:
+            delay = _retry_delay(throttled, attempt)
+            logger.warning(f"Graph $batch: {len(throttled)} sub-request(s) throttled, retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+    return results
@@ -0,0 +1,334 @@
+"""
+GPI Document Hub - Graph Notification Queue
+
+Durable queue between the Graph mail webhook and email processing. The
+webhook only validates and enqueues, so Graph gets its response within its
+deadline; attachment download, AI classification, BC validation and
+SharePoint upload happen in a worker pool.
+
+Key features:
+1. clientState is checked (constant-time) before anything is queued
+2. Deduplication: one queue entry per (mailbox, message) via a unique
+   index, so Graph redeliveries and repeated notifications are dropped
+3. Persistence: entries live in graph_notification_queue; workers claim
+   them with a lease, so entries held by a crashed worker are picked up
+   again once the lease expires. The lease is renewed while the handler
+   runs, and each claim carries its own lease_token so a worker that lost
+   its lease cannot complete or requeue the entry
+4. Failed entries are retried with backoff up to MAX_ATTEMPTS; done entries
+   are removed by a TTL index after DONE_RETENTION_DAYS
+5. Subscription lifecycle: the mail subscription is renewed before it
+   expires and recreated if Graph removed it
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from services.config_cache import config_cache, EMAIL_WATCHER
+from services.resilience import resilient_client
+
+logger = logging.getLogger(__name__)
+
+GRAPH_WEBHOOK_CLIENT_STATE = os.environ.get("GRAPH_WEBHOOK_CLIENT_STATE", "gpi-document-hub-secret")
+NOTIFICATION_WORKERS = int(os.environ.get("GRAPH_NOTIFICATION_WORKERS", "4"))
+
+# How long a claimed entry is owned before another worker may take it over;
+# the worker renews it every LEASE_RENEW_SECONDS while the handler runs
+LEASE_SECONDS = 600
+LEASE_RENEW_SECONDS = LEASE_SECONDS / 4
+DONE_RETENTION_DAYS = int(os.environ.get("GRAPH_NOTIFICATION_RETENTION_DAYS", "7"))
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SECONDS = 30
+# Idle workers re-check the queue this often (enqueue wakes them sooner)
+IDLE_POLL_SECONDS = 5
+
+# Graph caps mail subscriptions at 4230 minutes; renew well before expiry
+SUBSCRIPTION_LIFETIME = timedelta(minutes=4200)
+RENEW_BEFORE = timedelta(hours=12)
+RENEWAL_CHECK_SECONDS = 1800
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+DUPLICATE_KEY = 11000
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def valid_client_state(notification: Dict[str, Any]) -> bool:
+    # compare_digest only accepts ASCII str, so compare the encoded bytes
+    return hmac.compare_digest(
+        str(notification.get("clientState") or "").encode("utf-8"),
+        GRAPH_WEBHOOK_CLIENT_STATE.encode("utf-8"),
+    )
+
+
+def parse_message_notification(notification: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """
+    Mailbox and message id of a 'created' message notification.
+
+    Resource format: users/{mailbox}/mailFolders/Inbox/messages/{emailId}
+    (Graph may also send Users/{id}/Messages/{emailId}).
+    """
+    if notification.get("changeType") != "created":
+        return None
+    parts = (notification.get("resource") or "").split("/")
+    if len(parts) < 4 or parts[0].lower() != "users" or parts[-2].lower() != "messages":
+        return None
+    return {"mailbox": parts[1], "email_id": parts[-1]}
+
+
+class GraphNotificationQueue:
+    """Mongo-backed queue of Graph message notifications."""
+
+    def __init__(self, db):
+        self.queue = db.graph_notification_queue
+        self._wake = asyncio.Event()
+
+    async def ensure_indexes(self) -> None:
+        await self.queue.create_index("dedup_key", unique=True)
+        await self.queue.create_index([("status", 1), ("available_at", 1)])
+        await self.queue.create_index("lease_until")
+        # Set only on done entries; MongoDB deletes them once expire_at passes
+        await self.queue.create_index("expire_at", expireAfterSeconds=0)
+
+    async def enqueue(self, notifications: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Validate, deduplicate and persist a webhook payload's notifications."""
+        summary = {"accepted": 0, "duplicates": 0, "rejected": 0, "ignored": 0}
+        entries: Dict[str, Dict[str, Any]] = {}
+        now = _utc_now()
+        for notification in notifications:
+            if not valid_client_state(notification):
+                summary["rejected"] += 1
+                continue
+            parsed = parse_message_notification(notification)
+            if not parsed:
+                summary["ignored"] += 1
+                continue
+            dedup_key = f"{parsed['mailbox'].lower()}:{parsed['email_id']}"
+            if dedup_key in entries:
+                summary["duplicates"] += 1
+                continue
+            entries[dedup_key] = {
+                "id": str(uuid.uuid4()),
+                "dedup_key": dedup_key,
+                "mailbox": parsed["mailbox"],
+                "email_id": parsed["email_id"],
+                "subscription_id": notification.get("subscriptionId"),
+                "status": "queued",
+                "attempts": 0,
+                "available_at": now,
+                "enqueued_utc": now,
+            }
+
+        if entries:
+            try:
+                await self.queue.insert_many(list(entries.values()), ordered=False)
+                summary["accepted"] += len(entries)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                duplicates = sum(1 for err in errors if err.get("code") == DUPLICATE_KEY)
+                if duplicates < len(errors):
+                    raise
+                summary["duplicates"] += duplicates
+                summary["accepted"] += len(entries) - duplicates
+            self._wake.set()
+        return summary
+
+    async def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest available entry, or one whose lease expired."""
+        now = _utc_now()
+        lease_until = (datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS)).isoformat()
+        return await self.queue.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "processing", "lease_until": {"$lt": now}},
+            ]},
+            {"$set": {"status": "processing", "worker_id": WORKER_ID, "lease_token": str(uuid.uuid4()),
+                      "lease_until": lease_until, "updated_utc": now},
+             "$inc": {"attempts": 1}},
+            sort=[("available_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _owned(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter matching the entry only while this claim still holds its lease."""
+        return {"id": entry["id"], "lease_token": entry.get("lease_token")}
+
+    async def renew_lease(self, entry: Dict[str, Any]) -> bool:
+        """Extend the lease of a claimed entry. False if another claim took it over."""
+        lease_until = (datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS)).isoformat()
+        result = await self.queue.update_one(
+            {**self._owned(entry), "status": "processing"},
+            {"$set": {"lease_until": lease_until, "updated_utc": _utc_now()}}
+        )
+        return result.matched_count > 0
+
+    async def _heartbeat(self, entry: Dict[str, Any]) -> None:
+        while True:
+            await asyncio.sleep(LEASE_RENEW_SECONDS)
+            try:
+                if not await self.renew_lease(entry):
+                    logger.warning("Lost the lease on Graph notification %s", entry["dedup_key"])
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Could not renew lease on Graph notification %s: %s", entry["dedup_key"], str(e))
+
+    async def complete(self, entry: Dict[str, Any]) -> None:
+        now = datetime.now(timezone.utc)
+        await self.queue.update_one(
+            self._owned(entry),
+            {"$set": {
+                "status": "done", "completed_utc": now.isoformat(), "updated_utc": now.isoformat(),
+                "expire_at": now + timedelta(days=DONE_RETENTION_DAYS)
+            }}
+        )
+
+    async def fail(self, entry: Dict[str, Any], error: str) -> None:
+        """Requeue with backoff, or mark failed after MAX_ATTEMPTS."""
+        if entry.get("attempts", 0) >= MAX_ATTEMPTS:
+            fields = {"status": "failed"}
+        else:
+            delay = RETRY_BACKOFF_SECONDS * (2 ** (entry.get("attempts", 1) - 1))
+            fields = {
+                "status": "queued",
+                "available_at": (datetime.now(timezone.utc) + timedelta(seconds=delay)).isoformat(),
+            }
+        await self.queue.update_one(
+            self._owned(entry),
+            {"$set": {**fields, "last_error": error[:500], "updated_utc": _utc_now()}}
+        )
+
+    async def _worker(self, handler: Callable[[str, str], Awaitable[Any]]) -> None:
+        while True:
+            try:
+                entry = await self.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Graph notification claim failed: %s", str(e))
+                entry = None
+            if entry is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=IDLE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heartbeat = asyncio.create_task(self._heartbeat(entry))
+            try:
+                await handler(entry["email_id"], entry["mailbox"])
+                heartbeat.cancel()
+                await self.complete(entry)
+            except asyncio.CancelledError:
+                # Shutdown: the lease expires and another worker retries the entry
+                raise
+            except Exception as e:
+                heartbeat.cancel()
+                logger.error("Graph notification %s failed (attempt %d): %s", entry["dedup_key"], entry["attempts"], str(e))
+                await self.fail(entry, str(e))
+            finally:
+                heartbeat.cancel()
+
+    async def run_workers(self, handler: Callable[[str, str], Awaitable[Any]], concurrency: int = NOTIFICATION_WORKERS) -> None:
+        """Drain the queue with `concurrency` workers until cancelled."""
+        await asyncio.gather(*(self._worker(handler) for _ in range(concurrency)))
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = await self.queue.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]).to_list(None)
+        return {"by_status": {c["_id"]: c["count"] for c in counts}, "worker_id": WORKER_ID}
+
+
+class SubscriptionManager:
+    """Renews the email watcher's Graph subscription before it expires."""
+
+    def __init__(
+        self,
+        db,
+        token_provider: Callable[[], Awaitable[str]],
+        create_subscription: Callable[[str, str], Awaitable[Dict[str, Any]]],
+    ):
+        self.config = db.hub_config
+        self._get_token = token_provider
+        self._create_subscription = create_subscription
+        self._renew_now = asyncio.Event()
+
+    def request_renewal(self) -> None:
+        """Renew on the next loop iteration (e.g. after a reauthorizationRequired event)."""
+        self._renew_now.set()
+
+    async def _save(self, subscription_id: str, expiration: str) -> None:
+        await self.config.update_one(
+            {"_key": "email_watcher"},
+            {"$set": {"webhook_subscription_id": subscription_id, "webhook_expiration": expiration}}
+        )
+        await config_cache.invalidate(EMAIL_WATCHER)
+
+    async def check(self, force: bool = False) -> Dict[str, Any]:
+        """Renew the subscription if it expires within RENEW_BEFORE; recreate it if Graph dropped it."""
+        config = await self.config.find_one({"_key": "email_watcher"}, {"_id": 0}) or {}
+        subscription_id = config.get("webhook_subscription_id")
+        if not subscription_id or not config.get("enabled"):
+            return {"status": "skipped"}
+
+        expiration = config.get("webhook_expiration")
+        if not force and expiration:
+            try:
+                expires = datetime.fromisoformat(expiration.replace("Z", "+00:00"))
+                if expires - datetime.now(timezone.utc) > RENEW_BEFORE:
+                    return {"status": "valid", "expiration": expiration}
+            except ValueError:
+                pass
+
+        new_expiration = (datetime.now(timezone.utc) + SUBSCRIPTION_LIFETIME).strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+        token = await self._get_token()
+        async with resilient_client(timeout=30.0) as c:
+            resp = await c.patch(
+                f"https://graph.microsoft.com/v1.0/subscriptions/{subscription_id}",
+                headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+                json={"expirationDateTime": new_expiration}
+            )
+        if resp.status_code == 200:
+            expiration = resp.json().get("expirationDateTime", new_expiration)
+            await self._save(subscription_id, expiration)
+            logger.info("Renewed Graph subscription %s until %s", subscription_id, expiration)
+            return {"status": "renewed", "subscription_id": subscription_id, "expiration": expiration}
+
+        if resp.status_code == 404 and config.get("webhook_url") and config.get("mailbox_address"):
+            result = await self._create_subscription(config["mailbox_address"], config["webhook_url"])
+            if result.get("status") == "ok":
+                await self._save(result["subscription_id"], result.get("expiration"))
+                logger.info("Recreated Graph subscription %s (previous one was removed)", result["subscription_id"])
+                return {**result, "status": "recreated"}
+            raise Exception(f"Failed to recreate Graph subscription: {result.get('message')}")
+
+        raise Exception(f"Failed to renew Graph subscription (HTTP {resp.status_code}): {resp.text[:200]}")
+
+    async def run(self, interval_seconds: int = RENEWAL_CHECK_SECONDS) -> None:
+        """Background task: check the subscription periodically or when a renewal is requested."""
+        while True:
+            force = self._renew_now.is_set()
+            self._renew_now.clear()
+            try:
+                await self.check(force=force)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Graph subscription renewal failed: %s", str(e))
+            try:
+                await asyncio.wait_for(self._renew_now.wait(), timeout=interval_seconds)
+            except asyncio.TimeoutError:
+                pass
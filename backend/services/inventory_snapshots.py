@@ -0,0 +1,250 @@
+"""
+GPI Document Hub - Inventory Snapshots
+
+Snapshot semantics for imported inventory positions, so daily files replace
+positions instead of piling up new rows.
+
+Key features:
+1. sales_inventory_snapshots keeps one document per (customer_id, item_no,
+   warehouse_id, snapshot_date), written with unordered bulk upserts;
+   re-importing a day's file updates that day in place
+2. Delta detection: rows whose quantities did not change are matched but not
+   modified, and each write reports inserted / changed / unchanged counts
+3. sales_inventory_positions is the current position per (customer_id,
+   item_no, warehouse_id): the latest snapshot. A file with an older
+   snapshot_date never overwrites a newer position
+4. Retention: daily snapshots are kept for INVENTORY_SNAPSHOT_RETENTION_DAYS;
+   older ones are compacted to the last snapshot of each month
+5. Positions imported before snapshots existed (many rows per key) are
+   copied into the history and collapsed to the latest one on startup
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_SNAPSHOT_RETENTION_DAYS = int(os.environ.get("INVENTORY_SNAPSHOT_RETENTION_DAYS", "90"))
+DUPLICATE_KEY = 11000
+DELETE_BATCH_SIZE = 1000
+
+POSITION_KEY = ("customer_id", "item_no", "warehouse_id")
+SNAPSHOT_KEY = POSITION_KEY + ("snapshot_date",)
+QUANTITY_FIELDS = ("qty_on_hand", "qty_allocated", "qty_available", "qty_on_water", "qty_on_order")
+# Current positions (unique per key) are the documents that have an item_no
+IMPORTED_POSITION = {"item_no": {"$type": "string"}}
+
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d.%m.%Y", "%Y/%m/%d", "%Y%m%d")
+
+
+def normalize_snapshot_date(value: Any) -> Any:
+    """ISO date (YYYY-MM-DD) for the date formats files use, so snapshot dates sort and compare."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    text = str(value).strip()
+    # Excel and ISO timestamps: keep the date part
+    candidate = text[:10] if len(text) > 10 and text[4:5] == "-" else text
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(candidate, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return value
+
+
+class InventorySnapshotStore:
+    """Writes inventory position chunks as snapshots and keeps current positions up to date."""
+
+    def __init__(self, db=None):
+        self.db = db
+
+    def set_db(self, db) -> None:
+        self.db = db
+
+    async def ensure_indexes(self) -> None:
+        """Collapse legacy duplicate positions, then create the snapshot and current-position keys."""
+        snapshots = self.db.sales_inventory_snapshots
+        await snapshots.create_index([(field, 1) for field in SNAPSHOT_KEY], unique=True)
+        await snapshots.create_index("snapshot_date")
+        migrated = await self.migrate_legacy_positions()
+        if migrated:
+            logger.info("Moved %d legacy inventory positions into snapshots", migrated)
+        try:
+            await self.db.sales_inventory_positions.create_index(
+                [(field, 1) for field in POSITION_KEY],
+                unique=True, partialFilterExpression=IMPORTED_POSITION,
+                name="inventory_position_current_unique"
+            )
+        except Exception as e:
+            logger.warning("Could not create unique current inventory position index: %s", str(e))
+
+    async def migrate_legacy_positions(self) -> int:
+        """
+        Copy positions imported before snapshots existed into the history.
+
+        Those rows were inserted once per import, so a key can have many of
+        them; only the latest stays as the current position.
+        """
+        positions = self.db.sales_inventory_positions
+        cursor = positions.find(
+            {**IMPORTED_POSITION, "updated_utc": {"$exists": False}}
+        ).sort([("snapshot_date", 1), ("created_utc", 1)])
+
+        latest: Dict[tuple, Any] = {}
+        superseded: List[Any] = []
+        operations: List[UpdateOne] = []
+        migrated = 0
+        async for doc in cursor:
+            doc["snapshot_date"] = normalize_snapshot_date(doc.get("snapshot_date"))
+            key = tuple(doc.get(field) for field in POSITION_KEY)
+            if key in latest:
+                superseded.append(latest[key]["_id"])
+            latest[key] = doc
+            operations.append(self._snapshot_upsert(doc))
+            migrated += 1
+            if len(operations) >= DELETE_BATCH_SIZE:
+                await self._bulk(self.db.sales_inventory_snapshots, operations)
+                operations = []
+        if operations:
+            await self._bulk(self.db.sales_inventory_snapshots, operations)
+
+        for start in range(0, len(superseded), DELETE_BATCH_SIZE):
+            await positions.delete_many({"_id": {"$in": superseded[start:start + DELETE_BATCH_SIZE]}})
+        for doc in latest.values():
+            await positions.update_one({"_id": doc["_id"]}, {"$set": {
+                "snapshot_date": doc["snapshot_date"],
+                "updated_utc": doc.get("created_utc") or datetime.now(timezone.utc).isoformat()
+            }})
+        return migrated
+
+    def _snapshot_upsert(self, position: Dict[str, Any]) -> UpdateOne:
+        # Only values in $set: an unchanged re-import matches without modifying
+        return UpdateOne(
+            {field: position.get(field) for field in SNAPSHOT_KEY},
+            {
+                "$set": {
+                    "customer_sku": position.get("customer_sku"),
+                    **{field: position.get(field, 0.0) for field in QUANTITY_FIELDS}
+                },
+                "$setOnInsert": {
+                    "created_utc": position.get("created_utc"),
+                    "ingestion_id": position.get("ingestion_id")
+                }
+            },
+            upsert=True
+        )
+
+    def _current_upsert(self, position: Dict[str, Any], now: str) -> UpdateOne:
+        # Matches only if the stored position is not newer; otherwise the upsert
+        # collides with the unique key and is counted as stale
+        return UpdateOne(
+            {
+                **{field: position.get(field) for field in POSITION_KEY},
+                "snapshot_date": {"$lte": position["snapshot_date"]}
+            },
+            {
+                "$set": {
+                    "snapshot_date": position["snapshot_date"],
+                    "customer_sku": position.get("customer_sku"),
+                    **{field: position.get(field, 0.0) for field in QUANTITY_FIELDS},
+                    "ingestion_id": position.get("ingestion_id"),
+                    "updated_utc": now
+                },
+                "$setOnInsert": {
+                    "inventory_id": position["inventory_id"],
+                    "created_utc": position.get("created_utc") or now
+                }
+            },
+            upsert=True
+        )
+
+    async def _bulk(self, collection, operations: List[UpdateOne]) -> Dict[str, int]:
+        """Unordered bulk_write; duplicate-key errors are counted as stale instead of raised."""
+        try:
+            result = await collection.bulk_write(operations, ordered=False)
+            return {
+                "upserted": result.upserted_count,
+                "matched": result.matched_count,
+                "modified": result.modified_count,
+                "stale": 0
+            }
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY for err in errors):
+                raise
+            return {
+                "upserted": e.details.get("nUpserted", 0),
+                "matched": e.details.get("nMatched", 0),
+                "modified": e.details.get("nModified", 0),
+                "stale": len(errors)
+            }
+
+    async def write(self, positions: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Upsert a chunk of positions into the history and the current positions.
+
+        Returns counts: snapshots inserted / changed / unchanged, current
+        positions inserted / updated, and rows older than the current position.
+        """
+        if not positions:
+            return {}
+        now = datetime.now(timezone.utc).isoformat()
+        for position in positions:
+            position["snapshot_date"] = normalize_snapshot_date(position["snapshot_date"])
+
+        snapshots = await self._bulk(
+            self.db.sales_inventory_snapshots, [self._snapshot_upsert(p) for p in positions]
+        )
+        current = await self._bulk(
+            self.db.sales_inventory_positions, [self._current_upsert(p, now) for p in positions]
+        )
+        return {
+            "snapshots_inserted": snapshots["upserted"],
+            "snapshots_changed": snapshots["modified"],
+            "snapshots_unchanged": snapshots["matched"] - snapshots["modified"],
+            "positions_inserted": current["upserted"],
+            "positions_updated": current["modified"],
+            "positions_stale": current["stale"]
+        }
+
+    async def compact(
+        self,
+        retention_days: int = INVENTORY_SNAPSHOT_RETENTION_DAYS,
+        today: Optional[datetime] = None
+    ) -> int:
+        """Keep only the last snapshot of each month for snapshots past the retention window."""
+        today = today or datetime.now(timezone.utc)
+        cutoff = (today - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+        snapshots = self.db.sales_inventory_snapshots
+        pipeline = [
+            {"$match": {"snapshot_date": {"$lt": cutoff}}},
+            {"$sort": {"snapshot_date": -1}},
+            {"$group": {
+                "_id": {
+                    **{field: f"${field}" for field in POSITION_KEY},
+                    "month": {"$substrBytes": ["$snapshot_date", 0, 7]}
+                },
+                "ids": {"$push": "$_id"}
+            }},
+            {"$project": {"drop": {"$slice": ["$ids", 1, {"$size": "$ids"}]}}},
+            {"$match": {"drop.0": {"$exists": True}}}
+        ]
+        superseded: List[Any] = []
+        async for group in snapshots.aggregate(pipeline, allowDiskUse=True):
+            superseded.extend(group["drop"])
+
+        deleted = 0
+        for start in range(0, len(superseded), DELETE_BATCH_SIZE):
+            result = await snapshots.delete_many({"_id": {"$in": superseded[start:start + DELETE_BATCH_SIZE]}})
+            deleted += result.deleted_count
+        if deleted:
+            logger.info("Compacted %d inventory snapshots older than %s", deleted, cutoff)
+        return deleted
+
+
+inventory_snapshot_store = InventorySnapshotStore()
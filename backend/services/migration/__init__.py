@@ -7,11 +7,15 @@ This module provides tools for migrating documents from legacy systems
 Components:
 - LegacyDocumentSource: Abstract interface for legacy data sources
 - JsonFileSource: JSON file-based implementation for testing
+- StreamingJsonFileSource / NdjsonFileSource: constant-memory sources for large exports
 - MigrationJob: Core migration logic with dry run support
 - WorkflowInitializer: Determines initial workflow states for migrated docs
 """
 
-from .sources import LegacyDocumentSource, JsonFileSource, InMemorySource
+from .sources import (
+    LegacyDocumentSource, JsonFileSource, InMemorySource,
+    StreamingJsonFileSource, NdjsonFileSource, open_file_source
+)
 from .job import MigrationJob, MigrationResult
 from .workflow_initializer import WorkflowInitializer
 
@@ -19,6 +23,9 @@ __all__ = [
     'LegacyDocumentSource',
     'JsonFileSource',
     'InMemorySource',
+    'StreamingJsonFileSource',
+    'NdjsonFileSource',
+    'open_file_source',
     'MigrationJob',
     'MigrationResult',
     'WorkflowInitializer',
@@ -10,15 +10,29 @@ The migration job:
 3. Maps legacy fields to the GPI Hub document model
 4. Initializes workflow states based on legacy status
 5. Optionally writes to the database (or runs in dry-run mode)
+
+Reading, transforming and writing are pipelined: batches are read and
+transformed in a worker pool while earlier batches are written with unordered
+bulk upserts keyed on legacy_id, and progress is checkpointed by source offset
+so an interrupted run can resume where it stopped. A batch with failed writes
+holds the checkpoint below it, so a resume retries it.
 """
 
+import asyncio
+import collections
+import itertools
 import logging
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Iterator, Optional, List, Tuple
 from enum import Enum
 
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
 from ..workflow_engine import (
     DocType, SourceSystem, CaptureChannel, DocumentClassifier,
     WorkflowStatus, ZETADOCS_SET_MAPPING, SQUARE9_WORKFLOW_MAPPING
@@ -28,6 +42,9 @@ from .workflow_initializer import WorkflowInitializer
 
 logger = logging.getLogger(__name__)
 
+# MongoDB duplicate key error code
+DUPLICATE_KEY_ERROR = 11000
+
 
 class MigrationMode(str, Enum):
     """Migration execution modes."""
@@ -108,6 +125,11 @@ class MigrationResult:
     # Sample of migrated documents (for dry-run review)
     sample_documents: List[Dict[str, Any]] = field(default_factory=list)
     
+    # Throughput and checkpoint tracking
+    docs_per_second: float = 0.0
+    resumed_from_offset: int = 0
+    checkpoint_offset: int = 0
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
         return {
@@ -116,6 +138,9 @@ class MigrationResult:
             "started_at": self.started_at,
             "completed_at": self.completed_at,
             "duration_seconds": self.duration_seconds,
+            "docs_per_second": self.docs_per_second,
+            "resumed_from_offset": self.resumed_from_offset,
+            "checkpoint_offset": self.checkpoint_offset,
             "stats": self.stats.to_dict(),
             "sample_documents": self.sample_documents[:20],  # Limit sample size
         }
@@ -144,7 +169,11 @@ class MigrationJob:
         source: LegacyDocumentSource,
         db_collection=None,
         skip_duplicates: bool = True,
-        batch_size: int = 100
+        batch_size: int = 100,
+        transform_workers: int = 4,
+        write_concurrency: int = 4,
+        checkpoint_collection=None,
+        job_id: Optional[str] = None
     ):
         """
         Initialize the migration job.
@@ -152,13 +181,23 @@ class MigrationJob:
         Args:
             source: The legacy document source to read from
             db_collection: MongoDB collection for hub_documents (required for REAL mode)
-            skip_duplicates: If True, skip documents with matching legacy_id
+            skip_duplicates: If True, leave documents with a matching legacy_id untouched;
+                if False, refresh them with the newly transformed fields
             batch_size: Number of documents to process in each batch
+            transform_workers: Maximum number of batches transformed in parallel, off
+                the event loop
+            write_concurrency: Maximum number of batch writes in flight
+            checkpoint_collection: Optional MongoDB collection for resume checkpoints
+            job_id: Checkpoint key; required to save or resume checkpoints
         """
         self.source = source
         self.db_collection = db_collection
         self.skip_duplicates = skip_duplicates
         self.batch_size = batch_size
+        self.transform_workers = max(1, transform_workers)
+        self.write_concurrency = max(1, write_concurrency)
+        self.checkpoint_collection = checkpoint_collection
+        self.job_id = job_id
         
         self._migration_timestamp = None
     
@@ -167,7 +206,9 @@ class MigrationJob:
         mode: MigrationMode = MigrationMode.DRY_RUN,
         source_filter: Optional[str] = None,
         doc_type_filter: Optional[str] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        resume: bool = False,
+        start_offset: int = 0
     ) -> MigrationResult:
         """
         Execute the migration job.
@@ -177,11 +218,15 @@ class MigrationJob:
             source_filter: Filter by legacy system ("SQUARE9", "ZETADOCS")
             doc_type_filter: Filter by document type
             limit: Maximum number of documents to process
+            resume: Continue from the saved checkpoint for job_id
+            start_offset: Number of (filtered) source documents to skip;
+                overridden by the saved checkpoint when resume is True
             
         Returns:
             MigrationResult with statistics and sample documents
         """
         started_at = datetime.now(timezone.utc)
+        started_clock = time.monotonic()
         self._migration_timestamp = started_at.isoformat()
         
         stats = MigrationStats()
@@ -195,63 +240,115 @@ class MigrationJob:
         if mode == MigrationMode.REAL and self.db_collection is None:
             raise ValueError("db_collection is required for REAL mode migration")
         
-        # Get existing legacy IDs if skip_duplicates is enabled
-        existing_ids = set()
-        if self.skip_duplicates and mode == MigrationMode.REAL:
-            existing_ids = await self._get_existing_legacy_ids()
-            logger.info(f"Found {len(existing_ids)} existing migrated documents")
+        if resume:
+            start_offset = await self._load_checkpoint()
+        start_offset = max(0, start_offset)
+        if start_offset:
+            logger.info(f"Resuming migration from source offset {start_offset}")
+        
+        if mode == MigrationMode.REAL:
+            await self._ensure_legacy_id_index()
         
-        # Process documents
-        batch = []
-        for legacy_doc in self.source.iter_documents(source_filter, doc_type_filter, limit):
+        documents = itertools.islice(
+            self.source.iter_documents(source_filter, doc_type_filter, limit),
+            start_offset,
+            None
+        )
+        
+        # Completed batches by starting offset; the checkpoint only advances
+        # over a contiguous run of completed batches
+        completed: Dict[int, int] = {}
+        checkpoint = start_offset
+        in_flight = set()
+        write_slots = asyncio.Semaphore(self.write_concurrency)
+        loop = asyncio.get_running_loop()
+        
+        async def finish_batch(batch_offset: int, gpi_docs: List[Dict[str, Any]], size: int):
+            nonlocal checkpoint
             try:
-                # Skip duplicates
-                if legacy_doc.metadata.legacy_id in existing_ids:
-                    stats.record_skip(
-                        "Duplicate legacy_id",
-                        legacy_doc.metadata.legacy_id
+                if mode == MigrationMode.REAL:
+                    written = await self._write_batch(gpi_docs, stats)
+                else:
+                    written = True
+                    for gpi_doc in gpi_docs:
+                        self._record_success(stats, gpi_doc)
+            finally:
+                write_slots.release()
+            
+            if not written:
+                # Keep the checkpoint below this batch so a resume retries it
+                logger.warning(f"Batch at source offset {batch_offset} was not fully written")
+                return
+            completed[batch_offset] = size
+            advanced = False
+            while checkpoint in completed:
+                checkpoint += completed.pop(checkpoint)
+                advanced = True
+            if advanced and mode == MigrationMode.REAL:
+                await self._save_checkpoint(checkpoint)
+        
+        offset = start_offset
+        # Transforms for up to transform_workers read-ahead batches run in
+        # the pool at once; results are consumed in source order
+        transforms = collections.deque()
+        exhausted = False
+        # One extra thread so source reads are not queued behind transforms
+        with ThreadPoolExecutor(max_workers=self.transform_workers + 1) as executor:
+            while True:
+                while not exhausted and len(transforms) < self.transform_workers:
+                    # Source reads (file I/O, JSON decoding) stay off the event loop too
+                    legacy_batch = await loop.run_in_executor(
+                        executor, self._read_batch, documents
                     )
-                    continue
+                    if not legacy_batch:
+                        exhausted = True
+                        break
+                    transforms.append((
+                        offset,
+                        legacy_batch,
+                        loop.run_in_executor(executor, self._transform_batch, legacy_batch)
+                    ))
+                    offset += len(legacy_batch)
+                if not transforms:
+                    break
+                batch_offset, legacy_batch, transform = transforms.popleft()
                 
-                # Transform to GPI Hub document
-                gpi_doc = self._transform_document(legacy_doc)
+                # Backpressure: never run more than write_concurrency batches ahead
+                await write_slots.acquire()
                 
-                if gpi_doc is None:
-                    stats.record_skip(
-                        "Transformation failed",
-                        legacy_doc.metadata.legacy_id
-                    )
-                    continue
+                try:
+                    transformed = await transform
+                except BaseException:
+                    write_slots.release()
+                    raise
                 
-                # Collect sample for dry-run review
-                if len(sample_documents) < 20:
-                    sample_documents.append(gpi_doc)
+                gpi_docs = []
+                for legacy_doc, gpi_doc, error in transformed:
+                    if error is not None:
+                        stats.record_error(error, legacy_doc.metadata.legacy_id)
+                    elif gpi_doc is None:
+                        stats.record_skip(
+                            "Transformation failed",
+                            legacy_doc.metadata.legacy_id
+                        )
+                    else:
+                        # Collect sample for dry-run review
+                        if len(sample_documents) < 20:
+                            sample_documents.append(gpi_doc)
+                        gpi_docs.append(gpi_doc)
                 
-                # Record success stats
-                stats.record_success(
-                    gpi_doc.get("doc_type", "OTHER"),
-                    gpi_doc.get("source_system", "UNKNOWN"),
-                    gpi_doc.get("workflow_status", "unknown")
-                )
-                
-                # Batch for database insertion
-                if mode == MigrationMode.REAL:
-                    batch.append(gpi_doc)
-                    
-                    if len(batch) >= self.batch_size:
-                        await self._write_batch(batch)
-                        batch = []
-            
-            except Exception as e:
-                stats.record_error(str(e), legacy_doc.metadata.legacy_id)
+                task = asyncio.ensure_future(finish_batch(batch_offset, gpi_docs, len(legacy_batch)))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
         
-        # Write remaining batch
-        if mode == MigrationMode.REAL and batch:
-            await self._write_batch(batch)
+            if in_flight:
+                await asyncio.gather(*in_flight)
         
         # Build result
         completed_at = datetime.now(timezone.utc)
         duration = (completed_at - started_at).total_seconds()
+        elapsed = time.monotonic() - started_clock
+        docs_per_second = (stats.total_processed / elapsed) if elapsed > 0 else 0.0
         
         result = MigrationResult(
             mode=mode.value,
@@ -260,17 +357,41 @@ class MigrationJob:
             completed_at=completed_at.isoformat(),
             duration_seconds=duration,
             stats=stats,
-            sample_documents=sample_documents
+            sample_documents=sample_documents,
+            docs_per_second=round(docs_per_second, 2),
+            resumed_from_offset=start_offset,
+            checkpoint_offset=checkpoint
         )
         
         logger.info(
             f"Migration completed: {stats.total_success} success, "
             f"{stats.total_skipped} skipped, {stats.total_errors} errors "
-            f"in {duration:.2f}s"
+            f"in {duration:.2f}s ({docs_per_second:.1f} docs/s)"
         )
         
         return result
     
+    def _transform_batch(
+        self,
+        legacy_batch: List[LegacyDocument]
+    ) -> List[Tuple[LegacyDocument, Optional[Dict[str, Any]], Optional[str]]]:
+        """Transform a batch of documents, capturing per-document errors."""
+        transformed = []
+        for legacy_doc in legacy_batch:
+            try:
+                transformed.append((legacy_doc, self._transform_document(legacy_doc), None))
+            except Exception as e:
+                transformed.append((legacy_doc, None, str(e)))
+        return transformed
+    
+    @staticmethod
+    def _record_success(stats: MigrationStats, gpi_doc: Dict[str, Any]) -> None:
+        stats.record_success(
+            gpi_doc.get("doc_type", "OTHER"),
+            gpi_doc.get("source_system", "UNKNOWN"),
+            gpi_doc.get("workflow_status", "unknown")
+        )
+    
     def _transform_document(self, legacy_doc: LegacyDocument) -> Optional[Dict[str, Any]]:
         """
         Transform a legacy document to GPI Hub document format.
@@ -516,34 +637,120 @@ class MigrationJob:
         if metadata.extra:
             gpi_doc["legacy_extra"] = metadata.extra
     
-    async def _get_existing_legacy_ids(self) -> set:
-        """Get set of legacy_ids already in the database."""
-        if self.db_collection is None:
-            return set()
-        
-        cursor = self.db_collection.find(
-            {"is_migrated": True},
-            {"legacy_id": 1, "_id": 0}
+    async def _ensure_legacy_id_index(self) -> None:
+        """Ensure the unique legacy_id index that the upserts are keyed on exists."""
+        try:
+            await self.db_collection.create_index(
+                "legacy_id",
+                unique=True,
+                name="legacy_id_migrated_unique",
+                partialFilterExpression={"is_migrated": True}
+            )
+        except Exception as e:
+            # Existing duplicate legacy_ids prevent the index; upserts still work
+            logger.warning(f"Could not ensure unique legacy_id index: {e}")
+    
+    def _build_upsert(self, gpi_doc: Dict[str, Any]) -> UpdateOne:
+        """Build the upsert for one document, keyed on its legacy_id."""
+        key = {"legacy_id": gpi_doc["legacy_id"], "is_migrated": True}
+        if self.skip_duplicates:
+            return UpdateOne(key, {"$setOnInsert": gpi_doc}, upsert=True)
+        
+        # Refresh existing documents but keep their identity and creation time
+        on_insert_fields = ("id", "created_utc")
+        return UpdateOne(
+            key,
+            {
+                "$set": {k: v for k, v in gpi_doc.items() if k not in on_insert_fields},
+                "$setOnInsert": {k: gpi_doc[k] for k in on_insert_fields},
+            },
+            upsert=True
         )
+    
+    def _read_batch(self, documents: Iterator[LegacyDocument]) -> List[LegacyDocument]:
+        """Read the next batch from the source iterator (runs in the transform pool)."""
+        return list(itertools.islice(documents, self.batch_size))
+    
+    async def _write_batch(self, batch: List[Dict[str, Any]], stats: MigrationStats) -> bool:
+        """
+        Write a batch of documents with unordered bulk upserts and record results.
         
-        ids = set()
-        async for doc in cursor:
-            if doc.get("legacy_id"):
-                ids.add(doc["legacy_id"])
+        New documents count as successes. Documents whose legacy_id already
+        exists are skipped (skip_duplicates) or refreshed in place.
         
-        return ids
-    
-    async def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
-        """Write a batch of documents to the database."""
+        Returns False if any document failed to write for another reason,
+        so the caller does not checkpoint past it.
+        """
         if not batch or self.db_collection is None:
-            return
+            return True
         
+        upserted = set()
+        failed: Dict[int, Dict[str, Any]] = {}
         try:
-            result = await self.db_collection.insert_many(batch)
-            logger.debug(f"Inserted batch of {len(result.inserted_ids)} documents")
+            result = await self.db_collection.bulk_write(
+                [self._build_upsert(doc) for doc in batch],
+                ordered=False
+            )
+            upserted = set(result.upserted_ids.keys())
+        except BulkWriteError as e:
+            details = e.details or {}
+            upserted = {u["index"] for u in details.get("upserted", [])}
+            failed = {err["index"]: err for err in details.get("writeErrors", [])}
         except Exception as e:
             logger.error(f"Error writing batch: {e}")
-            raise
+            for doc in batch:
+                stats.record_error(f"Batch write failed: {e}", doc.get("legacy_id"))
+            return False
+        
+        written = True
+        for index, doc in enumerate(batch):
+            if index in upserted:
+                self._record_success(stats, doc)
+            elif index in failed:
+                err = failed[index]
+                if err.get("code") == DUPLICATE_KEY_ERROR:
+                    # Raced with another upsert of the same legacy_id
+                    stats.record_skip("Duplicate legacy_id", doc.get("legacy_id"))
+                else:
+                    stats.record_error(err.get("errmsg", "Write failed"), doc.get("legacy_id"))
+                    written = False
+            elif self.skip_duplicates:
+                stats.record_skip("Duplicate legacy_id", doc.get("legacy_id"))
+            else:
+                self._record_success(stats, doc)
+        
+        logger.debug(f"Upserted {len(upserted)} of {len(batch)} documents")
+        return written
+    
+    async def _load_checkpoint(self) -> int:
+        """Return the saved source offset for this job (0 if none)."""
+        if self.checkpoint_collection is None or not self.job_id:
+            return 0
+        checkpoint = await self.checkpoint_collection.find_one(
+            {"job_id": self.job_id}, {"_id": 0, "offset": 1}
+        )
+        return (checkpoint or {}).get("offset", 0)
+    
+    async def _save_checkpoint(self, offset: int) -> None:
+        """Persist the offset below which every source document has been written."""
+        if self.checkpoint_collection is None or not self.job_id:
+            return
+        try:
+            # $max: concurrent batch completions can save out of order, and
+            # an older offset must never overwrite a newer one
+            await self.checkpoint_collection.update_one(
+                {"job_id": self.job_id},
+                {
+                    "$max": {"offset": offset},
+                    "$set": {
+                        "source_name": self.source.get_source_name(),
+                        "updated_utc": datetime.now(timezone.utc).isoformat()
+                    }
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Could not save migration checkpoint at {offset}: {e}")
 
 
 class MigrationJobBuilder:
@@ -564,6 +771,10 @@ class MigrationJobBuilder:
         self._db_collection = None
         self._skip_duplicates = True
         self._batch_size = 100
+        self._transform_workers = 4
+        self._write_concurrency = 4
+        self._checkpoint_collection = None
+        self._job_id = None
     
     def with_source(self, source: LegacyDocumentSource) -> 'MigrationJobBuilder':
         """Set the document source."""
@@ -591,6 +802,18 @@ class MigrationJobBuilder:
         self._batch_size = size
         return self
     
+    def concurrency(self, transform_workers: int, write_concurrency: int) -> 'MigrationJobBuilder':
+        """Set transform worker threads and concurrent batch writes."""
+        self._transform_workers = transform_workers
+        self._write_concurrency = write_concurrency
+        return self
+    
+    def with_checkpoints(self, collection, job_id: str) -> 'MigrationJobBuilder':
+        """Persist resume checkpoints for job_id in the given collection."""
+        self._checkpoint_collection = collection
+        self._job_id = job_id
+        return self
+    
     def build(self) -> MigrationJob:
         """Build the migration job."""
         if self._source is None:
@@ -600,5 +823,9 @@ class MigrationJobBuilder:
             source=self._source,
             db_collection=self._db_collection,
             skip_duplicates=self._skip_duplicates,
-            batch_size=self._batch_size
+            batch_size=self._batch_size,
+            transform_workers=self._transform_workers,
+            write_concurrency=self._write_concurrency,
+            checkpoint_collection=self._checkpoint_collection,
+            job_id=self._job_id
         )
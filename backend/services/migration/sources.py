@@ -13,7 +13,7 @@ import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Dict, Any, Iterator, List
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 from enum import Enum
 
 logger = logging.getLogger(__name__)
@@ -137,6 +137,81 @@ class LegacyDocument:
         return result
 
 
+def legacy_document_from_dict(doc_data: Dict[str, Any]) -> LegacyDocument:
+    """Build a LegacyDocument from one exported document record."""
+    metadata_dict = doc_data.get("metadata", {})
+    
+    # Handle quality_tags as list
+    quality_tags = metadata_dict.get("quality_tags")
+    if quality_tags and isinstance(quality_tags, str):
+        quality_tags = [t.strip() for t in quality_tags.split(",")]
+    
+    metadata = LegacyDocumentMetadata(
+        legacy_system=metadata_dict.get("legacy_system", "UNKNOWN"),
+        legacy_id=metadata_dict.get("legacy_id", ""),
+        legacy_workflow_name=metadata_dict.get("legacy_workflow_name"),
+        legacy_zetadocs_set_code=metadata_dict.get("legacy_zetadocs_set_code"),
+        legacy_bc_doc_no=metadata_dict.get("legacy_bc_doc_no"),
+        vendor_name=metadata_dict.get("vendor_name"),
+        vendor_no=metadata_dict.get("vendor_no"),
+        customer_name=metadata_dict.get("customer_name"),
+        customer_no=metadata_dict.get("customer_no"),
+        invoice_number=metadata_dict.get("invoice_number"),
+        document_number=metadata_dict.get("document_number"),
+        po_number=metadata_dict.get("po_number"),
+        amount=metadata_dict.get("amount"),
+        currency=metadata_dict.get("currency"),
+        invoice_date=metadata_dict.get("invoice_date"),
+        due_date=metadata_dict.get("due_date"),
+        posting_date=metadata_dict.get("posting_date"),
+        quality_tags=quality_tags,
+        quality_category=metadata_dict.get("quality_category"),
+        is_paid=metadata_dict.get("is_paid", False),
+        is_posted=metadata_dict.get("is_posted", False),
+        is_exported=metadata_dict.get("is_exported", False),
+        is_approved=metadata_dict.get("is_approved", False),
+        is_canceled=metadata_dict.get("is_canceled", False),
+        is_voided=metadata_dict.get("is_voided", False),
+        is_closed=metadata_dict.get("is_closed", False),
+        is_reviewed=metadata_dict.get("is_reviewed", False),
+        created_date=metadata_dict.get("created_date"),
+        modified_date=metadata_dict.get("modified_date"),
+        created_by=metadata_dict.get("created_by"),
+        extra=metadata_dict.get("extra", {}),
+    )
+    
+    return LegacyDocument(
+        metadata=metadata,
+        binary_reference=doc_data.get("binary_reference")
+    )
+
+
+# doc_type hints shared by every source: Zetadocs set codes and Square9 workflow names
+ZETADOCS_DOC_TYPE_HINTS = {
+    "ZD00015": "AP_INVOICE",
+    "ZD00007": "SALES_INVOICE",
+    "ZD00002": "PURCHASE_ORDER",
+    "ZD00009": "SALES_CREDIT_MEMO",
+}
+SQUARE9_DOC_TYPE_HINTS = {
+    "AP_Invoice": "AP_INVOICE",
+    "AP Invoice": "AP_INVOICE",
+    "Sales Invoice": "SALES_INVOICE",
+    "Purchase Order": "PURCHASE_ORDER",
+    "Statement": "STATEMENT",
+    "Quality": "QUALITY_DOC",
+}
+
+
+def file_doc_type_hint(metadata: LegacyDocumentMetadata) -> Optional[str]:
+    """Get doc_type hint from metadata (Zetadocs set code first, then Square9 workflow)."""
+    if metadata.legacy_zetadocs_set_code:
+        return ZETADOCS_DOC_TYPE_HINTS.get(metadata.legacy_zetadocs_set_code)
+    if metadata.legacy_workflow_name:
+        return SQUARE9_DOC_TYPE_HINTS.get(metadata.legacy_workflow_name)
+    return None
+
+
 class LegacyDocumentSource(ABC):
     """
     Abstract base class for legacy document sources.
@@ -244,28 +319,7 @@ class InMemorySource(LegacyDocumentSource):
     
     def _get_doc_type_hint(self, metadata: LegacyDocumentMetadata) -> Optional[str]:
         """Get doc_type hint from metadata."""
-        # Check Zetadocs set code
-        zetadocs_mapping = {
-            "ZD00015": "AP_INVOICE",
-            "ZD00007": "SALES_INVOICE",
-            "ZD00002": "PURCHASE_ORDER",
-            "ZD00009": "SALES_CREDIT_MEMO",
-        }
-        if metadata.legacy_zetadocs_set_code:
-            return zetadocs_mapping.get(metadata.legacy_zetadocs_set_code)
-        
-        # Check Square9 workflow
-        square9_mapping = {
-            "AP_Invoice": "AP_INVOICE",
-            "AP Invoice": "AP_INVOICE",
-            "Sales Invoice": "SALES_INVOICE",
-            "Purchase Order": "PURCHASE_ORDER",
-            "Statement": "STATEMENT",
-        }
-        if metadata.legacy_workflow_name:
-            return square9_mapping.get(metadata.legacy_workflow_name)
-        
-        return None
+        return file_doc_type_hint(metadata)
 
 
 class JsonFileSource(LegacyDocumentSource):
@@ -308,54 +362,10 @@ class JsonFileSource(LegacyDocumentSource):
         with open(self._file_path, 'r', encoding='utf-8') as f:
             self._data = json.load(f)
         
-        self._documents = []
-        for doc_data in self._data.get("documents", []):
-            metadata_dict = doc_data.get("metadata", {})
-            
-            # Handle quality_tags as list
-            quality_tags = metadata_dict.get("quality_tags")
-            if quality_tags and isinstance(quality_tags, str):
-                quality_tags = [t.strip() for t in quality_tags.split(",")]
-            
-            metadata = LegacyDocumentMetadata(
-                legacy_system=metadata_dict.get("legacy_system", "UNKNOWN"),
-                legacy_id=metadata_dict.get("legacy_id", ""),
-                legacy_workflow_name=metadata_dict.get("legacy_workflow_name"),
-                legacy_zetadocs_set_code=metadata_dict.get("legacy_zetadocs_set_code"),
-                legacy_bc_doc_no=metadata_dict.get("legacy_bc_doc_no"),
-                vendor_name=metadata_dict.get("vendor_name"),
-                vendor_no=metadata_dict.get("vendor_no"),
-                customer_name=metadata_dict.get("customer_name"),
-                customer_no=metadata_dict.get("customer_no"),
-                invoice_number=metadata_dict.get("invoice_number"),
-                document_number=metadata_dict.get("document_number"),
-                po_number=metadata_dict.get("po_number"),
-                amount=metadata_dict.get("amount"),
-                currency=metadata_dict.get("currency"),
-                invoice_date=metadata_dict.get("invoice_date"),
-                due_date=metadata_dict.get("due_date"),
-                posting_date=metadata_dict.get("posting_date"),
-                quality_tags=quality_tags,
-                quality_category=metadata_dict.get("quality_category"),
-                is_paid=metadata_dict.get("is_paid", False),
-                is_posted=metadata_dict.get("is_posted", False),
-                is_exported=metadata_dict.get("is_exported", False),
-                is_approved=metadata_dict.get("is_approved", False),
-                is_canceled=metadata_dict.get("is_canceled", False),
-                is_voided=metadata_dict.get("is_voided", False),
-                is_closed=metadata_dict.get("is_closed", False),
-                is_reviewed=metadata_dict.get("is_reviewed", False),
-                created_date=metadata_dict.get("created_date"),
-                modified_date=metadata_dict.get("modified_date"),
-                created_by=metadata_dict.get("created_by"),
-                extra=metadata_dict.get("extra", {}),
-            )
-            
-            doc = LegacyDocument(
-                metadata=metadata,
-                binary_reference=doc_data.get("binary_reference")
-            )
-            self._documents.append(doc)
+        self._documents = [
+            legacy_document_from_dict(doc_data)
+            for doc_data in self._data.get("documents", [])
+        ]
         
         logger.info(f"Loaded {len(self._documents)} documents from {self._file_path}")
     
@@ -400,27 +410,268 @@ class JsonFileSource(LegacyDocumentSource):
     
     def _get_doc_type_hint(self, metadata: LegacyDocumentMetadata) -> Optional[str]:
         """Get doc_type hint from metadata using the same logic as InMemorySource."""
-        zetadocs_mapping = {
-            "ZD00015": "AP_INVOICE",
-            "ZD00007": "SALES_INVOICE", 
-            "ZD00002": "PURCHASE_ORDER",
-            "ZD00009": "SALES_CREDIT_MEMO",
-        }
-        if metadata.legacy_zetadocs_set_code:
-            return zetadocs_mapping.get(metadata.legacy_zetadocs_set_code)
+        return file_doc_type_hint(metadata)
+
+
+# Characters read from export files per chunk by the streaming sources
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Largest single document record the streaming JSON reader will buffer
+MAX_RECORD_CHARS = 64 * 1024 * 1024
+
+
+class _JsonStreamReader:
+    """
+    Incremental reader for a JSON document held in a text file.
+    
+    Only the current chunk plus any partially-read value is kept in memory,
+    so arbitrarily long arrays can be consumed one element at a time.
+    """
+    
+    _decoder = json.JSONDecoder()
+    
+    def __init__(self, fp, chunk_size: int = STREAM_CHUNK_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+    
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer. Returns False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._fp.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        self._buf += chunk
+        return True
+    
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it ('' at EOF)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+    
+    def expect(self, char: str) -> None:
+        """Consume the next non-whitespace character, which must be `char`."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed JSON export: expected '{char}', found '{found or 'EOF'}'")
+        self._pos += 1
+    
+    def read_value(self) -> Any:
+        """Decode the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if len(self._buf) - self._pos < MAX_RECORD_CHARS and self._fill():
+                    continue
+                raise
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+    
+    def iter_array(self) -> Iterator[Any]:
+        """Yield the elements of the array starting at the current position."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+class _StreamingFileSource(LegacyDocumentSource):
+    """
+    Base class for export file sources that never hold the whole export in memory.
+    
+    Subclasses yield raw document records; filtering, limits and conversion
+    to LegacyDocument happen lazily as records are read.
+    """
+    
+    def __init__(self, file_path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        self._file_path = Path(file_path)
+        self._chunk_size = chunk_size
+        self._counts: Dict[tuple, int] = {}
+    
+    def _check_exists(self) -> None:
+        if not self._file_path.exists():
+            raise FileNotFoundError(f"Migration source file not found: {self._file_path}")
+    
+    @abstractmethod
+    def _iter_records(self) -> Iterator[Dict[str, Any]]:
+        """Yield raw document records in file order."""
+        pass
+    
+    def iter_documents(
+        self,
+        source_filter: Optional[str] = None,
+        doc_type_filter: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[LegacyDocument]:
+        count = 0
+        for doc_data in self._iter_records():
+            doc = legacy_document_from_dict(doc_data)
+            
+            # Filter on the parsed value so defaults match the other sources
+            if source_filter and doc.metadata.legacy_system != source_filter:
+                continue
+            
+            # Apply doc_type filter
+            if doc_type_filter:
+                doc_type_hint = file_doc_type_hint(doc.metadata)
+                if doc_type_hint and doc_type_hint != doc_type_filter:
+                    continue
+            
+            # Apply limit
+            if limit and count >= limit:
+                break
+            
+            yield doc
+            count += 1
+    
+    def _count_all(self) -> Optional[int]:
+        """Cheap unfiltered count, or None if the format needs a full scan."""
+        return None
+    
+    def get_document_count(
+        self,
+        source_filter: Optional[str] = None,
+        doc_type_filter: Optional[str] = None
+    ) -> int:
+        key = (source_filter, doc_type_filter)
+        if key not in self._counts:
+            count = None
+            if not source_filter and not doc_type_filter:
+                count = self._count_all()
+            if count is None:
+                count = sum(1 for _ in self.iter_documents(source_filter, doc_type_filter))
+            self._counts[key] = count
+        return self._counts[key]
+
+
+class StreamingJsonFileSource(_StreamingFileSource):
+    """
+    Streaming variant of JsonFileSource for multi-GB exports.
+    
+    Reads the same file layout as JsonFileSource (or a bare top-level array
+    of documents) but parses the "documents" array incrementally, yielding
+    one LegacyDocument at a time. Header fields that precede "documents"
+    (source_name, exported_at, document_count) are available without reading
+    the array; an exported "document_count" makes unfiltered counts free.
+    """
+    
+    def __init__(self, file_path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        super().__init__(file_path, chunk_size)
+        self._header: Optional[Dict[str, Any]] = None
+    
+    def _open_documents(self, f) -> Tuple[Optional[_JsonStreamReader], Dict[str, Any]]:
+        """
+        Position a reader at the start of the documents array.
         
-        square9_mapping = {
-            "AP_Invoice": "AP_INVOICE",
-            "AP Invoice": "AP_INVOICE",
-            "Sales Invoice": "SALES_INVOICE",
-            "Purchase Order": "PURCHASE_ORDER",
-            "Statement": "STATEMENT",
-            "Quality": "QUALITY_DOC",
-        }
-        if metadata.legacy_workflow_name:
-            return square9_mapping.get(metadata.legacy_workflow_name)
+        Returns (reader, header) where header holds the top-level fields
+        that appear before "documents".
+        """
+        reader = _JsonStreamReader(f, self._chunk_size)
+        header: Dict[str, Any] = {}
         
-        return None
+        if reader.peek() == "[":
+            return reader, header
+        
+        reader.expect("{")
+        while reader.peek() != "}":
+            key = reader.read_value()
+            reader.expect(":")
+            if key == "documents":
+                return reader, header
+            header[key] = reader.read_value()
+            if reader.peek() == ",":
+                reader.expect(",")
+        return None, header
+    
+    def _read_header(self) -> Dict[str, Any]:
+        if self._header is None:
+            self._check_exists()
+            with open(self._file_path, 'r', encoding='utf-8') as f:
+                _, self._header = self._open_documents(f)
+        return self._header
+    
+    def _iter_records(self) -> Iterator[Dict[str, Any]]:
+        self._check_exists()
+        with open(self._file_path, 'r', encoding='utf-8') as f:
+            reader, header = self._open_documents(f)
+            if self._header is None:
+                self._header = header
+            if reader is None:
+                return
+            yield from reader.iter_array()
+    
+    def _count_all(self) -> Optional[int]:
+        count = self._read_header().get("document_count")
+        return count if isinstance(count, int) else None
+    
+    def get_source_name(self) -> str:
+        return self._read_header().get("source_name", self._file_path.stem)
+
+
+class NdjsonFileSource(_StreamingFileSource):
+    """
+    Newline-delimited JSON export source (one document record per line).
+    
+    Each non-blank line holds an object shaped like an entry of the
+    JsonFileSource "documents" array. Unfiltered counts only scan for
+    non-blank lines and do not parse any JSON.
+    """
+    
+    def _iter_records(self) -> Iterator[Dict[str, Any]]:
+        self._check_exists()
+        with open(self._file_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Malformed NDJSON record at {self._file_path}:{line_no}: {e}") from e
+    
+    def _count_all(self) -> Optional[int]:
+        self._check_exists()
+        with open(self._file_path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
+    
+    def get_source_name(self) -> str:
+        return self._file_path.stem
+
+
+def open_file_source(file_path: str) -> LegacyDocumentSource:
+    """
+    Open a legacy export file with a constant-memory streaming source.
+    
+    .ndjson / .jsonl files use NdjsonFileSource; anything else is parsed as
+    the JsonFileSource layout by StreamingJsonFileSource.
+    """
+    if Path(file_path).suffix.lower() in (".ndjson", ".jsonl"):
+        return NdjsonFileSource(file_path)
+    return StreamingJsonFileSource(file_path)
 
 
 def create_sample_migration_file(output_path: str) -> None:
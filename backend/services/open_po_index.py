@@ -0,0 +1,192 @@
+"""
+GPI Document Hub - Open Purchase Order Index
+
+In-memory index of Business Central open purchase orders, so PO lookups
+during validation, PO-linkage simulation and AP review do not query BC per
+document or per page view.
+
+Key features:
+1. Lookup by PO number, by vendor, and by amount (with tolerance) for PO
+   suggestions
+2. Full refresh on startup and on a slow schedule; incremental refresh in
+   between pulls only POs modified since the last refresh and drops POs
+   that are no longer open
+3. Lookups are synchronous dict/bisect reads; callers fall back to BC when
+   the index is not ready or a PO is not in it (it may exist but be closed)
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OPEN_PO_INDEX_REFRESH_SECONDS = int(os.environ.get("OPEN_PO_INDEX_REFRESH_SECONDS", "300"))
+OPEN_PO_INDEX_FULL_REFRESH_SECONDS = int(os.environ.get("OPEN_PO_INDEX_FULL_REFRESH_SECONDS", "3600"))
+# Default tolerance for amount suggestions, as a fraction of the amount
+DEFAULT_AMOUNT_TOLERANCE = 0.02
+
+
+def _po_amount(po: Dict[str, Any]) -> Optional[float]:
+    amount = po.get("totalAmountIncludingTax", po.get("totalAmountIncludingVat"))
+    try:
+        return float(amount) if amount is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenPOIndex:
+    """Open purchase orders keyed by number, vendor and amount."""
+
+    def __init__(self):
+        self._by_number: Dict[str, Dict[str, Any]] = {}
+        self._by_vendor: Dict[str, List[str]] = {}
+        # Sorted (amount, key) pairs and the bare amounts for bisect
+        self._amounts: List[Tuple[float, str]] = []
+        self._amount_values: List[float] = []
+        self._watermark: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self.last_full_refresh: Optional[str] = None
+        self.last_incremental_refresh: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.last_full_refresh is not None
+
+    def _rebuild_secondary(self) -> None:
+        by_vendor: Dict[str, List[str]] = {}
+        amounts = []
+        for key, po in self._by_number.items():
+            vendor = (po.get("vendorNumber") or "").upper()
+            if vendor:
+                by_vendor.setdefault(vendor, []).append(key)
+            amount = _po_amount(po)
+            if amount is not None:
+                amounts.append((amount, key))
+        amounts.sort()
+        self._by_vendor = by_vendor
+        self._amounts = amounts
+        self._amount_values = [a for a, _ in amounts]
+
+    def _advance_watermark(self, pos: List[Dict[str, Any]]) -> None:
+        modified = [po["lastModifiedDateTime"] for po in pos if po.get("lastModifiedDateTime")]
+        if modified:
+            latest = max(modified)
+            if not self._watermark or latest > self._watermark:
+                self._watermark = latest
+
+    def load(self, pos: List[Dict[str, Any]]) -> None:
+        """Replace the index with a full list of open POs."""
+        self._by_number = {po["number"].upper(): po for po in pos if po.get("number")}
+        self._rebuild_secondary()
+        self._watermark = None
+        self._advance_watermark(pos)
+        self.last_full_refresh = datetime.now(timezone.utc).isoformat()
+
+    def apply_changes(self, pos: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Merge POs modified since the last refresh; non-open POs are removed."""
+        added = removed = 0
+        for po in pos:
+            key = (po.get("number") or "").upper()
+            if not key:
+                continue
+            if po.get("status", "Open") == "Open":
+                added += key not in self._by_number
+                self._by_number[key] = po
+            elif self._by_number.pop(key, None) is not None:
+                removed += 1
+        self._rebuild_secondary()
+        self._advance_watermark(pos)
+        self.last_incremental_refresh = datetime.now(timezone.utc).isoformat()
+        return {"changed": len(pos), "added": added, "removed": removed}
+
+    async def refresh(self, service, full: bool = False) -> Dict[str, Any]:
+        """
+        Refresh from BC via BusinessCentralService.list_purchase_orders.
+
+        Falls back to a full refresh when the index has never been loaded or
+        there is no watermark to resume from.
+        """
+        async with self._lock:
+            try:
+                if full or not self.ready or not self._watermark:
+                    pos = await service.list_purchase_orders(open_only=True)
+                    self.load(pos)
+                    result = {"mode": "full", "open_pos": len(self._by_number)}
+                else:
+                    pos = await service.list_purchase_orders(open_only=False, modified_since=self._watermark)
+                    result = {"mode": "incremental", **self.apply_changes(pos), "open_pos": len(self._by_number)}
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error("Open PO index refresh failed: %s", str(e))
+                raise
+        logger.info("Open PO index refreshed: %s", result)
+        return result
+
+    def get(self, po_number: str) -> Optional[Dict[str, Any]]:
+        return self._by_number.get((po_number or "").strip().upper())
+
+    def for_vendor(self, vendor_number: str, limit: int = 50) -> List[Dict[str, Any]]:
+        keys = self._by_vendor.get((vendor_number or "").upper(), [])
+        return [self._by_number[k] for k in keys[:limit]]
+
+    def all(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return list(self._by_number.values())[:limit]
+
+    def suggest_by_amount(
+        self,
+        amount: float,
+        tolerance: float = DEFAULT_AMOUNT_TOLERANCE,
+        vendor_number: Optional[str] = None,
+        limit: int = 10,
+    ) -> List[Dict[str, Any]]:
+        """Open POs whose total is within amount * tolerance, closest first."""
+        margin = abs(amount) * tolerance
+        lo = bisect.bisect_left(self._amount_values, amount - margin)
+        hi = bisect.bisect_right(self._amount_values, amount + margin)
+        vendor = (vendor_number or "").upper()
+        matches = []
+        for po_amount, key in self._amounts[lo:hi]:
+            po = self._by_number[key]
+            if vendor and (po.get("vendorNumber") or "").upper() != vendor:
+                continue
+            matches.append({**po, "amount_difference": round(po_amount - amount, 2)})
+        matches.sort(key=lambda po: abs(po["amount_difference"]))
+        return matches[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "open_pos": len(self._by_number),
+            "vendors": len(self._by_vendor),
+            "watermark": self._watermark,
+            "last_full_refresh": self.last_full_refresh,
+            "last_incremental_refresh": self.last_incremental_refresh,
+            "last_error": self.last_error,
+        }
+
+
+open_po_index = OpenPOIndex()
+
+
+async def run_open_po_index_refresher(service) -> None:
+    """Background task: full refresh at start and hourly, incremental refresh in between."""
+    last_full = None
+    while True:
+        try:
+            now = asyncio.get_running_loop().time()
+            full = last_full is None or now - last_full >= OPEN_PO_INDEX_FULL_REFRESH_SECONDS
+            result = await open_po_index.refresh(service, full=full)
+            if result["mode"] == "full":
+                last_full = now
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Already logged by refresh(); keep serving the previous index
+            pass
+        await asyncio.sleep(OPEN_PO_INDEX_REFRESH_SECONDS)
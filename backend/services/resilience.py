@@ -0,0 +1,351 @@
+"""
+Resilient HTTP Client Layer for GPI Document Hub
+
+Shared retry, throttling and failure isolation for outbound calls to
+Microsoft Graph, Business Central and Spiro. Clients created with
+resilient_client() behave like httpx.AsyncClient; the behaviour lives in
+ResilientTransport so every request through such a client gets it.
+
+Key features:
+1. Retry: 429 and 503 are retried for any method (the server did not
+   process the request); 502/504 and dropped connections are retried for
+   idempotent methods. Waits honor Retry-After, otherwise use jittered
+   exponential backoff
+2. Adaptive concurrency (AIMD): requests in flight per host are capped; the
+   cap grows by one per window of successes and halves on throttling
+3. Circuit breaker: after repeated server errors to a host, calls fail fast
+   with CircuitOpenError until a cooldown passes and a trial call succeeds
+4. Metrics: Prometheus-style counters and gauges per host, see
+   render_prometheus() and get_resilience_stats()
+"""
+
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Retry policy
+MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 30.0
+# A Retry-After longer than this is returned to the caller instead of waited out
+MAX_RETRY_AFTER_SECONDS = 120.0
+
+THROTTLE_STATUSES = {429, 503}
+IDEMPOTENT_RETRY_STATUSES = {502, 504}
+BREAKER_FAILURE_STATUSES = {500, 502, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Per-host adaptive concurrency
+AIMD_INITIAL_LIMIT = 8
+AIMD_MIN_LIMIT = 1
+AIMD_MAX_LIMIT = 64
+AIMD_DECREASE_FACTOR = 0.5
+# Minimum seconds between two decreases, so one burst of 429s halves once
+AIMD_DECREASE_INTERVAL = 1.0
+
+# Circuit breaker
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30.0
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised without sending the request while a host's circuit breaker is open."""
+
+
+class AdaptiveLimiter:
+    """Concurrency limit for one host, adjusted by additive increase / multiplicative decrease."""
+
+    def __init__(self):
+        self.limit = float(AIMD_INITIAL_LIMIT)
+        self.in_flight = 0
+        self._waiters: List[asyncio.Future] = []
+        self._last_decrease = 0.0
+
+    async def acquire(self) -> None:
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        self._wake()
+
+    def on_success(self) -> None:
+        # +1 after roughly `limit` successes
+        self.limit = min(AIMD_MAX_LIMIT, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease >= AIMD_DECREASE_INTERVAL:
+            self.limit = max(AIMD_MIN_LIMIT, self.limit * AIMD_DECREASE_FACTOR)
+            self._last_decrease = now
+
+    def _wake(self) -> None:
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial after a cooldown."""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < BREAKER_COOLDOWN_SECONDS:
+                return False
+            self.state = "half_open"
+            self._trial_in_flight = False
+        # Half-open: let a single trial request through
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def release_trial(self) -> None:
+        """Free the half-open trial slot when the trial ended without an outcome (e.g. cancelled)."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("Circuit for %s closed", self.host)
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self.failures >= BREAKER_FAILURE_THRESHOLD:
+            if self.state != "open":
+                logger.warning("Circuit for %s opened after %d failures", self.host, self.failures)
+                _metrics.inc("http_client_circuit_opened_total", host=self.host)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class _HostState:
+    def __init__(self, host: str):
+        self.limiter = AdaptiveLimiter()
+        self.breaker = CircuitBreaker(host)
+
+
+class _Metrics:
+    """In-process counters rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = defaultdict(float)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def reset(self) -> None:
+        self.counters.clear()
+
+
+_hosts: Dict[str, _HostState] = {}
+_metrics = _Metrics()
+
+
+def _host_state(host: str) -> _HostState:
+    state = _hosts.get(host)
+    if state is None:
+        state = _hosts[host] = _HostState(host)
+    return state
+
+
+def _is_replayable(request: httpx.Request) -> bool:
+    """True if the request body is in memory and can be sent again."""
+    try:
+        request.content
+        return True
+    except httpx.RequestNotRead:
+        return False
+
+
+def retry_after_seconds(response: Any) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), if any."""
+    # Also used for Graph $batch sub-responses, whose headers are a plain dict
+    value = httpx.Headers(response.headers).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """httpx transport adding retries, per-host AIMD concurrency and circuit breaking."""
+
+    def __init__(self, inner: Optional[httpx.AsyncBaseTransport] = None, max_retries: int = MAX_RETRIES):
+        self._inner = inner or httpx.AsyncHTTPTransport()
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        method = request.method.upper()
+        state = _host_state(host)
+        replayable = _is_replayable(request)
+        attempt = 0
+
+        while True:
+            if not state.breaker.allow():
+                _metrics.inc("http_client_circuit_rejections_total", host=host)
+                raise CircuitOpenError(f"Circuit open for {host}", request=request)
+
+            try:
+                await state.limiter.acquire()
+            except BaseException:
+                state.breaker.release_trial()
+                raise
+            try:
+                response = await self._inner.handle_async_request(request)
+            except httpx.TransportError as e:
+                state.breaker.record_failure()
+                _metrics.inc("http_client_requests_total", host=host, status="error")
+                # A failed connect never reached the server, so any method may retry
+                connect_failed = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if not replayable or attempt >= self.max_retries or not (connect_failed or method in IDEMPOTENT_METHODS):
+                    raise
+                delay = _backoff_seconds(attempt)
+                reason = type(e).__name__
+                response = None
+            except BaseException:
+                # Cancelled or failed outside the transport: no verdict on the
+                # host, but a half-open trial must not stay held forever
+                state.breaker.release_trial()
+                raise
+            finally:
+                state.limiter.release()
+
+            if response is not None:
+                status = response.status_code
+                _metrics.inc("http_client_requests_total", host=host, status=str(status))
+
+                if status in THROTTLE_STATUSES:
+                    state.limiter.on_throttle()
+                    _metrics.inc("http_client_throttled_total", host=host)
+                else:
+                    state.limiter.on_success()
+                if status in BREAKER_FAILURE_STATUSES:
+                    state.breaker.record_failure()
+                else:
+                    state.breaker.record_success()
+
+                retryable = status in THROTTLE_STATUSES or (
+                    status in IDEMPOTENT_RETRY_STATUSES and method in IDEMPOTENT_METHODS
+                )
+                if not retryable or not replayable or attempt >= self.max_retries:
+                    return response
+
+                retry_after = retry_after_seconds(response)
+                if retry_after is not None and retry_after > MAX_RETRY_AFTER_SECONDS:
+                    return response
+                delay = retry_after if retry_after is not None else _backoff_seconds(attempt)
+                reason = str(status)
+                await response.aclose()
+
+            _metrics.inc("http_client_retries_total", host=host, reason=reason)
+            logger.warning(
+                "%s %s -> %s, retry %d/%d in %.1fs",
+                method, host, reason, attempt + 1, self.max_retries, delay
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+def resilient_client(**kwargs: Any) -> httpx.AsyncClient:
+    """Create an httpx.AsyncClient whose requests go through ResilientTransport."""
+    return httpx.AsyncClient(transport=ResilientTransport(), **kwargs)
+
+
+def get_resilience_stats() -> Dict[str, Any]:
+    """Per-host limiter and breaker state plus counter totals."""
+    hosts = {
+        host: {
+            "concurrency_limit": int(state.limiter.limit),
+            "in_flight": state.limiter.in_flight,
+            "circuit_state": state.breaker.state,
+            "consecutive_failures": state.breaker.failures,
+        }
+        for host, state in _hosts.items()
+    }
+    counters: Dict[str, float] = defaultdict(float)
+    for (name, labels), value in _metrics.counters.items():
+        counters[name] += value
+    return {"hosts": hosts, "counters": dict(counters)}
+
+
+def render_prometheus() -> str:
+    """Render counters and per-host gauges in Prometheus text exposition format."""
+    lines: List[str] = []
+    by_name: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], float]]] = defaultdict(list)
+    for (name, labels), value in _metrics.counters.items():
+        by_name[name].append((labels, value))
+
+    for name in sorted(by_name):
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in sorted(by_name[name]):
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value:g}")
+
+    circuit_values = {"closed": 0, "half_open": 1, "open": 2}
+    gauges = [
+        ("http_client_concurrency_limit", lambda s: int(s.limiter.limit)),
+        ("http_client_in_flight", lambda s: s.limiter.in_flight),
+        ("http_client_circuit_state", lambda s: circuit_values[s.breaker.state]),
+    ]
+    for name, read in gauges:
+        lines.append(f"# TYPE {name} gauge")
+        for host in sorted(_hosts):
+            lines.append(f'{name}{{host="{host}"}} {read(_hosts[host])}')
+
+    return "\n".join(lines) + "\n"
+
+
+def reset_resilience_state() -> None:
+    """Forget all host state and counters (used by tests)."""
+    _hosts.clear()
+    _metrics.reset()
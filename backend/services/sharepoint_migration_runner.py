@@ -0,0 +1,408 @@
+"""
+SharePoint Migration Runner for GPI Document Hub
+
+Runs the discover -> classify -> migrate pipeline of SharePointMigrationService
+as a long-lived background job instead of a single request-bound call.
+
+Key features:
+1. Persistence: each run is a document in sharepoint_migration_runs holding the
+   current phase, the classification cursor, per-phase counters and the last
+   drive delta token
+2. Resume: runs are claimed with a heartbeat; a supervisor loop restarts runs
+   whose worker stopped heartbeating (e.g. after a restart or crash)
+3. Control: runs can be paused, resumed and cancelled between batches
+4. Continuous mode: after migrating, the run sleeps and starts a new cycle
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Any
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from services.sharepoint_migration_service import (
+    SharePointMigrationService,
+    DEFAULT_SOURCE_SITE,
+    DEFAULT_SOURCE_LIBRARY,
+    DEFAULT_SOURCE_FOLDER,
+    DEFAULT_TARGET_SITE,
+    DEFAULT_TARGET_LIBRARY,
+)
+
+logger = logging.getLogger(__name__)
+
+PHASES = ["discover", "classify", "migrate"]
+
+# Run statuses after which the runner never picks a run up again
+TERMINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+# Heartbeat cadence, and how old a running run's heartbeat must be before
+# another worker may take it over
+HEARTBEAT_SECONDS = 30
+STALE_AFTER_SECONDS = 120
+
+# How often the supervisor looks for runs to start or take over
+SUPERVISOR_INTERVAL_SECONDS = 60
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Runs executing in this process, by run id
+_active_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class MigrationRun:
+    """Persisted state of a resumable SharePoint migration run."""
+    id: str
+    status: str  # pending, running, paused, completed, failed, cancelled
+    source_site_url: str
+    source_library_name: str
+    source_folder_path: str
+    target_site_url: str
+    target_library_name: str
+
+    # Options
+    batch_size: int = 25
+    classify_batch_mode: bool = True
+    continuous: bool = False
+    poll_interval_seconds: int = 300
+
+    # Position
+    current_phase: str = "discover"
+    cycle: int = 1
+    cursor: Dict[str, Any] = field(default_factory=dict)  # classify_after_id
+    delta_token: Optional[str] = None
+
+    # Per-phase counters, accumulated over all cycles
+    counters: Dict[str, Dict[str, int]] = field(default_factory=lambda: {phase: {} for phase in PHASES})
+
+    # Control and ownership
+    requested_action: Optional[str] = None  # pause, cancel
+    worker_id: Optional[str] = None
+    heartbeat_utc: Optional[str] = None
+    last_error: Optional[str] = None
+
+    # Timestamps
+    created_utc: Optional[str] = None
+    updated_utc: Optional[str] = None
+    started_utc: Optional[str] = None
+    completed_utc: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class SharePointMigrationRunner:
+    """Creates, controls and executes persisted SharePoint migration runs."""
+
+    def __init__(self, db, service: Optional[SharePointMigrationService] = None):
+        self.db = db
+        self.runs = db.sharepoint_migration_runs
+        self.service = service or SharePointMigrationService(db)
+
+    # ------------------------------------------------------------------
+    # Run management
+    # ------------------------------------------------------------------
+
+    async def create_run(
+        self,
+        source_site_url: str = DEFAULT_SOURCE_SITE,
+        source_library_name: str = DEFAULT_SOURCE_LIBRARY,
+        source_folder_path: str = DEFAULT_SOURCE_FOLDER,
+        target_site_url: str = DEFAULT_TARGET_SITE,
+        target_library_name: str = DEFAULT_TARGET_LIBRARY,
+        batch_size: int = 25,
+        classify_batch_mode: bool = True,
+        continuous: bool = False,
+        poll_interval_seconds: int = 300
+    ) -> Dict[str, Any]:
+        """Persist a new pending run."""
+        now = _utc_now()
+        run = MigrationRun(
+            id=str(uuid.uuid4()),
+            status="pending",
+            source_site_url=source_site_url,
+            source_library_name=source_library_name,
+            source_folder_path=source_folder_path,
+            target_site_url=target_site_url,
+            target_library_name=target_library_name,
+            batch_size=batch_size,
+            classify_batch_mode=classify_batch_mode,
+            continuous=continuous,
+            poll_interval_seconds=poll_interval_seconds,
+            created_utc=now,
+            updated_utc=now,
+        ).to_dict()
+        await self.runs.insert_one(dict(run))
+        return run
+
+    async def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return await self.runs.find_one({"id": run_id}, {"_id": 0})
+
+    async def list_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        cursor = self.runs.find({}, {"_id": 0}).sort("created_utc", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def request_action(self, run_id: str, action: str) -> bool:
+        """
+        Ask the run to pause or cancel at its next batch boundary.
+
+        Pending and paused runs are stopped immediately since no worker
+        is executing them.
+        """
+        if action not in ("pause", "cancel"):
+            raise ValueError(f"Unknown run action: {action}")
+        now = _utc_now()
+
+        stopped = "paused" if action == "pause" else "cancelled"
+        idle_statuses = ["pending"] if action == "pause" else ["pending", "paused"]
+        result = await self.runs.update_one(
+            {"id": run_id, "status": {"$in": idle_statuses}},
+            {"$set": {"status": stopped, "requested_action": None, "updated_utc": now}}
+        )
+        if result.modified_count:
+            return True
+
+        result = await self.runs.update_one(
+            {"id": run_id, "status": "running"},
+            {"$set": {"requested_action": action, "updated_utc": now}}
+        )
+        return result.modified_count > 0
+
+    async def resume_run(self, run_id: str) -> bool:
+        """Return a paused or failed run to pending and start it."""
+        result = await self.runs.update_one(
+            {"id": run_id, "status": {"$in": ["paused", "failed"]}},
+            {"$set": {
+                "status": "pending",
+                "requested_action": None,
+                "last_error": None,
+                "updated_utc": _utc_now()
+            }}
+        )
+        if not result.modified_count:
+            return False
+        self.start(run_id)
+        return True
+
+    def start(self, run_id: str) -> bool:
+        """Execute the run in a background task in this process."""
+        task = _active_tasks.get(run_id)
+        if task and not task.done():
+            return False
+        task = asyncio.create_task(self.execute(run_id))
+        _active_tasks[run_id] = task
+        task.add_done_callback(lambda _: _active_tasks.pop(run_id, None))
+        return True
+
+    async def start_claimable_runs(self) -> int:
+        """Start pending runs and take over running runs with a stale heartbeat."""
+        stale_cutoff = (datetime.now(timezone.utc) - timedelta(seconds=STALE_AFTER_SECONDS)).isoformat()
+        cursor = self.runs.find(
+            {"$or": [
+                {"status": "pending"},
+                {"status": "running", "heartbeat_utc": {"$lt": stale_cutoff}},
+            ]},
+            {"_id": 0, "id": 1}
+        )
+        started = 0
+        async for run in cursor:
+            if self.start(run["id"]):
+                started += 1
+        return started
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    async def _claim(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Atomically take ownership of a pending run or a run whose worker went away."""
+        now = _utc_now()
+        stale_cutoff = (datetime.now(timezone.utc) - timedelta(seconds=STALE_AFTER_SECONDS)).isoformat()
+        return await self.runs.find_one_and_update(
+            {"id": run_id, "$or": [
+                {"status": "pending"},
+                {"status": "running", "heartbeat_utc": {"$lt": stale_cutoff}},
+                {"status": "running", "heartbeat_utc": None},
+            ]},
+            {"$set": {
+                "status": "running",
+                "worker_id": WORKER_ID,
+                "heartbeat_utc": now,
+                "updated_utc": now,
+                "started_utc": now,
+            }},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _update(self, run_id: str, fields: Dict[str, Any], inc: Optional[Dict[str, int]] = None) -> None:
+        now = _utc_now()
+        update: Dict[str, Any] = {"$set": {**fields, "updated_utc": now, "heartbeat_utc": now}}
+        if inc:
+            update["$inc"] = inc
+        await self.runs.update_one({"id": run_id, "worker_id": WORKER_ID}, update)
+
+    async def _heartbeat(self, run_id: str) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            await self.runs.update_one(
+                {"id": run_id, "worker_id": WORKER_ID},
+                {"$set": {"heartbeat_utc": _utc_now()}}
+            )
+
+    async def _stop_requested(self, run_id: str) -> bool:
+        """Apply a pending pause/cancel request. Returns True if the run must stop."""
+        run = await self.runs.find_one({"id": run_id}, {"_id": 0, "requested_action": 1, "worker_id": 1})
+        if not run or run.get("worker_id") != WORKER_ID:
+            # Another worker took the run over
+            return True
+        action = run.get("requested_action")
+        if not action:
+            return False
+        status = "paused" if action == "pause" else "cancelled"
+        await self._update(run_id, {"status": status, "requested_action": None})
+        logger.info(f"Migration run {run_id} {status}")
+        return True
+
+    @staticmethod
+    def _counter_inc(phase: str, result: Dict[str, Any], keys: List[str]) -> Dict[str, int]:
+        return {
+            f"counters.{phase}.{key}": int(result.get(key) or 0)
+            for key in keys
+        }
+
+    async def execute(self, run_id: str) -> None:
+        """Run phases from the persisted position until done, stopped or failed."""
+        run = await self._claim(run_id)
+        if run is None:
+            logger.info(f"Migration run {run_id} is not claimable")
+            return
+
+        logger.info(f"Migration run {run_id} started by {WORKER_ID} at phase {run['current_phase']} (cycle {run['cycle']})")
+        heartbeat = asyncio.create_task(self._heartbeat(run_id))
+        try:
+            while True:
+                start = PHASES.index(run.get("current_phase") or PHASES[0])
+                for phase in PHASES[start:]:
+                    await self._update(run_id, {"current_phase": phase})
+                    if not await getattr(self, f"_run_{phase}")(run):
+                        return
+
+                if not run.get("continuous"):
+                    await self._update(run_id, {"status": "completed", "completed_utc": _utc_now()})
+                    logger.info(f"Migration run {run_id} completed")
+                    return
+
+                # Continuous mode: wait for the next cycle, staying responsive to pause/cancel
+                run["current_phase"] = PHASES[0]
+                run["cycle"] = run.get("cycle", 1) + 1
+                await self._update(run_id, {"current_phase": PHASES[0], "cycle": run["cycle"]})
+                waited = 0
+                while waited < run.get("poll_interval_seconds", 300):
+                    if await self._stop_requested(run_id):
+                        return
+                    await asyncio.sleep(min(HEARTBEAT_SECONDS, run["poll_interval_seconds"] - waited))
+                    waited += HEARTBEAT_SECONDS
+
+        except asyncio.CancelledError:
+            # Process shutdown: leave the run "running" so it is resumed later
+            raise
+        except Exception as e:
+            logger.error(f"Migration run {run_id} failed: {e}")
+            await self._update(run_id, {"status": "failed", "last_error": str(e)[:500]})
+        finally:
+            heartbeat.cancel()
+
+    async def _run_discover(self, run: Dict[str, Any]) -> bool:
+        if await self._stop_requested(run["id"]):
+            return False
+        result = await self.service.discover_candidates(
+            source_site_url=run["source_site_url"],
+            source_library_name=run["source_library_name"],
+            source_folder_path=run["source_folder_path"],
+            delta_token=run.get("delta_token"),
+            track_changes=True,
+        )
+        fields = {}
+        if result.get("delta_token"):
+            fields["delta_token"] = result["delta_token"]
+            run["delta_token"] = result["delta_token"]
+        await self._update(
+            run["id"], fields,
+            inc=self._counter_inc("discover", result, ["total_discovered", "new_candidates", "existing_candidates", "removed_candidates"])
+        )
+        return True
+
+    async def _run_classify(self, run: Dict[str, Any]) -> bool:
+        while True:
+            if await self._stop_requested(run["id"]):
+                return False
+
+            after_id = (run.get("cursor") or {}).get("classify_after_id")
+            result = await self.service.classify_candidates(
+                max_count=run.get("batch_size", 25),
+                batch_mode=run.get("classify_batch_mode", True),
+                after_id=ObjectId(after_id) if after_id else None,
+            )
+            if not result.get("last_id"):
+                return True
+
+            # The cursor survives across continuous cycles so low-confidence
+            # candidates are not re-sent to the AI every cycle
+            run.setdefault("cursor", {})["classify_after_id"] = str(result["last_id"])
+            await self._update(
+                run["id"],
+                {"cursor.classify_after_id": str(result["last_id"])},
+                inc=self._counter_inc("classify", result, ["processed", "high_confidence", "low_confidence", "folder_tree_matches"])
+            )
+
+    async def _run_migrate(self, run: Dict[str, Any]) -> bool:
+        while True:
+            if await self._stop_requested(run["id"]):
+                return False
+
+            result = await self.service.migrate_candidates(
+                target_site_url=run["target_site_url"],
+                target_library_name=run["target_library_name"],
+                max_count=run.get("batch_size", 25),
+            )
+            if not result.get("attempted"):
+                return True
+
+            await self._update(
+                run["id"], {},
+                inc=self._counter_inc("migrate", result, ["attempted", "migrated", "errors", "metadata_errors"])
+            )
+
+
+async def run_supervisor(db, interval_seconds: int = SUPERVISOR_INTERVAL_SECONDS) -> None:
+    """Background loop that starts pending runs and resumes orphaned ones."""
+    runner = SharePointMigrationRunner(db)
+    while True:
+        try:
+            started = await runner.start_claimable_runs()
+            if started:
+                logger.info(f"[MigrationRunSupervisor] Started {started} migration run(s)")
+        except Exception as e:
+            logger.error(f"[MigrationRunSupervisor] Error: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def stop_active_runs() -> None:
+    """Cancel runs executing in this process; they stay "running" and are resumed later."""
+    tasks = [task for task in _active_tasks.values() if not task.done()]
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -11,12 +11,20 @@ Key features:
 """
 
 import os
+import asyncio
 import logging
+import time
 import httpx
 import uuid
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
+from urllib.parse import quote, unquote
+
+from pymongo import UpdateOne
+
+from services.graph_batch import GraphRequest, send_batch
+from services.resilience import resilient_client
 
 logger = logging.getLogger(__name__)
 
@@ -64,9 +72,118 @@ REQUIRED_COLUMNS = [
     {"name": "Level3", "type": "text"},
 ]
 
+# Discovery: folder listings in flight at once, and candidates per bulk write
+LIST_CONCURRENCY = 8
+DISCOVERY_UPSERT_BATCH = 200
+
+# Migration transfer: candidates transferred at once, upload session chunk
+# size (must be a multiple of 320 KiB), largest file sent with a single PUT,
+# and how long to wait for a server-side copy
+MIGRATE_CONCURRENCY = 4
+UPLOAD_CHUNK_SIZE = 10 * 1024 * 1024
+SIMPLE_UPLOAD_LIMIT = 4 * 1024 * 1024
+COPY_TIMEOUT_SECONDS = 1800
+TRANSFER_MODES = ("auto", "copy", "stream")
+
 # Classification confidence threshold
 CONFIDENCE_THRESHOLD = 0.85
 
+# Batch AI classification: files packed into one LLM request, requests in
+# flight at once, and characters of extracted text sent per file
+AI_BATCH_SIZE = 20
+AI_BATCH_CONCURRENCY = 4
+AI_BATCH_TEXT_CHARS = 800
+
+# System prompt for AI classification aligned with Excel metadata structure
+CLASSIFICATION_SYSTEM_PROMPT = """You are a document classification expert for Gamer Packaging Inc (GPI), a packaging company.
+Your task is to analyze a file and extract metadata aligned with our SharePoint flat structure.
+
+You MUST respond with ONLY a JSON object in this exact format:
+{
+    "acct_type": "Manufacturers / Vendors | Customer Accounts | Corporate Internal | System Resources",
+    "acct_name": "string - The customer or vendor name (e.g., 'Duke Cannon', 'Menasha Packaging')",
+    "department": "CustomerRelations | Sales | Marketing | Operations | Quality | Finance | HR | IT | Purchasing | Warehouse | Engineering | Unknown",
+    "document_type": "One of: Supplier Documents, Marketing Literature, Capabilities / Catalogs, SOPs / Resources, Plant Warehouse List, Dunnage, Product Specification Sheet, Product Pack-Out Specs, Product Drawings, Graphical Die Line, Forecasts, Inventory Reports, Transaction History, Price List, Misc., Customer Documents, Drawing Approval, Specification Approval, Prototype Approval, Graphics Approval, Project Timeline, Supplier Quote, Customer Quote, Cost Analysis, Training, Agreement Resources, New Business Dev Resources, Quality Documents, Claims/Cases, Warehouse & Consignment, Invoice & Hold Agreement, Supply Agreement, Supply Addendum, Other",
+    "document_sub_type": "string - More specific classification (e.g., 'Beard Care', 'Face Care', 'Corrugated')",
+    "document_status": "Active | Archived | Pending",
+    "project_or_part_number": "string or null - Part numbers like BT-1000-110, GPI-12345",
+    "document_date": "YYYY-MM-DD or null - Date from filename or document",
+    "retention_category": "CustomerComm_LongTerm | WorkingDoc_2yrs | Accounting_7yrs | Legal_10yrs | Unknown",
+    "confidence": 0.0 to 1.0
+}
+
+CRITICAL DEPARTMENT CLASSIFICATION RULES:
+1. "Customer Relations" in path → department = "CustomerRelations", acct_type = "Customer Accounts"
+2. "Sales" in path OR sales orders/quotes → department = "Sales"
+3. "Marketing" in path OR marketing materials → department = "Marketing"
+4. "Quality" in path OR quality docs/claims/inspections → department = "Quality"
+5. "Warehouse" or "WH" or "Shipping" in path → department = "Warehouse"
+6. "Purchasing" or vendor-related procurement → department = "Purchasing"
+7. "Engineering" or technical drawings/specs → department = "Engineering"
+8. "Operations" or production/manufacturing docs → department = "Operations"
+9. "Finance" or "Accounting" or invoices/payments → department = "Finance"
+10. "HR" or employee/benefits docs → department = "HR"
+11. "IT" or technical/system docs → department = "IT"
+
+ACCT_TYPE RULES:
+- If dealing with a CUSTOMER (someone GPI sells to): acct_type = "Customer Accounts"
+- If dealing with a VENDOR/SUPPLIER (someone GPI buys from): acct_type = "Manufacturers / Vendors"
+- If internal company docs with no external party: acct_type = "Corporate Internal"
+
+DOCUMENT TYPE HINTS:
+- "Spec Binder", "Specification" → "Product Specification Sheet"
+- "Art Work", "Artwork", "Die Line" → "Product Drawings" or "Graphical Die Line"
+- "Quote" from customer → "Customer Quote"; Quote to customer → "Supplier Quote"
+- "PO", "Purchase Order" → "Supplier Documents"
+- "Invoice" → "Invoice & Hold Agreement"
+- "SOP", "Procedure", "Guide" → "SOPs / Resources"
+- "Agreement", "Contract" → "Agreement Resources" or "Supply Agreement"
+
+DATE PATTERNS IN FILENAMES:
+- "(9.23.25)" = September 23, 2025 → "2025-09-23"
+- "2025-01-15" → "2025-01-15"
+- "01152025" → "2025-01-15"
+
+RESPOND ONLY WITH THE JSON OBJECT, NO OTHER TEXT."""
+
+# Appended to the system prompt when several files share one request
+BATCH_CLASSIFICATION_INSTRUCTIONS = """
+
+BATCH MODE (overrides the single-object response format above):
+You will receive several files, each introduced by "### File <index>".
+Classify every file independently using the rules above.
+Respond with ONLY a JSON array containing exactly one object per file, each in the
+format above plus an "index" field equal to the file's index. NO OTHER TEXT."""
+
+
+def _parse_json_response(response: str) -> Any:
+    """Parse an LLM JSON response, stripping markdown code fences if present."""
+    import json
+    response_text = response.strip()
+    
+    # Handle markdown code blocks
+    if response_text.startswith("```"):
+        lines = response_text.split("\n")
+        response_text = "\n".join(lines[1:-1])
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    
+    return json.loads(response_text.strip())
+
+
+def _fallback_classification(error: str) -> Dict[str, Any]:
+    """Zero-confidence classification used when the AI call fails."""
+    return {
+        "acct_type": "Corporate Internal",
+        "document_type": "Other",
+        "document_status": "Active",
+        "department": "Unknown",
+        "confidence": 0.0,
+        "error": error
+    }
+
 
 @dataclass
 class MigrationCandidate:
@@ -123,6 +240,10 @@ class MigrationCandidate:
         return asdict(self)
 
 
+class DeltaTokenExpired(Exception):
+    """Graph rejected a stored delta link (410 Gone); a full resync is needed."""
+
+
 class SharePointMigrationService:
     """Service for SharePoint file migration with AI-powered metadata inference."""
     
@@ -583,7 +704,7 @@ class SharePointMigrationService:
         if cached and cached.get("expires_at", 0) > datetime.now().timestamp():
             return cached["token"]
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with resilient_client(timeout=30.0) as client:
             resp = await client.post(
                 f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token",
                 data={
@@ -614,7 +735,7 @@ class SharePointMigrationService:
         hostname = parts[0]
         site_path = f"/sites/{parts[1]}" if len(parts) > 1 else ""
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with resilient_client(timeout=30.0) as client:
             resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/sites/{hostname}:{site_path}:",
                 headers={"Authorization": f"Bearer {token}"}
@@ -625,7 +746,7 @@ class SharePointMigrationService:
     
     async def _get_drive_id(self, site_id: str, library_name: str, token: str) -> str:
         """Get drive ID for a document library."""
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with resilient_client(timeout=30.0) as client:
             resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/sites/{site_id}/drives",
                 headers={"Authorization": f"Bearer {token}"}
@@ -645,89 +766,207 @@ class SharePointMigrationService:
             
             raise Exception(f"Drive '{library_name}' not found. Available: {[d['name'] for d in drives]}")
     
-    async def _list_files_in_folder(
-        self, 
-        site_url: str, 
-        library_name: str, 
+    def _drive_file_info(self, item: Dict, drive_id: str, folder_path: str) -> Dict:
+        """Shape a Graph driveItem into the file record used by discovery."""
+        return {
+            "id": item["id"],
+            "name": item["name"],
+            "size": item.get("size", 0),
+            "web_url": item.get("webUrl", ""),
+            "created_datetime": item.get("createdDateTime"),
+            "last_modified": item.get("lastModifiedDateTime"),
+            "drive_id": drive_id,
+            "folder_path": folder_path
+        }
+    
+    async def _iter_folder_files(
+        self,
+        drive_id: str,
         folder_path: str,
         token: str,
-        recursive: bool = True
-    ) -> List[Dict]:
-        """List all files in a SharePoint folder, optionally recursively."""
-        site_id = await self._get_site_id(site_url, token)
-        drive_id = await self._get_drive_id(site_id, library_name, token)
-        
-        files = []
-        folders_to_process = [folder_path]
+        recursive: bool = True,
+        concurrency: int = LIST_CONCURRENCY
+    ) -> AsyncIterator[Dict]:
+        """
+        Yield files under a folder as they are listed.
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            while folders_to_process:
-                current_folder = folders_to_process.pop(0)
-                encoded_path = current_folder.replace(" ", "%20")
-                
-                # List items in the folder
+        Subfolders are listed by a pool of workers so sibling folders are
+        fetched concurrently; files are yielded as soon as their page arrives.
+        """
+        folders: asyncio.Queue = asyncio.Queue()
+        results: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 200)
+        finished = object()
+        folders.put_nowait(folder_path)
+        
+        async with resilient_client(timeout=60.0) as client:
+            async def list_folder(current_folder: str):
+                encoded_path = quote(current_folder)
                 url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{encoded_path}:/children"
                 
                 while url:
                     resp = await client.get(url, headers={"Authorization": f"Bearer {token}"})
                     if resp.status_code == 404:
                         logger.warning(f"Folder not found: {current_folder}")
-                        break
+                        return
                     if resp.status_code != 200:
                         raise Exception(f"Failed to list files: {resp.status_code} - {resp.text[:500]}")
                     
                     data = resp.json()
                     for item in data.get("value", []):
                         if "file" in item:
-                            files.append({
-                                "id": item["id"],
-                                "name": item["name"],
-                                "size": item.get("size", 0),
-                                "web_url": item.get("webUrl", ""),
-                                "created_datetime": item.get("createdDateTime"),
-                                "last_modified": item.get("lastModifiedDateTime"),
-                                "drive_id": drive_id,
-                                "folder_path": current_folder
-                            })
+                            await results.put(self._drive_file_info(item, drive_id, current_folder))
                         elif "folder" in item and recursive:
-                            # Add subfolder to process
-                            subfolder_path = f"{current_folder}/{item['name']}"
-                            folders_to_process.append(subfolder_path)
+                            folders.put_nowait(f"{current_folder}/{item['name']}")
                     
                     # Handle pagination
                     url = data.get("@odata.nextLink")
-        
-        return files
+            
+            async def worker():
+                while True:
+                    current_folder = await folders.get()
+                    try:
+                        await list_folder(current_folder)
+                    except Exception as e:
+                        await results.put(e)
+                    finally:
+                        folders.task_done()
+            
+            async def close_when_drained():
+                await folders.join()
+                await results.put(finished)
+            
+            tasks = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+            tasks.append(asyncio.create_task(close_when_drained()))
+            try:
+                while True:
+                    item = await results.get()
+                    if item is finished:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
     
-    async def discover_candidates(
+    async def _get_latest_delta_link(self, drive_id: str, token: str) -> str:
+        """Get a delta link for the drive's current state without enumerating it."""
+        async with resilient_client(timeout=30.0) as client:
+            resp = await client.get(
+                f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root/delta",
+                params={"token": "latest"},
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            if resp.status_code != 200:
+                raise Exception(f"Failed to get delta link: {resp.status_code} - {resp.text[:500]}")
+            return resp.json()["@odata.deltaLink"]
+    
+    async def _iter_delta_changes(
         self,
-        source_site_url: str = DEFAULT_SOURCE_SITE,
-        source_library_name: str = DEFAULT_SOURCE_LIBRARY,
-        source_folder_path: str = DEFAULT_SOURCE_FOLDER
-    ) -> Dict[str, int]:
-        """
-        Discover files in the source SharePoint folder and create migration candidates.
-        
-        Returns:
-            Dict with total_discovered, new_candidates, existing_candidates counts
+        drive_id: str,
+        folder_path: str,
+        token: str,
+        delta_link: str,
+        state: Dict[str, Any]
+    ) -> AsyncIterator[Dict]:
         """
-        logger.info(f"Discovering files in {source_site_url}/{source_library_name}/{source_folder_path}")
+        Yield files under folder_path changed since delta_link.
         
-        token = await self._get_graph_token()
-        files = await self._list_files_in_folder(
-            source_site_url, source_library_name, source_folder_path, token
-        )
+        Graph only supports delta on the drive root for SharePoint, so changes
+        are filtered to the folder here. Delta items carry no path; each
+        parent folder's path is fetched once and cached. Deleted items are
+        yielded as {"id": ..., "deleted": True}. The new delta link is stored
+        in state["delta_token"] once the last page is read.
         
+        Raises DeltaTokenExpired when Graph no longer accepts the link.
+        """
+        parent_paths: Dict[str, Optional[str]] = {}
+        
+        async with resilient_client(timeout=60.0) as client:
+            async def parent_path(parent_id: str) -> Optional[str]:
+                if parent_id not in parent_paths:
+                    resp = await client.get(
+                        f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{parent_id}",
+                        params={"$select": "id,name,parentReference,root"},
+                        headers={"Authorization": f"Bearer {token}"}
+                    )
+                    if resp.status_code == 404:
+                        parent_paths[parent_id] = None
+                    elif resp.status_code != 200:
+                        raise Exception(f"Failed to get folder {parent_id}: {resp.status_code} - {resp.text[:500]}")
+                    else:
+                        folder = resp.json()
+                        if "root" in folder:
+                            parent_paths[parent_id] = ""
+                        else:
+                            # e.g. /drives/{id}/root:/Customer Relations/Acme
+                            above = folder.get("parentReference", {}).get("path", "").split("root:", 1)[-1]
+                            parent_paths[parent_id] = unquote(f"{above}/{folder['name']}").strip("/")
+                return parent_paths[parent_id]
+            
+            url = delta_link
+            while url:
+                resp = await client.get(url, headers={"Authorization": f"Bearer {token}"})
+                if resp.status_code == 410:
+                    raise DeltaTokenExpired(f"Delta token expired for drive {drive_id}")
+                if resp.status_code != 200:
+                    raise Exception(f"Failed to get drive changes: {resp.status_code} - {resp.text[:500]}")
+                
+                data = resp.json()
+                for item in data.get("value", []):
+                    if "deleted" in item:
+                        yield {"id": item["id"], "deleted": True}
+                        continue
+                    if "file" not in item:
+                        continue
+                    path = await parent_path(item.get("parentReference", {}).get("id", ""))
+                    if path is None:
+                        continue
+                    if path == folder_path or path.startswith(f"{folder_path}/"):
+                        yield self._drive_file_info(item, drive_id, path)
+                
+                if data.get("@odata.deltaLink"):
+                    state["delta_token"] = data["@odata.deltaLink"]
+                url = data.get("@odata.nextLink")
+    
+    async def _list_files_in_folder(
+        self, 
+        site_url: str, 
+        library_name: str, 
+        folder_path: str,
+        token: str,
+        recursive: bool = True
+    ) -> List[Dict]:
+        """List all files in a SharePoint folder, optionally recursively."""
+        site_id = await self._get_site_id(site_url, token)
+        drive_id = await self._get_drive_id(site_id, library_name, token)
+        return [
+            file_info
+            async for file_info in self._iter_folder_files(drive_id, folder_path, token, recursive)
+        ]
+    
+    async def _upsert_discovered(
+        self,
+        files: List[Dict],
+        source_site_url: str,
+        source_library_name: str,
+        source_folder_path: str,
+        now: str
+    ) -> Dict[str, int]:
+        """Write one batch of discovered files as candidates with a single bulk write."""
+        item_ids = [f["id"] for f in files]
+        existing_ids = set()
+        async for doc in self.collection.find(
+            {"source_item_id": {"$in": item_ids}}, {"_id": 0, "source_item_id": 1}
+        ):
+            existing_ids.add(doc["source_item_id"])
+        
+        operations = []
         new_count = 0
-        existing_count = 0
-        now = datetime.now(timezone.utc).isoformat()
-        
         for file_info in files:
             source_item_id = file_info["id"]
             
-            # Check if candidate already exists
-            existing = await self.collection.find_one({"source_item_id": source_item_id})
-            
             # Build legacy path and URL
             folder_in_lib = file_info.get("folder_path", source_folder_path)
             legacy_path = f"/{source_library_name}/{folder_in_lib}/{file_info['name']}"
@@ -741,100 +980,204 @@ class SharePointMigrationService:
                 "file_name": file_info["name"],
                 "legacy_path": legacy_path,
                 "legacy_url": legacy_url,
+                "source_deleted": False,
                 "updated_utc": now
             }
             
-            if existing:
+            if source_item_id in existing_ids:
                 # Update existing record
-                await self.collection.update_one(
-                    {"source_item_id": source_item_id},
-                    {"$set": candidate_data}
+                operations.append(UpdateOne({"source_item_id": source_item_id}, {"$set": candidate_data}))
+                continue
+            
+            # Create new candidate
+            new_fields = {
+                "id": str(uuid.uuid4()),
+                "status": "discovered",
+                "created_utc": now,
+                # Initialize folder tree levels
+                "level1": None,
+                "level2": None,
+                "level3": None,
+                "level4": None,
+                "level5": None,
+                "classification_source": None,
+                # NEW: Initialize Excel metadata fields
+                "acct_type": None,
+                "acct_name": None,
+                "document_type": None,
+                "document_sub_type": None,
+                "document_status": "Active",
+                # Legacy metadata fields
+                "doc_type": None,
+                "department": None,
+                "customer_name": None,
+                "vendor_name": None,
+                "project_or_part_number": None,
+                "document_date": None,
+                "retention_category": None,
+                "classification_confidence": None,
+                "classification_method": None,
+                "target_site_url": None,
+                "target_library_name": None,
+                "target_item_id": None,
+                "target_url": None,
+                "migration_timestamp": None,
+                "migration_error": None
+            }
+            
+            # Lookup folder classification from imported CSV
+            folder_class = await self._lookup_folder_classification(
+                file_info["name"],
+                folder_in_lib
+            )
+            
+            if folder_class:
+                # Pre-populate from folder tree
+                metadata = self._map_folder_to_metadata(folder_class)
+                new_fields.update({
+                    "level1": folder_class.get("level1"),
+                    "level2": folder_class.get("level2"),
+                    "level3": folder_class.get("level3"),
+                    "level4": folder_class.get("level4"),
+                    "level5": folder_class.get("level5"),
+                    "classification_source": "folder_tree",
+                    # NEW: Excel metadata fields
+                    "acct_type": metadata.get("acct_type"),
+                    "acct_name": metadata.get("acct_name"),
+                    "document_type": metadata.get("document_type"),
+                    "document_sub_type": metadata.get("document_sub_type"),
+                    "document_status": metadata.get("document_status", "Active"),
+                    # Legacy fields
+                    "doc_type": metadata.get("doc_type"),
+                    "department": metadata.get("department"),
+                    "customer_name": metadata.get("customer_name"),
+                    "vendor_name": metadata.get("vendor_name"),
+                    "retention_category": metadata.get("retention_category"),
+                    "classification_confidence": 0.9,  # High confidence from folder tree
+                    "classification_method": "folder_tree_lookup",
+                })
+            
+            # Upsert so a concurrent discovery of the same file cannot duplicate it
+            operations.append(UpdateOne(
+                {"source_item_id": source_item_id},
+                {"$set": candidate_data, "$setOnInsert": new_fields},
+                upsert=True
+            ))
+            new_count += 1
+        
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        
+        return {"new_candidates": new_count, "existing_candidates": len(files) - new_count}
+    
+    async def _consume_discovered(
+        self,
+        files: AsyncIterator[Dict],
+        source_site_url: str,
+        source_library_name: str,
+        source_folder_path: str,
+        batch_size: int
+    ) -> Dict[str, int]:
+        """Upsert files from an enumeration stream in batches as they arrive."""
+        counts = {"total_discovered": 0, "new_candidates": 0, "existing_candidates": 0, "removed_candidates": 0}
+        now = datetime.now(timezone.utc).isoformat()
+        batch: List[Dict] = []
+        deleted_ids: List[str] = []
+        
+        async def flush():
+            if batch:
+                result = await self._upsert_discovered(
+                    batch, source_site_url, source_library_name, source_folder_path, now
+                )
+                counts["new_candidates"] += result["new_candidates"]
+                counts["existing_candidates"] += result["existing_candidates"]
+                batch.clear()
+            if deleted_ids:
+                result = await self.collection.update_many(
+                    {"source_item_id": {"$in": deleted_ids}},
+                    {"$set": {"source_deleted": True, "updated_utc": now}}
                 )
-                existing_count += 1
+                counts["removed_candidates"] += result.modified_count
+                deleted_ids.clear()
+        
+        async for file_info in files:
+            if file_info.get("deleted"):
+                deleted_ids.append(file_info["id"])
             else:
-                # Create new candidate
-                candidate_data.update({
-                    "id": str(uuid.uuid4()),
-                    "status": "discovered",
-                    "created_utc": now,
-                    # Initialize folder tree levels
-                    "level1": None,
-                    "level2": None,
-                    "level3": None,
-                    "level4": None,
-                    "level5": None,
-                    "classification_source": None,
-                    # NEW: Initialize Excel metadata fields
-                    "acct_type": None,
-                    "acct_name": None,
-                    "document_type": None,
-                    "document_sub_type": None,
-                    "document_status": "Active",
-                    # Legacy metadata fields
-                    "doc_type": None,
-                    "department": None,
-                    "customer_name": None,
-                    "vendor_name": None,
-                    "project_or_part_number": None,
-                    "document_date": None,
-                    "retention_category": None,
-                    "classification_confidence": None,
-                    "classification_method": None,
-                    "target_site_url": None,
-                    "target_library_name": None,
-                    "target_item_id": None,
-                    "target_url": None,
-                    "migration_timestamp": None,
-                    "migration_error": None
-                })
-                
-                # Lookup folder classification from imported CSV
-                folder_class = await self._lookup_folder_classification(
-                    file_info["name"],
-                    folder_in_lib
+                batch.append(file_info)
+                counts["total_discovered"] += 1
+            if len(batch) + len(deleted_ids) >= batch_size:
+                await flush()
+        await flush()
+        
+        return counts
+    
+    async def discover_candidates(
+        self,
+        source_site_url: str = DEFAULT_SOURCE_SITE,
+        source_library_name: str = DEFAULT_SOURCE_LIBRARY,
+        source_folder_path: str = DEFAULT_SOURCE_FOLDER,
+        delta_token: Optional[str] = None,
+        track_changes: bool = False,
+        concurrency: int = LIST_CONCURRENCY,
+        batch_size: int = DISCOVERY_UPSERT_BATCH
+    ) -> Dict[str, Any]:
+        """
+        Discover files in the source SharePoint folder and create migration candidates.
+        
+        Without a delta_token the folder tree is walked with `concurrency`
+        folder listings in flight. With a delta_token (from a previous call)
+        only files changed since then are fetched; an expired token falls
+        back to a full walk. Candidates are upserted in batches while the
+        enumeration is still running.
+        
+        Returns:
+            Dict with total_discovered, new_candidates, existing_candidates,
+            removed_candidates counts, the mode used, and delta_token when
+            delta_token or track_changes was given
+        """
+        logger.info(f"Discovering files in {source_site_url}/{source_library_name}/{source_folder_path}")
+        
+        token = await self._get_graph_token()
+        site_id = await self._get_site_id(source_site_url, token)
+        drive_id = await self._get_drive_id(site_id, source_library_name, token)
+        
+        state: Dict[str, Any] = {}
+        result = None
+        if delta_token:
+            try:
+                changes = self._iter_delta_changes(drive_id, source_folder_path, token, delta_token, state)
+                result = await self._consume_discovered(
+                    changes, source_site_url, source_library_name, source_folder_path, batch_size
                 )
-                
-                if folder_class:
-                    # Pre-populate from folder tree
-                    metadata = self._map_folder_to_metadata(folder_class)
-                    candidate_data.update({
-                        "level1": folder_class.get("level1"),
-                        "level2": folder_class.get("level2"),
-                        "level3": folder_class.get("level3"),
-                        "level4": folder_class.get("level4"),
-                        "level5": folder_class.get("level5"),
-                        "classification_source": "folder_tree",
-                        # NEW: Excel metadata fields
-                        "acct_type": metadata.get("acct_type"),
-                        "acct_name": metadata.get("acct_name"),
-                        "document_type": metadata.get("document_type"),
-                        "document_sub_type": metadata.get("document_sub_type"),
-                        "document_status": metadata.get("document_status", "Active"),
-                        # Legacy fields
-                        "doc_type": metadata.get("doc_type"),
-                        "department": metadata.get("department"),
-                        "customer_name": metadata.get("customer_name"),
-                        "vendor_name": metadata.get("vendor_name"),
-                        "retention_category": metadata.get("retention_category"),
-                        "classification_confidence": 0.9,  # High confidence from folder tree
-                        "classification_method": "folder_tree_lookup",
-                    })
-                
-                await self.collection.insert_one(candidate_data)
-                new_count += 1
+                result["mode"] = "delta"
+            except DeltaTokenExpired:
+                logger.warning("Delta token expired, falling back to full discovery")
+                state = {}
+        
+        if result is None:
+            if delta_token or track_changes:
+                # Taken before the walk so changes made during it show up next time
+                state["delta_token"] = await self._get_latest_delta_link(drive_id, token)
+            files = self._iter_folder_files(drive_id, source_folder_path, token, concurrency=concurrency)
+            result = await self._consume_discovered(
+                files, source_site_url, source_library_name, source_folder_path, batch_size
+            )
+            result["mode"] = "full"
         
-        total = len(files)
-        logger.info(f"Discovery complete: {total} files found, {new_count} new, {existing_count} existing")
+        if state.get("delta_token"):
+            result["delta_token"] = state["delta_token"]
         
-        return {
-            "total_discovered": total,
-            "new_candidates": new_count,
-            "existing_candidates": existing_count
-        }
+        logger.info(
+            f"Discovery complete ({result['mode']}): {result['total_discovered']} files found, "
+            f"{result['new_candidates']} new, {result['existing_candidates']} existing, "
+            f"{result['removed_candidates']} removed"
+        )
+        return result
     
     async def _get_file_content(self, drive_id: str, item_id: str, token: str) -> bytes:
         """Download file content from SharePoint."""
-        async with httpx.AsyncClient(timeout=120.0) as client:
+        async with resilient_client(timeout=120.0) as client:
             resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{item_id}/content",
                 headers={"Authorization": f"Bearer {token}"},
@@ -883,69 +1226,13 @@ class SharePointMigrationService:
         api_key = os.environ.get("EMERGENT_LLM_KEY")
         if not api_key:
             logger.warning("EMERGENT_LLM_KEY not configured")
-            return {
-                "acct_type": "Corporate Internal",
-                "document_type": "Other",
-                "document_status": "Active",
-                "department": "Unknown",
-                "confidence": 0.0,
-                "error": "API key not configured"
-            }
+            return _fallback_classification("API key not configured")
         
         try:
             from emergentintegrations.llm.chat import LlmChat, UserMessage
             
             # Build the classification prompt aligned with Excel metadata structure
-            system_prompt = """You are a document classification expert for Gamer Packaging Inc (GPI), a packaging company.
-Your task is to analyze a file and extract metadata aligned with our SharePoint flat structure.
-
-You MUST respond with ONLY a JSON object in this exact format:
-{
-    "acct_type": "Manufacturers / Vendors | Customer Accounts | Corporate Internal | System Resources",
-    "acct_name": "string - The customer or vendor name (e.g., 'Duke Cannon', 'Menasha Packaging')",
-    "department": "CustomerRelations | Sales | Marketing | Operations | Quality | Finance | HR | IT | Purchasing | Warehouse | Engineering | Unknown",
-    "document_type": "One of: Supplier Documents, Marketing Literature, Capabilities / Catalogs, SOPs / Resources, Plant Warehouse List, Dunnage, Product Specification Sheet, Product Pack-Out Specs, Product Drawings, Graphical Die Line, Forecasts, Inventory Reports, Transaction History, Price List, Misc., Customer Documents, Drawing Approval, Specification Approval, Prototype Approval, Graphics Approval, Project Timeline, Supplier Quote, Customer Quote, Cost Analysis, Training, Agreement Resources, New Business Dev Resources, Quality Documents, Claims/Cases, Warehouse & Consignment, Invoice & Hold Agreement, Supply Agreement, Supply Addendum, Other",
-    "document_sub_type": "string - More specific classification (e.g., 'Beard Care', 'Face Care', 'Corrugated')",
-    "document_status": "Active | Archived | Pending",
-    "project_or_part_number": "string or null - Part numbers like BT-1000-110, GPI-12345",
-    "document_date": "YYYY-MM-DD or null - Date from filename or document",
-    "retention_category": "CustomerComm_LongTerm | WorkingDoc_2yrs | Accounting_7yrs | Legal_10yrs | Unknown",
-    "confidence": 0.0 to 1.0
-}
-
-CRITICAL DEPARTMENT CLASSIFICATION RULES:
-1. "Customer Relations" in path → department = "CustomerRelations", acct_type = "Customer Accounts"
-2. "Sales" in path OR sales orders/quotes → department = "Sales"
-3. "Marketing" in path OR marketing materials → department = "Marketing"
-4. "Quality" in path OR quality docs/claims/inspections → department = "Quality"
-5. "Warehouse" or "WH" or "Shipping" in path → department = "Warehouse"
-6. "Purchasing" or vendor-related procurement → department = "Purchasing"
-7. "Engineering" or technical drawings/specs → department = "Engineering"
-8. "Operations" or production/manufacturing docs → department = "Operations"
-9. "Finance" or "Accounting" or invoices/payments → department = "Finance"
-10. "HR" or employee/benefits docs → department = "HR"
-11. "IT" or technical/system docs → department = "IT"
-
-ACCT_TYPE RULES:
-- If dealing with a CUSTOMER (someone GPI sells to): acct_type = "Customer Accounts"
-- If dealing with a VENDOR/SUPPLIER (someone GPI buys from): acct_type = "Manufacturers / Vendors"
-- If internal company docs with no external party: acct_type = "Corporate Internal"
-
-DOCUMENT TYPE HINTS:
-- "Spec Binder", "Specification" → "Product Specification Sheet"
-- "Art Work", "Artwork", "Die Line" → "Product Drawings" or "Graphical Die Line"
-- "Quote" from customer → "Customer Quote"; Quote to customer → "Supplier Quote"
-- "PO", "Purchase Order" → "Supplier Documents"
-- "Invoice" → "Invoice & Hold Agreement"
-- "SOP", "Procedure", "Guide" → "SOPs / Resources"
-- "Agreement", "Contract" → "Agreement Resources" or "Supply Agreement"
-
-DATE PATTERNS IN FILENAMES:
-- "(9.23.25)" = September 23, 2025 → "2025-09-23"
-- "2025-01-15" → "2025-01-15"
-- "01152025" → "2025-01-15"
-
-RESPOND ONLY WITH THE JSON OBJECT, NO OTHER TEXT."""
+            system_prompt = CLASSIFICATION_SYSTEM_PROMPT
             
             user_content = f"""Classify this file for Gamer Packaging Inc:
 
@@ -979,19 +1266,7 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
             logger.info(f"AI classification response for {file_name}: {response[:200]}")
             
             # Parse JSON response
-            import json
-            response_text = response.strip()
-            
-            # Handle markdown code blocks
-            if response_text.startswith("```"):
-                lines = response_text.split("\n")
-                response_text = "\n".join(lines[1:-1])
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            
-            result = json.loads(response_text.strip())
+            result = _parse_json_response(response)
             result["classification_method"] = "ai_with_path" if text_content else "ai_filename_only"
             
             # Ensure all required fields exist with sensible defaults
@@ -1004,45 +1279,127 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
             
         except Exception as e:
             logger.error(f"AI classification error: {e}")
-            return {
-                "acct_type": "Corporate Internal",
-                "document_type": "Other",
-                "document_status": "Active",
-                "department": "Unknown",
-                "confidence": 0.0,
-                "error": str(e)
-            }
+            return _fallback_classification(str(e))
     
-    async def classify_candidates(self, max_count: int = 25) -> Dict[str, int]:
+    async def _classify_batch_with_ai(self, items: List[Dict[str, str]]) -> List[Dict[str, Any]]:
         """
-        Classify discovered candidates using HYBRID approach:
-        1. First check if folder tree classification already exists
-        2. Use AI only for additional metadata (dates, part numbers) or unmatched paths
+        Classify several files with a single LLM request.
         
-        Args:
-            max_count: Maximum number of candidates to process
-            
-        Returns:
-            Dict with processed, updated, high_confidence, low_confidence, folder_tree_matches counts
+        Each item carries file_name, legacy_path and text_content. Returns one
+        result per item in input order; items the model leaves out of its answer
+        get the same zero-confidence fallback as a failed single classification.
         """
-        logger.info(f"Classifying up to {max_count} candidates (hybrid approach)")
-        
-        # Get candidates to classify
-        cursor = self.collection.find(
-            {"status": {"$in": ["discovered", "classified"]}}
-        ).limit(max_count)
-        
-        candidates = await cursor.to_list(length=max_count)
+        if not items:
+            return []
         
-        if not candidates:
-            logger.info("No candidates to classify")
-            return {"processed": 0, "updated": 0, "high_confidence": 0, "low_confidence": 0, "folder_tree_matches": 0}
+        api_key = os.environ.get("EMERGENT_LLM_KEY")
+        if not api_key:
+            logger.warning("EMERGENT_LLM_KEY not configured")
+            return [_fallback_classification("API key not configured") for _ in items]
         
-        token = await self._get_graph_token()
-        processed = 0
-        high_confidence = 0
+        try:
+            from emergentintegrations.llm.chat import LlmChat, UserMessage
+            
+            sections = []
+            for index, item in enumerate(items):
+                text_content = (item.get("text_content") or "")[:AI_BATCH_TEXT_CHARS]
+                section = f"### File {index}\nFile name: {item['file_name']}\nFull path: {item['legacy_path']}\n"
+                if text_content:
+                    section += f"Document text (first {AI_BATCH_TEXT_CHARS} chars):\n{text_content}\n"
+                else:
+                    section += "No text content available - classify based on file name and path only.\n"
+                sections.append(section)
+            
+            user_content = (
+                f"Classify these {len(items)} files for Gamer Packaging Inc. "
+                "For each, determine whether it relates to a CUSTOMER, a VENDOR/SUPPLIER or is INTERNAL.\n\n"
+                + "\n".join(sections)
+            )
+            
+            chat = LlmChat(
+                api_key=api_key,
+                session_id=f"migration_classify_batch_{uuid.uuid4().hex[:12]}",
+                system_message=CLASSIFICATION_SYSTEM_PROMPT + BATCH_CLASSIFICATION_INSTRUCTIONS
+            ).with_model("gemini", "gemini-2.0-flash")
+            
+            response = await chat.send_message(UserMessage(text=user_content))
+            logger.info(f"AI batch classification response for {len(items)} files: {response[:200]}")
+            
+            parsed = _parse_json_response(response)
+            if isinstance(parsed, dict):
+                parsed = parsed.get("results") or [parsed]
+            
+            by_index = {}
+            for entry in parsed:
+                if isinstance(entry, dict) and isinstance(entry.get("index"), int):
+                    by_index[entry.pop("index")] = entry
+            
+            results = []
+            for index, item in enumerate(items):
+                result = by_index.get(index)
+                if result is None:
+                    results.append(_fallback_classification("Missing from batch response"))
+                    continue
+                result["classification_method"] = "ai_batch_with_path" if item.get("text_content") else "ai_batch_filename_only"
+                result.setdefault("document_status", "Active")
+                result.setdefault("acct_type", "Corporate Internal")
+                result.setdefault("document_type", "Other")
+                result.setdefault("department", "Unknown")
+                results.append(result)
+            return results
+            
+        except Exception as e:
+            logger.error(f"AI batch classification error: {e}")
+            return [_fallback_classification(str(e)) for _ in items]
+    
+    async def classify_candidates(
+        self,
+        max_count: int = 25,
+        batch_mode: bool = False,
+        batch_size: int = AI_BATCH_SIZE,
+        concurrency: int = AI_BATCH_CONCURRENCY,
+        after_id: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """
+        Classify discovered candidates using HYBRID approach:
+        1. First check if folder tree classification already exists
+        2. Use AI only for additional metadata (dates, part numbers) or unmatched paths
+        
+        In batch mode, candidates that need full AI classification are packed
+        batch_size at a time into a single LLM request, with up to concurrency
+        requests (and file downloads) in flight at once.
+        
+        Args:
+            max_count: Maximum number of candidates to process
+            batch_mode: Classify unmatched candidates with multi-file LLM requests
+            batch_size: Files per LLM request in batch mode
+            concurrency: Concurrent LLM requests / downloads in batch mode
+            after_id: Only consider candidates whose _id is greater (resumable cursor)
+            
+        Returns:
+            Dict with processed, updated, high_confidence, low_confidence, folder_tree_matches
+            counts and last_id, the _id of the last candidate examined
+        """
+        logger.info(f"Classifying up to {max_count} candidates (hybrid approach)")
+        
+        # Get candidates to classify, in _id order so callers can page with after_id
+        query = {"status": {"$in": ["discovered", "classified"]}}
+        if after_id is not None:
+            query["_id"] = {"$gt": after_id}
+        cursor = self.collection.find(query).sort("_id", 1).limit(max_count)
+        
+        candidates = await cursor.to_list(length=max_count)
+        
+        if not candidates:
+            logger.info("No candidates to classify")
+            return {"processed": 0, "updated": 0, "high_confidence": 0, "low_confidence": 0, "folder_tree_matches": 0, "last_id": None}
+        
+        token = await self._get_graph_token()
+        processed = 0
+        high_confidence = 0
         low_confidence = 0
         folder_tree_matches = 0
+        pending_ai = []
         now = datetime.now(timezone.utc).isoformat()
         
         for candidate in candidates:
@@ -1140,93 +1497,37 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
                     )
                     high_confidence += 1
                     
+                elif batch_mode:
+                    # Classified together with other unmatched candidates below
+                    pending_ai.append(candidate)
+                    continue
+                
                 else:
                     # No folder tree match - use full AI classification
-                    text_content = ""
-                    try:
-                        content = await self._get_file_content(
-                            candidate["source_drive_id"],
-                            candidate["source_item_id"],
-                            token
-                        )
-                        text_content = await self._extract_text_from_file(
-                            candidate["file_name"],
-                            content
-                        )
-                    except Exception as e:
-                        logger.warning(f"Could not extract content from {candidate['file_name']}: {e}")
-                    
-                    # Full AI classification
+                    text_content = await self._fetch_text_content(candidate, token)
                     result = await self._classify_with_ai(
                         candidate["file_name"],
                         candidate["legacy_path"],
                         text_content
                     )
                     
-                    confidence = result.get("confidence", 0.0)
-                    new_status = "ready_for_migration" if confidence >= CONFIDENCE_THRESHOLD else "classified"
-                    
-                    if confidence >= CONFIDENCE_THRESHOLD:
+                    if await self._apply_ai_classification(candidate, result, now):
                         high_confidence += 1
                     else:
                         low_confidence += 1
-                    
-                    # Update candidate with AI results (includes new Excel metadata fields)
-                    update_data = {
-                        # NEW: Excel metadata fields
-                        "acct_type": result.get("acct_type"),
-                        "acct_name": result.get("acct_name"),
-                        "document_type": result.get("document_type"),
-                        "document_sub_type": result.get("document_sub_type"),
-                        "document_status": result.get("document_status", "Active"),
-                        # Legacy fields
-                        "doc_type": result.get("doc_type"),
-                        "department": result.get("department"),
-                        "customer_name": result.get("customer_name") or result.get("acct_name"),
-                        "vendor_name": result.get("vendor_name"),
-                        "project_or_part_number": result.get("project_or_part_number"),
-                        "document_date": result.get("document_date"),
-                        "retention_category": result.get("retention_category"),
-                        "classification_confidence": confidence,
-                        "classification_source": "ai",
-                        "classification_method": result.get("classification_method", "ai"),
-                        "status": new_status,
-                        "updated_utc": now
-                    }
-                    
-                    # Enhance with customer matching
-                    enhanced = await self._enhance_with_customer_match(
-                        update_data,
-                        candidate["file_name"],
-                        candidate.get("legacy_path", "")
-                    )
-                    if enhanced.get("customer_match_confidence"):
-                        update_data["acct_name"] = enhanced["acct_name"]
-                        update_data["customer_name"] = enhanced["customer_name"]
-                        update_data["customer_number"] = enhanced.get("customer_number")
-                        update_data["customer_match_confidence"] = enhanced["customer_match_confidence"]
-                        if enhanced.get("acct_type"):
-                            update_data["acct_type"] = enhanced["acct_type"]
-                        # Boost confidence if we matched a customer
-                        update_data["classification_confidence"] = max(confidence, enhanced["customer_match_confidence"])
-                    
-                    await self.collection.update_one(
-                        {"id": candidate["id"]},
-                        {"$set": update_data}
-                    )
                 
                 processed += 1
                 
             except Exception as e:
-                logger.error(f"Error classifying {candidate.get('file_name')}: {e}")
-                await self.collection.update_one(
-                    {"id": candidate["id"]},
-                    {"$set": {
-                        "status": "error",
-                        "migration_error": str(e),
-                        "updated_utc": now
-                    }}
-                )
+                await self._mark_classification_error(candidate, e, now)
+        
+        if pending_ai:
+            batch_counts = await self._classify_pending_in_batches(
+                pending_ai, token, now, batch_size, concurrency
+            )
+            processed += batch_counts["processed"]
+            high_confidence += batch_counts["high_confidence"]
+            low_confidence += batch_counts["low_confidence"]
         
         logger.info(f"Classification complete: {processed} processed, {folder_tree_matches} folder tree matches, {high_confidence} high confidence, {low_confidence} low confidence")
         
@@ -1235,8 +1536,147 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
             "updated": processed,
             "high_confidence": high_confidence,
             "low_confidence": low_confidence,
-            "folder_tree_matches": folder_tree_matches
+            "folder_tree_matches": folder_tree_matches,
+            "last_id": candidates[-1].get("_id")
+        }
+    
+    async def _mark_classification_error(self, candidate: Dict, error: Exception, now: str):
+        """Record a classification failure on the candidate."""
+        logger.error(f"Error classifying {candidate.get('file_name')}: {error}")
+        await self.collection.update_one(
+            {"id": candidate["id"]},
+            {"$set": {
+                "status": "error",
+                "migration_error": str(error),
+                "updated_utc": now
+            }}
+        )
+    
+    async def _fetch_text_content(self, candidate: Dict, token: str) -> str:
+        """Download a candidate and extract text for AI classification ('' on failure)."""
+        try:
+            content = await self._get_file_content(
+                candidate["source_drive_id"],
+                candidate["source_item_id"],
+                token
+            )
+            return await self._extract_text_from_file(
+                candidate["file_name"],
+                content
+            )
+        except Exception as e:
+            logger.warning(f"Could not extract content from {candidate['file_name']}: {e}")
+            return ""
+    
+    async def _apply_ai_classification(self, candidate: Dict, result: Dict[str, Any], now: str) -> bool:
+        """
+        Persist a full AI classification result on a candidate.
+        
+        Returns True if the candidate reached the confidence threshold and was
+        marked ready_for_migration.
+        """
+        confidence = result.get("confidence", 0.0)
+        new_status = "ready_for_migration" if confidence >= CONFIDENCE_THRESHOLD else "classified"
+        
+        # Update candidate with AI results (includes new Excel metadata fields)
+        update_data = {
+            # NEW: Excel metadata fields
+            "acct_type": result.get("acct_type"),
+            "acct_name": result.get("acct_name"),
+            "document_type": result.get("document_type"),
+            "document_sub_type": result.get("document_sub_type"),
+            "document_status": result.get("document_status", "Active"),
+            # Legacy fields
+            "doc_type": result.get("doc_type"),
+            "department": result.get("department"),
+            "customer_name": result.get("customer_name") or result.get("acct_name"),
+            "vendor_name": result.get("vendor_name"),
+            "project_or_part_number": result.get("project_or_part_number"),
+            "document_date": result.get("document_date"),
+            "retention_category": result.get("retention_category"),
+            "classification_confidence": confidence,
+            "classification_source": "ai",
+            "classification_method": result.get("classification_method", "ai"),
+            "status": new_status,
+            "updated_utc": now
         }
+        
+        # Enhance with customer matching
+        enhanced = await self._enhance_with_customer_match(
+            update_data,
+            candidate["file_name"],
+            candidate.get("legacy_path", "")
+        )
+        if enhanced.get("customer_match_confidence"):
+            update_data["acct_name"] = enhanced["acct_name"]
+            update_data["customer_name"] = enhanced["customer_name"]
+            update_data["customer_number"] = enhanced.get("customer_number")
+            update_data["customer_match_confidence"] = enhanced["customer_match_confidence"]
+            if enhanced.get("acct_type"):
+                update_data["acct_type"] = enhanced["acct_type"]
+            # Boost confidence if we matched a customer
+            update_data["classification_confidence"] = max(confidence, enhanced["customer_match_confidence"])
+        
+        await self.collection.update_one(
+            {"id": candidate["id"]},
+            {"$set": update_data}
+        )
+        
+        return confidence >= CONFIDENCE_THRESHOLD
+    
+    async def _classify_pending_in_batches(
+        self,
+        candidates: List[Dict],
+        token: str,
+        now: str,
+        batch_size: int,
+        concurrency: int
+    ) -> Dict[str, int]:
+        """
+        Fully AI-classify candidates using multi-file LLM requests.
+        
+        Text extraction and LLM requests both run with at most `concurrency`
+        operations in flight.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        batch_size = max(1, batch_size)
+        counts = {"processed": 0, "high_confidence": 0, "low_confidence": 0}
+        
+        async def fetch(candidate):
+            async with semaphore:
+                return await self._fetch_text_content(candidate, token)
+        
+        texts = await asyncio.gather(*(fetch(c) for c in candidates))
+        
+        async def classify_batch(start: int):
+            batch = candidates[start:start + batch_size]
+            items = [
+                {
+                    "file_name": c["file_name"],
+                    "legacy_path": c["legacy_path"],
+                    "text_content": texts[start + offset]
+                }
+                for offset, c in enumerate(batch)
+            ]
+            async with semaphore:
+                results = await self._classify_batch_with_ai(items)
+            
+            for candidate, result in zip(batch, results):
+                try:
+                    if await self._apply_ai_classification(candidate, result, now):
+                        counts["high_confidence"] += 1
+                    else:
+                        counts["low_confidence"] += 1
+                    counts["processed"] += 1
+                except Exception as e:
+                    await self._mark_classification_error(candidate, e, now)
+        
+        await asyncio.gather(*(
+            classify_batch(start) for start in range(0, len(candidates), batch_size)
+        ))
+        
+        logger.info(f"Batch AI classification: {counts['processed']} of {len(candidates)} candidates in {(len(candidates) + batch_size - 1) // batch_size} requests")
+        return counts
     
     async def _extract_dates_and_parts(self, file_name: str, legacy_path: str) -> Dict[str, Any]:
         """
@@ -1299,7 +1739,7 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
         """
         column_mapping = {}  # Maps our names to SharePoint internal names
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        async with resilient_client(timeout=60.0) as client:
             # Get existing columns
             resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/sites/{site_id}/lists/{list_id}/columns",
@@ -1323,6 +1763,7 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
             logger.info(f"Existing columns in destination: {list(existing_by_name.keys())}")
             
             # Create missing columns
+            to_create: List[GraphRequest] = []
             for col_def in REQUIRED_COLUMNS:
                 target_name = col_def["name"]
                 target_lower = target_name.lower()
@@ -1360,31 +1801,34 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
                         "displayAs": "dropDownMenu"
                     }
                 
-                create_resp = await client.post(
-                    f"https://graph.microsoft.com/v1.0/sites/{site_id}/lists/{list_id}/columns",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    json=col_payload
-                )
-                
-                if create_resp.status_code in (200, 201):
-                    created_col = create_resp.json()
-                    internal_name = created_col.get("name", target_name)
-                    column_mapping[target_name] = internal_name
-                    logger.info(f"Created column: {target_name} -> {internal_name}")
-                else:
-                    error_text = create_resp.text[:300]
-                    logger.warning(f"Could not create column {target_name}: {create_resp.status_code} - {error_text}")
-                    # Still add to mapping with assumed name - SharePoint might accept it
-                    column_mapping[target_name] = target_name
+                # Chain creates so the list schema is changed one column at a time
+                to_create.append(GraphRequest(
+                    id=target_name,
+                    method="POST",
+                    url=f"/sites/{site_id}/lists/{list_id}/columns",
+                    body=col_payload,
+                    depends_on=[to_create[-1].id] if to_create else []
+                ))
+            
+            if to_create:
+                responses = await send_batch(client, token, to_create)
+                for request in to_create:
+                    target_name = request.id
+                    create_resp = responses[target_name]
+                    if create_resp.ok:
+                        internal_name = (create_resp.body or {}).get("name", target_name)
+                        column_mapping[target_name] = internal_name
+                        logger.info(f"Created column: {target_name} -> {internal_name}")
+                    else:
+                        logger.warning(f"Could not create column {target_name}: {create_resp.status} - {create_resp.error_text}")
+                        # Still add to mapping with assumed name - SharePoint might accept it
+                        column_mapping[target_name] = target_name
         
         return column_mapping
     
     async def _get_list_id(self, site_id: str, library_name: str, token: str) -> str:
         """Get the list ID for a document library."""
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with resilient_client(timeout=30.0) as client:
             resp = await client.get(
                 f"https://graph.microsoft.com/v1.0/sites/{site_id}/lists",
                 headers={"Authorization": f"Bearer {token}"}
@@ -1415,7 +1859,7 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
         """
         CHUNK_SIZE = 10 * 1024 * 1024  # 10MB chunks (must be multiple of 320KB)
         
-        async with httpx.AsyncClient(timeout=300.0) as client:
+        async with resilient_client(timeout=300.0) as client:
             # Create upload session
             create_session_url = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{file_name}:/createUploadSession"
             
@@ -1494,12 +1938,318 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
             
             raise Exception("Upload session completed without final response")
     
+    async def _get_drive_root_id(self, drive_id: str, token: str) -> str:
+        """Get the item ID of a drive's root folder."""
+        async with resilient_client(timeout=30.0) as client:
+            resp = await client.get(
+                f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root",
+                params={"$select": "id"},
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            if resp.status_code != 200:
+                raise Exception(f"Failed to get drive root: {resp.status_code}")
+            return resp.json()["id"]
+    
+    async def _copy_item_server_side(
+        self,
+        client: httpx.AsyncClient,
+        candidate: Dict,
+        target_drive_id: str,
+        target_root_id: str,
+        token: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Copy a file with Graph's server-side copy action and wait for it to finish.
+        
+        Returns the new item, or None when Graph refuses or fails the copy so
+        the caller can fall back to streaming the file.
+        """
+        file_name = candidate["file_name"]
+        resp = await client.post(
+            f"https://graph.microsoft.com/v1.0/drives/{candidate['source_drive_id']}/items/{candidate['source_item_id']}/copy",
+            params={"@microsoft.graph.conflictBehavior": "replace"},
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "parentReference": {"driveId": target_drive_id, "id": target_root_id},
+                "name": file_name
+            }
+        )
+        monitor_url = resp.headers.get("Location")
+        if resp.status_code != 202 or not monitor_url:
+            logger.warning(f"Server-side copy not accepted for {file_name}: {resp.status_code} - {resp.text[:200]}")
+            return None
+        
+        delay = 1.0
+        deadline = time.monotonic() + COPY_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10.0)
+            
+            # The monitor URL is pre-authenticated
+            status_resp = await client.get(monitor_url)
+            if status_resp.status_code == 303:
+                item_url = status_resp.headers["Location"]
+            elif status_resp.status_code in (200, 202):
+                status = status_resp.json()
+                if status.get("status") == "failed":
+                    logger.warning(f"Server-side copy failed for {file_name}: {status.get('error')}")
+                    return None
+                if status.get("status") != "completed":
+                    continue
+                item_url = f"https://graph.microsoft.com/v1.0/drives/{target_drive_id}/items/{status['resourceId']}"
+            else:
+                logger.warning(f"Copy monitor error for {file_name}: {status_resp.status_code}")
+                return None
+            
+            item_resp = await client.get(item_url, headers={"Authorization": f"Bearer {token}"})
+            if item_resp.status_code != 200:
+                raise Exception(f"Copied item lookup failed: {item_resp.status_code}")
+            return item_resp.json()
+        
+        raise Exception(f"Server-side copy timed out after {COPY_TIMEOUT_SECONDS}s")
+    
+    async def _simple_upload(
+        self,
+        client: httpx.AsyncClient,
+        drive_id: str,
+        file_name: str,
+        content: bytes,
+        token: str
+    ) -> Dict[str, Any]:
+        """Upload a small file with a single PUT."""
+        upload_resp = await client.put(
+            f"https://graph.microsoft.com/v1.0/drives/{drive_id}/root:/{quote(file_name)}:/content",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/octet-stream"
+            },
+            content=content
+        )
+        if upload_resp.status_code not in (200, 201):
+            raise Exception(f"Upload failed: {upload_resp.status_code} - {upload_resp.text[:200]}")
+        return upload_resp.json()
+    
+    async def _stream_transfer(
+        self,
+        client: httpx.AsyncClient,
+        candidate: Dict,
+        target_drive_id: str,
+        token: str
+    ) -> Dict[str, Any]:
+        """
+        Stream a file from the source drive into the target drive.
+        
+        Files above SIMPLE_UPLOAD_LIMIT are forwarded to an upload session
+        chunk by chunk while downloading, so at most one chunk is in memory.
+        """
+        file_name = candidate["file_name"]
+        
+        async with client.stream(
+            "GET",
+            f"https://graph.microsoft.com/v1.0/drives/{candidate['source_drive_id']}/items/{candidate['source_item_id']}/content",
+            headers={"Authorization": f"Bearer {token}"},
+            follow_redirects=True
+        ) as download:
+            if download.status_code != 200:
+                raise Exception(f"Failed to download file: {download.status_code}")
+            
+            file_size = int(download.headers.get("Content-Length") or 0)
+            if not file_size or file_size <= SIMPLE_UPLOAD_LIMIT:
+                content = await download.aread()
+                if len(content) > SIMPLE_UPLOAD_LIMIT:
+                    # Source sent no Content-Length; use a buffered upload session
+                    return await self._upload_large_file(target_drive_id, file_name, content, token)
+                return await self._simple_upload(client, target_drive_id, file_name, content, token)
+            
+            logger.info(f"Streaming large file: {file_name} ({file_size} bytes)")
+            session_resp = await client.post(
+                f"https://graph.microsoft.com/v1.0/drives/{target_drive_id}/root:/{quote(file_name)}:/createUploadSession",
+                headers={
+                    "Authorization": f"Bearer {token}",
+                    "Content-Type": "application/json"
+                },
+                json={
+                    "item": {
+                        "@microsoft.graph.conflictBehavior": "replace",
+                        "name": file_name
+                    }
+                }
+            )
+            if session_resp.status_code not in (200, 201):
+                raise Exception(f"Failed to create upload session: {session_resp.status_code} - {session_resp.text[:200]}")
+            upload_url = session_resp.json()["uploadUrl"]
+            
+            offset = 0
+            buffer = bytearray()
+            new_item = None
+            
+            async def put_chunk(chunk: bytes):
+                chunk_resp = await client.put(
+                    upload_url,
+                    headers={
+                        "Content-Length": str(len(chunk)),
+                        "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{file_size}"
+                    },
+                    content=chunk
+                )
+                if chunk_resp.status_code == 202:
+                    return None
+                if chunk_resp.status_code in (200, 201):
+                    return chunk_resp.json()
+                raise Exception(f"Chunk upload failed: {chunk_resp.status_code} - {chunk_resp.text[:200]}")
+            
+            async for data in download.aiter_bytes():
+                buffer.extend(data)
+                while len(buffer) >= UPLOAD_CHUNK_SIZE:
+                    chunk = bytes(buffer[:UPLOAD_CHUNK_SIZE])
+                    del buffer[:UPLOAD_CHUNK_SIZE]
+                    new_item = await put_chunk(chunk)
+                    offset += len(chunk)
+            if buffer:
+                new_item = await put_chunk(bytes(buffer))
+            
+            if new_item is None:
+                raise Exception("Upload session completed without final response")
+            logger.info(f"Large file upload complete: {file_name} ({file_size} bytes)")
+            return new_item
+    
+    def _build_metadata_fields(self, candidate: Dict, column_mapping: Dict[str, str]) -> Dict[str, Any]:
+        """Build the list item fields for a candidate using the column mapping."""
+        # Use column mapping to get correct SharePoint column names
+        def get_col(name):
+            return column_mapping.get(name, name)
+        
+        # Prepare metadata fields - our custom columns only
+        acct_type = candidate.get("acct_type") or "Corporate Internal"
+        # Default AcctName to "Gamer Packaging" for internal/system docs
+        acct_name = candidate.get("acct_name") or candidate.get("customer_name") or candidate.get("vendor_name")
+        if not acct_name and acct_type in ["Corporate Internal", "System Resources"]:
+            acct_name = "Gamer Packaging"
+        
+        fields = {
+            # Excel metadata columns
+            get_col("AcctType"): acct_type,
+            get_col("AcctName"): acct_name or "",
+            get_col("DocumentType"): candidate.get("document_type") or "Other",
+            get_col("DocumentSubType"): candidate.get("document_sub_type") or "",
+            get_col("DocumentStatus"): candidate.get("document_status") or "Active",
+            # Legacy/tracking fields
+            get_col("ProjectOrPartNumber"): candidate.get("project_or_part_number") or "",
+            get_col("RetentionCategory"): candidate.get("retention_category") or "Unknown",
+            get_col("LegacyPath"): candidate.get("legacy_path") or "",
+            get_col("LegacyUrl"): candidate.get("legacy_url") or "",
+            # Folder tree levels for auditing
+            get_col("Level1"): candidate.get("level1") or "",
+            get_col("Level2"): candidate.get("level2") or "",
+            get_col("Level3"): candidate.get("level3") or "",
+        }
+        
+        # Add DocumentDate if available
+        if candidate.get("document_date"):
+            fields[get_col("DocumentDate")] = candidate["document_date"]
+        
+        return fields
+    
+    async def _write_metadata_batch(
+        self,
+        client: httpx.AsyncClient,
+        target_drive_id: str,
+        items: Dict[str, Dict[str, Any]],
+        token: str
+    ) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        Write list item fields for several drive items with Graph $batch.
+        
+        Each item is a single PATCH on its listItem/fields, so no separate
+        list item lookup is needed.
+        
+        Args:
+            items: Fields to write, by drive item ID
+            
+        Returns:
+            (metadata_write_status, metadata_write_error) by drive item ID
+        """
+        item_ids = list(items)
+        requests = [
+            GraphRequest(
+                id=str(index),
+                method="PATCH",
+                url=f"/drives/{target_drive_id}/items/{item_id}/listItem/fields",
+                body=items[item_id]
+            )
+            for index, item_id in enumerate(item_ids)
+        ]
+        responses = await send_batch(client, token, requests)
+        
+        results = {}
+        for index, item_id in enumerate(item_ids):
+            response = responses[str(index)]
+            if response.ok:
+                results[item_id] = ("success", None)
+            elif response.status == 404:
+                results[item_id] = ("list_item_not_found", None)
+            else:
+                results[item_id] = ("failed", response.error_text)
+        return results
+    
+    async def _apply_metadata_to_items(
+        self,
+        client: httpx.AsyncClient,
+        target_drive_id: str,
+        candidates_by_item: Dict[str, Dict],
+        column_mapping: Dict[str, str],
+        token: str
+    ) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        Write metadata for migrated candidates and record the outcome on each.
+        
+        Args:
+            candidates_by_item: Candidate by target drive item ID
+            
+        Returns:
+            (metadata_write_status, metadata_write_error) by drive item ID
+        """
+        fields_by_item = {
+            item_id: self._build_metadata_fields(candidate, column_mapping)
+            for item_id, candidate in candidates_by_item.items()
+        }
+        logger.info(f"Writing metadata for {len(fields_by_item)} items")
+        results = await self._write_metadata_batch(client, target_drive_id, fields_by_item, token)
+        
+        now = datetime.now(timezone.utc).isoformat()
+        operations = []
+        for item_id, (status, error) in results.items():
+            file_name = candidates_by_item[item_id].get("file_name")
+            if status == "success":
+                logger.info(f"Metadata written successfully for {file_name}")
+            elif status == "failed":
+                logger.warning(f"Could not update metadata for {file_name}: {error}")
+            else:
+                logger.warning(f"Could not get list item for {file_name}")
+            operations.append(UpdateOne(
+                {"id": candidates_by_item[item_id]["id"]},
+                {"$set": {
+                    "metadata_write_status": status,
+                    "metadata_write_error": error,
+                    "updated_utc": now
+                }}
+            ))
+        
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        return results
+    
     async def migrate_candidates(
         self,
         target_site_url: str = DEFAULT_TARGET_SITE,
         target_library_name: str = DEFAULT_TARGET_LIBRARY,
         max_count: int = 20,
-        only_ids: Optional[List[str]] = None
+        only_ids: Optional[List[str]] = None,
+        transfer_mode: str = "auto",
+        concurrency: int = MIGRATE_CONCURRENCY
     ) -> Dict[str, int]:
         """
         Migrate ready candidates to the target SharePoint site.
@@ -1509,11 +2259,16 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
             target_library_name: Destination library name
             max_count: Maximum number of files to migrate
             only_ids: Optional list of specific candidate IDs to migrate
+            transfer_mode: "auto" tries Graph server-side copy and streams the
+                file when the copy is refused; "copy" and "stream" force one
+            concurrency: Number of candidates transferred at once
             
         Returns:
             Dict with attempted, migrated, errors counts
         """
-        logger.info(f"Migrating up to {max_count} candidates to {target_site_url}")
+        if transfer_mode not in TRANSFER_MODES:
+            raise ValueError(f"Unknown transfer mode: {transfer_mode}")
+        logger.info(f"Migrating up to {max_count} candidates to {target_site_url} ({transfer_mode})")
         
         # Get candidates to migrate
         if only_ids:
@@ -1533,179 +2288,98 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
         target_site_id = await self._get_site_id(target_site_url, token)
         target_drive_id = await self._get_drive_id(target_site_id, target_library_name, token)
         target_list_id = await self._get_list_id(target_site_id, target_library_name, token)
+        target_root_id = None
+        if transfer_mode != "stream":
+            target_root_id = await self._get_drive_root_id(target_drive_id, token)
         
         # Ensure destination columns exist and get mapping
         column_mapping = await self._ensure_destination_columns(target_site_id, target_list_id, token)
         logger.info(f"Column mapping: {column_mapping}")
         
-        attempted = 0
-        migrated = 0
-        errors = 0
-        metadata_errors = 0
+        counts = {"attempted": 0, "migrated": 0, "errors": 0, "metadata_errors": 0, "copied": 0, "streamed": 0}
         now = datetime.now(timezone.utc).isoformat()
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        migrated_items: Dict[str, Dict] = {}  # candidate by new drive item ID
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            for candidate in candidates:
-                attempted += 1
+        async def migrate_one(client: httpx.AsyncClient, candidate: Dict):
+            counts["attempted"] += 1
+            
+            # Skip already migrated
+            if candidate.get("status") == "migrated" and candidate.get("target_item_id"):
+                logger.info(f"Skipping already migrated: {candidate['file_name']}")
+                return
+            
+            file_name = candidate["file_name"]
+            try:
+                async with semaphore:
+                    new_item = None
+                    transfer_method = "copy"
+                    if transfer_mode != "stream":
+                        new_item = await self._copy_item_server_side(
+                            client, candidate, target_drive_id, target_root_id, token
+                        )
+                        if new_item is None and transfer_mode == "copy":
+                            raise Exception("Server-side copy failed")
+                    if new_item is None:
+                        transfer_method = "stream"
+                        new_item = await self._stream_transfer(client, candidate, target_drive_id, token)
+                    counts["copied" if transfer_method == "copy" else "streamed"] += 1
                 
-                # Skip already migrated
-                if candidate.get("status") == "migrated" and candidate.get("target_item_id"):
-                    logger.info(f"Skipping already migrated: {candidate['file_name']}")
-                    continue
+                new_item_id = new_item["id"]
                 
-                try:
-                    # Download file from source
-                    file_content = await self._get_file_content(
-                        candidate["source_drive_id"],
-                        candidate["source_item_id"],
-                        token
-                    )
-                    
-                    file_name = candidate["file_name"]
-                    file_size = len(file_content)
-                    
-                    # Use chunked upload for files > 4MB
-                    if file_size > 4 * 1024 * 1024:
-                        logger.info(f"Using chunked upload for large file: {file_name} ({file_size} bytes)")
-                        new_item = await self._upload_large_file(
-                            target_drive_id,
-                            file_name,
-                            file_content,
-                            token
-                        )
-                    else:
-                        # Simple upload for small files
-                        upload_url = f"https://graph.microsoft.com/v1.0/drives/{target_drive_id}/root:/{file_name}:/content"
-                        
-                        upload_resp = await client.put(
-                            upload_url,
-                            headers={
-                                "Authorization": f"Bearer {token}",
-                                "Content-Type": "application/octet-stream"
-                            },
-                            content=file_content
-                        )
-                        
-                        if upload_resp.status_code not in (200, 201):
-                            raise Exception(f"Upload failed: {upload_resp.status_code} - {upload_resp.text[:200]}")
-                        
-                        new_item = upload_resp.json()
-                    
-                    new_item_id = new_item["id"]
-                    new_web_url = new_item.get("webUrl", "")
-                    
-                    # Update metadata on the new item
-                    # Get the list item ID
-                    list_item_resp = await client.get(
-                        f"https://graph.microsoft.com/v1.0/drives/{target_drive_id}/items/{new_item_id}/listItem",
-                        headers={"Authorization": f"Bearer {token}"}
-                    )
-                    
-                    metadata_write_status = "not_attempted"
-                    metadata_write_error = None
-                    
-                    if list_item_resp.status_code == 200:
-                        list_item_id = list_item_resp.json()["id"]
-                        
-                        # Use column mapping to get correct SharePoint column names
-                        def get_col(name):
-                            return column_mapping.get(name, name)
-                        
-                        # Prepare metadata fields - our custom columns only
-                        acct_type = candidate.get("acct_type") or "Corporate Internal"
-                        # Default AcctName to "Gamer Packaging" for internal/system docs
-                        acct_name = candidate.get("acct_name") or candidate.get("customer_name") or candidate.get("vendor_name")
-                        if not acct_name and acct_type in ["Corporate Internal", "System Resources"]:
-                            acct_name = "Gamer Packaging"
-                        
-                        fields = {
-                            # Excel metadata columns
-                            get_col("AcctType"): acct_type,
-                            get_col("AcctName"): acct_name or "",
-                            get_col("DocumentType"): candidate.get("document_type") or "Other",
-                            get_col("DocumentSubType"): candidate.get("document_sub_type") or "",
-                            get_col("DocumentStatus"): candidate.get("document_status") or "Active",
-                            # Legacy/tracking fields
-                            get_col("ProjectOrPartNumber"): candidate.get("project_or_part_number") or "",
-                            get_col("RetentionCategory"): candidate.get("retention_category") or "Unknown",
-                            get_col("LegacyPath"): candidate.get("legacy_path") or "",
-                            get_col("LegacyUrl"): candidate.get("legacy_url") or "",
-                            # Folder tree levels for auditing
-                            get_col("Level1"): candidate.get("level1") or "",
-                            get_col("Level2"): candidate.get("level2") or "",
-                            get_col("Level3"): candidate.get("level3") or "",
-                        }
-                        
-                        # Add DocumentDate if available
-                        if candidate.get("document_date"):
-                            fields[get_col("DocumentDate")] = candidate["document_date"]
-                        
-                        logger.info(f"Writing metadata for {file_name}: {list(fields.keys())}")
-                        
-                        # Update list item fields
-                        update_resp = await client.patch(
-                            f"https://graph.microsoft.com/v1.0/sites/{target_site_id}/lists/{target_list_id}/items/{list_item_id}/fields",
-                            headers={
-                                "Authorization": f"Bearer {token}",
-                                "Content-Type": "application/json"
-                            },
-                            json=fields
-                        )
-                        
-                        if update_resp.status_code in (200, 201):
-                            metadata_write_status = "success"
-                            logger.info(f"Metadata written successfully for {file_name}")
-                        else:
-                            metadata_write_status = "failed"
-                            metadata_write_error = update_resp.text[:300]
-                            metadata_errors += 1
-                            logger.warning(f"Could not update metadata for {file_name}: {update_resp.status_code} - {metadata_write_error}")
-                    else:
-                        metadata_write_status = "list_item_not_found"
-                        logger.warning(f"Could not get list item for {file_name}: {list_item_resp.status_code}")
-                    
-                    # Update candidate record
-                    await self.collection.update_one(
-                        {"id": candidate["id"]},
-                        {"$set": {
-                            "status": "migrated",
-                            "target_site_url": target_site_url,
-                            "target_library_name": target_library_name,
-                            "target_item_id": new_item_id,
-                            "target_url": new_web_url,
-                            "migration_timestamp": now,
-                            "migration_error": None,
-                            "metadata_write_status": metadata_write_status,
-                            "metadata_write_error": metadata_write_error,
-                            "updated_utc": now
-                        }}
-                    )
-                    
-                    migrated += 1
-                    logger.info(f"Migrated: {file_name} (metadata: {metadata_write_status})")
-                    
-                except Exception as e:
-                    errors += 1
-                    error_msg = str(e)[:250]
-                    logger.error(f"Error migrating {candidate.get('file_name')}: {error_msg}")
-                    
-                    await self.collection.update_one(
-                        {"id": candidate["id"]},
-                        {"$set": {
-                            "status": "error",
-                            "migration_error": error_msg,
-                            "updated_utc": now
-                        }}
-                    )
+                # Record the transfer now; metadata is written in one batch afterwards
+                await self.collection.update_one(
+                    {"id": candidate["id"]},
+                    {"$set": {
+                        "status": "migrated",
+                        "target_site_url": target_site_url,
+                        "target_library_name": target_library_name,
+                        "target_item_id": new_item_id,
+                        "target_url": new_item.get("webUrl", ""),
+                        "transfer_method": transfer_method,
+                        "migration_timestamp": now,
+                        "migration_error": None,
+                        "metadata_write_status": "pending",
+                        "metadata_write_error": None,
+                        "updated_utc": now
+                    }}
+                )
+                
+                migrated_items[new_item_id] = candidate
+                counts["migrated"] += 1
+                logger.info(f"Migrated: {file_name} via {transfer_method}")
+                
+            except Exception as e:
+                counts["errors"] += 1
+                error_msg = str(e)[:250]
+                logger.error(f"Error migrating {candidate.get('file_name')}: {error_msg}")
+                
+                await self.collection.update_one(
+                    {"id": candidate["id"]},
+                    {"$set": {
+                        "status": "error",
+                        "migration_error": error_msg,
+                        "updated_utc": now
+                    }}
+                )
         
-        logger.info(f"Migration complete: {attempted} attempted, {migrated} migrated, {errors} errors, {metadata_errors} metadata failures")
+        async with resilient_client(timeout=120.0) as client:
+            await asyncio.gather(*(migrate_one(client, candidate) for candidate in candidates))
+            
+            # Update metadata on the new items
+            if migrated_items:
+                results = await self._apply_metadata_to_items(
+                    client, target_drive_id, migrated_items, column_mapping, token
+                )
+                counts["metadata_errors"] = sum(1 for status, _ in results.values() if status == "failed")
         
-        return {
-            "attempted": attempted,
-            "migrated": migrated,
-            "errors": errors,
-            "metadata_errors": metadata_errors
-        }
+        logger.info(
+            f"Migration complete: {counts['attempted']} attempted, {counts['migrated']} migrated "
+            f"({counts['copied']} copied, {counts['streamed']} streamed), {counts['errors']} errors, "
+            f"{counts['metadata_errors']} metadata failures"
+        )
+        
+        return counts
     
     async def get_summary(self) -> Dict[str, Any]:
         """Get summary statistics for migration candidates including new Excel metadata."""
@@ -1849,6 +2523,68 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
         
         return result.modified_count > 0
 
+    async def apply_metadata_to_candidates(
+        self,
+        candidate_ids: Optional[List[str]] = None,
+        max_count: int = 200
+    ) -> Dict[str, Any]:
+        """
+        Apply metadata to already migrated files in SharePoint.
+        
+        Writes go through Graph $batch, 20 files per request. Without
+        candidate_ids, migrated candidates whose metadata write has not
+        succeeded are processed, up to max_count.
+        
+        Returns:
+            Dict with processed/success/failed/list_item_not_found counts and
+            per-candidate results
+        """
+        query: Dict[str, Any] = {"status": "migrated", "target_item_id": {"$nin": [None, ""]}}
+        if candidate_ids:
+            query["id"] = {"$in": candidate_ids}
+            limit = len(candidate_ids)
+        else:
+            query["metadata_write_status"] = {"$ne": "success"}
+            limit = max_count
+        candidates = await self.collection.find(query, {"_id": 0}).limit(limit).to_list(length=limit)
+        
+        summary: Dict[str, Any] = {"processed": len(candidates), "success": 0, "failed": 0, "list_item_not_found": 0, "results": {}}
+        if not candidates:
+            return summary
+        
+        # Candidates can target different libraries; resolve each library once
+        groups: Dict[Tuple[str, str], List[Dict]] = {}
+        for candidate in candidates:
+            key = (
+                candidate.get("target_site_url") or DEFAULT_TARGET_SITE,
+                candidate.get("target_library_name") or DEFAULT_TARGET_LIBRARY
+            )
+            groups.setdefault(key, []).append(candidate)
+        
+        token = await self._get_graph_token()
+        async with resilient_client(timeout=60.0) as client:
+            for (target_site_url, target_library_name), group in groups.items():
+                target_site_id = await self._get_site_id(target_site_url, token)
+                target_drive_id = await self._get_drive_id(target_site_id, target_library_name, token)
+                target_list_id = await self._get_list_id(target_site_id, target_library_name, token)
+                
+                # Ensure columns exist
+                column_mapping = await self._ensure_destination_columns(target_site_id, target_list_id, token)
+                
+                candidates_by_item = {c["target_item_id"]: c for c in group}
+                results = await self._apply_metadata_to_items(
+                    client, target_drive_id, candidates_by_item, column_mapping, token
+                )
+                for item_id, (status, error) in results.items():
+                    summary[status] += 1
+                    summary["results"][candidates_by_item[item_id]["id"]] = {"status": status, "error": error}
+        
+        logger.info(
+            f"Applied metadata to {summary['processed']} migrated files: {summary['success']} success, "
+            f"{summary['failed']} failed, {summary['list_item_not_found']} without list item"
+        )
+        return summary
+    
     async def apply_metadata_to_migrated(self, candidate_id: str) -> Dict[str, Any]:
         """
         Apply metadata to an already migrated file in SharePoint.
@@ -1863,96 +2599,16 @@ Common vendors include glass manufacturers (OI, Anchor, Ball), packaging supplie
             return {"success": False, "error": "Candidate must be migrated with target_item_id", "status": "invalid_state"}
         
         try:
-            token = await self._get_graph_token()
-            
-            # Get target site info
-            target_site_url = candidate.get("target_site_url", DEFAULT_TARGET_SITE)
-            target_library_name = candidate.get("target_library_name", DEFAULT_TARGET_LIBRARY)
-            target_item_id = candidate["target_item_id"]
-            
-            target_site_id = await self._get_site_id(target_site_url, token)
-            target_drive_id = await self._get_drive_id(target_site_id, target_library_name, token)
-            target_list_id = await self._get_list_id(target_site_id, target_library_name, token)
-            
-            # Ensure columns exist
-            column_mapping = await self._ensure_destination_columns(target_site_id, target_list_id, token)
+            summary = await self.apply_metadata_to_candidates([candidate_id])
+            result = summary["results"].get(candidate_id)
+            if result is None:
+                return {"success": False, "error": "Candidate not found", "status": "not_found"}
             
-            # Get the list item ID
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                list_item_resp = await client.get(
-                    f"https://graph.microsoft.com/v1.0/drives/{target_drive_id}/items/{target_item_id}/listItem",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-                
-                if list_item_resp.status_code != 200:
-                    error_msg = f"Could not get list item: {list_item_resp.status_code}"
-                    return {"success": False, "error": error_msg, "status": "list_item_error"}
-                
-                list_item_id = list_item_resp.json()["id"]
-                
-                # Use column mapping to get correct SharePoint column names
-                def get_col(name):
-                    return column_mapping.get(name, name)
-                
-                # Prepare metadata fields
-                acct_type = candidate.get("acct_type") or "Corporate Internal"
-                acct_name = candidate.get("acct_name") or candidate.get("customer_name") or candidate.get("vendor_name")
-                if not acct_name and acct_type in ["Corporate Internal", "System Resources"]:
-                    acct_name = "Gamer Packaging"
-                
-                fields = {
-                    get_col("AcctType"): acct_type,
-                    get_col("AcctName"): acct_name or "",
-                    get_col("DocumentType"): candidate.get("document_type") or "Other",
-                    get_col("DocumentSubType"): candidate.get("document_sub_type") or "",
-                    get_col("DocumentStatus"): candidate.get("document_status") or "Active",
-                    get_col("ProjectOrPartNumber"): candidate.get("project_or_part_number") or "",
-                    get_col("RetentionCategory"): candidate.get("retention_category") or "Unknown",
-                    get_col("LegacyPath"): candidate.get("legacy_path") or "",
-                    get_col("LegacyUrl"): candidate.get("legacy_url") or "",
-                    get_col("Level1"): candidate.get("level1") or "",
-                    get_col("Level2"): candidate.get("level2") or "",
-                    get_col("Level3"): candidate.get("level3") or "",
-                }
-                
-                if candidate.get("document_date"):
-                    fields[get_col("DocumentDate")] = candidate["document_date"]
-                
-                logger.info(f"Applying metadata to {candidate['file_name']}: {list(fields.keys())}")
-                
-                # Update list item fields
-                update_resp = await client.patch(
-                    f"https://graph.microsoft.com/v1.0/sites/{target_site_id}/lists/{target_list_id}/items/{list_item_id}/fields",
-                    headers={
-                        "Authorization": f"Bearer {token}",
-                        "Content-Type": "application/json"
-                    },
-                    json=fields
-                )
-                
-                if update_resp.status_code in (200, 201):
-                    # Update candidate record
-                    now = datetime.now(timezone.utc).isoformat()
-                    await self.collection.update_one(
-                        {"id": candidate_id},
-                        {"$set": {
-                            "metadata_write_status": "success",
-                            "metadata_write_error": None,
-                            "updated_utc": now
-                        }}
-                    )
-                    return {"success": True, "status": "success"}
-                else:
-                    error_msg = update_resp.text[:300]
-                    await self.collection.update_one(
-                        {"id": candidate_id},
-                        {"$set": {
-                            "metadata_write_status": "failed",
-                            "metadata_write_error": error_msg,
-                            "updated_utc": datetime.now(timezone.utc).isoformat()
-                        }}
-                    )
-                    return {"success": False, "error": error_msg, "status": "failed"}
+            if result["status"] == "success":
+                return {"success": True, "status": "success"}
+            if result["status"] == "list_item_not_found":
+                return {"success": False, "error": "Could not get list item", "status": "list_item_error"}
+            return {"success": False, "error": result["error"], "status": "failed"}
         
         except Exception as e:
             error_msg = str(e)[:250]
@@ -0,0 +1,289 @@
+"""
+SharePoint Document Storage for GPI Document Hub
+
+Uploads hub documents to the SharePoint document library and creates their
+organization-wide view link.
+
+Key features:
+1. Small files: the upload and createLink travel in one Graph $batch call
+   (createLink addresses the new file by path and dependsOn the upload)
+2. Large files: resumable upload session fed from the file on disk in
+   UPLOAD_CHUNK_SIZE fragments. Graph requires fragments of one session in
+   order, so the next fragment is read from disk while the current one is
+   uploading instead of sending fragments concurrently. A failed fragment
+   resumes from the session's nextExpectedRanges
+3. Site and drive ids are resolved once per process, not per upload
+"""
+
+import asyncio
+import base64
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import quote
+
+import httpx
+
+from services.graph_batch import GraphRequest, send_batch
+from services.resilience import resilient_client
+
+logger = logging.getLogger(__name__)
+
+GRAPH_BASE = "https://graph.microsoft.com/v1.0"
+
+# Graph caps simple PUT uploads at 4 MB
+SIMPLE_UPLOAD_LIMIT = 4 * 1024 * 1024
+# Largest file sent inside a $batch; base64 grows it by a third and the
+# whole batch payload must stay under Graph's 4 MB request limit
+BATCH_UPLOAD_LIMIT = 2 * 1024 * 1024
+# Upload session fragments must be a multiple of 320 KiB
+UPLOAD_CHUNK_SIZE = 32 * 320 * 1024
+# Times a failed fragment is resumed from nextExpectedRanges before giving up
+MAX_FRAGMENT_RESUMES = 3
+
+SHARE_LINK_REQUEST = {"type": "view", "scope": "organization"}
+
+
+class SharePointStorage:
+    """Upload files to one SharePoint document library and create view links."""
+
+    def __init__(
+        self,
+        token_provider: Callable[[], Awaitable[str]],
+        site_hostname: str,
+        site_path: str,
+        library_name: str,
+        client_id: str = "",
+    ):
+        self._get_token = token_provider
+        self.site_hostname = site_hostname
+        self.site_path = site_path
+        self.library_name = library_name
+        self.client_id = client_id
+        self._drive_id: Optional[str] = None
+
+    async def _resolve_drive_id(self, client: httpx.AsyncClient, token: str) -> str:
+        if self._drive_id:
+            return self._drive_id
+
+        # Site format: sites/{hostname}:/{server-relative-path}:
+        site_resp = await client.get(
+            f"{GRAPH_BASE}/sites/{self.site_hostname}:{self.site_path}:",
+            headers={"Authorization": f"Bearer {token}"})
+        site_data = site_resp.json()
+        if site_resp.status_code in (401, 403):
+            raise Exception(
+                f"Graph API permission denied (HTTP {site_resp.status_code}). "
+                f"The app registration needs 'Sites.ReadWrite.All' (Application) permission with admin consent. "
+                f"Go to Azure Portal > App Registrations > {self.client_id} > API Permissions > Add 'Sites.ReadWrite.All' > Grant admin consent."
+            )
+        if site_resp.status_code == 404 or "id" not in site_data:
+            error = site_data.get("error", {})
+            raise Exception(
+                f"SharePoint site not found (HTTP {site_resp.status_code}). "
+                f"Check SHAREPOINT_SITE_HOSTNAME='{self.site_hostname}' and SHAREPOINT_SITE_PATH='{self.site_path}'. "
+                f"Detail: {error.get('message', error.get('code', 'unknown'))}"
+            )
+        site_id = site_data["id"]
+
+        drives_resp = await client.get(
+            f"{GRAPH_BASE}/sites/{site_id}/drives",
+            headers={"Authorization": f"Bearer {token}"})
+        drives_data = drives_resp.json()
+        if drives_resp.status_code in (401, 403):
+            raise Exception(f"Graph permission denied listing drives (HTTP {drives_resp.status_code}). Ensure 'Sites.ReadWrite.All' permission is granted.")
+        if "error" in drives_data:
+            raise Exception(f"Drive list error: {drives_data['error'].get('message', drives_data['error'])}")
+        drives = drives_data.get("value", [])
+        drive = next((d for d in drives if d["name"] == self.library_name), drives[0] if drives else None)
+        if not drive:
+            raise Exception(f"Document library '{self.library_name}' not found. Available: {[d['name'] for d in drives]}")
+        self._drive_id = drive["id"]
+        return self._drive_id
+
+    async def upload(
+        self,
+        file_name: str,
+        folder: str,
+        content: Optional[bytes] = None,
+        file_path: Optional[Path] = None,
+        create_link: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Upload a file, from file_path if it exists on disk, otherwise from content.
+
+        Returns:
+            Dict with drive_id, item_id, web_url, name, share_link (None
+            when create_link is False) and uploaded_utc, when the upload
+            itself finished
+        """
+        from_disk = file_path is not None and Path(file_path).exists()
+        if not from_disk and content is None:
+            raise ValueError("upload needs content or an existing file_path")
+        size = os.path.getsize(file_path) if from_disk else len(content)
+
+        token = await self._get_token()
+        async with resilient_client(timeout=60.0) as client:
+            drive_id = await self._resolve_drive_id(client, token)
+            item_path = f"{folder}/{file_name}" if folder else file_name
+
+            if create_link and size <= BATCH_UPLOAD_LIMIT:
+                data = Path(file_path).read_bytes() if from_disk else content
+                return await self._upload_and_link_batch(client, token, drive_id, item_path, file_name, data)
+
+            if size <= SIMPLE_UPLOAD_LIMIT:
+                data = Path(file_path).read_bytes() if from_disk else content
+                item = await self._simple_upload(client, token, drive_id, item_path, data)
+            else:
+                logger.info("Uploading %s (%d bytes) through an upload session", file_name, size)
+                item = await self._session_upload(client, token, drive_id, item_path, size, file_path if from_disk else None, content)
+            uploaded_utc = datetime.now(timezone.utc).isoformat()
+
+            share_link = await self._create_link(client, token, drive_id, item["id"]) if create_link else None
+            return {
+                "drive_id": drive_id, "item_id": item["id"], "web_url": item.get("webUrl", ""),
+                "name": file_name, "share_link": share_link, "uploaded_utc": uploaded_utc
+            }
+
+    async def _upload_and_link_batch(
+        self, client: httpx.AsyncClient, token: str, drive_id: str, item_path: str, file_name: str, data: bytes
+    ) -> Dict[str, Any]:
+        """Upload and create the view link in a single $batch call."""
+        path = f"/drives/{drive_id}/root:/{quote(item_path)}:"
+        responses = await send_batch(client, token, [
+            GraphRequest(
+                id="upload", method="PUT", url=f"{path}/content",
+                body=base64.b64encode(data).decode("ascii"),
+                headers={"Content-Type": "application/octet-stream"}
+            ),
+            GraphRequest(id="link", method="POST", url=f"{path}/createLink", body=SHARE_LINK_REQUEST, depends_on=["upload"]),
+        ])
+        uploaded_utc = datetime.now(timezone.utc).isoformat()
+        upload = responses["upload"]
+        if upload.status in (401, 403):
+            raise Exception(f"Upload permission denied (HTTP {upload.status}). Ensure app has 'Files.ReadWrite.All' or 'Sites.ReadWrite.All'.")
+        if not upload.ok or "id" not in (upload.body or {}):
+            raise Exception(f"Upload failed (HTTP {upload.status}): {upload.error_text}")
+        item = upload.body
+
+        link = responses["link"]
+        if link.ok:
+            share_link = (link.body or {}).get("link", {}).get("webUrl", "")
+        else:
+            # The file is stored; retry the link on its own
+            logger.warning("createLink in batch failed for %s (HTTP %d), retrying alone", file_name, link.status)
+            share_link = await self._create_link(client, token, drive_id, item["id"])
+
+        return {
+            "drive_id": drive_id, "item_id": item["id"], "web_url": item.get("webUrl", ""),
+            "name": file_name, "share_link": share_link, "uploaded_utc": uploaded_utc
+        }
+
+    async def _simple_upload(
+        self, client: httpx.AsyncClient, token: str, drive_id: str, item_path: str, data: bytes
+    ) -> Dict[str, Any]:
+        upload_resp = await client.put(
+            f"{GRAPH_BASE}/drives/{drive_id}/root:/{quote(item_path)}:/content",
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/octet-stream"},
+            content=data)
+        item = upload_resp.json()
+        if upload_resp.status_code in (401, 403):
+            raise Exception(f"Upload permission denied (HTTP {upload_resp.status_code}). Ensure app has 'Files.ReadWrite.All' or 'Sites.ReadWrite.All'.")
+        if "id" not in item:
+            error = item.get("error", {})
+            raise Exception(f"Upload failed (HTTP {upload_resp.status_code}): {error.get('message', error.get('code', item))}")
+        return item
+
+    async def _session_upload(
+        self,
+        client: httpx.AsyncClient,
+        token: str,
+        drive_id: str,
+        item_path: str,
+        size: int,
+        file_path: Optional[Path],
+        content: Optional[bytes],
+    ) -> Dict[str, Any]:
+        session_resp = await client.post(
+            f"{GRAPH_BASE}/drives/{drive_id}/root:/{quote(item_path)}:/createUploadSession",
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            json={"item": {"@microsoft.graph.conflictBehavior": "replace"}})
+        if session_resp.status_code in (401, 403):
+            raise Exception(f"Upload permission denied (HTTP {session_resp.status_code}). Ensure app has 'Files.ReadWrite.All' or 'Sites.ReadWrite.All'.")
+        if session_resp.status_code not in (200, 201):
+            raise Exception(f"Failed to create upload session: {session_resp.status_code} - {session_resp.text[:200]}")
+        upload_url = session_resp.json()["uploadUrl"]
+
+        handle = open(file_path, "rb") if file_path else None
+
+        def read_at(offset: int) -> bytes:
+            if handle is None:
+                return content[offset:offset + UPLOAD_CHUNK_SIZE]
+            handle.seek(offset)
+            return handle.read(UPLOAD_CHUNK_SIZE)
+
+        try:
+            offset = 0
+            resumes = 0
+            next_read = asyncio.ensure_future(asyncio.to_thread(read_at, 0))
+            while True:
+                chunk = await next_read
+                end = offset + len(chunk)
+                if end < size:
+                    # Read ahead while this fragment uploads
+                    next_read = asyncio.ensure_future(asyncio.to_thread(read_at, end))
+                try:
+                    # The upload URL is pre-authenticated; no Authorization header
+                    resp = await client.put(
+                        upload_url,
+                        headers={"Content-Length": str(len(chunk)), "Content-Range": f"bytes {offset}-{end - 1}/{size}"},
+                        content=chunk)
+                except httpx.TransportError as e:
+                    resp = None
+                    error = str(e)
+                else:
+                    if resp.status_code in (200, 201):
+                        return resp.json()
+                    if resp.status_code == 202 and end < size:
+                        offset = end
+                        continue
+                    error = f"{resp.status_code} - {resp.text[:200]}"
+
+                resumes += 1
+                if resumes > MAX_FRAGMENT_RESUMES:
+                    raise Exception(f"Chunk upload failed: {error}")
+                offset = await self._next_expected_offset(client, upload_url)
+                logger.warning("Upload fragment failed (%s), resuming at byte %d", error, offset)
+                if end < size:
+                    # Let the read-ahead finish before the handle is reused
+                    await next_read
+                next_read = asyncio.ensure_future(asyncio.to_thread(read_at, offset))
+        finally:
+            if handle:
+                handle.close()
+
+    @staticmethod
+    async def _next_expected_offset(client: httpx.AsyncClient, upload_url: str) -> int:
+        status_resp = await client.get(upload_url)
+        if status_resp.status_code != 200:
+            raise Exception(f"Upload session lost: {status_resp.status_code} - {status_resp.text[:200]}")
+        ranges = status_resp.json().get("nextExpectedRanges") or ["0-"]
+        return int(ranges[0].split("-")[0])
+
+    async def _create_link(self, client: httpx.AsyncClient, token: str, drive_id: str, item_id: str) -> str:
+        resp = await client.post(
+            f"{GRAPH_BASE}/drives/{drive_id}/items/{item_id}/createLink",
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            json=SHARE_LINK_REQUEST)
+        data = resp.json()
+        if "error" in data:
+            raise Exception(f"Sharing link error: {data['error'].get('message', data['error'])}")
+        return data.get("link", {}).get("webUrl", "")
+
+    async def create_link(self, drive_id: str, item_id: str) -> str:
+        """Create (or return the existing) organization view link for an item."""
+        token = await self._get_token()
+        async with resilient_client(timeout=30.0) as client:
+            return await self._create_link(client, token, drive_id, item_id)
@@ -20,6 +20,8 @@ from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
+from services.resilience import resilient_client
+
 logger = logging.getLogger(__name__)
 
 # =============================================================================
@@ -29,10 +31,9 @@ logger = logging.getLogger(__name__)
 SPIRO_OAUTH_URL = "https://engine.spiro.ai/oauth/token"
 SPIRO_API_BASE = "https://api.spiro.ai/api/v1"
 
-# Rate limiting settings
+# Rate limiting settings (429/503 backoff is handled by services.resilience)
 SPIRO_REQUEST_TIMEOUT = 30
 SPIRO_MAX_RETRIES = 3
-SPIRO_RETRY_DELAY = 1.0  # seconds
 
 # Token file for persistent storage (in container, use env var path or default)
 SPIRO_TOKEN_FILE = os.environ.get("SPIRO_TOKEN_FILE", "/app/backend/data/spiro_token.json")
@@ -178,7 +179,7 @@ class SpiroClient:
             return False
         
         try:
-            async with httpx.AsyncClient(timeout=SPIRO_REQUEST_TIMEOUT) as client:
+            async with resilient_client(timeout=SPIRO_REQUEST_TIMEOUT) as client:
                 resp = await client.post(
                     SPIRO_OAUTH_URL,
                     json={
@@ -212,7 +213,7 @@ class SpiroClient:
             return False
         
         try:
-            async with httpx.AsyncClient(timeout=SPIRO_REQUEST_TIMEOUT) as client:
+            async with resilient_client(timeout=SPIRO_REQUEST_TIMEOUT) as client:
                 resp = await client.post(
                     SPIRO_OAUTH_URL,
                     json={
@@ -276,7 +277,7 @@ class SpiroClient:
         
         for attempt in range(SPIRO_MAX_RETRIES):
             try:
-                async with httpx.AsyncClient(timeout=SPIRO_REQUEST_TIMEOUT) as client:
+                async with resilient_client(timeout=SPIRO_REQUEST_TIMEOUT) as client:
                     if method.upper() == "GET":
                         resp = await client.get(url, headers=headers, params=params)
                     elif method.upper() == "POST":
@@ -298,11 +299,9 @@ class SpiroClient:
                             logger.error("Spiro token refresh failed after 401")
                             return None
                     elif resp.status_code == 429:
-                        # Rate limited
-                        logger.warning("Spiro API rate limited, waiting before retry")
-                        import asyncio
-                        await asyncio.sleep(SPIRO_RETRY_DELAY * (attempt + 1))
-                        continue
+                        # The resilient client already waited out Retry-After and retried
+                        logger.error("Spiro API still rate limited after retries")
+                        return None
                     else:
                         logger.error("Spiro API error: %d - %s", resp.status_code, resp.text[:300])
                         return None
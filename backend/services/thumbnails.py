@@ -0,0 +1,241 @@
+"""
+GPI Document Hub - Page Thumbnails
+
+Renders small JPEG previews of document pages at ingestion time so queue
+triage and the document detail page can show an invoice without downloading
+the original file.
+
+Key features:
+1. Background stage: intake enqueues the document and a worker pool renders
+   it off the request path (CPU work runs in a thread)
+2. First page by default; THUMBNAIL_PAGES > 1 renders that many pages
+3. Thumbnails are stored in the blob store (deduplicated, referenced by the
+   document id) and listed on the hub document as `thumbnails`
+4. PDFs are rasterized with pypdfium2, images (PNG/JPEG/TIFF, incl.
+   multi-page TIFF) with Pillow; other types are marked unsupported
+5. Documents ingested before this stage (or while the worker was down) are
+   rendered on first request by ensure(); content is read through the
+   read_content hook, so files stored before the blob store are found too
+6. A document whose file cannot be read is left without a status (and
+   retried later); only loaded content of another type is unsupported
+"""
+
+import asyncio
+import io
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.blob_store import blob_store as default_blob_store
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTH = int(os.environ.get("THUMBNAIL_WIDTH", "320"))
+THUMBNAIL_PAGES = int(os.environ.get("THUMBNAIL_PAGES", "1"))
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", "70"))
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_QUEUE_SIZE = 1000
+
+READY = "ready"
+UNSUPPORTED = "unsupported"
+FAILED = "failed"
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".gif", ".bmp", ".webp")
+
+
+def _is_pdf(content: bytes, content_type: Optional[str], file_name: Optional[str]) -> bool:
+    return (
+        content[:5] == b"%PDF-"
+        or (content_type or "").lower() == "application/pdf"
+        or (file_name or "").lower().endswith(".pdf")
+    )
+
+
+def _is_image(content_type: Optional[str], file_name: Optional[str]) -> bool:
+    return (content_type or "").lower().startswith("image/") or (file_name or "").lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _encode(image, width: int, quality: int) -> Dict[str, Any]:
+    image = image.convert("RGB")
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return {"data": buffer.getvalue(), "width": image.width, "height": image.height}
+
+
+def _render_pdf(content: bytes, pages: int, width: int, quality: int) -> List[Dict[str, Any]]:
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(content)
+    try:
+        thumbnails = []
+        for index in range(min(len(pdf), pages)):
+            page = pdf[index]
+            try:
+                # Render at the target width directly instead of downscaling a full-size bitmap
+                bitmap = page.render(scale=width / page.get_width())
+                thumbnails.append(_encode(bitmap.to_pil(), width, quality))
+            finally:
+                page.close()
+        return thumbnails
+    finally:
+        pdf.close()
+
+
+def _render_image(content: bytes, pages: int, width: int, quality: int) -> List[Dict[str, Any]]:
+    from PIL import Image, ImageSequence
+
+    with Image.open(io.BytesIO(content)) as image:
+        thumbnails = []
+        for frame in ImageSequence.Iterator(image):
+            if len(thumbnails) >= pages:
+                break
+            frame.draft("RGB", (width, width * 2))
+            thumbnails.append(_encode(frame, width, quality))
+        return thumbnails
+
+
+def render_thumbnails(
+    content: bytes,
+    content_type: Optional[str] = None,
+    file_name: Optional[str] = None,
+    pages: int = THUMBNAIL_PAGES,
+    width: int = THUMBNAIL_WIDTH,
+    quality: int = THUMBNAIL_QUALITY,
+) -> Optional[List[Dict[str, Any]]]:
+    """JPEG thumbnails ({data, width, height}) of the first `pages` pages, or None if the type is unsupported."""
+    if _is_pdf(content, content_type, file_name):
+        try:
+            return _render_pdf(content, pages, width, quality)
+        except ImportError:
+            logger.warning("pypdfium2 not installed; PDF thumbnails are disabled")
+            return None
+    if _is_image(content_type, file_name):
+        return _render_image(content, pages, width, quality)
+    return None
+
+
+class ThumbnailRenderer:
+    """Background worker pool that renders and stores document thumbnails."""
+
+    def __init__(self, blob_store=None, workers: int = THUMBNAIL_WORKERS):
+        self.blob_store = blob_store or default_blob_store
+        self.workers = workers
+        self._docs = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=THUMBNAIL_QUEUE_SIZE)
+        self._tasks: List[asyncio.Task] = []
+        self._rendered = 0
+        self._unsupported = 0
+        self._failed = 0
+        self._missing = 0
+        self._dropped = 0
+        self._read_content: Callable[[Dict[str, Any]], Awaitable[Optional[bytes]]] = self._read_blob
+
+    def bind(self, db, read_content: Optional[Callable[[Dict[str, Any]], Awaitable[Optional[bytes]]]] = None) -> None:
+        """Attach the database; read_content(doc) loads a document's file (default: the blob store)."""
+        self._docs = db.hub_documents
+        if read_content is not None:
+            self._read_content = read_content
+
+    def start(self, db, read_content: Optional[Callable[[Dict[str, Any]], Awaitable[Optional[bytes]]]] = None) -> None:
+        self.bind(db, read_content)
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def enqueue(self, doc_id: str) -> None:
+        """Queue a stored document for rendering. Never blocks intake."""
+        if not self._tasks:
+            return
+        try:
+            self._queue.put_nowait(doc_id)
+        except asyncio.QueueFull:
+            # Rendered on first request instead
+            self._dropped += 1
+
+    async def _worker(self) -> None:
+        while True:
+            doc_id = await self._queue.get()
+            try:
+                doc = await self._docs.find_one({"id": doc_id}, {"_id": 0})
+                if doc and not doc.get("thumbnail_status"):
+                    await self.render(doc)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Thumbnail rendering failed for %s: %s", doc_id, str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _read_blob(self, doc: Dict[str, Any]) -> Optional[bytes]:
+        return await self.blob_store.get(doc.get("sha256_hash"))
+
+    async def render(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Render, store and record the thumbnails of one document. Returns the fields set on it."""
+        content = await self._read_content(doc)
+        if content is None:
+            # Nothing recorded: the file may be readable on a later request
+            logger.warning("No stored file for %s; thumbnails not rendered", doc["id"])
+            self._missing += 1
+            return {"thumbnails": [], "thumbnail_status": None}
+        fields: Dict[str, Any] = {"thumbnails": [], "thumbnail_status": UNSUPPORTED}
+        if content:
+            try:
+                rendered = await asyncio.to_thread(
+                    render_thumbnails, content, doc.get("content_type"), doc.get("file_name")
+                )
+            except Exception as e:
+                logger.warning("Could not render thumbnails for %s: %s", doc["id"], str(e))
+                rendered = None
+                fields["thumbnail_status"] = FAILED
+            if rendered:
+                thumbnails = []
+                for page, thumbnail in enumerate(rendered, start=1):
+                    sha256 = await self.blob_store.put(thumbnail["data"], doc["id"])
+                    thumbnails.append({
+                        "page": page, "sha256": sha256, "width": thumbnail["width"],
+                        "height": thumbnail["height"], "size": len(thumbnail["data"]),
+                    })
+                fields = {"thumbnails": thumbnails, "thumbnail_status": READY}
+        if fields["thumbnail_status"] == READY:
+            self._rendered += 1
+        elif fields["thumbnail_status"] == FAILED:
+            self._failed += 1
+        else:
+            self._unsupported += 1
+        await self._docs.update_one({"id": doc["id"]}, {"$set": fields})
+        return fields
+
+    async def ensure(self, doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Thumbnails of a document, rendering them now if intake did not."""
+        if doc.get("thumbnail_status"):
+            return doc.get("thumbnails") or []
+        return (await self.render(doc))["thumbnails"]
+
+    async def release(self, doc: Dict[str, Any]) -> None:
+        for thumbnail in doc.get("thumbnails") or []:
+            await self.blob_store.release(thumbnail["sha256"], doc["id"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "workers": len(self._tasks),
+            "rendered": self._rendered,
+            "unsupported": self._unsupported,
+            "failed": self._failed,
+            "missing": self._missing,
+            "dropped": self._dropped,
+        }
+
+
+thumbnail_renderer = ThumbnailRenderer()
@@ -0,0 +1,133 @@
+"""
+GPI Document Hub - Vendor Alias Index
+
+O(1) in-memory lookup of vendor aliases by normalized key, shared by
+lookup_vendor_alias (intake) and match_vendor_in_bc (BC validation).
+
+Key features:
+1. One normalization pipeline (normalize_vendor_name) for stored alias keys
+   and lookups; aliases are stored with a precomputed alias_key
+2. The index is rebuilt from the config cache's vendor_aliases section, so
+   alias create/delete (which invalidate that section) refresh it
+3. Hit/miss counters for alias metrics
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from services.config_cache import config_cache
+
+
+def normalize_vendor_name(name: str) -> str:
+    """
+    Normalize vendor name for matching.
+    Strips common suffixes, punctuation, and converts to lowercase.
+    """
+    if not name:
+        return ""
+
+    # Convert to lowercase
+    name = name.lower()
+
+    # Remove common business suffixes
+    suffixes = [
+        r'\s*,?\s*(inc\.?|incorporated)$',
+        r'\s*,?\s*(llc\.?|l\.l\.c\.?)$',
+        r'\s*,?\s*(ltd\.?|limited)$',
+        r'\s*,?\s*(corp\.?|corporation)$',
+        r'\s*,?\s*(co\.?|company)$',
+        r'\s*,?\s*(plc\.?)$',
+        r'\s*,?\s*(gmbh)$',
+        r'\s*,?\s*(ag)$',
+    ]
+
+    for suffix in suffixes:
+        name = re.sub(suffix, '', name, flags=re.IGNORECASE)
+
+    # Remove punctuation and extra spaces
+    name = re.sub(r'[^\w\s]', '', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+
+    return name
+
+
+def alias_keys(alias: Dict[str, Any]) -> List[str]:
+    """Every key an alias document answers to, most specific first."""
+    alias_string = alias.get("alias_string") or ""
+    keys = [
+        alias.get("alias_key") or normalize_vendor_name(alias_string),
+        alias_string.lower(),
+        # Stored normalized forms (AP normalization, legacy and config-router schemas)
+        alias.get("normalized_alias"),
+        alias.get("normalized"),
+        alias.get("alias_normalized"),
+    ]
+    return [k for k in dict.fromkeys(keys) if k]
+
+
+def alias_target(alias: Dict[str, Any]) -> Optional[str]:
+    """BC vendor name or number an alias points at."""
+    return (
+        alias.get("vendor_name") or alias.get("vendor_no")
+        or alias.get("canonical_vendor_name") or alias.get("canonical_vendor_no")
+    )
+
+
+class VendorAliasIndex:
+    """Vendor aliases keyed by normalized name."""
+
+    def __init__(self):
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._source: Optional[List[Dict[str, Any]]] = None
+        self._hits = 0
+        self._misses = 0
+        self._rebuilds = 0
+
+    def build(self, aliases: List[Dict[str, Any]]) -> None:
+        by_key: Dict[str, Dict[str, Any]] = {}
+        for alias in aliases:
+            for key in alias_keys(alias):
+                # First alias wins, as with the previous find_one
+                by_key.setdefault(key, alias)
+        self._by_key = by_key
+        self._source = aliases
+        self._rebuilds += 1
+
+    async def _current(self) -> Dict[str, Dict[str, Any]]:
+        aliases = await config_cache.vendor_aliases()
+        # The cache hands out a new list after every reload
+        if aliases is not self._source:
+            self.build(aliases)
+        return self._by_key
+
+    def _find(self, by_key: Dict[str, Dict[str, Any]], name: str) -> Optional[Dict[str, Any]]:
+        for key in dict.fromkeys((name.lower(), normalize_vendor_name(name))):
+            alias = by_key.get(key)
+            if alias:
+                return alias
+        return None
+
+    async def lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        """Alias document for a raw or normalized vendor name, or None."""
+        if not name:
+            return None
+        alias = self._find(await self._current(), name)
+        if alias:
+            self._hits += 1
+        else:
+            self._misses += 1
+        return alias
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "aliases": len(self._source or []),
+            "keys": len(self._by_key),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            "rebuilds": self._rebuilds,
+        }
+
+
+vendor_alias_index = VendorAliasIndex()
@@ -0,0 +1,59 @@
+"""
+httpx stand-ins shared by the unit tests that exercise Graph and Business
+Central calls without a network.
+
+FakeClient replaces the object yielded by `async with resilient_client(...)`;
+each HTTP verb is an AsyncMock whose side effect is the handler passed in.
+"""
+from unittest.mock import AsyncMock
+
+
+class FakeResponse:
+    """httpx.Response stand-in with a JSON body, headers and optional streamed chunks."""
+
+    def __init__(self, status_code, data=None, headers=None, chunks=None):
+        self.status_code = status_code
+        self._data = data or {}
+        self.headers = headers or {}
+        self.text = str(data)
+        self.content = self.text.encode()
+        self._chunks = chunks or []
+
+    def json(self):
+        return self._data
+
+    async def aread(self):
+        return b"".join(self._chunks)
+
+    async def aiter_bytes(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+class FakeClient:
+    """httpx.AsyncClient stand-in; get/post/put/patch run the given side effects."""
+
+    def __init__(self, get=None, post=None, put=None, patch=None):
+        self.get = AsyncMock(side_effect=get)
+        self.post = AsyncMock(side_effect=post)
+        self.put = AsyncMock(side_effect=put)
+        self.patch = AsyncMock(side_effect=patch)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeStream:
+    """Context manager returned by client.stream(), yielding a FakeResponse."""
+
+    def __init__(self, response):
+        self.response = response
+
+    async def __aenter__(self):
+        return self.response
+
+    async def __aexit__(self, *args):
+        return False
@@ -0,0 +1,211 @@
+"""
+Unit tests for the audit write-behind buffer.
+
+Covers batching into insert_many/bulk_write, flush on close, backpressure,
+retry of failed entries only and visibility of buffered entries.
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import BulkWriteError
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.audit_writer import AuditWriter
+
+
+def _db():
+    collections = {}
+
+    def collection(name):
+        if name not in collections:
+            coll = MagicMock()
+            coll.insert_one = AsyncMock()
+            coll.update_one = AsyncMock()
+            coll.insert_many = AsyncMock()
+            coll.bulk_write = AsyncMock()
+            collections[name] = coll
+        return collections[name]
+
+    db = MagicMock()
+    db.__getitem__.side_effect = collection
+    return db
+
+
+class TestAuditWriter:
+    """Tests for AuditWriter."""
+
+    @pytest.mark.asyncio
+    async def test_writes_directly_when_not_started(self):
+        db = _db()
+        writer = AuditWriter()
+        entry = {"id": "1"}
+
+        await writer.insert(db, "mail_intake_log", entry)
+
+        db["mail_intake_log"].insert_one.assert_awaited_once_with({"id": "1"})
+        assert "_id" not in entry
+
+    @pytest.mark.asyncio
+    async def test_batches_per_collection_and_flushes_on_close(self):
+        db = _db()
+        writer = AuditWriter(flush_interval=60)
+        writer.start(db)
+
+        for i in range(3):
+            await writer.insert(db, "mail_intake_log", {"id": str(i)})
+        await writer.insert(db, "mail_poll_runs", {"run_id": "r1"})
+        await writer.update(db, "vendor_aliases", {"alias_string": "ACME"}, {"$inc": {"usage_count": 1}})
+        db["mail_intake_log"].insert_many.assert_not_called()
+
+        await writer.close()
+
+        docs = db["mail_intake_log"].insert_many.call_args.args[0]
+        assert [d["id"] for d in docs] == ["0", "1", "2"]
+        db["mail_poll_runs"].insert_many.assert_awaited_once()
+        assert len(db["vendor_aliases"].bulk_write.call_args.args[0]) == 1
+        assert writer.stats()["written"] == 5
+        assert not writer.running
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_without_waiting_for_interval(self):
+        db = _db()
+        writer = AuditWriter(batch_size=2, flush_interval=60)
+        writer.start(db)
+
+        await writer.insert(db, "hub_workflow_runs", {"id": "a"})
+        await writer.insert(db, "hub_workflow_runs", {"id": "b"})
+        await asyncio.sleep(0.01)
+
+        db["hub_workflow_runs"].insert_many.assert_awaited_once()
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_backpressure_when_buffer_full(self):
+        db = _db()
+        release = asyncio.Event()
+
+        async def slow_insert_many(docs, ordered=False):
+            await release.wait()
+
+        db["mail_intake_log"].insert_many.side_effect = slow_insert_many
+        writer = AuditWriter(batch_size=100, max_pending=2, flush_interval=60)
+        writer.start(db)
+
+        await writer.insert(db, "mail_intake_log", {"id": "1"})
+        await writer.insert(db, "mail_intake_log", {"id": "2"})
+        await asyncio.sleep(0.01)  # first flush is now blocked writing 1 and 2
+        await writer.insert(db, "mail_intake_log", {"id": "3"})
+        await writer.insert(db, "mail_intake_log", {"id": "4"})
+        blocked = asyncio.create_task(writer.insert(db, "mail_intake_log", {"id": "5"}))
+        await asyncio.sleep(0.01)
+
+        assert not blocked.done()
+        assert writer.stats()["backpressure_waits"] >= 1
+        release.set()
+        await asyncio.wait_for(blocked, timeout=1)
+        await writer.close()
+        written = [d["id"] for c in db["mail_intake_log"].insert_many.call_args_list for d in c.args[0]]
+        assert sorted(written) == ["1", "2", "3", "4", "5"]
+
+    @pytest.mark.asyncio
+    async def test_close_waits_for_the_batch_being_written(self):
+        db = _db()
+        writing = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow_insert_many(documents, ordered=True):
+            writing.set()
+            await release.wait()
+
+        db["workflow_runs"].insert_many.side_effect = slow_insert_many
+        writer = AuditWriter(batch_size=3, flush_interval=60)
+        writer.start(db)
+        for i in range(3):
+            await writer.insert(db, "workflow_runs", {"id": str(i)})
+        await asyncio.wait_for(writing.wait(), timeout=1)
+
+        closing = asyncio.create_task(writer.close())
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.wait_for(closing, timeout=1)
+
+        assert writer.stats()["written"] == 3
+        assert writer.stats()["dropped"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_retried(self):
+        db = _db()
+        db["mail_poll_runs"].insert_many.side_effect = [Exception("mongo down"), None]
+        writer = AuditWriter(flush_interval=60)
+        writer.start(db)
+
+        await writer.insert(db, "mail_poll_runs", {"run_id": "r1"})
+        assert await writer.flush() == 0
+        assert writer.stats()["pending"] == 1
+        assert await writer.flush() == 1
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_partial_failure_requeues_only_failed_entries(self):
+        db = _db()
+        db["workflow_runs"].insert_many.side_effect = [
+            BulkWriteError({"writeErrors": [{"index": 1, "code": 91, "errmsg": "shutdown in progress"}]}),
+            None,
+        ]
+        db["vendor_aliases"].bulk_write.side_effect = [
+            BulkWriteError({"writeErrors": [{"index": 0, "code": 91, "errmsg": "shutdown in progress"}]}),
+            None,
+        ]
+        writer = AuditWriter(flush_interval=60)
+        writer.start(db)
+
+        for i in range(3):
+            await writer.insert(db, "workflow_runs", {"id": str(i)})
+        for alias in ("a", "b"):
+            await writer.update(db, "vendor_aliases", {"alias": alias}, {"$inc": {"usage_count": 1}})
+        assert await writer.flush() == 3
+        assert writer.stats()["pending"] == 2
+        await writer.close()
+
+        retried_inserts = db["workflow_runs"].insert_many.call_args.args[0]
+        assert [d["id"] for d in retried_inserts] == ["1"]
+        retried_updates = db["vendor_aliases"].bulk_write.call_args.args[0]
+        assert [op._filter for op in retried_updates] == [{"alias": "a"}]
+
+    @pytest.mark.asyncio
+    async def test_duplicate_key_rejections_are_not_retried(self):
+        db = _db()
+        db["mail_intake_log"].insert_many.side_effect = [
+            BulkWriteError({"writeErrors": [
+                {"index": 0, "code": 11000, "errmsg": "duplicate key"},
+                {"index": 2, "code": 91, "errmsg": "shutdown in progress"},
+            ]}),
+            None,
+        ]
+        writer = AuditWriter(flush_interval=60)
+        writer.start(db)
+
+        for i in range(3):
+            await writer.insert(db, "mail_intake_log", {"id": str(i)})
+        assert await writer.flush() == 1
+        assert [e["id"] for e in writer.pending("mail_intake_log")] == ["2"]
+        await writer.close()
+
+        retried = db["mail_intake_log"].insert_many.call_args.args[0]
+        assert [d["id"] for d in retried] == ["2"]
+
+    @pytest.mark.asyncio
+    async def test_pending_entries_are_visible(self):
+        db = _db()
+        writer = AuditWriter(flush_interval=60)
+        writer.start(db)
+
+        await writer.insert(db, "mail_intake_log", {"internet_message_id": "m1", "attachment_hash": "h1"})
+        await writer.insert(db, "mail_poll_runs", {"internet_message_id": "m1"})
+
+        matches = writer.pending("mail_intake_log", lambda e: e["attachment_hash"] == "h1")
+        assert len(matches) == 1
+        assert writer.pending("mail_intake_log", lambda e: e["attachment_hash"] == "h2") == []
+        await writer.close()
+        assert writer.pending("mail_intake_log") == []
@@ -0,0 +1,112 @@
+"""
+Unit tests for bulk BC validation.
+
+Covers `number in (...)` prefetch into the BC lookup cache, fan-out of
+cached results to per-document validation and the single bulk_write.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+import services.bc_sandbox_service as sandbox
+from services.bc_lookup_cache import bc_lookup_cache
+from services.bc_bulk_validation import validate_documents_bulk
+from tests.http_fakes import FakeClient, FakeResponse
+
+
+@pytest.fixture(autouse=True)
+def live_sandbox():
+    bc_lookup_cache.clear()
+    with patch.object(sandbox, "DEMO_MODE", False), \
+         patch.object(sandbox, "BC_SANDBOX_CLIENT_SECRET", "secret"), \
+         patch.object(sandbox, "get_bc_sandbox_token", new=AsyncMock(return_value="token")), \
+         patch.object(sandbox, "_get_company_id", new=AsyncMock(return_value="co-1")):
+        yield
+    bc_lookup_cache.clear()
+
+
+def _bc_get(url, headers=None, params=None):
+    """BC returns vendors V1..V3 and PO-1; everything else does not exist."""
+    known = {"vendors": ["V1", "V2", "V3"], "purchaseOrders": ["PO-1"]}
+    entity_set = url.rsplit("/", 1)[-1]
+    requested = [n.strip("'") for n in params["$filter"][len("number in ("):-1].split(",")]
+    return FakeResponse(200, {"value": [
+        {"number": n, "id": f"{n}-id"} for n in requested if n in known.get(entity_set, [])
+    ]})
+
+
+class TestPrefetchLookups:
+    """Tests for bc_sandbox_service.prefetch_lookups."""
+
+    @pytest.mark.asyncio
+    async def test_one_query_per_entity_chunk(self):
+        client = FakeClient(get=_bc_get)
+        vendors = {f"V{i}" for i in range(1, 51)}
+
+        with patch("services.bc_sandbox_service.resilient_client", return_value=client):
+            stats = await sandbox.prefetch_lookups({"vendor": vendors, "purchase_order": {"PO-1"}})
+
+        # 50 vendors -> 2 chunks of 40/10, plus one PO query
+        assert stats == {"requested": 51, "already_cached": 0, "bc_calls": 3}
+        filters = sorted(c.kwargs["params"]["$filter"] for c in client.get.call_args_list)
+        assert filters[0] == "number in ('PO-1')"
+
+        with patch.object(sandbox, "_fetch_vendor", new=AsyncMock()) as fetch:
+            found = await sandbox.get_vendor("V2")
+            missing = await sandbox.get_vendor("V40")
+        fetch.assert_not_called()
+        assert found.is_found and found.data["id"] == "V2-id"
+        assert missing.status == sandbox.BCLookupStatus.NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_quotes_escaped_and_cached_numbers_skipped(self):
+        client = FakeClient(get=_bc_get)
+
+        with patch("services.bc_sandbox_service.resilient_client", return_value=client):
+            await sandbox.prefetch_lookups({"vendor": {"V1"}})
+            stats = await sandbox.prefetch_lookups({"vendor": {"V1", "O'BRIEN"}})
+
+        assert stats["already_cached"] == 1
+        assert client.get.call_args.kwargs["params"]["$filter"] == "number in ('O''BRIEN')"
+
+    @pytest.mark.asyncio
+    async def test_failed_query_leaves_numbers_uncached(self):
+        client = FakeClient(get=lambda url, headers=None, params=None: FakeResponse(500))
+
+        with patch("services.bc_sandbox_service.resilient_client", return_value=client):
+            await sandbox.prefetch_lookups({"purchase_order": {"PO-1"}})
+
+        assert not bc_lookup_cache.contains("purchase_order", "PO-1")
+
+
+class TestValidateDocumentsBulk:
+    """Tests for validate_documents_bulk."""
+
+    @pytest.mark.asyncio
+    async def test_batch_resolved_with_few_calls_and_one_write(self):
+        docs = [
+            {"id": f"d{i}", "doc_type": "AP_INVOICE", "vendor_canonical": f"V{i % 3 + 1}", "po_number": "PO-1"}
+            for i in range(30)
+        ]
+        docs.append({"id": "d-po", "doc_type": "PURCHASE_ORDER", "po_number": "PO-404"})
+        docs.append({"id": "d-none", "doc_type": "AP_INVOICE"})
+        db = MagicMock()
+        db.hub_documents.bulk_write = AsyncMock()
+        client = FakeClient(get=_bc_get)
+
+        with patch("services.bc_sandbox_service.resilient_client", return_value=client):
+            summary = await validate_documents_bulk(db, docs)
+
+        assert client.get.call_count == 2
+        assert summary["bc_calls"] == 2
+        assert summary["validated"] == 31
+        assert summary["skipped"] == 1
+        db.hub_documents.bulk_write.assert_awaited_once()
+        operations = db.hub_documents.bulk_write.call_args.args[0]
+        assert len(operations) == 31
+
+        by_id = {r["document_id"]: r for r in summary["results"]}
+        assert by_id["d0"]["warnings"] == []
+        assert by_id["d-po"]["warnings"] == ["PO PO-404 not found in BC"]
+        assert by_id["d-none"]["error"] == "No vendor number available for validation"
@@ -0,0 +1,193 @@
+"""
+Unit tests for the Business Central lookup cache.
+
+Covers per-entity TTLs, negative caching, errors not being cached,
+single-flight loads, invalidation, stats, and the cached BC sandbox
+lookups.
+"""
+import asyncio
+import pytest
+import types
+from unittest.mock import AsyncMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+import services.bc_sandbox_service as sandbox
+from services.bc_lookup_cache import (
+    BCLookupCache,
+    bc_lookup_cache,
+    ENTITY_TTL_SECONDS,
+    NEGATIVE_TTL_SECONDS,
+    NOT_FOUND,
+)
+from services.bc_sandbox_service import BCLookupResult, BCLookupStatus
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    bc_lookup_cache.clear()
+    yield
+    bc_lookup_cache.clear()
+
+
+class TestBCLookupCache:
+    """Tests for BCLookupCache."""
+
+    @pytest.mark.asyncio
+    async def test_found_value_expires_after_entity_ttl(self):
+        cache = BCLookupCache()
+        loader = AsyncMock(return_value={"number": "V10000"})
+
+        with patch("services.bc_lookup_cache.time.monotonic", return_value=1000.0):
+            await cache.get_or_load("vendor", "V10000", loader)
+            await cache.get_or_load("vendor", "V10000", loader)
+        assert loader.await_count == 1
+
+        with patch("services.bc_lookup_cache.time.monotonic", return_value=1000.0 + ENTITY_TTL_SECONDS["vendor"]):
+            await cache.get_or_load("vendor", "V10000", loader)
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_not_found_uses_negative_ttl(self):
+        cache = BCLookupCache()
+        loader = AsyncMock(return_value=[])
+        outcome = lambda v: NOT_FOUND
+
+        with patch("services.bc_lookup_cache.time.monotonic", return_value=1000.0):
+            await cache.get_or_load("purchase_order", "PO-9", loader, outcome=outcome)
+            await cache.get_or_load("purchase_order", "PO-9", loader, outcome=outcome)
+        assert loader.await_count == 1
+        assert cache.stats()["entities"]["purchase_order"]["negative_hits"] == 1
+
+        with patch("services.bc_lookup_cache.time.monotonic", return_value=1000.0 + NEGATIVE_TTL_SECONDS):
+            await cache.get_or_load("purchase_order", "PO-9", loader, outcome=outcome)
+        assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self):
+        cache = BCLookupCache()
+        loader = AsyncMock(side_effect=[RuntimeError("BC down"), {"id": "c1"}])
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_load("company", "primary", loader)
+        assert await cache.get_or_load("company", "primary", loader) == {"id": "c1"}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self):
+        cache = BCLookupCache()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0)
+            return {"number": "PO-1"}
+
+        results = await asyncio.gather(*(cache.get_or_load("purchase_order", "PO-1", loader) for _ in range(5)))
+
+        assert calls == 1
+        assert all(r == {"number": "PO-1"} for r in results)
+
+    @pytest.mark.asyncio
+    async def test_waiter_takes_over_when_loading_caller_is_cancelled(self):
+        cache = BCLookupCache()
+        started = asyncio.Event()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                started.set()
+                await asyncio.sleep(10)
+            return {"number": "V10000"}
+
+        leader = asyncio.create_task(cache.get_or_load("vendor", "V10000", loader))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_load("vendor", "V10000", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await asyncio.wait_for(waiter, timeout=1) == {"number": "V10000"}
+        assert leader.cancelled()
+        assert calls == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_cancel_the_load(self):
+        cache = BCLookupCache()
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return {"number": "V10000"}
+
+        leader = asyncio.create_task(cache.get_or_load("vendor", "V10000", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_load("vendor", "V10000", loader))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        release.set()
+
+        assert await leader == {"number": "V10000"}
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    @pytest.mark.asyncio
+    async def test_invalidate_entity(self):
+        cache = BCLookupCache()
+        await cache.get_or_load("purchase_invoice", "PI-1", AsyncMock(return_value={"id": 1}))
+        await cache.get_or_load("purchase_invoice", "PI-2", AsyncMock(return_value={"id": 2}))
+
+        assert cache.invalidate("purchase_invoice") == 2
+        assert cache.get("purchase_invoice", "PI-1") == (False, None)
+        assert cache.stats()["entities"]["purchase_invoice"]["invalidations"] == 1
+
+
+class TestCachedSandboxLookups:
+    """Tests for the cached lookups in bc_sandbox_service."""
+
+    @pytest.mark.asyncio
+    async def test_get_purchase_order_caches_found_and_not_found(self):
+        found = BCLookupResult(status=BCLookupStatus.SUCCESS, data={"number": "PO-1"})
+        missing = BCLookupResult(status=BCLookupStatus.NOT_FOUND, error="not found")
+        fetch = AsyncMock(side_effect=lambda po: found if po == "PO-1" else missing)
+
+        with patch.object(sandbox, "_fetch_purchase_order", new=fetch):
+            for _ in range(3):
+                await sandbox.get_purchase_order("PO-1")
+                await sandbox.get_purchase_order("PO-404")
+
+        assert fetch.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_get_vendor_does_not_cache_errors(self):
+        error = BCLookupResult(status=BCLookupStatus.ERROR, error="BC API error: 500")
+        fetch = AsyncMock(return_value=error)
+
+        with patch.object(sandbox, "_fetch_vendor", new=fetch):
+            await sandbox.get_vendor("V10000")
+            await sandbox.get_vendor("V10000")
+
+        assert fetch.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_hits_return_copies_with_their_own_timing(self):
+        found = BCLookupResult(status=BCLookupStatus.SUCCESS, data={"number": "V10000"}, timing_ms=250)
+
+        with patch.object(sandbox, "_fetch_vendor", new=AsyncMock(return_value=found)):
+            first = await sandbox.get_vendor("V10000")
+            first.data["number"] = "changed"
+            second = await sandbox.get_vendor("V10000")
+
+        assert second is not first
+        assert second.data == {"number": "V10000"}
+        assert second.timing_ms < 250
+
+    def test_status_includes_cache_stats(self):
+        # server reads MONGO_URL at import time; the status only needs its BC secret
+        fake_server = types.ModuleType("server")
+        fake_server.BC_CLIENT_SECRET = ""
+        with patch.dict(sys.modules, {"server": fake_server}):
+            status = sandbox.get_bc_sandbox_status()
+        assert status["lookup_cache"]["negative_ttl_seconds"] == NEGATIVE_TTL_SECONDS
+        assert "entities" in status["lookup_cache"]
@@ -0,0 +1,161 @@
+"""
+Unit tests for the content-addressed blob store.
+
+Covers deduplication, sharded atomic writes, reference counting on release
+and the S3 backend against an in-memory stand-in client.
+"""
+import pytest
+from types import SimpleNamespace
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.blob_store import BlobStore, LocalBlobBackend, S3BlobBackend, blob_key, content_hash
+
+
+class FakeRefs:
+    """Just enough of a Motor collection for blob_refs."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, filter, update, upsert=False):
+        doc = self.docs.get(filter["sha256"])
+        if doc is None:
+            if not upsert:
+                return
+            doc = self.docs[filter["sha256"]] = {"sha256": filter["sha256"], "refs": [], **update["$setOnInsert"]}
+        ref = update["$addToSet"]["refs"]
+        if ref not in doc["refs"]:
+            doc["refs"].append(ref)
+
+    async def find_one_and_update(self, filter, update, projection=None, return_document=None):
+        doc = self.docs.get(filter["sha256"])
+        if doc is None:
+            return None
+        doc["refs"] = [r for r in doc["refs"] if r != update["$pull"]["refs"]]
+        return {"refs": list(doc["refs"])}
+
+    async def delete_one(self, filter):
+        doc = self.docs.get(filter["sha256"])
+        deleted = doc is not None and len(doc["refs"]) == filter["refs"]["$size"]
+        if deleted:
+            del self.docs[filter["sha256"]]
+        return SimpleNamespace(deleted_count=1 if deleted else 0)
+
+
+class FakeS3Error(Exception):
+    def __init__(self, status):
+        self.response = {"ResponseMetadata": {"HTTPStatusCode": status}}
+
+
+class FakeS3Client:
+    """In-memory stand-in for a boto3 S3 client."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error(404)
+        return {}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key):
+        return {"Body": SimpleNamespace(read=lambda: self.objects[(Bucket, Key)])}
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.objects[(Bucket, Key)] = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+def _store(backend):
+    store = BlobStore(backend)
+    store._refs = FakeRefs()
+    return store
+
+
+class TestBlobStore:
+    """Tests for BlobStore with the local backend."""
+
+    @pytest.mark.asyncio
+    async def test_same_content_is_stored_once(self, tmp_path):
+        store = _store(LocalBlobBackend(tmp_path))
+        content = b"%PDF-1.4 invoice"
+
+        first = await store.put(content, "doc-1")
+        second = await store.put(content, "doc-2")
+
+        assert first == second == content_hash(content)
+        path = tmp_path / blob_key(first)
+        assert path.read_bytes() == content
+        assert path.parent.parent.name == first[:2]
+        assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [first]
+        assert store.stats()["writes"] == 1
+        assert store.stats()["dedup_hits"] == 1
+        assert store._refs.docs[first]["refs"] == ["doc-1", "doc-2"]
+        assert await store.get(first) == content
+        assert await store.local_path(first) == path
+
+    @pytest.mark.asyncio
+    async def test_blob_deleted_with_last_reference(self, tmp_path):
+        store = _store(LocalBlobBackend(tmp_path))
+        sha = await store.put(b"shared", "doc-1")
+        await store.put(b"shared", "doc-2")
+
+        assert await store.release(sha, "doc-1") is False
+        assert await store.get(sha) == b"shared"
+
+        assert await store.release(sha, "doc-2") is True
+        assert await store.get(sha) is None
+        assert sha not in store._refs.docs
+        assert not [p for p in tmp_path.rglob("*") if p.is_file()]
+
+    @pytest.mark.asyncio
+    async def test_release_restores_blob_referenced_again_meanwhile(self, tmp_path):
+        store = _store(LocalBlobBackend(tmp_path))
+        sha = await store.put(b"contested", "doc-1")
+        refs = store._refs
+        original_delete_one = refs.delete_one
+
+        async def delete_one_after_new_put(filter):
+            # Another request stores the same file between the pull and the delete
+            refs.docs[sha]["refs"].append("doc-2")
+            return await original_delete_one(filter)
+
+        refs.delete_one = delete_one_after_new_put
+
+        assert await store.release(sha, "doc-1") is False
+        assert await store.get(sha) == b"contested"
+        assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [sha]
+
+    @pytest.mark.asyncio
+    async def test_missing_blob_and_empty_hash(self, tmp_path):
+        store = _store(LocalBlobBackend(tmp_path))
+
+        assert await store.get("ab" * 32) is None
+        assert await store.local_path(None) is None
+        assert await store.release(None, "doc-1") is False
+
+
+class TestS3Backend:
+    """Tests for the S3 backend against an in-memory client."""
+
+    @pytest.mark.asyncio
+    async def test_put_read_cache_and_delete(self, tmp_path):
+        client = FakeS3Client()
+        store = _store(S3BlobBackend(bucket="docs", prefix="blobs/", client=client, cache_dir=tmp_path))
+
+        sha = await store.put(b"remote pdf", "doc-1")
+        assert client.objects[("docs", f"blobs/{blob_key(sha)}")] == b"remote pdf"
+
+        path = await store.local_path(sha)
+        assert path == tmp_path / blob_key(sha)
+        assert path.read_bytes() == b"remote pdf"
+
+        assert await store.release(sha, "doc-1") is True
+        assert client.objects == {}
+        assert not path.exists()
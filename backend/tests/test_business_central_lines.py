@@ -0,0 +1,118 @@
+"""
+Unit tests for Business Central document line creation.
+
+Covers creating invoice and sales order lines through one OData $batch
+call, atomic failure reporting, the per-line fallback and the item GUID
+cache.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+import services.business_central_service as bc_module
+from services.business_central_service import BusinessCentralService
+from tests.http_fakes import FakeClient, FakeResponse
+
+
+def _batch_ok(url, headers=None, json=None):
+    return FakeResponse(200, {"responses": [
+        {"id": r["id"], "status": 201, "body": {"id": f"line-{r['id']}"}} for r in json["requests"]
+    ]})
+
+
+FREIGHT_LINES = [
+    {"description": f"Accessorial {i}", "quantity": 1, "unit_price": 10 + i}
+    for i in range(30)
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_item_cache():
+    bc_module._item_id_cache.clear()
+    yield
+    bc_module._item_id_cache.clear()
+
+
+class TestAddInvoiceLines:
+    """Tests for BusinessCentralService._add_invoice_lines."""
+
+    @pytest.mark.asyncio
+    async def test_all_lines_in_one_atomic_batch(self):
+        client = FakeClient(post=_batch_ok)
+        service = BusinessCentralService(use_mock=False)
+        service._get_item_id_by_code = AsyncMock(return_value="item-guid")
+
+        with patch("services.business_central_service.httpx.AsyncClient", return_value=client):
+            result = await service._add_invoice_lines("inv-1", FREIGHT_LINES, "token", "co-1")
+
+        assert result == {"added": 30, "total": 30, "errors": []}
+        assert client.post.call_count == 1
+        call = client.post.call_args
+        assert call.args[0].endswith("/api/v2.0/$batch")
+        assert call.kwargs["headers"]["Isolation"] == "snapshot"
+        requests = call.kwargs["json"]["requests"]
+        assert len(requests) == 30
+        assert requests[0]["url"] == "companies(co-1)/purchaseInvoices(inv-1)/purchaseInvoiceLines"
+        assert requests[0]["body"]["itemId"] == "item-guid"
+
+    @pytest.mark.asyncio
+    async def test_failed_line_rolls_back_batch(self):
+        def post(url, headers=None, json=None):
+            return FakeResponse(200, {"responses": [
+                {"id": r["id"], "status": 400 if r["id"] == "2" else 201, "body": {"error": "bad"}}
+                for r in json["requests"]
+            ]})
+
+        client = FakeClient(post=post)
+        service = BusinessCentralService(use_mock=False)
+        service._get_item_id_by_code = AsyncMock(return_value="item-guid")
+
+        with patch("services.business_central_service.httpx.AsyncClient", return_value=client):
+            result = await service._add_invoice_lines("inv-1", FREIGHT_LINES[:3], "token", "co-1")
+
+        assert result["added"] == 0
+        assert result["errors"][0]["line"] == 2
+        assert "rolled back" in result["errors"][1]["error"]
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_single_posts(self):
+        responses = [FakeResponse(404, {"error": "no batch"}), FakeResponse(201), FakeResponse(201)]
+        client = FakeClient(post=responses)
+        service = BusinessCentralService(use_mock=False)
+
+        with patch("services.business_central_service.httpx.AsyncClient", return_value=client):
+            result = await service._add_sales_order_lines(
+                "so-1", [{"itemNumber": "A", "quantity": 2}, {"itemNumber": "B"}], "token", "co-1"
+            )
+
+        assert result == {"added": 2, "total": 2, "errors": []}
+        assert client.post.call_args.args[0].endswith("companies(co-1)/salesOrders(so-1)/salesOrderLines")
+
+
+class TestGetItemIdByCode:
+    """Tests for BusinessCentralService._get_item_id_by_code caching."""
+
+    @pytest.mark.asyncio
+    async def test_found_item_is_cached(self):
+        client = FakeClient(get=lambda url, headers=None, params=None: FakeResponse(
+            200, {"value": [{"id": "item-guid", "number": "FREIGHT"}]}
+        ))
+        service = BusinessCentralService(use_mock=False)
+
+        with patch("services.business_central_service.httpx.AsyncClient", return_value=client):
+            first = await service._get_item_id_by_code("FREIGHT", "token", "co-1")
+            second = await service._get_item_id_by_code("FREIGHT", "token", "co-1")
+
+        assert first == second == "item-guid"
+        assert client.get.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_item_is_not_cached(self):
+        client = FakeClient(get=lambda url, headers=None, params=None: FakeResponse(200, {"value": []}))
+        service = BusinessCentralService(use_mock=False)
+
+        with patch("services.business_central_service.httpx.AsyncClient", return_value=client):
+            assert await service._get_item_id_by_code("FREIGHT", "token", "co-1") is None
+
+        assert ("co-1", "FREIGHT") not in bc_module._item_id_cache
@@ -0,0 +1,99 @@
+"""
+Unit tests for the configuration cache.
+
+Covers lazy loading, typed accessors returning copies, local invalidation
+and invalidations made by other processes (version counter).
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.config_cache import ConfigCache, JOB_TYPES, VENDOR_ALIASES
+
+
+def _cursor(docs):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(side_effect=lambda length=None: [dict(d) for d in docs])
+    return cursor
+
+
+def _db(job_types=None, aliases=None):
+    db = MagicMock()
+    db.hub_job_types.find = MagicMock(return_value=_cursor(job_types or []))
+    db.vendor_aliases.find = MagicMock(return_value=_cursor(aliases or []))
+    db.mailbox_sources.find = MagicMock(return_value=_cursor([
+        {"mailbox_id": "m1", "enabled": True}, {"mailbox_id": "m2", "enabled": False}
+    ]))
+    db.hub_config.find_one = AsyncMock(return_value={"_key": "email_watcher", "enabled": True})
+    db.hub_settings.find_one = AsyncMock(return_value=None)
+    db.hub_settings.find_one_and_update = AsyncMock(return_value={JOB_TYPES: 1})
+    return db
+
+
+def _cache(db):
+    cache = ConfigCache()
+    cache.bind(db)
+    return cache
+
+
+class TestConfigCache:
+    """Tests for ConfigCache."""
+
+    @pytest.mark.asyncio
+    async def test_sections_load_once(self):
+        db = _db(job_types=[{"job_type": "AP_Invoice", "sharepoint_folder": "AP"}])
+        cache = _cache(db)
+
+        first = await cache.job_type("AP_Invoice")
+        first["sharepoint_folder"] = "changed by caller"
+        second = await cache.job_type("AP_Invoice")
+
+        assert second["sharepoint_folder"] == "AP"
+        assert await cache.job_type("Unknown") is None
+        assert db.hub_job_types.find.call_count == 1
+        assert cache.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_mailbox_sources_enabled_filter(self):
+        cache = _cache(_db())
+
+        assert [m["mailbox_id"] for m in await cache.mailbox_sources(enabled_only=True)] == ["m1"]
+        assert len(await cache.mailbox_sources()) == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_reloads_and_bumps_shared_version(self):
+        db = _db(job_types=[{"job_type": "AP_Invoice"}])
+        cache = _cache(db)
+        await cache.job_type("AP_Invoice")
+
+        await cache.invalidate(JOB_TYPES)
+        await cache.job_type("AP_Invoice")
+
+        assert db.hub_job_types.find.call_count == 2
+        assert db.hub_settings.find_one_and_update.call_args.args[1] == {"$inc": {JOB_TYPES: 1}}
+        assert cache.stats()["versions"][JOB_TYPES] == 1
+
+    @pytest.mark.asyncio
+    async def test_version_bumped_elsewhere_triggers_reload(self):
+        db = _db(aliases=[{"alias_string": "ACME"}])
+        cache = _cache(db)
+        await cache.vendor_aliases()
+
+        db.hub_settings.find_one = AsyncMock(return_value={VENDOR_ALIASES: 3})
+        await cache.refresh_versions()
+        await cache.vendor_aliases()
+        await cache.vendor_aliases()
+
+        assert db.vendor_aliases.find.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_max_age_bounds_staleness(self):
+        db = _db()
+        cache = ConfigCache(max_age_seconds=0)
+        cache.bind(db)
+
+        await cache.email_watcher()
+        await cache.email_watcher()
+
+        assert db.hub_config.find_one.await_count == 2
@@ -0,0 +1,132 @@
+"""
+Unit tests for the aggregation-based customer dashboard.
+
+Covers response assembly from the aggregation results, the pipeline shapes
+and the per-customer TTL cache with single-flight loads and invalidation.
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.customer_dashboard import (
+    CustomerDashboardCache, build_customer_dashboard, inventory_pipeline, open_orders_pipeline
+)
+
+
+def _cursor(docs):
+    return SimpleNamespace(to_list=AsyncMock(return_value=docs))
+
+
+def _db(customer=None, positions=(), summary=(), orders=(), lost=0):
+    db = MagicMock()
+    db.sales_customers.find_one = AsyncMock(return_value=customer)
+    db.sales_inventory_positions.aggregate = MagicMock(
+        side_effect=lambda pipeline: _cursor(list(summary) if "$group" in pipeline[-1] else list(positions))
+    )
+    db.sales_open_order_headers.aggregate = MagicMock(return_value=_cursor(list(orders)))
+    db.sales_lost_business.count_documents = AsyncMock(return_value=lost)
+    return db
+
+
+class TestBuildDashboard:
+    """Tests for build_customer_dashboard."""
+
+    @pytest.mark.asyncio
+    async def test_response_and_alerts(self):
+        db = _db(
+            customer={"customer_id": "C1", "name": "Acme", "account_manager": "Pat"},
+            positions=[
+                {"item_id": "i1", "item_no": "A-1", "warehouse_code": "WH1", "qty_on_hand": 100.0,
+                 "qty_available": 10.0, "_low_stock": True},
+                {"item_no": "A-2", "qty_on_hand": 5.0, "qty_available": 5.0, "_low_stock": False},
+            ],
+            summary=[{"_id": None, "on_hand": 105.0, "available": 15.0}],
+            orders=[{
+                "orders": [{"order_id": "o1", "total_qty": 8.0, "line_count": 2}],
+                "backordered": [{"order_id": "o1", "order_line_id": "l2", "item_id": "i1", "item_no": "A-1", "ordered_qty": 3.0}],
+            }],
+            lost=2,
+        )
+
+        dashboard = await build_customer_dashboard(db, "C1", days=7)
+
+        assert (dashboard["customer_name"], dashboard["account_manager"]) == ("Acme", "Pat")
+        assert dashboard["summary"] == {"on_hand": 105.0, "allocated": 0, "available": 15.0, "on_water": 0, "on_order": 0}
+        assert [p["item_no"] for p in dashboard["inventory_positions"]] == ["A-1", "A-2"]
+        assert all("_low_stock" not in p for p in dashboard["inventory_positions"])
+        assert dashboard["open_orders"] == [{"order_id": "o1", "total_qty": 8.0, "line_count": 2}]
+        alerts = {a["alert_type"]: a for a in dashboard["alerts"]}
+        assert alerts["low_stock"]["message"] == "Low stock: A-1 at WH1 - 10 available"
+        assert alerts["at_risk_order"]["details"] == {"line_id": "l2", "qty": 3.0}
+        assert alerts["lost_business"]["details"] == {"count": 2, "days": 7}
+
+    @pytest.mark.asyncio
+    async def test_missing_customer_returns_none(self):
+        assert await build_customer_dashboard(_db(), "nobody") is None
+
+    def test_pipelines_filter_and_join(self):
+        inventory = inventory_pipeline("C1", "WH1")
+        assert inventory[0] == {"$match": {"customer_id": "C1", "warehouse_id": "WH1"}}
+        lookups = [s["$lookup"].get("foreignField") for s in inventory if "$lookup" in s]
+        assert lookups == ["item_id", "item_no", "warehouse_id", "code", None]
+
+        orders = open_orders_pipeline("C1")
+        assert orders[0]["$match"]["status"] == {"$nin": ["shipped", "closed"]}
+        assert set(orders[-1]["$facet"]) == {"orders", "backordered"}
+
+
+class TestCache:
+    """Tests for CustomerDashboardCache."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_load_once(self):
+        cache = CustomerDashboardCache(ttl_seconds=60)
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"customer_id": "C1"}
+
+        results = await asyncio.gather(*[cache.get(("C1", None, 30), load) for _ in range(5)])
+
+        assert len(calls) == 1
+        assert all(r == {"customer_id": "C1"} for r in results)
+        assert cache.stats()["hits"] == 4
+
+    @pytest.mark.asyncio
+    async def test_invalidate_by_customer_and_expiry(self):
+        cache = CustomerDashboardCache(ttl_seconds=60)
+        loads = {"C1": 0, "C2": 0}
+
+        def loader(customer_id):
+            async def load():
+                loads[customer_id] += 1
+                return {"customer_id": customer_id}
+            return load
+
+        for customer_id in ("C1", "C2"):
+            await cache.get((customer_id, None, 30), loader(customer_id))
+        cache.invalidate("C1")
+        for customer_id in ("C1", "C2"):
+            await cache.get((customer_id, None, 30), loader(customer_id))
+        assert loads == {"C1": 2, "C2": 1}
+
+        cache.ttl_seconds = 0
+        await cache.get(("C2", None, 30), loader("C2"))
+        assert loads["C2"] == 2
+
+    @pytest.mark.asyncio
+    async def test_load_racing_invalidation_and_misses_are_not_cached(self):
+        cache = CustomerDashboardCache(ttl_seconds=60)
+
+        async def load_during_import():
+            cache.invalidate()
+            return {"stale": True}
+
+        assert await cache.get(("C1", None, 30), load_during_import) == {"stale": True}
+        assert await cache.get(("C1", None, 30), AsyncMock(return_value=None)) is None
+        assert cache.stats()["entries"] == 0
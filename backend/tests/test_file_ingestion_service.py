@@ -0,0 +1,307 @@
+"""
+Unit tests for streaming CSV/Excel ingestion.
+
+Covers incremental CSV and read-only Excel parsing, chunked validation,
+batched imports with progress on file_ingestion_log and PO grouping across
+chunks.
+"""
+import io
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+import services.file_ingestion_service as ingestion_module
+from services.file_ingestion_service import FileIngestionService
+
+
+INVENTORY_CSV = (
+    "Item,On Hand,Allocated,Warehouse\n"
+    "A-1,100,10,WH1\n"
+    "A-2,\"1,200\",0,WH1\n"
+    ",5,0,WH2\n"
+    "A-4,abc,0,WH2\n"
+    "A-5,7,,WH2\n"
+).encode("utf-8")
+
+ORDERS_CSV = (
+    "PO Number,Item,Qty\n"
+    "PO-1,A-1,5\n"
+    "PO-2,A-2,3\n"
+    "PO-1,A-3,2\n"
+    "PO-1,A-4,1\n"
+).encode("utf-8")
+
+
+class FakeOrderHeaders:
+    """Order headers upserted by (ingestion_id, customer_po_no) with $inc totals."""
+
+    def __init__(self):
+        self.docs = []
+        self.bulk_writes = 0
+
+    def _find(self, filter):
+        return next((d for d in self.docs if all(d.get(k) == v for k, v in filter.items())), None)
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_writes += 1
+        upserted = 0
+        for op in operations:
+            doc = self._find(op._filter)
+            if doc is None:
+                doc = {**op._filter, **op._doc["$setOnInsert"], "total_qty": 0, "line_count": 0}
+                self.docs.append(doc)
+                upserted += 1
+            for field, value in op._doc["$inc"].items():
+                doc[field] += value
+            doc.update(op._doc["$set"])
+        return SimpleNamespace(upserted_count=upserted)
+
+    def find(self, filter, projection=None):
+        pos = filter["customer_po_no"]["$in"]
+        return _AsyncIter([
+            dict(d) for d in self.docs
+            if d["ingestion_id"] == filter["ingestion_id"] and d["customer_po_no"] in pos
+        ])
+
+    async def distinct(self, field, filter):
+        return [d[field] for d in self.docs if d["ingestion_id"] == filter["ingestion_id"]]
+
+
+def _db():
+    db = MagicMock()
+    db.sales_open_order_headers = FakeOrderHeaders()
+    for name in ("file_ingestion_log", "sales_open_order_lines"):
+        coll = getattr(db, name)
+        coll.insert_one = AsyncMock()
+        coll.insert_many = AsyncMock()
+        coll.update_one = AsyncMock()
+    for name in ("sales_inventory_snapshots", "sales_inventory_positions"):
+        coll = getattr(db, name)
+        coll.bulk_write = AsyncMock(side_effect=lambda ops, ordered: SimpleNamespace(
+            upserted_count=len(ops), matched_count=0, modified_count=0
+        ))
+    db.sales_inventory_snapshots.aggregate = MagicMock(return_value=_AsyncIter([]))
+    return db
+
+
+class _AsyncIter:
+    def __init__(self, items):
+        self.items = list(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.items:
+            raise StopAsyncIteration
+        return self.items.pop(0)
+
+
+class TestParsing:
+    """Tests for streaming parse_file."""
+
+    def test_csv_counts_errors_and_preview(self):
+        result = FileIngestionService().parse_file(INVENTORY_CSV, "inv.csv", "inventory_position")
+
+        assert result.success
+        assert (result.rows_parsed, result.rows_valid, result.rows_invalid) == (5, 3, 2)
+        assert [e["row"] for e in result.validation_errors] == [4, 5]
+        assert [r["item_no"] for r in result.preview_data] == ["A-1", "A-2", "A-5"]
+
+    def test_csv_stream_with_bom_and_latin1(self):
+        service = FileIngestionService()
+        bom = service.parse_file(io.BytesIO(b"\xef\xbb\xbf" + ORDERS_CSV), "po.csv", "sales_order")
+        assert bom.column_mapping["customer_po"] == "PO Number"
+
+        latin1 = "PO Number,Item,Qty\nPO-\xe9,A-1,5\n".encode("latin-1")
+        result = service.parse_file(io.BytesIO(latin1), "po.csv", "sales_order")
+        assert result.preview_data[0]["customer_po"] == "PO-\xe9"
+
+        # Encoding is detected from the first block; stray bytes later fall back to latin-1
+        mixed = b"PO Number,Item,Qty\nPO-\xc3\xa9,A-1,5\n" + b"PO-\xe9,A-2,1\n"
+        with patch.object(ingestion_module, "READ_BLOCK_SIZE", 24):
+            result = service.parse_file(io.BytesIO(mixed), "po.csv", "sales_order")
+        assert [r["customer_po"] for r in result.preview_data] == ["PO-\xe9", "PO-\xe9"]
+
+    def test_validation_errors_are_capped(self):
+        rows = "".join(f",{i}\n" for i in range(20))
+        with patch.object(ingestion_module, "MAX_VALIDATION_ERRORS", 5):
+            result = FileIngestionService().parse_file(f"Item,On Hand\n{rows}".encode(), "inv.csv", "inventory_position")
+
+        assert result.rows_invalid == 20
+        assert len(result.validation_errors) == 5
+        assert not result.success
+
+    def test_xlsx_read_only(self):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["Item", "On Hand"])
+        sheet.append(["A-1", 12])
+        sheet.append([None, None])
+        sheet.append(["A-2", 3.5])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        service = FileIngestionService()
+        result = service.parse_file(buffer.getvalue(), "inv.xlsx", "inventory_position")
+
+        assert result.rows_parsed == 2
+        assert [(r["item_no"], r["qty_on_hand"]) for r in result.preview_data] == [("A-1", "12"), ("A-2", "3.5")]
+        assert service.get_excel_sheets(buffer.getvalue()) == ["Sheet"]
+
+    def test_missing_required_columns(self):
+        result = FileIngestionService().parse_file(b"Foo,Bar\n1,2\n", "x.csv", "inventory_position")
+
+        assert result.error.startswith("Missing required columns")
+
+
+class TestImportFile:
+    """Tests for FileIngestionService.import_file."""
+
+    @pytest.mark.asyncio
+    async def test_inventory_is_upserted_in_batches_with_progress(self):
+        db = _db()
+        service = FileIngestionService(db)
+
+        result = await service.import_file(
+            io.BytesIO(INVENTORY_CSV), "inv.csv", "inventory_position", customer_id="C1", chunk_size=2
+        )
+
+        assert result["success"]
+        assert result["positions_created"] == 3
+        assert result["total_on_hand"] == 1307.0
+        assert result["snapshot_changes"]["snapshots_inserted"] == 3
+        batches = [c.args[0] for c in db.sales_inventory_positions.bulk_write.call_args_list]
+        assert [len(b) for b in batches] == [2, 1]
+        assert batches[0][0]._doc["$set"]["qty_available"] == 90.0
+        assert db.sales_inventory_snapshots.aggregate.called
+        assert db.file_ingestion_log.insert_one.call_args.args[0]["status"] == "running"
+        final = db.file_ingestion_log.update_one.call_args.args[1]["$set"]
+        assert final["status"] == "completed"
+        assert final["rows_imported"] == 3
+        assert final["rows_invalid"] == 2
+
+    @pytest.mark.asyncio
+    async def test_sales_orders_grouped_across_chunks(self):
+        db = _db()
+        service = FileIngestionService(db)
+
+        result = await service.import_file(io.BytesIO(ORDERS_CSV), "po.csv", "sales_order", chunk_size=1)
+
+        assert result["orders_created"] == 2
+        assert result["lines_created"] == 4
+        assert result["total_quantity"] == 11.0
+        headers = db.sales_open_order_headers
+        assert headers.bulk_writes == 4
+        assert len(headers.docs) == 2
+        po1 = next(h for h in headers.docs if h["customer_po_no"] == "PO-1")
+        assert (po1["line_count"], po1["total_qty"]) == (3, 8.0)
+        assert sorted(result["order_ids"]) == sorted(h["order_id"] for h in headers.docs)
+        lines = [c.args[0][0] for c in db.sales_open_order_lines.insert_many.call_args_list]
+        assert [l["line_number"] for l in lines if l["order_id"] == po1["order_id"]] == [1, 2, 3]
+        assert {l["order_id"] for l in lines} == {h["order_id"] for h in headers.docs}
+
+    @pytest.mark.asyncio
+    async def test_dry_run_writes_nothing(self):
+        db = _db()
+        service = FileIngestionService(db)
+
+        result = await service.import_file(io.BytesIO(ORDERS_CSV), "po.csv", "sales_order", dry_run=True)
+
+        assert result["dry_run"] and result["orders_created"] == 2
+        assert len(result["preview"]) == 2
+        db.sales_open_order_lines.insert_many.assert_not_called()
+        db.file_ingestion_log.insert_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_file_without_valid_rows_fails(self):
+        db = _db()
+        service = FileIngestionService(db)
+
+        result = await service.import_file(io.BytesIO(b"Item,On Hand\n,1\n"), "inv.csv", "inventory_position")
+
+        assert not result["success"]
+        assert result["rows_invalid"] == 1
+        assert db.file_ingestion_log.update_one.call_args.args[1]["$set"]["status"] == "failed"
+
+
+EDGE_CSV = (
+    "Item,On Hand,Allocated,Available,Warehouse\n"
+    "A-1, 100 ,10,,WH1\n"
+    "A-2,\"1,200\",x,5,\n"
+    "A-3,1_000,0\n"
+    "A-4,1e2,1,,WH2,extra\n"
+    " ,abc,0,,WH2\n"
+    ",,,,\n"
+).encode("utf-8")
+
+
+class TestColumnarValidation:
+    """The columnar (pandas) path matches the row-by-row path."""
+
+    @pytest.mark.parametrize("data,ingestion_type", [
+        (INVENTORY_CSV, "inventory_position"),
+        (EDGE_CSV, "inventory_position"),
+        (ORDERS_CSV + b",A-9,0\nPO-3,,-1\nPO-3,A-9,zz\nPO-4,A-1,\n", "sales_order"),
+        (b"Customer SKU,Item\nC-1,A-1\n,A-2\nC-3,\n", "customer_item"),
+    ])
+    def test_same_results_as_row_path(self, data, ingestion_type):
+        service = FileIngestionService()
+        rows = service.parse_file(data, "f.csv", ingestion_type, columnar=False).model_dump()
+        columns = service.parse_file(data, "f.csv", ingestion_type, columnar=True).model_dump()
+
+        rows.pop("ingestion_id"), columns.pop("ingestion_id")
+        assert columns == rows
+        assert columns["validation_errors"]
+
+    def test_parse_quantities(self):
+        import pandas as pd
+        service = FileIngestionService()
+        values = pd.Series(["1,200", "", "abc", "1_000", "-2.5", "1e3"])
+
+        parsed, ok = service._parse_quantities(values)
+
+        assert ok.tolist() == [True, False, False, True, True, True]
+        assert [parsed[i] for i in (0, 3, 4, 5)] == [1200.0, 1000.0, -2.5, 1000.0]
+
+    def test_inventory_positions_match_row_path(self):
+        service = FileIngestionService()
+        result = service.parse_file(EDGE_CSV, "inv.csv", "inventory_position", columnar=False)
+        valid_rows = result.preview_data
+        import pandas as pd
+        frame = pd.DataFrame(valid_rows)
+
+        expected = service._inventory_positions(valid_rows, "C1", None, "ing", "now", "today")
+        actual = service._inventory_positions_frame(frame, "C1", None, "ing", "now", "today")
+
+        for position in expected + actual:
+            assert position.pop("inventory_id").startswith("inv_")
+        assert actual == expected
+        assert all(type(p["qty_available"]) is float for p in actual)
+
+    @pytest.mark.parametrize("columnar", [False, True])
+    def test_xlsx_headers_and_chunks(self, columnar):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["PO", "SKU", "Qty"])
+        for i in range(5):
+            sheet.append([f"PO-{i % 2}", f"A-{i}", i])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+
+        service = FileIngestionService()
+        chunks, is_frame = service._validated(
+            io.BytesIO(buffer.getvalue()),
+            ingestion_module.IngestionResult(
+                success=False, ingestion_id="x", ingestion_type="sales_order", file_name="po.xlsx",
+                rows_parsed=0, rows_valid=0, rows_invalid=0
+            ),
+            chunk_size=2, columnar=columnar
+        )
+
+        assert is_frame == columnar
+        assert [len(c) for c in chunks] == [1, 2, 1]
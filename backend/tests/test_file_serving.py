@@ -0,0 +1,131 @@
+"""
+Unit tests for document file serving.
+
+Covers ETag/304 handling, byte ranges (206/416), If-Range, cache headers and
+the zero-copy send path.
+"""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.file_serving import RangeNotSatisfiable, etag_matches, file_response, parse_range
+
+SHA = "a" * 64
+CONTENT = bytes(range(256)) * 40
+
+
+def make_client(path, sha256=SHA) -> TestClient:
+    app = FastAPI()
+
+    @app.api_route("/file", methods=["GET", "HEAD"])
+    async def serve(request: Request):
+        return file_response(request, path, "application/pdf", "invoice.pdf", sha256=sha256)
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(CONTENT)
+    return path
+
+
+class TestParseRange:
+    """Tests for parse_range and etag_matches."""
+
+    def test_ranges(self):
+        assert parse_range(None, 100) is None
+        assert parse_range("bytes=0-9", 100) == (0, 9)
+        assert parse_range("bytes=90-", 100) == (90, 99)
+        assert parse_range("bytes=-10", 100) == (90, 99)
+        assert parse_range("bytes=50-500", 100) == (50, 99)
+        assert parse_range("bytes=0-1,5-6", 100) is None
+        assert parse_range("items=0-1", 100) is None
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range("bytes=100-", 100)
+
+    def test_etag_matches(self):
+        assert etag_matches(f'"x", "{SHA}"', f'"{SHA}"')
+        assert etag_matches(f'W/"{SHA}"', f'"{SHA}"')
+        assert etag_matches("*", f'"{SHA}"')
+        assert not etag_matches('"other"', f'"{SHA}"')
+
+
+class TestFileResponse:
+    """Tests for file_response through a test app."""
+
+    def test_full_response_headers(self, pdf):
+        response = make_client(pdf).get("/file")
+
+        assert response.status_code == 200
+        assert response.content == CONTENT
+        assert response.headers["etag"] == f'"{SHA}"'
+        assert response.headers["accept-ranges"] == "bytes"
+        assert "immutable" in response.headers["cache-control"]
+        assert response.headers["content-disposition"] == 'inline; filename="invoice.pdf"'
+
+    def test_not_modified(self, pdf):
+        client = make_client(pdf)
+        response = client.get("/file", headers={"If-None-Match": f'"{SHA}"'})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        last_modified = client.get("/file").headers["last-modified"]
+        assert client.get("/file", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    def test_byte_range(self, pdf):
+        response = make_client(pdf).get("/file", headers={"Range": "bytes=1000-1999"})
+
+        assert response.status_code == 206
+        assert response.content == CONTENT[1000:2000]
+        assert response.headers["content-range"] == f"bytes 1000-1999/{len(CONTENT)}"
+        assert response.headers["content-length"] == "1000"
+
+    def test_unsatisfiable_range(self, pdf):
+        response = make_client(pdf).get("/file", headers={"Range": f"bytes={len(CONTENT)}-"})
+
+        assert response.status_code == 416
+        assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+    def test_stale_if_range_sends_whole_file(self, pdf):
+        client = make_client(pdf)
+        response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+        assert response.status_code == 200
+        assert response.content == CONTENT
+
+        response = client.get("/file", headers={"Range": "bytes=0-9", "If-Range": f'"{SHA}"'})
+        assert response.status_code == 206
+
+    def test_without_hash_clients_revalidate(self, pdf):
+        response = make_client(pdf, sha256=None).get("/file")
+
+        assert response.headers["etag"].startswith('W/"')
+        assert response.headers["cache-control"] == "private, no-cache"
+
+    def test_head_sends_headers_only(self, pdf):
+        response = make_client(pdf).head("/file")
+
+        assert response.status_code == 200
+        assert response.headers["content-length"] == str(len(CONTENT))
+        assert response.content == b""
+
+    @pytest.mark.asyncio
+    async def test_zero_copy_when_server_supports_it(self, pdf):
+        scope = {"type": "http", "method": "GET", "headers": [(b"range", b"bytes=10-19")],
+                 "extensions": {"http.response.zerocopysend": {}}}
+        response = file_response(Request(scope), pdf, "application/pdf", "invoice.pdf", sha256=SHA)
+        sent = []
+
+        async def send(message):
+            if message["type"] == "http.response.zerocopysend":
+                message = {**message, "data": message["file"].read()}
+            sent.append(message)
+
+        await response(scope, None, send)
+
+        assert sent[0]["status"] == 206
+        assert sent[1]["type"] == "http.response.zerocopysend"
+        assert (sent[1]["offset"], sent[1]["count"]) == (10, 10)
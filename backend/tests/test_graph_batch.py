@@ -0,0 +1,166 @@
+"""
+Unit tests for Microsoft Graph JSON batching.
+
+Covers chunking to 20 sub-requests with dependency groups, dependsOn
+ordering, per-sub-request 429 retry, and the batched metadata write used by
+SharePoint migration.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch, MagicMock
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.graph_batch import (
+    GraphRequest,
+    send_batch,
+    _chunk_requests,
+    MAX_BATCH_REQUESTS,
+)
+from services.sharepoint_migration_service import SharePointMigrationService
+from tests.http_fakes import FakeResponse
+
+
+def _batch_client(handler):
+    """Client whose POST answers each $batch payload with handler(sub_request)."""
+    client = MagicMock()
+    payloads = []
+
+    async def post(url, headers=None, json=None):
+        payloads.append(json)
+        return FakeResponse(200, {"responses": [handler(r) for r in json["requests"]]})
+
+    client.post = AsyncMock(side_effect=post)
+    return client, payloads
+
+
+class TestChunkRequests:
+    """Tests for _chunk_requests."""
+
+    def test_splits_at_twenty(self):
+        requests = [GraphRequest(id=str(i), method="GET", url=f"/items/{i}") for i in range(45)]
+        chunks = _chunk_requests(requests)
+        assert [len(c) for c in chunks] == [20, 20, 5]
+
+    def test_keeps_dependency_group_together(self):
+        requests = [GraphRequest(id=str(i), method="GET", url="/x") for i in range(19)]
+        requests.append(GraphRequest(id="a", method="POST", url="/x"))
+        requests.append(GraphRequest(id="b", method="POST", url="/x", depends_on=["a"]))
+        chunks = _chunk_requests(requests)
+        assert [r.id for r in chunks[1]] == ["a", "b"]
+
+    def test_oversized_group_rejected(self):
+        requests = [GraphRequest(id="0", method="POST", url="/x")]
+        for i in range(1, MAX_BATCH_REQUESTS + 1):
+            requests.append(GraphRequest(id=str(i), method="POST", url="/x", depends_on=[str(i - 1)]))
+        with pytest.raises(ValueError):
+            _chunk_requests(requests)
+
+
+class TestSendBatch:
+    """Tests for send_batch."""
+
+    @pytest.mark.asyncio
+    async def test_returns_response_per_request(self):
+        client, payloads = _batch_client(lambda r: {"id": r["id"], "status": 200, "body": {"url": r["url"]}})
+        requests = [GraphRequest(id=str(i), method="GET", url=f"/items/{i}") for i in range(25)]
+
+        responses = await send_batch(client, "token", requests)
+
+        assert len(payloads) == 2
+        assert responses["24"].ok
+        assert responses["24"].body == {"url": "/items/24"}
+
+    @pytest.mark.asyncio
+    async def test_retries_only_throttled_sub_requests(self):
+        attempts = {}
+
+        def handler(r):
+            attempts[r["id"]] = attempts.get(r["id"], 0) + 1
+            if r["id"] == "1" and attempts["1"] == 1:
+                return {"id": "1", "status": 429, "headers": {"Retry-After": "3"}}
+            return {"id": r["id"], "status": 204}
+
+        client, payloads = _batch_client(handler)
+        requests = [GraphRequest(id=str(i), method="PATCH", url="/x", body={}) for i in range(3)]
+        sleep = AsyncMock()
+
+        with patch("services.graph_batch.asyncio.sleep", new=sleep):
+            responses = await send_batch(client, "token", requests)
+
+        assert all(r.ok for r in responses.values())
+        assert [r["id"] for r in payloads[1]["requests"]] == ["1"]
+        sleep.assert_awaited_once_with(3.0)
+
+    @pytest.mark.asyncio
+    async def test_http_date_retry_after(self):
+        from email.utils import format_datetime
+        from datetime import datetime, timedelta, timezone
+        retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        attempts = {}
+
+        def handler(r):
+            attempts[r["id"]] = attempts.get(r["id"], 0) + 1
+            if attempts[r["id"]] == 1:
+                return {"id": r["id"], "status": 429, "headers": {"retry-after": retry_at}}
+            return {"id": r["id"], "status": 204}
+
+        client, payloads = _batch_client(handler)
+        sleep = AsyncMock()
+
+        with patch("services.graph_batch.asyncio.sleep", new=sleep):
+            responses = await send_batch(client, "token", [GraphRequest(id="1", method="PATCH", url="/x", body={})])
+
+        assert responses["1"].ok
+        assert 25 < sleep.await_args.args[0] <= 30
+
+    @pytest.mark.asyncio
+    async def test_failed_dependency_resent_without_finished_dependency(self):
+        def handler(r):
+            if r["id"] == "a":
+                return {"id": "a", "status": 400, "body": {"error": "bad"}}
+            if r.get("dependsOn"):
+                return {"id": r["id"], "status": 424}
+            return {"id": r["id"], "status": 201}
+
+        client, payloads = _batch_client(handler)
+        requests = [
+            GraphRequest(id="a", method="POST", url="/x", body={}),
+            GraphRequest(id="b", method="POST", url="/x", body={}, depends_on=["a"]),
+        ]
+
+        responses = await send_batch(client, "token", requests)
+
+        assert payloads[0]["requests"][1]["dependsOn"] == ["a"]
+        assert "dependsOn" not in payloads[1]["requests"][0]
+        assert responses["a"].status == 400
+        assert responses["b"].status == 201
+
+    @pytest.mark.asyncio
+    async def test_duplicate_ids_rejected(self):
+        client, _ = _batch_client(lambda r: {"id": r["id"], "status": 200})
+        requests = [GraphRequest(id="1", method="GET", url="/x"), GraphRequest(id="1", method="GET", url="/y")]
+        with pytest.raises(ValueError):
+            await send_batch(client, "token", requests)
+
+
+class TestWriteMetadataBatch:
+    """Tests for SharePointMigrationService._write_metadata_batch."""
+
+    @pytest.mark.asyncio
+    async def test_patches_list_item_fields_in_one_call(self):
+        def handler(r):
+            return {"id": r["id"], "status": 404 if "item-2" in r["url"] else 200}
+
+        client, payloads = _batch_client(handler)
+        service = SharePointMigrationService(MagicMock())
+
+        results = await service._write_metadata_batch(
+            client, "drive", {"item-1": {"AcctType": "Customer Accounts"}, "item-2": {}}, "token"
+        )
+
+        assert len(payloads) == 1
+        request = payloads[0]["requests"][0]
+        assert request["method"] == "PATCH"
+        assert request["url"] == "/drives/drive/items/item-1/listItem/fields"
+        assert request["body"] == {"AcctType": "Customer Accounts"}
+        assert results == {"item-1": ("success", None), "item-2": ("list_item_not_found", None)}
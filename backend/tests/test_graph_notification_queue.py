@@ -0,0 +1,195 @@
+"""
+Unit tests for the Graph notification queue and subscription renewal.
+
+Covers clientState validation, deduplication, worker success/retry handling,
+lease renewal and renewal/recreation of the mail subscription.
+"""
+import asyncio
+import pytest
+from datetime import datetime, timezone, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+import services.graph_notification_queue as queue_module
+from services.graph_notification_queue import (
+    GraphNotificationQueue, SubscriptionManager, GRAPH_WEBHOOK_CLIENT_STATE, parse_message_notification
+)
+from pymongo.errors import BulkWriteError
+from tests.http_fakes import FakeClient, FakeResponse
+
+
+def _notification(email_id, client_state=GRAPH_WEBHOOK_CLIENT_STATE):
+    return {
+        "subscriptionId": "sub-1",
+        "clientState": client_state,
+        "changeType": "created",
+        "resource": f"users/ap@contoso.com/mailFolders/Inbox/messages/{email_id}",
+    }
+
+
+def _queue():
+    db = MagicMock()
+    db.graph_notification_queue.insert_many = AsyncMock()
+    db.graph_notification_queue.update_one = AsyncMock()
+    db.graph_notification_queue.find_one_and_update = AsyncMock()
+    return GraphNotificationQueue(db), db.graph_notification_queue
+
+
+class TestEnqueue:
+    """Tests for GraphNotificationQueue.enqueue."""
+
+    def test_parse_message_notification(self):
+        assert parse_message_notification(_notification("m1")) == {"mailbox": "ap@contoso.com", "email_id": "m1"}
+        assert parse_message_notification({"changeType": "updated", "resource": "users/x/messages/m1"}) is None
+        assert parse_message_notification({"changeType": "created", "resource": "Users/u1/Messages/m2"}) == {
+            "mailbox": "u1", "email_id": "m2"}
+
+    @pytest.mark.asyncio
+    async def test_rejects_bad_client_state_and_dedupes_batch(self):
+        queue, coll = _queue()
+
+        summary = await queue.enqueue([
+            _notification("m1"), _notification("m1"), _notification("m2", client_state="forged"),
+            {"clientState": GRAPH_WEBHOOK_CLIENT_STATE, "changeType": "deleted", "resource": "users/a/messages/m3"},
+        ])
+
+        assert summary == {"accepted": 1, "duplicates": 1, "rejected": 1, "ignored": 1}
+        entries = coll.insert_many.call_args.args[0]
+        assert [e["dedup_key"] for e in entries] == ["ap@contoso.com:m1"]
+        assert entries[0]["status"] == "queued"
+
+    @pytest.mark.asyncio
+    async def test_non_ascii_client_state_is_rejected(self):
+        queue, coll = _queue()
+
+        summary = await queue.enqueue([_notification("m1", client_state="é"), _notification("m2")])
+
+        assert summary == {"accepted": 1, "duplicates": 0, "rejected": 1, "ignored": 0}
+        assert [e["email_id"] for e in coll.insert_many.call_args.args[0]] == ["m2"]
+
+    @pytest.mark.asyncio
+    async def test_already_queued_notifications_count_as_duplicates(self):
+        queue, coll = _queue()
+        coll.insert_many.side_effect = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000}]})
+
+        summary = await queue.enqueue([_notification("m1"), _notification("m2")])
+
+        assert summary["accepted"] == 1
+        assert summary["duplicates"] == 1
+
+
+class TestWorkers:
+    """Tests for the worker loop."""
+
+    @pytest.mark.asyncio
+    async def test_processes_and_retries(self):
+        queue, coll = _queue()
+        ok = {"id": "e1", "dedup_key": "mb:m1", "email_id": "m1", "mailbox": "mb", "attempts": 1}
+        bad = {"id": "e2", "dedup_key": "mb:m2", "email_id": "m2", "mailbox": "mb", "attempts": 1}
+        coll.find_one_and_update.side_effect = [ok, bad, None, None, None]
+
+        async def handler(email_id, mailbox):
+            if email_id == "m2":
+                raise Exception("Graph 503")
+
+        with patch.object(queue_module, "IDLE_POLL_SECONDS", 0.01):
+            task = asyncio.create_task(queue.run_workers(handler, concurrency=1))
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        updates = {c.args[0]["id"]: c.args[1]["$set"] for c in coll.update_one.call_args_list}
+        assert updates["e1"]["status"] == "done"
+        assert updates["e2"]["status"] == "queued"
+        assert updates["e2"]["last_error"] == "Graph 503"
+        assert updates["e2"]["available_at"] > datetime.now(timezone.utc).isoformat()
+
+    @pytest.mark.asyncio
+    async def test_lease_renewed_while_handler_runs(self):
+        queue, coll = _queue()
+        coll.update_one.return_value = MagicMock(matched_count=1)
+        entry = {"id": "e1", "dedup_key": "mb:m1", "email_id": "m1", "mailbox": "mb", "attempts": 1,
+                 "lease_token": "t1"}
+        coll.find_one_and_update.side_effect = [entry, None, None, None]
+
+        async def slow_handler(email_id, mailbox):
+            await asyncio.sleep(0.05)
+
+        with patch.object(queue_module, "IDLE_POLL_SECONDS", 0.01), \
+             patch.object(queue_module, "LEASE_RENEW_SECONDS", 0.01):
+            task = asyncio.create_task(queue.run_workers(slow_handler, concurrency=1))
+            await asyncio.sleep(0.1)
+            task.cancel()
+
+        calls = [(c.args[0], c.args[1]["$set"]) for c in coll.update_one.call_args_list]
+        renewals = [f for f, update in calls if "lease_until" in update]
+        assert renewals and all(f == {"id": "e1", "lease_token": "t1", "status": "processing"} for f in renewals)
+        done_filter, done = calls[-1]
+        assert done_filter == {"id": "e1", "lease_token": "t1"}
+        assert done["status"] == "done"
+        assert done["expire_at"] > datetime.now(timezone.utc) + timedelta(days=1)
+
+    @pytest.mark.asyncio
+    async def test_each_claim_gets_its_own_lease_token(self):
+        queue, coll = _queue()
+
+        await queue.claim()
+        await queue.claim()
+
+        tokens = [c.args[1]["$set"]["lease_token"] for c in coll.find_one_and_update.call_args_list]
+        assert len(set(tokens)) == 2
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self):
+        queue, coll = _queue()
+
+        await queue.fail({"id": "e1", "attempts": queue_module.MAX_ATTEMPTS}, "still failing")
+
+        assert coll.update_one.call_args.args[1]["$set"]["status"] == "failed"
+
+
+class TestSubscriptionManager:
+    """Tests for SubscriptionManager.check."""
+
+    def _manager(self, config, create=None):
+        db = MagicMock()
+        db.hub_config.find_one = AsyncMock(return_value=config)
+        db.hub_config.update_one = AsyncMock()
+        manager = SubscriptionManager(db, AsyncMock(return_value="token"), create or AsyncMock())
+        return manager, db.hub_config
+
+    @pytest.mark.asyncio
+    async def test_valid_subscription_is_left_alone(self):
+        expires = (datetime.now(timezone.utc) + timedelta(days=2)).isoformat()
+        manager, _ = self._manager({"enabled": True, "webhook_subscription_id": "sub-1", "webhook_expiration": expires})
+
+        assert (await manager.check())["status"] == "valid"
+
+    @pytest.mark.asyncio
+    async def test_renews_before_expiry(self):
+        expires = (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat()
+        manager, config = self._manager({"enabled": True, "webhook_subscription_id": "sub-1", "webhook_expiration": expires})
+        client = FakeClient(patch=lambda url, headers=None, json=None: FakeResponse(200, {"expirationDateTime": "2026-01-03T00:00:00Z"}))
+
+        with patch.object(queue_module, "resilient_client", return_value=client):
+            result = await manager.check()
+
+        assert result["status"] == "renewed"
+        assert client.patch.call_args.args[0].endswith("/subscriptions/sub-1")
+        assert config.update_one.call_args.args[1]["$set"]["webhook_expiration"] == "2026-01-03T00:00:00Z"
+
+    @pytest.mark.asyncio
+    async def test_recreates_removed_subscription(self):
+        create = AsyncMock(return_value={"status": "ok", "subscription_id": "sub-2", "expiration": "2026-01-03T00:00:00Z"})
+        manager, config = self._manager({
+            "enabled": True, "webhook_subscription_id": "sub-1", "webhook_expiration": None,
+            "mailbox_address": "ap@contoso.com", "webhook_url": "https://hub/api/graph/webhook"
+        }, create=create)
+        client = FakeClient(patch=lambda url, headers=None, json=None: FakeResponse(404, {}))
+
+        with patch.object(queue_module, "resilient_client", return_value=client):
+            result = await manager.check()
+
+        assert result["status"] == "recreated"
+        create.assert_awaited_once_with("ap@contoso.com", "https://hub/api/graph/webhook")
+        assert config.update_one.call_args.args[1]["$set"]["webhook_subscription_id"] == "sub-2"
@@ -0,0 +1,205 @@
+"""
+Unit tests for inventory snapshots.
+
+Covers snapshot upserts with delta counts, current positions that ignore
+older files, the legacy position migration and monthly compaction.
+"""
+import copy
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import sys
+sys.path.insert(0, '/app/backend')
+from pymongo.errors import BulkWriteError
+from services.inventory_snapshots import (
+    POSITION_KEY, SNAPSHOT_KEY, InventorySnapshotStore, normalize_snapshot_date
+)
+
+
+def _matches(doc, filter):
+    for field, condition in filter.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$lte" in condition and not (value is not None and value <= condition["$lte"]):
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            if "$type" in condition and not isinstance(value, str):
+                return False
+            if "$exists" in condition and (field in doc) != condition["$exists"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for unordered upserts with a unique key."""
+
+    def __init__(self, unique_key=(), docs=()):
+        self.unique_key = unique_key
+        self.docs = [dict(d, _id=i) for i, d in enumerate(docs)]
+        self.next_id = len(self.docs)
+
+    async def bulk_write(self, operations, ordered=True):
+        counts = {"nUpserted": 0, "nMatched": 0, "nModified": 0}
+        errors = []
+        for index, op in enumerate(operations):
+            filter, update = op._filter, op._doc
+            doc = next((d for d in self.docs if _matches(d, filter)), None)
+            if doc is not None:
+                before = copy.deepcopy(doc)
+                doc.update(update["$set"])
+                counts["nMatched"] += 1
+                counts["nModified"] += doc != before
+                continue
+            new = {k: v for k, v in filter.items() if not isinstance(v, dict)}
+            new.update(update["$set"], **update.get("$setOnInsert", {}))
+            key = tuple(new.get(f) for f in self.unique_key)
+            if any(tuple(d.get(f) for f in self.unique_key) == key for d in self.docs):
+                errors.append({"index": index, "code": 11000})
+                continue
+            new["_id"] = self.next_id
+            self.next_id += 1
+            self.docs.append(new)
+            counts["nUpserted"] += 1
+        if errors:
+            raise BulkWriteError({**counts, "writeErrors": errors})
+        return SimpleNamespace(
+            upserted_count=counts["nUpserted"], matched_count=counts["nMatched"], modified_count=counts["nModified"]
+        )
+
+    def find(self, filter):
+        docs = [copy.deepcopy(d) for d in self.docs if _matches(d, filter)]
+
+        class Cursor:
+            def sort(self, keys):
+                docs.sort(key=lambda d: tuple(d.get(k) or "" for k, _ in keys))
+                return self
+
+            async def __aiter__(self):
+                for doc in docs:
+                    yield doc
+
+        return Cursor()
+
+    async def delete_many(self, filter):
+        before = len(self.docs)
+        self.docs = [d for d in self.docs if not _matches(d, filter)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    async def update_one(self, filter, update):
+        for doc in self.docs:
+            if _matches(doc, filter):
+                doc.update(update["$set"])
+                return
+
+
+def _position(item="A-1", date="2026-10-01", on_hand=10.0, **extra):
+    return {
+        "inventory_id": f"inv_{item}_{date}", "customer_id": "C1", "item_no": item, "customer_sku": None,
+        "warehouse_id": "WH1", "snapshot_date": date, "qty_on_hand": on_hand, "qty_allocated": 0.0,
+        "qty_available": on_hand, "qty_on_water": 0.0, "qty_on_order": 0.0,
+        "created_utc": "now", "ingestion_id": "ing", **extra
+    }
+
+
+def _store(positions=()):
+    db = SimpleNamespace(
+        sales_inventory_snapshots=FakeCollection(SNAPSHOT_KEY),
+        sales_inventory_positions=FakeCollection(POSITION_KEY, positions),
+    )
+    return InventorySnapshotStore(db), db
+
+
+class TestWrite:
+    """Tests for InventorySnapshotStore.write."""
+
+    @pytest.mark.asyncio
+    async def test_reimport_is_detected_as_unchanged(self):
+        store, db = _store()
+
+        first = await store.write([_position("A-1"), _position("A-2")])
+        again = await store.write([_position("A-1"), _position("A-2", on_hand=7.0)])
+
+        assert first["snapshots_inserted"] == 2 and first["positions_inserted"] == 2
+        assert (again["snapshots_inserted"], again["snapshots_changed"], again["snapshots_unchanged"]) == (0, 1, 1)
+        assert len(db.sales_inventory_snapshots.docs) == 2
+        assert len(db.sales_inventory_positions.docs) == 2
+
+    @pytest.mark.asyncio
+    async def test_new_day_adds_history_and_moves_current(self):
+        store, db = _store()
+        await store.write([_position(date="2026-10-01")])
+
+        counts = await store.write([_position(date="10/02/2026", on_hand=5.0)])
+
+        assert counts["positions_updated"] == 1
+        assert [d["snapshot_date"] for d in db.sales_inventory_snapshots.docs] == ["2026-10-01", "2026-10-02"]
+        current = db.sales_inventory_positions.docs
+        assert len(current) == 1
+        assert (current[0]["snapshot_date"], current[0]["qty_on_hand"]) == ("2026-10-02", 5.0)
+        assert current[0]["inventory_id"] == "inv_A-1_2026-10-01"
+
+    @pytest.mark.asyncio
+    async def test_older_file_does_not_overwrite_current(self):
+        store, db = _store()
+        await store.write([_position(date="2026-10-05", on_hand=50.0)])
+
+        counts = await store.write([_position(date="2026-10-01", on_hand=1.0)])
+
+        assert counts["positions_stale"] == 1
+        assert counts["snapshots_inserted"] == 1
+        assert db.sales_inventory_positions.docs[0]["qty_on_hand"] == 50.0
+
+    def test_normalize_snapshot_date(self):
+        assert normalize_snapshot_date("2026-10-18") == "2026-10-18"
+        assert normalize_snapshot_date("10/18/2026") == "2026-10-18"
+        assert normalize_snapshot_date("2026-10-18 00:00:00") == "2026-10-18"
+        assert normalize_snapshot_date(datetime(2026, 10, 18, tzinfo=timezone.utc)) == "2026-10-18"
+        assert normalize_snapshot_date("Q3") == "Q3"
+
+
+class TestMaintenance:
+    """Tests for the legacy migration and compaction."""
+
+    @pytest.mark.asyncio
+    async def test_legacy_duplicates_collapse_to_latest(self):
+        legacy = [
+            _position(date="2026-09-01", on_hand=1.0, created_utc="a"),
+            _position(date="2026-09-02", on_hand=2.0, created_utc="b"),
+            _position(date="2026-09-02", on_hand=3.0, created_utc="c"),
+            {"inventory_id": "inv_seed", "customer_id": "C1", "item_id": "item_001", "warehouse_id": "WH1"},
+        ]
+        store, db = _store(legacy)
+
+        migrated = await store.migrate_legacy_positions()
+
+        assert migrated == 3
+        current = [d for d in db.sales_inventory_positions.docs if "item_no" in d]
+        assert len(current) == 1 and current[0]["qty_on_hand"] == 3.0 and current[0]["updated_utc"] == "c"
+        assert len(db.sales_inventory_positions.docs) == 2
+        snapshots = {d["snapshot_date"]: d["qty_on_hand"] for d in db.sales_inventory_snapshots.docs}
+        assert snapshots == {"2026-09-01": 1.0, "2026-09-02": 3.0}
+        assert await store.migrate_legacy_positions() == 0
+
+    @pytest.mark.asyncio
+    async def test_compact_deletes_all_but_last_snapshot_per_month(self):
+        store, db = _store()
+        snapshots = db.sales_inventory_snapshots
+        snapshots.docs = [{"_id": i} for i in range(5)]
+        pipelines = []
+
+        async def aggregate(pipeline, allowDiskUse=False):
+            pipelines.append(pipeline)
+            yield {"_id": {}, "drop": [1, 2]}
+            yield {"_id": {}, "drop": [4]}
+
+        snapshots.aggregate = aggregate
+
+        deleted = await store.compact(retention_days=30, today=datetime(2026, 10, 31, tzinfo=timezone.utc))
+
+        assert deleted == 3
+        assert [d["_id"] for d in snapshots.docs] == [0, 3]
+        assert pipelines[0][0] == {"$match": {"snapshot_date": {"$lt": "2026-10-01"}}}
@@ -3,12 +3,14 @@ Tests for Legacy Migration Module
 
 Tests the migration job, sources, and workflow initialization.
 """
+import json
 import pytest
 import sys
 sys.path.insert(0, '/app/backend')
 
 from services.migration import (
     LegacyDocumentSource, JsonFileSource, InMemorySource,
+    StreamingJsonFileSource, NdjsonFileSource, open_file_source,
     MigrationJob, MigrationResult, WorkflowInitializer
 )
 from services.migration.sources import LegacyDocumentMetadata, LegacyDocument
@@ -132,6 +134,129 @@ class TestInMemorySource:
             )
         
         assert source.get_document_count() == 5
+    
+    def test_doc_type_filter_matches_file_sources(self):
+        """InMemorySource maps Square9 workflows to doc types like the file sources."""
+        source = InMemorySource("test")
+        source.add_documents([
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", "S9-001", legacy_workflow_name="Quality")),
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", "S9-002", legacy_workflow_name="AP Invoice")),
+        ])
+        
+        docs = list(source.iter_documents(doc_type_filter="QUALITY_DOC"))
+        assert [d.metadata.legacy_id for d in docs] == ["S9-001"]
+
+
+class TestStreamingJsonFileSource:
+    """Tests for StreamingJsonFileSource."""
+    
+    def _write_export(self, tmp_path, documents, **header):
+        path = tmp_path / "export.json"
+        path.write_text(json.dumps({**header, "documents": documents}, indent=2))
+        return str(path)
+    
+    def _documents(self, count):
+        return [
+            {
+                "metadata": {
+                    "legacy_system": "SQUARE9" if i % 2 == 0 else "ZETADOCS",
+                    "legacy_id": f"DOC-{i:04d}",
+                    "legacy_workflow_name": "AP_Invoice",
+                    "amount": 100.0 + i,
+                    "quality_tags": "a, b",
+                },
+                "binary_reference": f"/legacy/{i}.pdf"
+            }
+            for i in range(count)
+        ]
+    
+    def test_matches_json_file_source(self, tmp_path):
+        """Test streaming yields the same documents as the in-memory loader."""
+        path = self._write_export(tmp_path, self._documents(50), source_name="Export A")
+        
+        # Tiny chunks force values to span chunk boundaries
+        streamed = list(StreamingJsonFileSource(path, chunk_size=7).iter_documents())
+        loaded = list(JsonFileSource(path).iter_documents())
+        
+        assert [d.to_dict() for d in streamed] == [d.to_dict() for d in loaded]
+        assert streamed[3].metadata.quality_tags == ["a", "b"]
+        assert StreamingJsonFileSource(path).get_source_name() == "Export A"
+    
+    def test_filters_and_limit(self, tmp_path):
+        """Test filters are applied while streaming."""
+        path = self._write_export(tmp_path, self._documents(20))
+        source = StreamingJsonFileSource(path, chunk_size=16)
+        
+        square9 = list(source.iter_documents(source_filter="SQUARE9"))
+        assert len(square9) == 10
+        assert all(d.metadata.legacy_system == "SQUARE9" for d in square9)
+        
+        limited = list(source.iter_documents(source_filter="ZETADOCS", limit=3))
+        assert [d.metadata.legacy_id for d in limited] == ["DOC-0001", "DOC-0003", "DOC-0005"]
+        
+        assert source.get_document_count(doc_type_filter="SALES_INVOICE") == 0
+        assert source.get_source_name() == "export"
+    
+    def test_count_uses_exported_document_count(self, tmp_path):
+        """Test an exported document_count is used without parsing documents."""
+        path = tmp_path / "export.json"
+        path.write_text('{"document_count": 3, "documents": [ not parsed ]}')
+        
+        assert StreamingJsonFileSource(str(path)).get_document_count() == 3
+    
+    def test_top_level_array(self, tmp_path):
+        """Test a bare array of documents is accepted."""
+        path = tmp_path / "export.json"
+        path.write_text(json.dumps(self._documents(4)))
+        source = StreamingJsonFileSource(str(path), chunk_size=5)
+        
+        assert source.get_document_count() == 4
+        assert source.get_source_name() == "export"
+    
+    def test_missing_file(self, tmp_path):
+        """Test a missing file raises FileNotFoundError."""
+        source = StreamingJsonFileSource(str(tmp_path / "missing.json"))
+        with pytest.raises(FileNotFoundError):
+            list(source.iter_documents())
+
+
+class TestNdjsonFileSource:
+    """Tests for NdjsonFileSource."""
+    
+    def test_iterates_and_counts(self, tmp_path):
+        """Test NDJSON records are streamed and blank lines ignored."""
+        path = tmp_path / "export.ndjson"
+        lines = [
+            json.dumps({"metadata": {"legacy_system": "SQUARE9", "legacy_id": f"S9-{i}"}})
+            for i in range(5)
+        ]
+        path.write_text("\n".join(lines[:3]) + "\n\n" + "\n".join(lines[3:]))
+        
+        source = open_file_source(str(path))
+        assert isinstance(source, NdjsonFileSource)
+        assert source.get_document_count() == 5
+        assert [d.metadata.legacy_id for d in source.iter_documents(limit=2)] == ["S9-0", "S9-1"]
+        assert source.get_document_count(source_filter="ZETADOCS") == 0
+    
+    def test_source_filter_uses_parsed_legacy_system(self, tmp_path):
+        """Test records without a legacy_system match the UNKNOWN default."""
+        path = tmp_path / "export.ndjson"
+        path.write_text(
+            json.dumps({"metadata": {"legacy_id": "X-1"}}) + "\n"
+            + json.dumps({"metadata": {"legacy_system": "SQUARE9", "legacy_id": "S9-1"}}) + "\n"
+        )
+        
+        unknown = list(NdjsonFileSource(str(path)).iter_documents(source_filter="UNKNOWN"))
+        
+        assert [d.metadata.legacy_id for d in unknown] == ["X-1"]
+    
+    def test_malformed_line_reports_position(self, tmp_path):
+        """Test malformed records raise with the line number."""
+        path = tmp_path / "export.jsonl"
+        path.write_text('{"metadata": {}}\n{broken\n')
+        
+        with pytest.raises(ValueError, match=":2"):
+            list(NdjsonFileSource(str(path)).iter_documents())
 
 
 class TestWorkflowInitializerAPInvoice:
@@ -546,48 +671,61 @@ class MockAsyncCollection:
     def __init__(self):
         self.documents = []
         self._existing_legacy_ids = set()
+        self.indexes = []
+        self.bulk_write_calls = 0
     
     def add_existing_legacy_ids(self, ids):
         """Simulate existing migrated documents."""
         self._existing_legacy_ids.update(ids)
     
-    def find(self, query, projection=None):
-        """Mock find - returns async iterator."""
-        return MockAsyncCursor(self._existing_legacy_ids, query)
+    async def create_index(self, keys, **kwargs):
+        """Mock create_index."""
+        self.indexes.append((keys, kwargs))
+        return kwargs.get("name", keys)
     
-    async def insert_many(self, docs):
-        """Mock insert_many."""
-        self.documents.extend(docs)
-        return MockInsertResult([d.get("id") for d in docs])
+    async def bulk_write(self, requests, ordered=True):
+        """Mock bulk_write supporting upserts keyed on legacy_id."""
+        self.bulk_write_calls += 1
+        upserted_ids = {}
+        for index, request in enumerate(requests):
+            legacy_id = request._filter["legacy_id"]
+            if legacy_id in self._existing_legacy_ids:
+                continue
+            doc = dict(request._filter)
+            doc.update(request._doc.get("$setOnInsert", {}))
+            doc.update(request._doc.get("$set", {}))
+            self._existing_legacy_ids.add(legacy_id)
+            self.documents.append(doc)
+            upserted_ids[index] = doc.get("id")
+        return MockBulkWriteResult(upserted_ids)
     
     def get_inserted_documents(self):
         """Get all inserted documents."""
         return self.documents
 
 
-class MockInsertResult:
-    """Mock insert result."""
-    def __init__(self, ids):
-        self.inserted_ids = ids
+class MockBulkWriteResult:
+    """Mock bulk write result."""
+    def __init__(self, upserted_ids):
+        self.upserted_ids = upserted_ids
 
 
-class MockAsyncCursor:
-    """Mock async cursor for find()."""
-    
-    def __init__(self, legacy_ids, query):
-        self._legacy_ids = legacy_ids
-        self._index = 0
-        self._ids_list = list(legacy_ids)
-    
-    def __aiter__(self):
-        return self
-    
-    async def __anext__(self):
-        if self._index >= len(self._ids_list):
-            raise StopAsyncIteration
-        legacy_id = self._ids_list[self._index]
-        self._index += 1
-        return {"legacy_id": legacy_id}
+class MockCheckpointCollection:
+    """Mock collection storing migration checkpoints."""
+    
+    def __init__(self):
+        self.checkpoints = {}
+        self.saved_offsets = []
+    
+    async def find_one(self, query, projection=None):
+        return self.checkpoints.get(query["job_id"])
+    
+    async def update_one(self, query, update, upsert=False):
+        checkpoint = self.checkpoints.setdefault(query["job_id"], {})
+        checkpoint.update(update["$set"])
+        for key, value in update["$max"].items():
+            checkpoint[key] = max(checkpoint.get(key, value), value)
+        self.saved_offsets.append(update["$max"]["offset"])
 
 
 @pytest.mark.asyncio
@@ -782,6 +920,216 @@ class TestMigrationJobRealRun:
         assert result.stats.total_success == 1
         assert len(mock_collection.get_inserted_documents()) == 1
     
+    async def test_real_run_writes_unordered_upsert_batches(self):
+        """Test documents are written as bulk upserts keyed on legacy_id."""
+        source = InMemorySource("test")
+        mock_collection = MockAsyncCollection()
+        
+        for i in range(25):
+            source.add_document(
+                LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", f"S9-{i:03d}"))
+            )
+        
+        job = MigrationJob(source, db_collection=mock_collection, batch_size=10, write_concurrency=2)
+        result = await job.run(mode=MigrationMode.REAL)
+        
+        assert mock_collection.bulk_write_calls == 3
+        assert result.stats.total_success == 25
+        assert result.checkpoint_offset == 25
+        keys, options = mock_collection.indexes[0]
+        assert keys == "legacy_id" and options["unique"] is True
+    
+    async def test_batches_are_transformed_in_parallel(self):
+        """Test up to transform_workers batches are transformed at once, in source order."""
+        import threading
+        import time
+        
+        source = InMemorySource("test")
+        source.add_documents([
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", f"S9-{i:03d}"))
+            for i in range(12)
+        ])
+        mock_collection = MockAsyncCollection()
+        job = MigrationJob(source, db_collection=mock_collection, batch_size=2, transform_workers=3)
+        
+        lock = threading.Lock()
+        running = 0
+        peak = 0
+        original_transform = job._transform_batch
+        
+        def slow_transform(legacy_batch):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return original_transform(legacy_batch)
+        
+        job._transform_batch = slow_transform
+        result = await job.run(mode=MigrationMode.REAL)
+        
+        assert peak == 3
+        assert result.stats.total_success == 12
+        assert result.checkpoint_offset == 12
+        assert [d["legacy_id"] for d in mock_collection.documents] == [f"S9-{i:03d}" for i in range(12)]
+    
+    async def test_real_run_duplicate_within_source_is_skipped(self):
+        """Test a repeated legacy_id does not abort the rest of the batch."""
+        source = InMemorySource("test")
+        mock_collection = MockAsyncCollection()
+        
+        source.add_documents([
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", "S9-001")),
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", "S9-001")),
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", "S9-002")),
+        ])
+        
+        job = MigrationJob(source, db_collection=mock_collection)
+        result = await job.run(mode=MigrationMode.REAL)
+        
+        assert result.stats.total_success == 2
+        assert result.stats.total_skipped == 1
+    
+    async def test_real_run_bulk_write_errors_recorded_per_document(self):
+        """Test BulkWriteError details map back to individual documents."""
+        from pymongo.errors import BulkWriteError
+        
+        source = InMemorySource("test")
+        source.add_documents([
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", f"S9-{i:03d}"))
+            for i in range(3)
+        ])
+        
+        mock_collection = MockAsyncCollection()
+        
+        async def failing_bulk_write(requests, ordered=True):
+            assert ordered is False
+            raise BulkWriteError({
+                "upserted": [{"index": 0, "_id": "a"}],
+                "writeErrors": [
+                    {"index": 1, "code": 11000, "errmsg": "duplicate key"},
+                    {"index": 2, "code": 121, "errmsg": "validation failed"},
+                ],
+            })
+        
+        mock_collection.bulk_write = failing_bulk_write
+        
+        job = MigrationJob(source, db_collection=mock_collection)
+        result = await job.run(mode=MigrationMode.REAL)
+        
+        assert result.stats.total_success == 1
+        assert result.stats.total_skipped == 1
+        assert result.stats.total_errors == 1
+        assert result.stats.errors[0]["legacy_id"] == "S9-002"
+    
+    async def test_real_run_refreshes_existing_when_not_skipping(self):
+        """Test skip_duplicates=False updates existing documents in place."""
+        source = InMemorySource("test")
+        mock_collection = MockAsyncCollection()
+        mock_collection.add_existing_legacy_ids({"S9-001"})
+        source.add_document(
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", "S9-001"))
+        )
+        
+        captured = []
+        original_bulk_write = mock_collection.bulk_write
+        
+        async def capture(requests, ordered=True):
+            captured.extend(requests)
+            return await original_bulk_write(requests, ordered=ordered)
+        
+        mock_collection.bulk_write = capture
+        
+        job = MigrationJob(source, db_collection=mock_collection, skip_duplicates=False)
+        result = await job.run(mode=MigrationMode.REAL)
+        
+        assert result.stats.total_success == 1
+        update = captured[0]._doc
+        assert "id" in update["$setOnInsert"]
+        assert "id" not in update["$set"]
+        assert update["$set"]["legacy_id"] == "S9-001"
+    
+    async def test_real_run_checkpoint_and_resume(self):
+        """Test checkpoints are saved by source offset and used to resume."""
+        source = InMemorySource("test")
+        for i in range(12):
+            source.add_document(
+                LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", f"S9-{i:03d}"))
+            )
+        
+        checkpoints = MockCheckpointCollection()
+        checkpoints.checkpoints["job-1"] = {"offset": 5}
+        mock_collection = MockAsyncCollection()
+        
+        job = MigrationJob(
+            source,
+            db_collection=mock_collection,
+            batch_size=4,
+            checkpoint_collection=checkpoints,
+            job_id="job-1"
+        )
+        result = await job.run(mode=MigrationMode.REAL, resume=True)
+        
+        assert result.resumed_from_offset == 5
+        assert result.checkpoint_offset == 12
+        assert result.stats.total_success == 7
+        assert mock_collection.documents[0]["legacy_id"] == "S9-005"
+        assert checkpoints.saved_offsets[-1] == 12
+        assert checkpoints.saved_offsets == sorted(checkpoints.saved_offsets)
+        assert result.to_dict()["docs_per_second"] >= 0
+    
+    async def test_checkpoint_never_moves_backwards(self):
+        """Test a late save of an older offset keeps the newer checkpoint."""
+        checkpoints = MockCheckpointCollection()
+        job = MigrationJob(InMemorySource("test"), checkpoint_collection=checkpoints, job_id="job-1")
+        
+        await job._save_checkpoint(8)
+        await job._save_checkpoint(4)
+        
+        assert checkpoints.checkpoints["job-1"]["offset"] == 8
+    
+    async def test_real_run_failed_batch_holds_checkpoint(self):
+        """Test a batch that fails to write is not checkpointed past."""
+        source = InMemorySource("test")
+        source.add_documents([
+            LegacyDocument(metadata=LegacyDocumentMetadata("SQUARE9", f"S9-{i:03d}"))
+            for i in range(12)
+        ])
+        
+        checkpoints = MockCheckpointCollection()
+        mock_collection = MockAsyncCollection()
+        original_bulk_write = mock_collection.bulk_write
+        
+        async def flaky_bulk_write(requests, ordered=True):
+            if requests[0]._filter["legacy_id"] == "S9-004":
+                raise ConnectionError("connection reset")
+            return await original_bulk_write(requests, ordered=ordered)
+        
+        mock_collection.bulk_write = flaky_bulk_write
+        
+        job = MigrationJob(
+            source,
+            db_collection=mock_collection,
+            batch_size=4,
+            checkpoint_collection=checkpoints,
+            job_id="job-1"
+        )
+        result = await job.run(mode=MigrationMode.REAL)
+        
+        assert result.stats.total_errors == 4
+        assert result.stats.total_success == 8
+        assert result.checkpoint_offset == 4
+        assert checkpoints.checkpoints["job-1"]["offset"] == 4
+        
+        mock_collection.bulk_write = original_bulk_write
+        resumed = await job.run(mode=MigrationMode.REAL, resume=True)
+        
+        assert resumed.resumed_from_offset == 4
+        assert resumed.checkpoint_offset == 12
+        assert sorted(d["legacy_id"] for d in mock_collection.documents) == [f"S9-{i:03d}" for i in range(12)]
+    
     async def test_real_run_sets_correct_fields(self):
         """Test that inserted documents have correct fields."""
         source = InMemorySource("test")
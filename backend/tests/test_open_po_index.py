@@ -0,0 +1,108 @@
+"""
+Unit tests for the open purchase order index.
+
+Covers lookups by number, vendor and amount tolerance, full and
+incremental refresh, and its use in PO-linkage simulation.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.open_po_index import OpenPOIndex
+from services.bc_simulation_service import simulate_po_linkage
+
+
+OPEN_POS = [
+    {"number": "PO-1", "vendorNumber": "V1", "status": "Open", "totalAmountIncludingTax": 1000.0,
+     "lastModifiedDateTime": "2026-03-01T10:00:00Z"},
+    {"number": "PO-2", "vendorNumber": "V2", "status": "Open", "totalAmountIncludingTax": 1010.0,
+     "lastModifiedDateTime": "2026-03-02T10:00:00Z"},
+    {"number": "PO-3", "vendorNumber": "V1", "status": "Open", "totalAmountIncludingTax": 5000.0,
+     "lastModifiedDateTime": "2026-03-03T10:00:00Z"},
+]
+
+
+def _index():
+    index = OpenPOIndex()
+    index.load([dict(po) for po in OPEN_POS])
+    return index
+
+
+class TestLookups:
+    """Tests for OpenPOIndex lookups."""
+
+    def test_get_is_case_insensitive(self):
+        index = _index()
+        assert index.get(" po-1 ")["vendorNumber"] == "V1"
+        assert index.get("PO-9") is None
+
+    def test_for_vendor(self):
+        assert [po["number"] for po in _index().for_vendor("v1")] == ["PO-1", "PO-3"]
+
+    def test_suggest_by_amount_closest_first(self):
+        matches = _index().suggest_by_amount(1008.0, tolerance=0.01)
+        assert [po["number"] for po in matches] == ["PO-2", "PO-1"]
+        assert matches[0]["amount_difference"] == 2.0
+
+    def test_suggest_by_amount_filters_vendor(self):
+        matches = _index().suggest_by_amount(1008.0, tolerance=0.01, vendor_number="V1")
+        assert [po["number"] for po in matches] == ["PO-1"]
+
+
+class TestRefresh:
+    """Tests for OpenPOIndex.refresh."""
+
+    @pytest.mark.asyncio
+    async def test_full_then_incremental(self):
+        service = MagicMock()
+        service.list_purchase_orders = AsyncMock(side_effect=[
+            [dict(po) for po in OPEN_POS],
+            [
+                {"number": "PO-1", "status": "Released", "lastModifiedDateTime": "2026-03-04T10:00:00Z"},
+                {"number": "PO-4", "vendorNumber": "V3", "status": "Open", "totalAmountIncludingTax": 20.0,
+                 "lastModifiedDateTime": "2026-03-05T10:00:00Z"},
+            ],
+        ])
+        index = OpenPOIndex()
+
+        first = await index.refresh(service)
+        second = await index.refresh(service)
+
+        assert first == {"mode": "full", "open_pos": 3}
+        assert second == {"mode": "incremental", "changed": 2, "added": 1, "removed": 1, "open_pos": 3}
+        incremental_call = service.list_purchase_orders.call_args_list[1]
+        assert incremental_call.kwargs == {"open_only": False, "modified_since": "2026-03-03T10:00:00Z"}
+        assert index.get("PO-1") is None
+        assert index.stats()["watermark"] == "2026-03-05T10:00:00Z"
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_keeps_previous_index(self):
+        service = MagicMock()
+        service.list_purchase_orders = AsyncMock(side_effect=Exception("BC down"))
+        index = _index()
+
+        with pytest.raises(Exception):
+            await index.refresh(service, full=True)
+
+        assert index.get("PO-1") is not None
+        assert index.stats()["last_error"] == "BC down"
+
+
+class TestPOLinkageSimulation:
+    """Tests for simulate_po_linkage with the open PO index."""
+
+    def test_closed_po_would_fail(self):
+        with patch("services.bc_simulation_service.open_po_index", _index()):
+            result = simulate_po_linkage({"document_id": "d1", "po_number": "PO-404", "vendor_canonical": "V1"})
+
+        assert result.would_succeed_in_production is False
+        assert "not an open purchase order" in result.failure_reason
+
+    def test_open_po_passes(self):
+        with patch("services.bc_simulation_service.open_po_index", _index()):
+            result = simulate_po_linkage({"document_id": "d1", "po_number": "PO-1", "vendor_canonical": "V1"})
+
+        assert result.would_succeed_in_production is True
+        check = next(c for c in result.validation_checks if c["check"] == "po_open_in_bc")
+        assert check["bc_vendor_number"] == "V1"
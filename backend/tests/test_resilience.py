@@ -0,0 +1,217 @@
+"""
+Unit tests for the resilient HTTP client layer.
+
+Covers Retry-After handling, which methods and statuses are retried, the
+circuit breaker, AIMD concurrency limits and metrics rendering.
+"""
+import asyncio
+import pytest
+import httpx
+from unittest.mock import AsyncMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.resilience import (
+    AdaptiveLimiter,
+    CircuitOpenError,
+    ResilientTransport,
+    BREAKER_FAILURE_THRESHOLD,
+    get_resilience_stats,
+    render_prometheus,
+    reset_resilience_state,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    reset_resilience_state()
+    yield
+    reset_resilience_state()
+
+
+def _client(responses, calls=None, max_retries=4):
+    """Client over a mock transport answering from a list of (status, headers)."""
+    queue = list(responses)
+
+    def handler(request):
+        if calls is not None:
+            calls.append(request)
+        status, headers = queue.pop(0)
+        return httpx.Response(status, headers=headers, json={})
+
+    transport = ResilientTransport(inner=httpx.MockTransport(handler), max_retries=max_retries)
+    return httpx.AsyncClient(transport=transport)
+
+
+class TestRetries:
+    """Tests for ResilientTransport retry behaviour."""
+
+    @pytest.mark.asyncio
+    async def test_429_waits_retry_after_then_succeeds(self):
+        calls = []
+        sleep = AsyncMock()
+        async with _client([(429, {"Retry-After": "2"}), (200, {})], calls) as client:
+            with patch("services.resilience.asyncio.sleep", new=sleep):
+                resp = await client.post("https://graph.microsoft.com/v1.0/x", json={"a": 1})
+
+        assert resp.status_code == 200
+        assert len(calls) == 2
+        sleep.assert_awaited_once_with(2.0)
+        counters = get_resilience_stats()["counters"]
+        assert counters["http_client_throttled_total"] == 1
+        assert counters["http_client_retries_total"] == 1
+
+    @pytest.mark.asyncio
+    async def test_gateway_error_not_retried_for_post(self):
+        calls = []
+        async with _client([(502, {})], calls) as client:
+            resp = await client.post("https://api.businesscentral.dynamics.com/x", json={})
+
+        assert resp.status_code == 502
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_gateway_error_retried_for_get(self):
+        calls = []
+        async with _client([(504, {}), (200, {})], calls) as client:
+            with patch("services.resilience.asyncio.sleep", new=AsyncMock()):
+                resp = await client.get("https://api.businesscentral.dynamics.com/x")
+
+        assert resp.status_code == 200
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        async with _client([(503, {})] * 3, max_retries=2) as client:
+            with patch("services.resilience.asyncio.sleep", new=AsyncMock()):
+                resp = await client.get("https://graph.microsoft.com/x")
+
+        assert resp.status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_long_retry_after_returned_to_caller(self):
+        calls = []
+        async with _client([(429, {"Retry-After": "3600"})], calls) as client:
+            resp = await client.get("https://graph.microsoft.com/x")
+
+        assert resp.status_code == 429
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_streamed_body_not_replayed(self):
+        calls = []
+
+        async def body():
+            yield b"chunk"
+
+        async with _client([(429, {"Retry-After": "1"})], calls) as client:
+            resp = await client.put("https://tenant.sharepoint.com/upload", content=body())
+
+        assert resp.status_code == 429
+        assert len(calls) == 1
+
+
+class TestCircuitBreaker:
+    """Tests for the per-host circuit breaker."""
+
+    @pytest.mark.asyncio
+    async def test_opens_after_repeated_server_errors(self):
+        calls = []
+        responses = [(500, {})] * BREAKER_FAILURE_THRESHOLD
+        async with _client(responses, calls) as client:
+            for _ in range(BREAKER_FAILURE_THRESHOLD):
+                await client.post("https://api.businesscentral.dynamics.com/x", json={})
+            with pytest.raises(CircuitOpenError):
+                await client.post("https://api.businesscentral.dynamics.com/x", json={})
+            assert get_resilience_stats()["hosts"]["api.businesscentral.dynamics.com"]["circuit_state"] == "open"
+
+        assert len(calls) == BREAKER_FAILURE_THRESHOLD
+
+    @pytest.mark.asyncio
+    async def test_half_open_trial_closes_circuit(self):
+        async with _client([(500, {})] * BREAKER_FAILURE_THRESHOLD + [(200, {})]) as client:
+            for _ in range(BREAKER_FAILURE_THRESHOLD):
+                await client.post("https://graph.microsoft.com/x", json={})
+            with patch("services.resilience.time.monotonic", return_value=10 ** 9):
+                resp = await client.post("https://graph.microsoft.com/x", json={})
+
+        assert resp.status_code == 200
+        assert get_resilience_stats()["hosts"]["graph.microsoft.com"]["circuit_state"] == "closed"
+
+
+    @pytest.mark.asyncio
+    async def test_cancelled_half_open_trial_releases_circuit(self):
+        started = asyncio.Event()
+        statuses = [500] * BREAKER_FAILURE_THRESHOLD + [None, 200]
+
+        async def handler(request):
+            status = statuses.pop(0)
+            if status is None:
+                started.set()
+                await asyncio.sleep(60)
+            return httpx.Response(status, json={})
+
+        transport = ResilientTransport(inner=httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(BREAKER_FAILURE_THRESHOLD):
+                await client.post("https://graph.microsoft.com/x", json={})
+            with patch("services.resilience.time.monotonic", return_value=10 ** 9):
+                trial = asyncio.ensure_future(client.post("https://graph.microsoft.com/x", json={}))
+                await started.wait()
+                trial.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await trial
+                resp = await client.post("https://graph.microsoft.com/x", json={})
+
+        assert resp.status_code == 200
+        assert get_resilience_stats()["hosts"]["graph.microsoft.com"]["circuit_state"] == "closed"
+
+
+class TestAdaptiveLimiter:
+    """Tests for AIMD concurrency limiting."""
+
+    def test_throttle_halves_and_success_grows(self):
+        limiter = AdaptiveLimiter()
+        limiter.limit = 8
+        limiter.on_throttle()
+        assert limiter.limit == 4
+        # A second 429 in the same burst does not halve again
+        limiter.on_throttle()
+        assert limiter.limit == 4
+        for _ in range(4):
+            limiter.on_success()
+        # Additive increase: about +1 per `limit` successes
+        assert 4 < limiter.limit < 5
+
+    @pytest.mark.asyncio
+    async def test_caps_requests_in_flight(self):
+        limiter = AdaptiveLimiter()
+        limiter.limit = 2
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            await limiter.acquire()
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0)
+            limiter.release()
+
+        await asyncio.gather(*(work() for _ in range(6)))
+
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+
+class TestMetrics:
+    """Tests for Prometheus rendering."""
+
+    @pytest.mark.asyncio
+    async def test_render_prometheus(self):
+        async with _client([(200, {})]) as client:
+            await client.get("https://graph.microsoft.com/x")
+
+        text = render_prometheus()
+
+        assert 'http_client_requests_total{host="graph.microsoft.com",status="200"} 1' in text
+        assert '# TYPE http_client_concurrency_limit gauge' in text
+        assert 'http_client_circuit_state{host="graph.microsoft.com"} 0' in text
@@ -0,0 +1,139 @@
+"""
+Unit tests for batch AI classification in the SharePoint migration service.
+
+Covers packing several files into one LLM request and mapping the per-item
+answers back to the input order.
+"""
+import pytest
+import os
+import json
+from unittest.mock import AsyncMock, patch, MagicMock
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.sharepoint_migration_service import (
+    SharePointMigrationService,
+    _parse_json_response,
+)
+
+
+def _items(count):
+    return [
+        {
+            "file_name": f"file_{i}.pdf",
+            "legacy_path": f"Customer Relations/Acme/file_{i}.pdf",
+            "text_content": "Spec sheet" if i % 2 == 0 else "",
+        }
+        for i in range(count)
+    ]
+
+
+def _mock_llm(response):
+    mock_chat = MagicMock()
+    mock_chat.with_model.return_value = mock_chat
+    mock_chat.send_message = AsyncMock(return_value=response)
+    module = MagicMock(LlmChat=lambda **kwargs: mock_chat, UserMessage=lambda **kwargs: kwargs)
+    return mock_chat, module
+
+
+class TestParseJsonResponse:
+    """Tests for _parse_json_response."""
+    
+    def test_plain_json(self):
+        assert _parse_json_response('{"confidence": 0.9}') == {"confidence": 0.9}
+    
+    def test_fenced_array(self):
+        response = '```json\n[{"index": 0}, {"index": 1}]\n```'
+        assert _parse_json_response(response) == [{"index": 0}, {"index": 1}]
+
+
+class TestClassifyBatchWithAI:
+    """Tests for SharePointMigrationService._classify_batch_with_ai."""
+    
+    @pytest.mark.asyncio
+    async def test_no_api_key_returns_fallback_per_item(self):
+        service = SharePointMigrationService(MagicMock())
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("EMERGENT_LLM_KEY", None)
+            results = await service._classify_batch_with_ai(_items(3))
+        
+        assert len(results) == 3
+        assert all(r["confidence"] == 0.0 for r in results)
+        assert all("not configured" in r["error"] for r in results)
+    
+    @pytest.mark.asyncio
+    async def test_single_request_results_mapped_by_index(self):
+        # Answers out of order and missing index 1
+        response = json.dumps([
+            {"index": 2, "document_type": "Price List", "confidence": 0.7},
+            {"index": 0, "document_type": "Product Specification Sheet", "confidence": 0.95},
+        ])
+        mock_chat, module = _mock_llm(response)
+        service = SharePointMigrationService(MagicMock())
+        
+        with patch.dict(os.environ, {"EMERGENT_LLM_KEY": "test-key"}):
+            with patch.dict('sys.modules', {'emergentintegrations.llm.chat': module}):
+                results = await service._classify_batch_with_ai(_items(3))
+        
+        assert mock_chat.send_message.await_count == 1
+        sent = mock_chat.send_message.await_args.args[0]["text"]
+        assert "### File 0" in sent and "### File 2" in sent
+        
+        assert results[0]["document_type"] == "Product Specification Sheet"
+        assert results[0]["classification_method"] == "ai_batch_with_path"
+        assert results[0]["acct_type"] == "Corporate Internal"
+        assert results[1]["confidence"] == 0.0
+        assert "Missing" in results[1]["error"]
+        assert results[2]["document_type"] == "Price List"
+        assert "index" not in results[2]
+    
+    @pytest.mark.asyncio
+    async def test_unparseable_response_falls_back(self):
+        mock_chat, module = _mock_llm("not json")
+        service = SharePointMigrationService(MagicMock())
+        
+        with patch.dict(os.environ, {"EMERGENT_LLM_KEY": "test-key"}):
+            with patch.dict('sys.modules', {'emergentintegrations.llm.chat': module}):
+                results = await service._classify_batch_with_ai(_items(2))
+        
+        assert [r["confidence"] for r in results] == [0.0, 0.0]
+
+
+class TestClassifyCandidatesBatchMode:
+    """Tests for classify_candidates(batch_mode=True)."""
+    
+    @pytest.mark.asyncio
+    async def test_unmatched_candidates_are_batched(self):
+        candidates = [
+            {
+                "id": f"c{i}",
+                "file_name": f"file_{i}.pdf",
+                "legacy_path": f"Misc/file_{i}.pdf",
+                "source_drive_id": "drive",
+                "source_item_id": f"item{i}",
+                "status": "discovered",
+            }
+            for i in range(5)
+        ]
+        db = MagicMock()
+        cursor = MagicMock()
+        cursor.sort.return_value = cursor
+        cursor.limit.return_value = cursor
+        cursor.to_list = AsyncMock(return_value=candidates)
+        db.migration_candidates.find.return_value = cursor
+        db.migration_candidates.update_one = AsyncMock()
+        
+        service = SharePointMigrationService(db)
+        service._get_graph_token = AsyncMock(return_value="token")
+        service._fetch_text_content = AsyncMock(return_value="")
+        service._enhance_with_customer_match = AsyncMock(side_effect=lambda metadata, *args: metadata)
+        service._classify_batch_with_ai = AsyncMock(
+            side_effect=lambda items: [{"confidence": 0.9, "document_type": "Other"} for _ in items]
+        )
+        
+        result = await service.classify_candidates(max_count=5, batch_mode=True, batch_size=2, concurrency=2)
+        
+        assert service._classify_batch_with_ai.await_count == 3
+        assert result["processed"] == 5
+        assert result["high_confidence"] == 5
+        assert db.migration_candidates.update_one.await_count == 5
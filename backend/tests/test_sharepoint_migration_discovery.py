@@ -0,0 +1,164 @@
+"""
+Unit tests for SharePoint migration discovery.
+
+Covers concurrent folder enumeration, Graph delta change filtering and
+batched candidate upserts.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch, MagicMock
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.sharepoint_migration_service import (
+    SharePointMigrationService,
+    DeltaTokenExpired,
+)
+from tests.http_fakes import FakeClient, FakeResponse
+
+
+class RoutedClient(FakeClient):
+    """FakeClient answering GETs from a {url_fragment: response} map."""
+
+    def __init__(self, routes):
+        super().__init__(get=self._route)
+        self.routes = routes
+        self.urls = []
+
+    def _route(self, url, params=None, headers=None):
+        self.urls.append(url)
+        for fragment, response in self.routes.items():
+            if url.endswith(fragment):
+                return response
+        return FakeResponse(404)
+
+
+def _file(item_id, name, parent_id="p"):
+    return {"id": item_id, "name": name, "file": {}, "webUrl": f"https://x/{name}", "parentReference": {"id": parent_id}}
+
+
+def _folder(name):
+    return {"id": name, "name": name, "folder": {}}
+
+
+class AsyncCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class TestIterFolderFiles:
+    """Tests for SharePointMigrationService._iter_folder_files."""
+
+    @pytest.mark.asyncio
+    async def test_walks_subfolders_and_pages(self):
+        client = RoutedClient({
+            "root:/Root:/children": FakeResponse(200, {
+                "value": [_file("1", "a.pdf"), _folder("Sub")],
+                "@odata.nextLink": "https://graph/page2",
+            }),
+            "page2": FakeResponse(200, {"value": [_file("2", "b.pdf")]}),
+            "root:/Root/Sub:/children": FakeResponse(200, {"value": [_file("3", "c.pdf")]}),
+        })
+        service = SharePointMigrationService(MagicMock())
+
+        with patch("services.sharepoint_migration_service.httpx.AsyncClient", return_value=client):
+            files = [f async for f in service._iter_folder_files("drive", "Root", "token", concurrency=3)]
+
+        by_id = {f["id"]: f for f in files}
+        assert set(by_id) == {"1", "2", "3"}
+        assert by_id["3"]["folder_path"] == "Root/Sub"
+        assert by_id["1"]["drive_id"] == "drive"
+
+    @pytest.mark.asyncio
+    async def test_listing_error_is_raised(self):
+        client = RoutedClient({"root:/Root:/children": FakeResponse(500, {"error": "boom"})})
+        service = SharePointMigrationService(MagicMock())
+
+        with patch("services.sharepoint_migration_service.httpx.AsyncClient", return_value=client):
+            with pytest.raises(Exception, match="Failed to list files: 500"):
+                [f async for f in service._iter_folder_files("drive", "Root", "token")]
+
+
+class TestIterDeltaChanges:
+    """Tests for SharePointMigrationService._iter_delta_changes."""
+
+    @pytest.mark.asyncio
+    async def test_filters_to_folder_and_stores_new_link(self):
+        client = RoutedClient({
+            "delta?token=abc": FakeResponse(200, {
+                "value": [
+                    _file("1", "in.pdf", parent_id="acme"),
+                    _file("2", "out.pdf", parent_id="other"),
+                    {"id": "3", "deleted": {}},
+                ],
+                "@odata.deltaLink": "https://graph/delta?token=def",
+            }),
+            "items/acme": FakeResponse(200, {"name": "Acme", "parentReference": {"path": "/drives/d/root:/Customer%20Relations"}}),
+            "items/other": FakeResponse(200, {"name": "HR", "parentReference": {"path": "/drives/d/root:"}}),
+        })
+        service = SharePointMigrationService(MagicMock())
+        state = {}
+
+        with patch("services.sharepoint_migration_service.httpx.AsyncClient", return_value=client):
+            changes = [
+                c async for c in service._iter_delta_changes(
+                    "d", "Customer Relations", "token", "https://graph/delta?token=abc", state
+                )
+            ]
+
+        assert changes[0]["id"] == "1"
+        assert changes[0]["folder_path"] == "Customer Relations/Acme"
+        assert changes[1] == {"id": "3", "deleted": True}
+        assert len(changes) == 2
+        assert state["delta_token"] == "https://graph/delta?token=def"
+
+    @pytest.mark.asyncio
+    async def test_expired_token(self):
+        client = RoutedClient({"delta?token=old": FakeResponse(410)})
+        service = SharePointMigrationService(MagicMock())
+
+        with patch("services.sharepoint_migration_service.httpx.AsyncClient", return_value=client):
+            with pytest.raises(DeltaTokenExpired):
+                [c async for c in service._iter_delta_changes("d", "Root", "token", "https://graph/delta?token=old", {})]
+
+
+class TestConsumeDiscovered:
+    """Tests for SharePointMigrationService._consume_discovered."""
+
+    @pytest.mark.asyncio
+    async def test_batches_upserts_and_marks_deleted(self):
+        db = MagicMock()
+        db.migration_candidates.find = MagicMock(return_value=AsyncCursor([{"source_item_id": "1"}]))
+        db.migration_candidates.bulk_write = AsyncMock()
+        db.migration_candidates.update_many = AsyncMock(return_value=MagicMock(modified_count=1))
+        service = SharePointMigrationService(db)
+        service._lookup_folder_classification = AsyncMock(return_value=None)
+
+        async def files():
+            yield {"id": "1", "name": "a.pdf", "web_url": "", "drive_id": "d", "folder_path": "Root"}
+            yield {"id": "2", "name": "b.pdf", "web_url": "", "drive_id": "d", "folder_path": "Root"}
+            yield {"id": "9", "deleted": True}
+
+        counts = await service._consume_discovered(files(), "site", "Documents", "Root", batch_size=100)
+
+        assert counts == {
+            "total_discovered": 2,
+            "new_candidates": 1,
+            "existing_candidates": 1,
+            "removed_candidates": 1,
+        }
+        operations = db.migration_candidates.bulk_write.call_args.args[0]
+        assert len(operations) == 2
+        new_op = operations[1]
+        assert new_op._upsert is True
+        assert new_op._doc["$setOnInsert"]["status"] == "discovered"
+        assert "$setOnInsert" not in operations[0]._doc
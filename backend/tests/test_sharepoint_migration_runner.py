@@ -0,0 +1,168 @@
+"""
+Unit tests for resumable SharePoint migration runs.
+
+Covers phase execution with a persisted classification cursor, pause/cancel
+handling between batches and claiming runs.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import sys
+sys.path.insert(0, '/app/backend')
+from bson import ObjectId
+from services.sharepoint_migration_runner import (
+    SharePointMigrationRunner,
+    WORKER_ID,
+)
+
+
+def _run_doc(**overrides):
+    run = {
+        "id": "run-1",
+        "status": "running",
+        "source_site_url": "https://source",
+        "source_library_name": "Documents",
+        "source_folder_path": "",
+        "target_site_url": "https://target",
+        "target_library_name": "Documents",
+        "batch_size": 10,
+        "classify_batch_mode": True,
+        "continuous": False,
+        "poll_interval_seconds": 300,
+        "current_phase": "discover",
+        "cycle": 1,
+        "cursor": {},
+        "worker_id": WORKER_ID,
+    }
+    run.update(overrides)
+    return run
+
+
+def _make_runner(run, control=None, service=None):
+    """Runner over a mocked runs collection; control is what find_one returns."""
+    db = MagicMock()
+    runs = MagicMock()
+    runs.find_one_and_update = AsyncMock(return_value=run)
+    runs.find_one = AsyncMock(return_value=control or {"worker_id": WORKER_ID})
+    runs.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+    db.sharepoint_migration_runs = runs
+    return SharePointMigrationRunner(db, service=service or MagicMock()), runs
+
+
+def _set_fields(runs):
+    return [c.args[1].get("$set", {}) for c in runs.update_one.call_args_list]
+
+
+class TestExecute:
+    """Tests for SharePointMigrationRunner.execute."""
+
+    @pytest.mark.asyncio
+    async def test_runs_all_phases_and_completes(self):
+        first_id = ObjectId()
+        service = MagicMock()
+        service.discover_candidates = AsyncMock(return_value={"total_discovered": 3, "new_candidates": 3})
+        service.classify_candidates = AsyncMock(side_effect=[
+            {"processed": 3, "high_confidence": 2, "last_id": first_id},
+            {"processed": 0, "last_id": None},
+        ])
+        service.migrate_candidates = AsyncMock(side_effect=[
+            {"attempted": 2, "migrated": 2},
+            {"attempted": 0},
+        ])
+        runner, runs = _make_runner(_run_doc(), service=service)
+
+        await runner.execute("run-1")
+
+        # Second classify page continues after the first page's last id
+        assert service.classify_candidates.call_args_list[1].kwargs["after_id"] == first_id
+        sets = _set_fields(runs)
+        assert any(s.get("cursor.classify_after_id") == str(first_id) for s in sets)
+        assert sets[-1]["status"] == "completed"
+        incs = [c.args[1].get("$inc", {}) for c in runs.update_one.call_args_list]
+        assert {"counters.migrate.migrated": 2}.items() <= next(
+            i for i in incs if "counters.migrate.migrated" in i
+        ).items()
+
+    @pytest.mark.asyncio
+    async def test_resumes_from_saved_phase_and_cursor(self):
+        saved_id = ObjectId()
+        service = MagicMock()
+        service.discover_candidates = AsyncMock()
+        service.classify_candidates = AsyncMock(return_value={"processed": 0, "last_id": None})
+        service.migrate_candidates = AsyncMock(return_value={"attempted": 0})
+        run = _run_doc(current_phase="classify", cursor={"classify_after_id": str(saved_id)})
+        runner, _ = _make_runner(run, service=service)
+
+        await runner.execute("run-1")
+
+        service.discover_candidates.assert_not_called()
+        assert service.classify_candidates.call_args.kwargs["after_id"] == saved_id
+
+    @pytest.mark.asyncio
+    async def test_pause_request_stops_before_next_batch(self):
+        service = MagicMock()
+        service.discover_candidates = AsyncMock()
+        runner, runs = _make_runner(
+            _run_doc(),
+            control={"worker_id": WORKER_ID, "requested_action": "pause"},
+            service=service
+        )
+
+        await runner.execute("run-1")
+
+        service.discover_candidates.assert_not_called()
+        assert _set_fields(runs)[-1]["status"] == "paused"
+
+    @pytest.mark.asyncio
+    async def test_failure_marks_run_failed(self):
+        service = MagicMock()
+        service.discover_candidates = AsyncMock(side_effect=Exception("Graph unavailable"))
+        runner, runs = _make_runner(_run_doc(), service=service)
+
+        await runner.execute("run-1")
+
+        last = _set_fields(runs)[-1]
+        assert last["status"] == "failed"
+        assert "Graph unavailable" in last["last_error"]
+
+    @pytest.mark.asyncio
+    async def test_unclaimable_run_is_not_executed(self):
+        service = MagicMock()
+        service.discover_candidates = AsyncMock()
+        runner, runs = _make_runner(None, service=service)
+
+        await runner.execute("run-1")
+
+        service.discover_candidates.assert_not_called()
+        runs.update_one.assert_not_called()
+
+
+class TestRequestAction:
+    """Tests for SharePointMigrationRunner.request_action."""
+
+    @pytest.mark.asyncio
+    async def test_idle_run_is_stopped_immediately(self):
+        runner, runs = _make_runner(_run_doc())
+
+        assert await runner.request_action("run-1", "cancel") is True
+
+        assert runs.update_one.call_count == 1
+        assert runs.update_one.call_args.args[1]["$set"]["status"] == "cancelled"
+
+    @pytest.mark.asyncio
+    async def test_running_run_gets_requested_action(self):
+        runner, runs = _make_runner(_run_doc())
+        runs.update_one = AsyncMock(side_effect=[
+            MagicMock(modified_count=0),
+            MagicMock(modified_count=1),
+        ])
+
+        assert await runner.request_action("run-1", "pause") is True
+
+        assert runs.update_one.call_args.args[1]["$set"]["requested_action"] == "pause"
+
+    @pytest.mark.asyncio
+    async def test_unknown_action_rejected(self):
+        runner, _ = _make_runner(_run_doc())
+        with pytest.raises(ValueError):
+            await runner.request_action("run-1", "restart")
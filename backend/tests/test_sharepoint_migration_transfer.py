@@ -0,0 +1,153 @@
+"""
+Unit tests for SharePoint migration file transfer.
+
+Covers Graph server-side copy with monitor polling, streamed chunked
+transfer and concurrent migration with copy-to-stream fallback.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch, MagicMock
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.sharepoint_migration_service import SharePointMigrationService
+from tests.http_fakes import FakeResponse, FakeStream
+
+
+CANDIDATE = {
+    "id": "c1",
+    "file_name": "drawing.dwg",
+    "source_drive_id": "src-drive",
+    "source_item_id": "src-item",
+    "status": "ready_for_migration",
+}
+
+
+class TestCopyItemServerSide:
+    """Tests for SharePointMigrationService._copy_item_server_side."""
+
+    @pytest.mark.asyncio
+    async def test_polls_monitor_until_completed(self):
+        client = MagicMock()
+        client.post = AsyncMock(return_value=FakeResponse(202, headers={"Location": "https://monitor"}))
+        client.get = AsyncMock(side_effect=[
+            FakeResponse(202, {"status": "inProgress"}),
+            FakeResponse(200, {"status": "completed", "resourceId": "new-id"}),
+            FakeResponse(200, {"id": "new-id", "webUrl": "https://target/drawing.dwg"}),
+        ])
+        service = SharePointMigrationService(MagicMock())
+
+        with patch("services.sharepoint_migration_service.asyncio.sleep", new=AsyncMock()):
+            item = await service._copy_item_server_side(client, CANDIDATE, "dst-drive", "root-id", "token")
+
+        assert item["id"] == "new-id"
+        body = client.post.call_args.kwargs["json"]
+        assert body["parentReference"] == {"driveId": "dst-drive", "id": "root-id"}
+        assert client.get.call_args.args[0].endswith("/drives/dst-drive/items/new-id")
+
+    @pytest.mark.asyncio
+    async def test_refused_copy_returns_none(self):
+        client = MagicMock()
+        client.post = AsyncMock(return_value=FakeResponse(400, {"error": "notSupported"}))
+        service = SharePointMigrationService(MagicMock())
+
+        assert await service._copy_item_server_side(client, CANDIDATE, "dst-drive", "root-id", "token") is None
+
+
+class TestStreamTransfer:
+    """Tests for SharePointMigrationService._stream_transfer."""
+
+    @pytest.mark.asyncio
+    async def test_large_file_forwarded_in_chunks(self):
+        data = [b"a" * 5, b"b" * 5, b"c" * 3]
+        client = MagicMock()
+        client.stream = MagicMock(return_value=FakeStream(
+            FakeResponse(200, headers={"Content-Length": "13"}, chunks=data)
+        ))
+        client.post = AsyncMock(return_value=FakeResponse(200, {"uploadUrl": "https://upload"}))
+        client.put = AsyncMock(side_effect=[
+            FakeResponse(202),
+            FakeResponse(202),
+            FakeResponse(201, {"id": "new-id"}),
+        ])
+        service = SharePointMigrationService(MagicMock())
+
+        with patch("services.sharepoint_migration_service.SIMPLE_UPLOAD_LIMIT", 4), \
+             patch("services.sharepoint_migration_service.UPLOAD_CHUNK_SIZE", 6):
+            item = await service._stream_transfer(client, CANDIDATE, "dst-drive", "token")
+
+        assert item == {"id": "new-id"}
+        ranges = [c.kwargs["headers"]["Content-Range"] for c in client.put.call_args_list]
+        assert ranges == ["bytes 0-5/13", "bytes 6-11/13", "bytes 12-12/13"]
+
+    @pytest.mark.asyncio
+    async def test_small_file_uses_single_put(self):
+        client = MagicMock()
+        client.stream = MagicMock(return_value=FakeStream(
+            FakeResponse(200, headers={"Content-Length": "3"}, chunks=[b"abc"])
+        ))
+        client.put = AsyncMock(return_value=FakeResponse(201, {"id": "new-id"}))
+        client.post = AsyncMock()
+        service = SharePointMigrationService(MagicMock())
+
+        item = await service._stream_transfer(client, CANDIDATE, "dst-drive", "token")
+
+        assert item == {"id": "new-id"}
+        assert client.put.call_args.kwargs["content"] == b"abc"
+        client.post.assert_not_called()
+
+
+class TestMigrateCandidates:
+    """Tests for SharePointMigrationService.migrate_candidates transfer selection."""
+
+    def _service(self, candidates):
+        db = MagicMock()
+        cursor = MagicMock()
+        cursor.limit.return_value = cursor
+        cursor.to_list = AsyncMock(return_value=candidates)
+        db.migration_candidates.find.return_value = cursor
+        db.migration_candidates.update_one = AsyncMock()
+        service = SharePointMigrationService(db)
+        service._get_graph_token = AsyncMock(return_value="token")
+        service._get_site_id = AsyncMock(return_value="site")
+        service._get_drive_id = AsyncMock(return_value="dst-drive")
+        service._get_list_id = AsyncMock(return_value="list")
+        service._get_drive_root_id = AsyncMock(return_value="root-id")
+        service._ensure_destination_columns = AsyncMock(return_value={})
+        service._apply_metadata_to_items = AsyncMock(return_value={})
+        return service, db
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_stream_when_copy_refused(self):
+        candidates = [dict(CANDIDATE, id="c1"), dict(CANDIDATE, id="c2")]
+        service, db = self._service(candidates)
+        service._copy_item_server_side = AsyncMock(side_effect=[{"id": "n1"}, None])
+        service._stream_transfer = AsyncMock(return_value={"id": "n2"})
+
+        result = await service.migrate_candidates(max_count=2)
+
+        assert result["migrated"] == 2
+        assert result["copied"] == 1
+        assert result["streamed"] == 1
+        methods = {
+            c.args[0]["id"]: c.args[1]["$set"]["transfer_method"]
+            for c in db.migration_candidates.update_one.call_args_list
+        }
+        assert methods == {"c1": "copy", "c2": "stream"}
+
+    @pytest.mark.asyncio
+    async def test_copy_mode_does_not_stream(self):
+        service, db = self._service([dict(CANDIDATE)])
+        service._copy_item_server_side = AsyncMock(return_value=None)
+        service._stream_transfer = AsyncMock()
+
+        result = await service.migrate_candidates(transfer_mode="copy")
+
+        assert result["errors"] == 1
+        service._stream_transfer.assert_not_called()
+        assert db.migration_candidates.update_one.call_args.args[1]["$set"]["status"] == "error"
+
+    @pytest.mark.asyncio
+    async def test_unknown_transfer_mode(self):
+        service, _ = self._service([])
+        with pytest.raises(ValueError):
+            await service.migrate_candidates(transfer_mode="ftp")
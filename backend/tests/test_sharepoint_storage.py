@@ -0,0 +1,145 @@
+"""
+Unit tests for SharePoint document storage.
+
+Covers the single $batch upload + createLink for small files, resumable
+upload sessions streamed from disk for large files, and drive caching.
+"""
+import base64
+import pytest
+from unittest.mock import AsyncMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+import services.sharepoint_storage as storage_module
+from services.sharepoint_storage import SharePointStorage
+from services.graph_batch import GraphResponse
+from tests.http_fakes import FakeClient, FakeResponse
+
+
+def _site_get(url, headers=None):
+    if url.endswith("/drives"):
+        return FakeResponse(200, {"value": [{"name": "Documents", "id": "drive-1"}]})
+    return FakeResponse(200, {"id": "site-1"})
+
+
+def _client(put=None, post=None):
+    return FakeClient(get=_site_get, put=put, post=post)
+
+
+def _storage():
+    return SharePointStorage(AsyncMock(return_value="token"), "contoso.sharepoint.com", "/sites/hub", "Documents")
+
+
+class TestBatchUpload:
+    """Tests for small files uploaded with their link in one $batch."""
+
+    @pytest.mark.asyncio
+    async def test_upload_and_link_in_one_batch(self, tmp_path):
+        file_path = tmp_path / "doc-1"
+        file_path.write_bytes(b"%PDF small")
+        batch = AsyncMock(return_value={
+            "upload": GraphResponse("upload", 201, {"id": "item-1", "webUrl": "https://sp/item-1"}),
+            "link": GraphResponse("link", 200, {"link": {"webUrl": "https://sp/share/1"}}),
+        })
+        client = _client()
+        storage = _storage()
+
+        with patch.object(storage_module, "resilient_client", return_value=client), \
+             patch.object(storage_module, "send_batch", batch):
+            result = await storage.upload("Invoice 1.pdf", "AP", file_path=file_path)
+            await storage.upload("Invoice 2.pdf", "AP", content=b"x")
+
+        assert result.pop("uploaded_utc")
+        assert result == {"drive_id": "drive-1", "item_id": "item-1", "web_url": "https://sp/item-1",
+                          "name": "Invoice 1.pdf", "share_link": "https://sp/share/1"}
+        upload_req, link_req = batch.call_args_list[0].args[2]
+        assert upload_req.url == "/drives/drive-1/root:/AP/Invoice%201.pdf:/content"
+        assert base64.b64decode(upload_req.body) == b"%PDF small"
+        assert link_req.url == "/drives/drive-1/root:/AP/Invoice%201.pdf:/createLink"
+        assert link_req.depends_on == ["upload"]
+        client.put.assert_not_called()
+        client.post.assert_not_called()
+        # Site and drive resolved once for both uploads
+        assert client.get.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_link_in_batch_is_retried_alone(self):
+        batch = AsyncMock(return_value={
+            "upload": GraphResponse("upload", 201, {"id": "item-1"}),
+            "link": GraphResponse("link", 503, {"error": {"code": "serviceNotAvailable"}}),
+        })
+        client = _client(post=lambda url, headers=None, json=None: FakeResponse(200, {"link": {"webUrl": "https://sp/share/1"}}))
+
+        with patch.object(storage_module, "resilient_client", return_value=client), \
+             patch.object(storage_module, "send_batch", batch):
+            result = await _storage().upload("a.pdf", "AP", content=b"x")
+
+        assert result["share_link"] == "https://sp/share/1"
+        assert client.post.call_args.args[0].endswith("/drives/drive-1/items/item-1/createLink")
+
+
+class TestSessionUpload:
+    """Tests for large files uploaded through an upload session."""
+
+    @pytest.mark.asyncio
+    async def test_streams_file_in_fragments_then_links(self, tmp_path):
+        size = storage_module.SIMPLE_UPLOAD_LIMIT + 1000
+        file_path = tmp_path / "doc-big"
+        file_path.write_bytes(b"a" * size)
+        sent = []
+
+        def put(url, headers=None, content=None):
+            sent.append((headers["Content-Range"], len(content)))
+            assert "Authorization" not in headers
+            done = sum(n for _, n in sent) == size
+            return FakeResponse(201, {"id": "item-big"}) if done else FakeResponse(202, {})
+
+        def post(url, headers=None, json=None):
+            if url.endswith("createUploadSession"):
+                return FakeResponse(200, {"uploadUrl": "https://upload/session"})
+            return FakeResponse(200, {"link": {"webUrl": "https://sp/share/big"}})
+
+        client = _client(put=put, post=post)
+        with patch.object(storage_module, "resilient_client", return_value=client), \
+             patch.object(storage_module, "UPLOAD_CHUNK_SIZE", 2 * 1024 * 1024):
+            result = await _storage().upload("big.pdf", "AP", file_path=file_path)
+
+        assert result["item_id"] == "item-big"
+        assert result["share_link"] == "https://sp/share/big"
+        assert sent == [
+            (f"bytes 0-2097151/{size}", 2097152),
+            (f"bytes 2097152-4194303/{size}", 2097152),
+            (f"bytes 4194304-{size - 1}/{size}", 1000),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_failed_fragment_resumes_from_next_expected_range(self):
+        size = storage_module.SIMPLE_UPLOAD_LIMIT + 1000
+        ranges = []
+        failures = iter([True])
+
+        def put(url, headers=None, content=None):
+            ranges.append(headers["Content-Range"])
+            if len(ranges) == 2 and next(failures, False):
+                return FakeResponse(500, {"error": "boom"})
+            if headers["Content-Range"].endswith(f"{size - 1}/{size}"):
+                return FakeResponse(201, {"id": "item-big"})
+            return FakeResponse(202, {})
+
+        client = _client(
+            put=put,
+            post=lambda url, headers=None, json=None: FakeResponse(200, {"uploadUrl": "https://upload/session"}))
+
+        def get(url, headers=None):
+            if url == "https://upload/session":
+                return FakeResponse(200, {"nextExpectedRanges": ["2097152-"]})
+            return _site_get(url, headers)
+
+        client.get = AsyncMock(side_effect=get)
+        with patch.object(storage_module, "resilient_client", return_value=client), \
+             patch.object(storage_module, "UPLOAD_CHUNK_SIZE", 2 * 1024 * 1024):
+            result = await _storage().upload("big.pdf", "AP", content=b"b" * size, create_link=False)
+
+        assert result["share_link"] is None
+        assert ranges[1] == ranges[2] == f"bytes 2097152-4194303/{size}"
+        assert ranges[-1] == f"bytes 4194304-{size - 1}/{size}"
@@ -0,0 +1,128 @@
+"""
+Unit tests for page thumbnail rendering.
+
+Covers image and PDF rendering, storage in the blob store, unsupported
+types, files missing or stored outside the blob store and on-demand
+rendering for documents without thumbnails.
+"""
+import io
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from PIL import Image
+
+import sys
+sys.path.insert(0, '/app/backend')
+from services.thumbnails import ThumbnailRenderer, render_thumbnails, READY, UNSUPPORTED
+
+
+def _png(width=1200, height=1600, frames=1):
+    buffer = io.BytesIO()
+    images = [Image.new("RGB", (width, height), (255, 255, 255 - i)) for i in range(frames)]
+    fmt = "TIFF" if frames > 1 else "PNG"
+    images[0].save(buffer, format=fmt, save_all=frames > 1, append_images=images[1:])
+    return buffer.getvalue()
+
+
+def _renderer(content):
+    store = MagicMock()
+    store.get = AsyncMock(return_value=content)
+    store.put = AsyncMock(side_effect=lambda data, ref: f"thumb-{len(store.put.call_args_list)}")
+    db = MagicMock()
+    db.hub_documents.update_one = AsyncMock()
+    renderer = ThumbnailRenderer(blob_store=store)
+    renderer.bind(db)
+    return renderer, store, db.hub_documents
+
+
+class TestRenderThumbnails:
+    """Tests for render_thumbnails."""
+
+    def test_image_is_downscaled_to_jpeg(self):
+        [thumbnail] = render_thumbnails(_png(), "image/png", "scan.png", width=320)
+
+        assert (thumbnail["width"], thumbnail["height"]) == (320, 427)
+        assert thumbnail["data"][:2] == b"\xff\xd8"
+
+    def test_multi_page_tiff_respects_page_limit(self):
+        content = _png(frames=3)
+
+        assert len(render_thumbnails(content, "image/tiff", "scan.tif", pages=1)) == 1
+        assert len(render_thumbnails(content, "image/tiff", "scan.tif", pages=5)) == 3
+
+    def test_pdf_first_page(self):
+        pytest.importorskip("pypdfium2")
+        buffer = io.BytesIO()
+        Image.new("RGB", (850, 1100), "white").save(buffer, format="PDF")
+
+        [thumbnail] = render_thumbnails(buffer.getvalue(), "application/pdf", "invoice.pdf", width=200)
+
+        assert thumbnail["width"] == 200
+
+    def test_unsupported_type(self):
+        assert render_thumbnails(b"col1,col2\n", "text/csv", "lines.csv") is None
+
+
+class TestThumbnailRenderer:
+    """Tests for ThumbnailRenderer."""
+
+    @pytest.mark.asyncio
+    async def test_render_stores_thumbnails_and_updates_document(self):
+        renderer, store, docs = _renderer(_png())
+        doc = {"id": "doc-1", "sha256_hash": "abc", "content_type": "image/png", "file_name": "scan.png"}
+
+        fields = await renderer.render(doc)
+
+        assert fields["thumbnail_status"] == READY
+        assert fields["thumbnails"][0]["page"] == 1
+        assert store.put.call_args.args[1] == "doc-1"
+        assert docs.update_one.call_args.args[1]["$set"] == fields
+        assert renderer.stats()["rendered"] == 1
+
+    @pytest.mark.asyncio
+    async def test_unsupported_document_is_marked(self):
+        renderer, store, docs = _renderer(b"plain text")
+
+        fields = await renderer.render({"id": "doc-2", "sha256_hash": "abc", "content_type": "text/plain", "file_name": "a.txt"})
+
+        assert fields == {"thumbnails": [], "thumbnail_status": UNSUPPORTED}
+        store.put.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_legacy_file_is_read_through_hook(self):
+        renderer, store, docs = _renderer(None)
+        read_content = AsyncMock(return_value=_png())
+        renderer.bind(MagicMock(hub_documents=docs), read_content=read_content)
+
+        fields = await renderer.render({"id": "doc-6", "content_type": "image/png", "file_name": "old.png"})
+
+        assert fields["thumbnail_status"] == READY
+        assert read_content.call_args.args[0]["id"] == "doc-6"
+        store.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_missing_file_is_not_marked_unsupported(self):
+        renderer, store, docs = _renderer(None)
+
+        assert await renderer.ensure({"id": "doc-7", "sha256_hash": "gone", "file_name": "x.pdf"}) == []
+
+        docs.update_one.assert_not_called()
+        assert renderer.stats()["missing"] == 1
+        assert renderer.stats()["unsupported"] == 0
+
+    @pytest.mark.asyncio
+    async def test_ensure_reuses_existing_thumbnails(self):
+        renderer, store, _ = _renderer(_png())
+        existing = [{"page": 1, "sha256": "t1"}]
+
+        assert await renderer.ensure({"id": "doc-3", "thumbnail_status": READY, "thumbnails": existing}) == existing
+        store.get.assert_not_called()
+
+        rendered = await renderer.ensure({"id": "doc-4", "sha256_hash": "abc", "content_type": "image/png", "file_name": "x.png"})
+        assert len(rendered) == 1
+
+    def test_enqueue_is_a_no_op_until_started(self):
+        renderer, _, _ = _renderer(b"")
+
+        renderer.enqueue("doc-5")
+
+        assert renderer.stats()["queued"] == 0
@@ -0,0 +1,76 @@
+"""
+Unit tests for the in-memory vendor alias index.
+
+Covers normalized-key lookups across the alias schemas, first-alias-wins,
+rebuild after the alias section is reloaded and hit/miss counters.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+import sys
+sys.path.insert(0, '/app/backend')
+import services.vendor_alias_index as index_module
+from services.vendor_alias_index import VendorAliasIndex, alias_keys, alias_target, normalize_vendor_name
+
+
+ACME = {"alias_string": "ACME Corp.", "normalized_alias": "acme", "vendor_name": "Acme Manufacturing", "vendor_no": "V100"}
+LEGACY = {"alias_string": "Tumalo Creek", "alias_normalized": "tumalo creek", "canonical_vendor_no": "V200"}
+
+
+def _patched(aliases):
+    return patch.object(index_module.config_cache, "vendor_aliases", AsyncMock(return_value=aliases))
+
+
+class TestAliasKeys:
+    """Tests for key derivation."""
+
+    def test_keys_include_precomputed_and_stored_forms(self):
+        assert alias_keys(ACME) == ["acme", "acme corp."]
+        assert alias_keys({**ACME, "alias_key": "acme"}) == ["acme", "acme corp."]
+
+    def test_target_falls_back_to_canonical_fields(self):
+        assert alias_target(ACME) == "Acme Manufacturing"
+        assert alias_target(LEGACY) == "V200"
+
+    def test_normalize_strips_suffix_and_punctuation(self):
+        assert normalize_vendor_name("Acme, Inc.") == "acme"
+        assert normalize_vendor_name("") == ""
+
+
+class TestVendorAliasIndex:
+    """Tests for VendorAliasIndex.lookup."""
+
+    @pytest.mark.asyncio
+    async def test_lookup_by_raw_and_normalized_name(self):
+        index = VendorAliasIndex()
+        with _patched([ACME, LEGACY]):
+            assert await index.lookup("ACME Corp.") is ACME
+            assert await index.lookup("Acme, LLC") is ACME
+            assert await index.lookup("Tumalo Creek") is LEGACY
+            assert await index.lookup("Unknown Vendor") is None
+            assert await index.lookup("") is None
+
+        stats = index.stats()
+        assert stats["hits"] == 3
+        assert stats["misses"] == 1
+        assert stats["aliases"] == 2
+
+    @pytest.mark.asyncio
+    async def test_first_alias_wins_on_shared_key(self):
+        index = VendorAliasIndex()
+        other = {"alias_string": "Acme", "vendor_name": "Someone Else"}
+        with _patched([ACME, other]):
+            assert await index.lookup("acme") is ACME
+
+    @pytest.mark.asyncio
+    async def test_rebuilds_only_when_section_reloaded(self):
+        index = VendorAliasIndex()
+        aliases = [ACME]
+        with _patched(aliases):
+            await index.lookup("acme")
+            await index.lookup("acme")
+        assert index.stats()["rebuilds"] == 1
+
+        with _patched([ACME, LEGACY]):
+            assert await index.lookup("tumalo creek") is LEGACY
+        assert index.stats()["rebuilds"] == 2